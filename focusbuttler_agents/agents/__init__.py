@@ -1,8 +1,33 @@
 """Agents module initialization"""
 
-from .productivity_coach import productivity_coach, get_coaching
-from .task_categorizer import task_categorizer, categorize_task, TaskType, TaskCategorization
-from .energy_advisor import energy_advisor, get_energy_advice, EnergyAdvice
+from .productivity_coach import (
+    productivity_coach,
+    productivity_coach_fast,
+    get_coaching,
+    stream_coaching,
+    coaching_cascade,
+)
+from .memory_consolidator import memory_consolidator
+from .context_builder import context_builder
+from .task_categorizer import (
+    task_categorizer,
+    task_batch_categorizer,
+    categorize_task,
+    categorize_tasks,
+    categorization_cache,
+    fast_classifier,
+    TaskType,
+    TaskCategorization,
+)
+from .energy_advisor import (
+    energy_advisor,
+    energy_advisor_stream,
+    get_energy_advice,
+    stream_energy_advice,
+    advise_uncached,
+    energy_table,
+    EnergyAdvice,
+)
 from .focus_guardian import (
     focus_guardian,
     start_session_message,
@@ -10,25 +35,52 @@ from .focus_guardian import (
     distraction_recovery,
     end_session_message,
     stream_session_insights,
+    session_scheduler,
+    message_pool,
+    all_pool_buckets,
 )
+from .day_planner import day_plan_narrator, plan_day, plan_batch, PlanRequest, DayPlan
 
 __all__ = [
     # Agents
     "productivity_coach",
+    "productivity_coach_fast",
     "task_categorizer", 
+    "task_batch_categorizer",
     "energy_advisor",
+    "energy_advisor_stream",
     "focus_guardian",
+    "day_plan_narrator",
     # Functions
     "get_coaching",
+    "stream_coaching",
     "categorize_task",
+    "categorize_tasks",
     "get_energy_advice",
+    "stream_energy_advice",
+    "advise_uncached",
     "start_session_message",
     "mid_session_check",
     "distraction_recovery",
     "end_session_message",
     "stream_session_insights",
+    "plan_day",
+    "plan_batch",
+    # Schedulers
+    "session_scheduler",
+    "memory_consolidator",
+    "context_builder",
+    "coaching_cascade",
+    # Caches
+    "categorization_cache",
+    "message_pool",
+    "energy_table",
+    "all_pool_buckets",
+    "fast_classifier",
     # Types
     "TaskType",
     "TaskCategorization",
     "EnergyAdvice",
+    "PlanRequest",
+    "DayPlan",
 ]
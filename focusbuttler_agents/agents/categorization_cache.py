@@ -0,0 +1,178 @@
+"""
+Categorization Cache
+
+Two-tier result cache that sits in front of the TaskCategorizer agent.
+Users capture the same task titles over and over ("reply to emails", "standup"),
+so repeat titles are answered from a bounded in-memory LRU, backed by an
+on-disk SQLite store that survives restarts.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Generic, TypeVar
+
+from pydantic import BaseModel
+
+from core.storage import Storage
+
+
+M = TypeVar("M", bound=BaseModel)
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+_MAX_KEYS_PER_QUERY = 500  # Below SQLite's bound-parameter limit
+
+
+def normalize_title(task_title: str) -> str:
+    """Normalize a task title for cache lookups (case, whitespace, punctuation)"""
+    text = _PUNCTUATION.sub(" ", task_title.casefold())
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class CategorizationCache(Generic[M]):
+    """Bounded LRU with TTL, backed by a persistent SQLite table"""
+
+    def __init__(
+        self,
+        model: type[M],
+        storage: Storage | None = None,
+        max_entries: int = 10_000,
+        ttl_seconds: float = 7 * 24 * 60 * 60,
+    ):
+        self.model = model
+        self.storage = storage
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._memory: OrderedDict[str, tuple[float, M]] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if storage is not None:
+            storage.ensure_schema(
+                """CREATE TABLE IF NOT EXISTS categorization_cache (
+                    key TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )"""
+            )
+
+    def get(self, task_title: str) -> M | None:
+        """Return the cached result for a title, or None on a miss
+
+        Reads SQLite on a miss, so use `aget` on the event loop.
+        """
+        key = normalize_title(task_title)
+        now = time.time()
+
+        with self._lock:
+            result = self._from_memory(key, now)
+            if result is None and self.storage is not None:
+                rows = self.storage.query(
+                    "SELECT key, payload, created_at FROM categorization_cache WHERE key = ?",
+                    (key,),
+                )
+                result = self._from_disk(rows, now).get(key)
+            if result is None:
+                self.misses += 1
+            return result
+
+    async def aget(self, task_title: str) -> M | None:
+        """`get` with the SQLite read done off the event loop"""
+        return (await self.aget_many([task_title]))[0]
+
+    async def aget_many(self, task_titles: list[str]) -> list[M | None]:
+        """Cached results for many titles, with one SQLite read for the memory misses"""
+        keys = [normalize_title(title) for title in task_titles]
+        now = time.time()
+
+        with self._lock:
+            found = {key: result for key in set(keys) if (result := self._from_memory(key, now)) is not None}
+        missing = [key for key in set(keys) if key not in found]
+
+        if missing and self.storage is not None:
+            for start in range(0, len(missing), _MAX_KEYS_PER_QUERY):
+                batch = missing[start:start + _MAX_KEYS_PER_QUERY]
+                rows = await self.storage.aquery(
+                    "SELECT key, payload, created_at FROM categorization_cache "
+                    f"WHERE key IN ({', '.join('?' * len(batch))})",
+                    batch,
+                )
+                with self._lock:
+                    found.update(self._from_disk(rows, now))
+
+        results = [found.get(key) for key in keys]
+        with self._lock:
+            # Repeated titles were looked up once but count once per title
+            self.hits += sum(1 for result in results if result is not None) - len(found)
+            self.misses += sum(1 for result in results if result is None)
+        return results
+
+    def set(self, task_title: str, result: M) -> None:
+        """Store a result for a title in both tiers"""
+        key = normalize_title(task_title)
+        now = time.time()
+
+        with self._lock:
+            self._remember(key, now, result)
+            if self.storage is not None:
+                self.storage.write_nowait(
+                    "INSERT OR REPLACE INTO categorization_cache (key, payload, created_at) "
+                    "VALUES (?, ?, ?)",
+                    (key, result.model_dump_json(), now),
+                )
+
+    def clear(self) -> None:
+        """Drop every cached entry from memory and disk"""
+        with self._lock:
+            self._memory.clear()
+            if self.storage is not None:
+                self.storage.write_nowait("DELETE FROM categorization_cache").result()
+
+    def stats(self) -> dict:
+        """Hit/miss counters for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "max_entries": self.max_entries,
+        }
+
+    def _from_memory(self, key: str, now: float) -> M | None:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        created_at, result = entry
+        if now - created_at >= self.ttl_seconds:
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def _from_disk(self, rows: list[tuple], now: float) -> dict[str, M]:
+        """Fresh results from `categorization_cache` rows; expired rows are deleted"""
+        found = {}
+        for key, payload, created_at in rows:
+            if now - created_at < self.ttl_seconds:
+                found[key] = self.model.model_validate_json(payload)
+                self._remember(key, created_at, found[key])
+                self.hits += 1
+                self.disk_hits += 1
+            else:
+                self.storage.write_nowait("DELETE FROM categorization_cache WHERE key = ?", (key,))
+        return found
+
+    def _remember(self, key: str, created_at: float, result: M) -> None:
+        self._memory[key] = (created_at, result)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
@@ -0,0 +1,401 @@
+"""
+Context Builder
+
+Builds the memory context for the coach and the team within a per-agent
+input-token budget, instead of letting agno inject every user memory plus
+the last runs into each prompt. Prompts stay the same size as a user's
+history grows.
+
+- Memories are deduplicated (near-identical wording keeps the newest), then
+  ranked by word overlap with the question and by recency. They are cached
+  per user; with several workers, a version row per user in SQLite is bumped
+  when they change, so every worker drops its stale copy.
+- The last CONTEXT_RECENT_RUNS runs per user and agent are kept verbatim.
+  Older runs are folded into a rolling summary, which is stored and only
+  changes when new runs push old ones out of the recent window.
+- Memories get up to half of the budget, then recent runs and the summary
+  take what they need; whatever is left goes to further memories.
+
+Prompt tokens before (what agno used to inject) and after compaction are
+recorded per agent for /metrics and /v1/context/stats. Set
+CONTEXT_COMPACTION=0 to go back to agno's own memory injection.
+"""
+
+import asyncio
+import json
+import math
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from core.metrics import metrics, span
+from core.storage import Storage, get_storage
+from core.workers import worker_count
+from knowledge.bm25_index import tokenize
+
+
+CONTEXT_COMPACTION = os.getenv("CONTEXT_COMPACTION", "1") == "1"
+DEFAULT_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
+# Per-agent overrides, e.g. CONTEXT_BUDGETS='{"HyperfocusTeam": 1600}'
+BUDGETS = json.loads(os.getenv("CONTEXT_BUDGETS", "{}"))
+RECENT_RUNS = int(os.getenv("CONTEXT_RECENT_RUNS", "3"))
+SUMMARY_TOKENS = int(os.getenv("CONTEXT_SUMMARY_TOKENS", "300"))
+MEMORY_HALF_LIFE_DAYS = float(os.getenv("CONTEXT_MEMORY_HALF_LIFE_DAYS", "30"))
+MEMORY_CACHE_SECONDS = float(os.getenv("CONTEXT_MEMORY_CACHE_SECONDS", "300"))
+MEMORY_SHARE = 0.5  # Of the budget, before runs and the summary take theirs
+RUN_MAX_TOKENS = 200
+SUMMARY_LINE_CHARS = 160
+DUPLICATE_SIMILARITY = 0.8
+# What agno injected before compaction: every memory plus this many runs
+UNCOMPACTED_RUNS = 5
+RUN_FETCH = 50
+MAX_MEMORIES = 200
+STATS_WINDOW = 1000
+
+context_tokens = metrics.histogram(
+    "hyperfocus_context_prompt_tokens",
+    "Estimated prompt tokens before and after context compaction",
+    ("agent", "stage"),
+    buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768),
+)
+
+
+def count_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)"""
+    return math.ceil(len(text) / 4)
+
+
+def _truncate(text: str, tokens: int) -> str:
+    text = " ".join(text.split())
+    limit = tokens * 4
+    return text if len(text) <= limit else text[: limit - 1].rstrip() + "…"
+
+
+@dataclass
+class _Memory:
+    text: str
+    updated_at: float
+    words: frozenset
+
+
+@dataclass
+class _Summary:
+    through_id: int
+    text: str
+
+
+class ContextBuilder:
+    """Ranked memories, recent runs and a rolling summary, within a token budget"""
+
+    def __init__(self, storage: Storage):
+        self.storage = storage
+        self._db = None
+        self._memories: dict[str, tuple[float, int, tuple[list[_Memory], int]]] = {}
+        self._summaries: dict[tuple[str, str], _Summary] = {}
+        self._fold_lock = asyncio.Lock()
+        self._tokens: dict[str, dict[str, deque]] = {}
+
+        self.builds = 0
+        self.summary_recomputes = 0
+        self.duplicates_removed = 0
+
+        storage.ensure_schema(
+            """CREATE TABLE IF NOT EXISTS context_runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                agent TEXT NOT NULL,
+                user_message TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )""",
+            "CREATE INDEX IF NOT EXISTS context_runs_user ON context_runs (user_id, agent, id)",
+            """CREATE TABLE IF NOT EXISTS context_summaries (
+                user_id TEXT NOT NULL,
+                agent TEXT NOT NULL,
+                through_id INTEGER NOT NULL,
+                summary TEXT NOT NULL,
+                PRIMARY KEY (user_id, agent)
+            )""",
+            """CREATE TABLE IF NOT EXISTS context_memory_versions (
+                user_id TEXT PRIMARY KEY,
+                version INTEGER NOT NULL
+            )""",
+        )
+
+    def record_run(self, user_id: str, agent: str, user_message: str, response: str) -> None:
+        """Keep a completed run for the next prompt's context"""
+        if not CONTEXT_COMPACTION:
+            return
+        self.storage.write_nowait(
+            "INSERT INTO context_runs (user_id, agent, user_message, response, created_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (user_id, agent, user_message, response, time.time()),
+        )
+
+    def invalidate(self, user_id: str) -> None:
+        """Drop cached memories after they change, in every worker"""
+        self._memories.pop(user_id, None)
+        if worker_count() > 1:
+            self.storage.write_nowait(
+                "INSERT INTO context_memory_versions (user_id, version) VALUES (?, 1) "
+                "ON CONFLICT (user_id) DO UPDATE SET version = version + 1",
+                (user_id,),
+            )
+
+    async def build(self, agent: str, user_id: str, question: str) -> str:
+        """The prompt for `question` with the user's compacted context"""
+        if not CONTEXT_COMPACTION:
+            return question
+        with span("context"):
+            budget = BUDGETS.get(agent, DEFAULT_BUDGET)
+            (memories, memory_tokens), (summary, runs, last_runs) = await asyncio.gather(
+                self._user_memories(user_id), self._history(user_id, agent)
+            )
+
+            ranked = self._rank(memories, question)
+            lines, unused = _take_memories(ranked, int(budget * MEMORY_SHARE))
+            remaining = budget - int(budget * MEMORY_SHARE) + unused
+
+            exchanges = []
+            for _, message, response in reversed(runs):
+                exchange = (
+                    f"User: {_truncate(message, RUN_MAX_TOKENS // 2)}\n"
+                    f"You: {_truncate(response, RUN_MAX_TOKENS)}"
+                )
+                cost = count_tokens(exchange)
+                if cost > remaining:
+                    break
+                exchanges.insert(0, exchange)
+                remaining -= cost
+            summary_text = _truncate_lines(summary.text, remaining) if summary.text else ""
+            remaining -= count_tokens(summary_text)
+            more, _ = _take_memories(ranked[len(lines):], remaining)
+            lines += more
+
+            sections = []
+            if lines:
+                sections.append("What you know about the user:\n" + "\n".join(lines))
+            if summary_text:
+                sections.append("Earlier conversations:\n" + summary_text)
+            if exchanges:
+                sections.append("Recent conversations:\n" + "\n\n".join(exchanges))
+
+            prompt = "\n\n".join(sections + [f"Current message:\n{question}"]) if sections else question
+            self._record(agent, memory_tokens, last_runs, question, prompt)
+            return prompt
+
+    def stats(self) -> dict:
+        return {
+            "enabled": CONTEXT_COMPACTION,
+            "builds": self.builds,
+            "summary_recomputes": self.summary_recomputes,
+            "duplicates_removed": self.duplicates_removed,
+            "agents": {
+                agent: {
+                    "budget": BUDGETS.get(agent, DEFAULT_BUDGET),
+                    **{
+                        f"{stage}_tokens_p{int(q * 100)}": _percentile(samples, q)
+                        for stage, samples in stages.items()
+                        for q in (0.5, 0.95)
+                    },
+                }
+                for agent, stages in self._tokens.items()
+            },
+        }
+
+    # Memories
+
+    async def _user_memories(self, user_id: str) -> tuple[list[_Memory], int]:
+        """Deduplicated memories, and the tokens of all of them before deduplication"""
+        cached = self._memories.get(user_id)
+        fresh = cached is not None and time.monotonic() - cached[0] < MEMORY_CACHE_SECONDS
+        version = 0
+        if worker_count() > 1:
+            # Read before loading, so a change made meanwhile shows up next time
+            version = await self._memory_version(user_id)
+            fresh = fresh and cached[1] == version
+        if fresh:
+            return cached[2]
+        try:
+            rows = await asyncio.to_thread(
+                self._agno_db().get_user_memories, user_id=user_id, limit=MAX_MEMORIES
+            )
+        except Exception as e:
+            print(f"Loading memories for {user_id} failed: {e}")
+            rows = []
+        raw = [
+            _Memory(m.memory, float(m.updated_at or 0), frozenset(tokenize(m.memory)))
+            for m in rows or []
+            if m.memory
+        ]
+        memories = (self._dedupe(raw), sum(count_tokens(m.text) for m in raw))
+        self._memories[user_id] = (time.monotonic(), version, memories)
+        return memories
+
+    async def _memory_version(self, user_id: str) -> int:
+        """How many times any worker has invalidated the user's memories"""
+        rows = await self.storage.aquery(
+            "SELECT version FROM context_memory_versions WHERE user_id = ?", (user_id,)
+        )
+        return rows[0][0] if rows else 0
+
+    def _dedupe(self, memories: list[_Memory]) -> list[_Memory]:
+        """Newest first, skipping memories that mostly repeat a kept one"""
+        kept: list[_Memory] = []
+        for memory in sorted(memories, key=lambda m: m.updated_at, reverse=True):
+            if any(_similarity(memory.words, other.words) >= DUPLICATE_SIMILARITY for other in kept):
+                self.duplicates_removed += 1
+                continue
+            kept.append(memory)
+        return kept
+
+    @staticmethod
+    def _rank(memories: list[_Memory], question: str) -> list[_Memory]:
+        words = set(tokenize(question))
+        now = time.time()
+
+        def score(memory: _Memory) -> float:
+            relevance = len(words & memory.words) / len(words) if words else 0.0
+            age_days = max(0.0, now - memory.updated_at) / 86400
+            return relevance + 0.5 * 0.5 ** (age_days / MEMORY_HALF_LIFE_DAYS)
+
+        return sorted(memories, key=score, reverse=True)
+
+    # Runs
+
+    async def _history(self, user_id: str, agent: str) -> tuple[_Summary, list[tuple], list[tuple]]:
+        """The rolling summary, the runs after it, and the latest runs regardless
+
+        Runs beyond the recent window are folded into the summary first.
+        Folded runs are deleted, except the last few, which are kept so the
+        uncompacted prompt size can still be reported.
+        """
+        summary = await self._summary(user_id, agent)
+        latest = await self.storage.aquery(
+            "SELECT id, user_message, response FROM context_runs "
+            "WHERE user_id = ? AND agent = ? ORDER BY id DESC LIMIT ?",
+            (user_id, agent, RUN_FETCH),
+        )
+        latest.reverse()
+        runs = [run for run in latest if run[0] > summary.through_id]
+        if len(runs) > RECENT_RUNS:
+            async with self._fold_lock:
+                summary = self._summaries[(user_id, agent)]
+                runs = [run for run in runs if run[0] > summary.through_id]
+                folded, runs = runs[:-RECENT_RUNS], runs[-RECENT_RUNS:]
+                if folded:
+                    summary = self._fold(user_id, agent, summary, folded, latest)
+        return summary, runs, latest[-UNCOMPACTED_RUNS:]
+
+    def _fold(self, user_id: str, agent: str, summary: _Summary, folded: list[tuple], latest: list[tuple]) -> _Summary:
+        summary = _Summary(folded[-1][0], _roll(summary.text, folded))
+        self._summaries[(user_id, agent)] = summary
+        self.summary_recomputes += 1
+        self.storage.write_nowait(
+            "INSERT INTO context_summaries (user_id, agent, through_id, summary) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (user_id, agent) DO UPDATE SET through_id = excluded.through_id, "
+            "summary = excluded.summary WHERE excluded.through_id > context_summaries.through_id",
+            (user_id, agent, summary.through_id, summary.text),
+        )
+        keep_from = latest[-UNCOMPACTED_RUNS][0] if len(latest) >= UNCOMPACTED_RUNS else 0
+        self.storage.write_nowait(
+            "DELETE FROM context_runs WHERE user_id = ? AND agent = ? AND id <= ? AND id < ?",
+            (user_id, agent, summary.through_id, keep_from),
+        )
+        return summary
+
+    async def _summary(self, user_id: str, agent: str) -> _Summary:
+        """The cached summary, or the stored one if it is further along (another worker folded)"""
+        cached = self._summaries.get((user_id, agent))
+        if cached is not None and worker_count() == 1:
+            return cached
+        rows = await self.storage.aquery(
+            "SELECT through_id, summary FROM context_summaries WHERE user_id = ? AND agent = ?",
+            (user_id, agent),
+        )
+        summary = _Summary(*rows[0]) if rows else _Summary(0, "")
+        current = self._summaries.get((user_id, agent))
+        if current is None or summary.through_id > current.through_id:
+            self._summaries[(user_id, agent)] = summary
+        return self._summaries[(user_id, agent)]
+
+    # Reporting
+
+    def _record(self, agent: str, memory_tokens: int, last_runs: list[tuple], question: str, prompt: str) -> None:
+        """Tokens agno would have sent (every memory, last runs in full) vs. the built prompt"""
+        before = memory_tokens + count_tokens(question) + sum(
+            count_tokens(message) + count_tokens(response) for _, message, response in last_runs
+        )
+        after = count_tokens(prompt)
+        self.builds += 1
+        stages = self._tokens.setdefault(
+            agent, {"before": deque(maxlen=STATS_WINDOW), "after": deque(maxlen=STATS_WINDOW)}
+        )
+        for stage, tokens in (("before", before), ("after", after)):
+            stages[stage].append(tokens)
+            context_tokens.observe(tokens, agent=agent, stage=stage)
+
+    def _agno_db(self):
+        if self._db is None:
+            self._db = self.storage.agno_db()
+        return self._db
+
+
+def _take_memories(ranked: list[_Memory], tokens: int) -> tuple[list[str], int]:
+    """Lines for the best-ranked memories that fit, and the tokens left over"""
+    lines = []
+    for memory in ranked:
+        cost = count_tokens(memory.text) + 1
+        if cost > tokens:
+            break
+        lines.append(f"- {memory.text}")
+        tokens -= cost
+    return lines, tokens
+
+
+def _roll(summary: str, runs: list[tuple]) -> str:
+    """Append one line per folded run; the oldest lines fall off past the budget"""
+    lines = summary.splitlines() if summary else []
+    for _, message, response in runs:
+        line = f"- Asked: {_truncate(message, SUMMARY_LINE_CHARS // 8)} Advised: {_first_sentence(response)}"
+        lines.append(line[:SUMMARY_LINE_CHARS])
+    return _truncate_lines("\n".join(lines), SUMMARY_TOKENS)
+
+
+def _truncate_lines(text: str, tokens: int) -> str:
+    """The newest lines of `text` that fit in `tokens`"""
+    kept, used = [], 0
+    for line in reversed(text.splitlines()):
+        cost = count_tokens(line) + 1
+        if used + cost > tokens:
+            break
+        kept.insert(0, line)
+        used += cost
+    return "\n".join(kept)
+
+
+def _first_sentence(text: str) -> str:
+    text = " ".join(text.replace("*", "").split())
+    for end in (". ", "! ", "? "):
+        index = text.find(end)
+        if 0 < index < SUMMARY_LINE_CHARS:
+            return text[: index + 1]
+    return _truncate(text, SUMMARY_LINE_CHARS // 4)
+
+
+def _similarity(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 1.0 if a == b else 0.0
+    return len(a & b) / len(a | b)
+
+
+def _percentile(samples, q: float) -> int:
+    if not samples:
+        return 0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+# Shared builder for the coach and the team
+context_builder = ContextBuilder(get_storage())
@@ -0,0 +1,567 @@
+"""
+Day Planner
+
+Builds a user's day plan locally, replacing one categorization call per task
+and one energy-advice call per hour. Tasks arrive already categorized (their
+TaskType and the energy they need). The day is first laid out over the
+user's energy curve: a Hyperfocus block wherever the curve is high enough,
+each followed by a short break, and a Scatterfocus block wherever it is not.
+Tasks are then packed into the blocks:
+
+- Purposeful tasks, and necessary tasks that need high or peak energy, go to
+  Hyperfocus blocks. Other necessary tasks go to Scatterfocus blocks, which
+  keep part of their time free for mind-wandering. Distracting tasks are
+  deferred and unnecessary tasks are dropped.
+- Tasks are admitted in the order given, purposeful before necessary, until
+  the blocks of their kind are full. The rest are returned as unscheduled.
+- Admitted tasks are placed from the most demanding to the least demanding,
+  each as a whole into the highest-energy block that still has room for it,
+  so the hardest work lands in the best window. A task that fits no block
+  whole is left unscheduled. Only a task longer than every block of its
+  kind is split: it is placed first, starting in the best block with room
+  and continuing in the blocks right after it (then right before it).
+
+Every step is a vectorized NumPy pass over all users at once. The layout
+loops over the handful of blocks in a day and placement over the k-th task
+of every user, not over users, so a nightly batch for every user takes
+seconds. The LLM is called at most once
+per plan, to write the narrative summary, and a template summary is used
+without it.
+
+The energy curve comes from the request, else the user's energy profile,
+else a typical circadian curve.
+
+Usage:
+    python -m agents.day_planner --users 10000 --tasks 500
+"""
+
+import argparse
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+from pydantic.alias_generators import to_camel
+
+from analytics.energy_profile import HOURS, energy_profiles, level_name, level_score
+from core.llm_scheduler import DeadlineExceeded
+from core.models import chat_model
+from core.registry import register_agent
+
+from .task_categorizer import TaskType
+
+
+HYPERFOCUS_MINUTES = int(os.getenv("PLAN_HYPERFOCUS_MINUTES", "90"))
+SCATTERFOCUS_MINUTES = int(os.getenv("PLAN_SCATTERFOCUS_MINUTES", "30"))
+BREAK_MINUTES = int(os.getenv("PLAN_BREAK_MINUTES", "15"))
+# Mean curve level (0 = exhausted to 4 = peak) a window needs to be a Hyperfocus block
+HYPERFOCUS_MIN_ENERGY = float(os.getenv("PLAN_HYPERFOCUS_MIN_ENERGY", "2.5"))
+MIN_HYPERFOCUS_MINUTES = 25  # A shorter window at the end of the day becomes Scatterfocus
+SCATTERFOCUS_TASK_SHARE = 0.5  # The rest of a Scatterfocus block stays unplanned
+MISMATCH_TOLERANCE = 0.5  # Levels below the need before a placement counts as a mismatch
+MAX_PLAN_TASKS = 1000
+PROMPT_TASKS_PER_BLOCK = 5
+DAY_MINUTES = HOURS * 60
+
+# Late-morning peak, post-lunch dip and a smaller afternoon peak
+DEFAULT_CURVE = (
+    0.5, 0.5, 0.5, 0.5, 0.5, 1.0, 1.5, 2.0, 2.5, 3.0, 3.5, 3.5,
+    3.0, 2.0, 2.0, 2.5, 3.0, 2.5, 2.0, 2.0, 1.5, 1.0, 0.5, 0.5,
+)
+
+BLOCK_KINDS = ("hyperfocus", "scatterfocus", "break")
+HYPERFOCUS, SCATTERFOCUS, BREAK = range(3)
+# Per-task outcome in a BatchPlan
+SCHEDULED, UNSCHEDULED, DEFERRED, DROPPED = range(4)
+# TaskType codes in batch arrays are indices into this tuple
+TASK_TYPES = tuple(TaskType)
+_PURPOSEFUL, _NECESSARY, _DISTRACTING, _UNNECESSARY = (TASK_TYPES.index(t) for t in TaskType)
+_HIGH_ENERGY = level_score("high")
+
+
+class PlanTaskIn(BaseModel):
+    """One categorized task; camelCase (app JSON) and snake_case keys are both accepted"""
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+    title: str
+    task_type: TaskType
+    estimated_energy_required: str = "moderate"  # low, moderate, high, peak
+    estimated_minutes: int = Field(30, ge=5, le=480)
+
+
+class PlanRequest(BaseModel):
+    """A day to plan"""
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+    user_id: str = ""
+    tasks: list[PlanTaskIn] = Field(max_length=MAX_PLAN_TASKS)
+    energy_curve: Optional[list[float]] = Field(None, min_length=HOURS, max_length=HOURS)  # Level per hour
+    start_hour: int = Field(9, ge=0, le=23)
+    end_hour: int = Field(17, ge=1, le=24)
+    narrative: bool = True  # Have the model write the summary
+
+    @model_validator(mode="after")
+    def _check_hours(self):
+        if self.end_hour <= self.start_hour:
+            raise ValueError("end_hour must be after start_hour")
+        return self
+
+
+class PlannedTask(BaseModel):
+    """A task, or the part of one, placed in a block"""
+    title: str
+    task_type: TaskType
+    estimated_energy_required: str
+    start: str  # HH:MM
+    end: str
+    minutes: int
+    continued: bool  # Started in an earlier block
+
+
+class PlanBlock(BaseModel):
+    """A Hyperfocus, Scatterfocus or break block"""
+    kind: str
+    start: str
+    end: str
+    energy: float  # Mean curve level over the block
+    energy_level: str
+    tasks: list[PlannedTask]
+
+
+class DayPlan(BaseModel):
+    """A scheduled day"""
+    user_id: str
+    blocks: list[PlanBlock]
+    unscheduled: list[str]  # Did not fit in today's blocks
+    deferred: list[str]  # Distracting: batch them into a break or another day
+    dropped: list[str]  # Unnecessary
+    energy_mismatches: int  # Scheduled tasks placed below the energy they need
+    summary: str
+    summary_source: str  # model or template
+
+
+@dataclass
+class BatchPlan:
+    """Plans for many users as flat arrays
+
+    Blocks are sorted by user and start time. Segments are the scheduled
+    pieces of tasks (one per block a task occupies).
+    """
+    block_user: np.ndarray
+    block_kind: np.ndarray
+    block_start: np.ndarray  # Minutes after midnight
+    block_minutes: np.ndarray
+    block_energy: np.ndarray
+    status: np.ndarray  # Per task: SCHEDULED, UNSCHEDULED, DEFERRED or DROPPED
+    energy_gap: np.ndarray  # Per task: lowest block energy minus the energy needed (NaN if not scheduled)
+    segment_task: np.ndarray
+    segment_block: np.ndarray
+    segment_start: np.ndarray
+    segment_minutes: np.ndarray
+
+
+def layout_blocks(curves: np.ndarray, start_minute, end_minute) -> tuple[np.ndarray, ...]:
+    """Hyperfocus, break and Scatterfocus blocks for every user's day
+
+    `curves` is (users, 24) levels; the day runs [start_minute, end_minute).
+    Returns (user, kind, start, minutes, energy) sorted by user and start.
+    """
+    n = len(curves)
+    rows = np.arange(n)
+    integral = np.zeros((n, HOURS + 1))
+    integral[:, 1:] = np.cumsum(curves, axis=1) * 60
+
+    def area(users: np.ndarray, minute: np.ndarray) -> np.ndarray:
+        hour = np.minimum(minute // 60, HOURS - 1)
+        return integral[users, hour] + curves[users, hour] * (minute - hour * 60)
+
+    def mean_energy(users: np.ndarray, begin: np.ndarray, length: np.ndarray) -> np.ndarray:
+        return (area(users, begin + length) - area(users, begin)) / np.maximum(length, 1)
+
+    t = np.broadcast_to(np.asarray(start_minute, dtype=np.int64), (n,)).copy()
+    end = np.broadcast_to(np.asarray(end_minute, dtype=np.int64), (n,))
+    parts = []
+
+    def add(mask: np.ndarray, begin: np.ndarray, length: np.ndarray, kind: int) -> None:
+        users = rows[mask]
+        parts.append((
+            users, np.full(len(users), kind), begin[mask], length[mask],
+            mean_energy(users, begin[mask], length[mask]),
+        ))
+
+    while True:
+        left = end - t
+        active = left > 0
+        if not active.any():
+            break
+        span = np.minimum(HYPERFOCUS_MINUTES, left)
+        hyper = (
+            active
+            & (span >= MIN_HYPERFOCUS_MINUTES)
+            & (mean_energy(rows, t, span) >= HYPERFOCUS_MIN_ENERGY)
+        )
+        length = np.where(hyper, span, np.minimum(SCATTERFOCUS_MINUTES, left))
+        add(hyper, t, length, HYPERFOCUS)
+        add(active & ~hyper, t, length, SCATTERFOCUS)
+        t = np.where(active, t + length, t)
+        rest = hyper & (t < end)
+        pause = np.minimum(BREAK_MINUTES, end - t)
+        add(rest, t, pause, BREAK)
+        t = np.where(rest, t + pause, t)
+
+    if not parts:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty, empty, np.zeros(0)
+    user, kind, start, minutes, energy = (np.concatenate(column) for column in zip(*parts))
+    order = np.lexsort((start, user))
+    user, kind, start, minutes, energy = user[order], kind[order], start[order], minutes[order], energy[order]
+
+    # Back-to-back Scatterfocus windows become one block
+    scatter = kind == SCATTERFOCUS
+    joined = np.r_[False, scatter[1:] & scatter[:-1] & (user[1:] == user[:-1])]
+    run = np.cumsum(~joined) - 1
+    merged_minutes = np.bincount(run, minutes).astype(np.int64)
+    merged_energy = np.bincount(run, energy * minutes) / np.maximum(merged_minutes, 1)
+    return user[~joined], kind[~joined], start[~joined], merged_minutes, merged_energy
+
+
+def plan_batch(
+    task_user: np.ndarray,
+    task_type: np.ndarray,
+    energy_required: np.ndarray,
+    minutes: np.ndarray,
+    curves: np.ndarray,
+    start_minute=9 * 60,
+    end_minute=17 * 60,
+) -> BatchPlan:
+    """Schedule every user's tasks in one pass
+
+    Tasks are flat arrays: the row of their user in `curves`, the index of
+    their TaskType in TASK_TYPES, the energy they need (0-4) and their
+    length in minutes. A user's tasks are admitted in array order.
+    """
+    curves = np.asarray(curves, dtype=float)
+    task_user = np.asarray(task_user, dtype=np.int64)
+    task_type = np.asarray(task_type)
+    energy_required = np.asarray(energy_required, dtype=float)
+    minutes = np.maximum(np.asarray(minutes, dtype=np.int64), 1)
+    block_user, block_kind, block_start, block_minutes, block_energy = layout_blocks(
+        curves, start_minute, end_minute
+    )
+
+    status = np.full(len(task_user), UNSCHEDULED, dtype=np.int8)
+    status[task_type == _DISTRACTING] = DEFERRED
+    status[task_type == _UNNECESSARY] = DROPPED
+    group = np.full(len(task_user), -1, dtype=np.int64)
+    demanding = (task_type == _PURPOSEFUL) | ((task_type == _NECESSARY) & (energy_required >= _HIGH_ENERGY))
+    group[demanding] = HYPERFOCUS
+    group[(task_type == _NECESSARY) & ~demanding] = SCATTERFOCUS
+
+    # One packing group per (user, block kind); capacity is in minutes
+    capacity = np.where(
+        block_kind == HYPERFOCUS,
+        block_minutes,
+        np.where(block_kind == SCATTERFOCUS, (block_minutes * SCATTERFOCUS_TASK_SHARE).astype(np.int64), 0),
+    )
+    block_key = block_user * 2 + np.minimum(block_kind, 1)
+    usable = np.flatnonzero(capacity > 0)
+    group_capacity = np.bincount(block_key[usable], capacity[usable], 2 * len(curves))
+
+    # Admission: in order (purposeful first) until the group is full
+    candidates = np.flatnonzero(group >= 0)
+    key = task_user * 2 + group
+    rank = (task_type != _PURPOSEFUL).astype(np.int8)
+    order = candidates[np.lexsort((candidates, rank[candidates], key[candidates]))]
+    fits = _group_cumsum(key[order], minutes[order]) <= group_capacity[key[order]]
+    admitted = order[fits]
+
+    # Placement: most demanding tasks into the highest-energy blocks
+    segment_task, segment_block, segment_start, segment_minutes = _place(
+        admitted, key[admitted], minutes[admitted], -energy_required[admitted], rank[admitted],
+        usable, block_key, block_start, capacity, block_energy,
+    )
+    placed = np.unique(segment_task)
+    status[placed] = SCHEDULED
+    energy_gap = np.full(len(task_user), np.nan)
+    if len(placed):
+        gaps = block_energy[segment_block] - energy_required[segment_task]
+        offsets = np.flatnonzero(np.r_[True, segment_task[1:] != segment_task[:-1]])
+        energy_gap[placed] = np.minimum.reduceat(gaps, offsets)
+    return BatchPlan(
+        block_user=block_user,
+        block_kind=block_kind,
+        block_start=block_start,
+        block_minutes=block_minutes,
+        block_energy=block_energy,
+        status=status,
+        energy_gap=energy_gap,
+        segment_task=segment_task,
+        segment_block=segment_block,
+        segment_start=segment_start,
+        segment_minutes=segment_minutes,
+    )
+
+
+def _place(
+    tasks: np.ndarray,
+    task_key: np.ndarray,
+    task_minutes: np.ndarray,
+    demand: np.ndarray,
+    rank: np.ndarray,
+    blocks: np.ndarray,
+    block_key: np.ndarray,
+    block_start: np.ndarray,
+    capacity: np.ndarray,
+    block_energy: np.ndarray,
+) -> tuple[np.ndarray, ...]:
+    """Place admitted tasks into their group's blocks; returns segments sorted by task and start
+
+    Each packing group's blocks form one row of a grid, in time order. Round
+    k places the k-th task of every group at once, so the loop runs as many
+    times as the longest group has tasks.
+    """
+    empty = np.zeros(0, dtype=np.int64)
+    if len(tasks) == 0:
+        return empty, empty, empty, empty
+    blocks = blocks[np.lexsort((block_start[blocks], block_key[blocks]))]
+    groups, group_first, row_of_block = np.unique(block_key[blocks], return_index=True, return_inverse=True)
+    column = np.arange(len(blocks)) - group_first[row_of_block]
+    shape = (len(groups), int(column.max()) + 1)
+    free = np.zeros(shape, dtype=np.int64)
+    free[row_of_block, column] = capacity[blocks]
+    cell = np.full(shape, -1, dtype=np.int64)
+    cell[row_of_block, column] = blocks
+    energy = np.full(shape, -np.inf)
+    energy[row_of_block, column] = block_energy[blocks]
+    best_first = np.argsort(-energy, axis=1, kind="stable")  # Columns to try, best energy first
+    largest = free.max(axis=1)
+
+    rows = np.searchsorted(groups, task_key)
+    oversized = task_minutes > largest[rows]
+    order = np.lexsort((tasks, rank, demand, ~oversized, task_key))
+    turn = _group_cumsum(task_key[order], np.ones(len(order), dtype=np.int64)) - 1
+    columns = np.arange(shape[1])
+    pieces = []
+
+    def cut(task_index: np.ndarray, row: np.ndarray, col: np.ndarray, length: np.ndarray) -> None:
+        used = capacity[cell[row, col]] - free[row, col]
+        free[row, col] -= length
+        block = cell[row, col]
+        pieces.append((tasks[task_index], block, block_start[block] + used, length))
+
+    for k in range(int(turn.max()) + 1):
+        now = order[turn == k]
+        row, length = rows[now], task_minutes[now]
+
+        # Whole tasks: the first block in energy order with room
+        whole = ~oversized[now]
+        room = np.take_along_axis(free[row], best_first[row], axis=1) >= length[:, None]
+        fits = whole & room.any(axis=1)
+        col = best_first[row, room.argmax(axis=1)]
+        cut(now[fits], row[fits], col[fits], length[fits])
+
+        # Oversized tasks: from the best block with room, forwards in time, then backwards
+        split = ~whole & (free[row].sum(axis=1) >= length)
+        if split.any():
+            row, length, now = row[split], length[split], now[split]
+            has_room = np.take_along_axis(free[row], best_first[row], axis=1) > 0
+            start = best_first[row, has_room.argmax(axis=1)][:, None]
+            distance = np.where(columns >= start, columns - start, shape[1] - 1 - columns)
+            sequence = np.argsort(distance, axis=1, kind="stable")
+            available = np.take_along_axis(free[row], sequence, axis=1)
+            taken = np.clip(length[:, None] - (np.cumsum(available, axis=1) - available), 0, available)
+            piece_row, piece_step = np.nonzero(taken)
+            cut(now[piece_row], row[piece_row], sequence[piece_row, piece_step], taken[piece_row, piece_step])
+
+    segment_task, segment_block, segment_start, segment_minutes = (
+        np.concatenate(parts) for parts in zip(*pieces)
+    )
+    by_task = np.lexsort((segment_start, segment_task))
+    return segment_task[by_task], segment_block[by_task], segment_start[by_task], segment_minutes[by_task]
+
+
+def _group_cumsum(keys: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Inclusive running sum of `values` restarting at each new key (keys sorted)"""
+    if len(keys) == 0:
+        return np.zeros(0, dtype=np.int64)
+    total = np.cumsum(values)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    lengths = np.diff(np.r_[starts, len(keys)])
+    return total - np.repeat(total[starts] - values[starts], lengths)
+
+
+# Narrative writer - the only model call a plan makes
+def _build_day_plan_narrator():
+    from agno.agent import Agent
+
+    return Agent(
+        name="DayPlanNarrator",
+        model=chat_model("mistral-small-latest"),
+        description="Writes a short, encouraging overview of a day plan built with the Hyperfocus method.",
+        instructions="""You receive a day plan that has already been scheduled.
+Do not change it. In 3-4 sentences, tell the user how their day is shaped: when the
+Hyperfocus blocks are and what they are for, how to use the Scatterfocus blocks and
+breaks to recharge, and what was left out. Be specific and encouraging.""",
+        markdown=False,
+    )
+
+
+day_plan_narrator = register_agent("DayPlanNarrator", _build_day_plan_narrator)
+
+
+async def plan_day(request: PlanRequest) -> DayPlan:
+    """Schedule one user's tasks, with a narrative summary from at most one model call"""
+    tasks = request.tasks
+    batch = plan_batch(
+        np.zeros(len(tasks), dtype=np.int64),
+        np.array([TASK_TYPES.index(task.task_type) for task in tasks], dtype=np.int64),
+        np.array([_required_energy(task.estimated_energy_required) for task in tasks], dtype=float),
+        np.array([task.estimated_minutes for task in tasks], dtype=np.int64),
+        _energy_curve(request)[None, :],
+        request.start_hour * 60,
+        request.end_hour * 60,
+    )
+    plan = _day_plan(request, batch)
+    if request.narrative and any(block.tasks for block in plan.blocks):
+        try:
+            response = await day_plan_narrator.arun(_summary_prompt(plan))
+            if response.content:
+                plan.summary, plan.summary_source = str(response.content).strip(), "model"
+        except Exception as e:
+            # The template summary stands in for the model's
+            if not isinstance(e, DeadlineExceeded):
+                print(f"Day plan summary failed: {e}")
+    return plan
+
+
+def _required_energy(level: str) -> int:
+    score = level_score(level)
+    return level_score("moderate") if score is None else score
+
+
+def _energy_curve(request: PlanRequest) -> np.ndarray:
+    if request.energy_curve is not None:
+        return np.clip(np.array(request.energy_curve, dtype=float), 0, 4)
+    curve = np.array(DEFAULT_CURVE)
+    profile = energy_profiles.get(request.user_id) if request.user_id else None
+    if profile is not None:
+        hourly = np.array([np.nan if level is None else level for level in profile.hourly])
+        curve = np.where(np.isnan(hourly), curve, hourly)
+    return curve
+
+
+def _clock(minute: int) -> str:
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+def _day_plan(request: PlanRequest, batch: BatchPlan) -> DayPlan:
+    tasks = request.tasks
+    pieces: dict[int, list[PlannedTask]] = {}
+    seen = set()
+    for i in np.argsort(batch.segment_start, kind="stable").tolist():
+        index = int(batch.segment_task[i])
+        task = tasks[index]
+        start = int(batch.segment_start[i])
+        pieces.setdefault(int(batch.segment_block[i]), []).append(PlannedTask(
+            title=task.title,
+            task_type=task.task_type,
+            estimated_energy_required=task.estimated_energy_required,
+            start=_clock(start),
+            end=_clock(start + int(batch.segment_minutes[i])),
+            minutes=int(batch.segment_minutes[i]),
+            continued=index in seen,
+        ))
+        seen.add(index)
+
+    blocks = [
+        PlanBlock(
+            kind=BLOCK_KINDS[int(batch.block_kind[b])],
+            start=_clock(int(batch.block_start[b])),
+            end=_clock(int(batch.block_start[b] + batch.block_minutes[b])),
+            energy=round(float(batch.block_energy[b]), 2),
+            energy_level=level_name(float(batch.block_energy[b])),
+            tasks=pieces.get(b, []),
+        )
+        for b in range(len(batch.block_start))
+    ]
+    def titles(outcome: int) -> list[str]:
+        return [tasks[i].title for i in np.flatnonzero(batch.status == outcome).tolist()]
+
+    plan = DayPlan(
+        user_id=request.user_id,
+        blocks=blocks,
+        unscheduled=titles(UNSCHEDULED),
+        deferred=titles(DEFERRED),
+        dropped=titles(DROPPED),
+        energy_mismatches=int(np.sum(batch.energy_gap < -MISMATCH_TOLERANCE)),
+        summary="",
+        summary_source="template",
+    )
+    plan.summary = _template_summary(plan)
+    return plan
+
+
+def _template_summary(plan: DayPlan) -> str:
+    hyper = [block for block in plan.blocks if block.kind == "hyperfocus"]
+    scheduled = sum(not task.continued for block in plan.blocks for task in block.tasks)
+    if not scheduled:
+        return "Nothing to schedule today: add purposeful or necessary tasks to build a plan."
+    parts = [f"{scheduled} tasks planned across {len(hyper)} Hyperfocus blocks"]
+    if hyper:
+        best = max(hyper, key=lambda block: block.energy)
+        parts.append(f"your most demanding work is at {best.start}-{best.end}, when energy is {best.energy_level}")
+    if plan.unscheduled:
+        parts.append(f"{len(plan.unscheduled)} tasks did not fit and carry over")
+    if plan.deferred:
+        parts.append(f"{len(plan.deferred)} distracting tasks are deferred to breaks")
+    if plan.dropped:
+        parts.append(f"{len(plan.dropped)} unnecessary tasks were dropped")
+    return "; ".join(parts) + "."
+
+
+def _summary_prompt(plan: DayPlan) -> str:
+    lines = []
+    for block in plan.blocks:
+        titles = [task.title for task in block.tasks[:PROMPT_TASKS_PER_BLOCK]]
+        if len(block.tasks) > PROMPT_TASKS_PER_BLOCK:
+            titles.append(f"+{len(block.tasks) - PROMPT_TASKS_PER_BLOCK} more")
+        detail = f": {', '.join(titles)}" if titles else ""
+        lines.append(f"{block.start}-{block.end} {block.kind} (energy {block.energy_level}){detail}")
+    lines.append(
+        f"Did not fit: {len(plan.unscheduled)}; deferred distracting: {len(plan.deferred)}; "
+        f"dropped unnecessary: {len(plan.dropped)}"
+    )
+    return "Today's plan:\n" + "\n".join(lines) + "\n\nSummarize this plan for the user."
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Time a nightly planning batch on synthetic data")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--tasks", type=int, default=500, help="Tasks per user")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    n = args.users * args.tasks
+    curves = np.clip(np.array(DEFAULT_CURVE) + rng.normal(0, 0.6, (args.users, HOURS)), 0, 4)
+    task_user = np.repeat(np.arange(args.users), args.tasks)
+    task_type = rng.choice(len(TASK_TYPES), n, p=[0.4, 0.4, 0.1, 0.1])
+    energy_required = rng.integers(1, 5, n)
+    minutes = rng.choice([15, 30, 45, 60, 90, 120], n)
+
+    started = time.perf_counter()
+    batch = plan_batch(task_user, task_type, energy_required, minutes, curves)
+    elapsed = time.perf_counter() - started
+    outcomes = np.bincount(batch.status, minlength=4)
+    print(f"Planned {args.users} users x {args.tasks} tasks in {elapsed:.2f}s")
+    print(
+        f"{len(batch.block_start)} blocks; tasks scheduled {outcomes[SCHEDULED]}, unscheduled "
+        f"{outcomes[UNSCHEDULED]}, deferred {outcomes[DEFERRED]}, dropped {outcomes[DROPPED]}; "
+        f"{len(batch.segment_task)} scheduled pieces"
+    )
+
+
+if __name__ == "__main__":
+    main()
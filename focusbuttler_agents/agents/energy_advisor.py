@@ -5,10 +5,19 @@ Analyzes user energy patterns and provides personalized recommendations
 for optimal work scheduling based on natural energy rhythms.
 """
 
-from agno.agent import Agent
-from agno.models.mistral import MistralChat
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, ValidationError
+from typing import AsyncIterator, Optional
+
+from analytics.energy_profile import energy_profiles
+from core.coalesce import coalesced
+from core.llm_scheduler import Priority
+from core.metrics import record_parse_failure
+from core.models import chat_model
+from core.registry import register_agent
+from tools import distractions_per_session, energy_by_hour
+
+from .energy_table import EnergyAdviceTable, table_version
+from .streaming import PartialJSONFields, stream_text
 
 
 class EnergyAdvice(BaseModel):
@@ -19,13 +28,7 @@ class EnergyAdvice(BaseModel):
     next_energy_shift: Optional[str]  # When energy is expected to change
 
 
-# Energy Advisor Agent
-energy_advisor = Agent(
-    name="EnergyAdvisor",
-    model=MistralChat(id="mistral-small-latest"),
-    description="Expert at analyzing energy patterns and recommending optimal work schedules.",
-    response_model=EnergyAdvice,
-    instructions="""You are an energy optimization expert who helps users work with their natural rhythms.
+ENERGY_INSTRUCTIONS = """You are an energy optimization expert who helps users work with their natural rhythms.
 
 Key principles:
 1. **Circadian Rhythms**: Most people have peak energy in late morning (10-12pm) and mid-afternoon (2-4pm)
@@ -48,32 +51,142 @@ Signs to watch for:
 Always suggest:
 - What type of work is optimal NOW
 - When the next energy shift is likely
-- How to manage current energy state""",
-    markdown=False,
-)
+- How to manage current energy state"""
+
+
+# Energy Advisor Agent
+def _build_energy_advisor():
+    from agno.agent import Agent
+
+    return Agent(
+        name="EnergyAdvisor",
+        model=chat_model("mistral-small-latest"),
+        description="Expert at analyzing energy patterns and recommending optimal work schedules.",
+        response_model=EnergyAdvice,
+        instructions=ENERGY_INSTRUCTIONS,
+        tools=[energy_by_hour, distractions_per_session],
+        markdown=False,
+    )
+
+
+energy_advisor = register_agent("EnergyAdvisor", _build_energy_advisor, hot=True)
+
 
+# Streaming variant - writes the JSON itself so fields can be parsed as they arrive
+def _build_energy_advisor_stream():
+    from agno.agent import Agent
 
+    return Agent(
+        name="EnergyAdvisorStream",
+        model=chat_model("mistral-small-latest"),
+        description="Expert at analyzing energy patterns and recommending optimal work schedules.",
+        instructions=ENERGY_INSTRUCTIONS + """
+
+Respond with a single JSON object and nothing else, with the keys in this order:
+{"current_recommendation": "...", "optimal_task_type": "purposeful|necessary|creative|rest",
+ "reasoning": "...", "next_energy_shift": "..." or null}""",
+        markdown=False,
+    )
+
+
+energy_advisor_stream = register_agent("EnergyAdvisorStream", _build_energy_advisor_stream)
+
+
+@coalesced(normalize=("current_energy",))
 async def get_energy_advice(
     current_energy: str,
     hour_of_day: int,
-    recent_activities: str = ""
+    recent_activities: str = "",
+    user_id: str = "",
 ) -> EnergyAdvice:
-    """Get energy-based work recommendations"""
-    prompt = f"""The user's current energy level is: {current_energy}
-Current time: {hour_of_day}:00
-Recent activities: {recent_activities or "Not specified"}
-
-What type of work should they focus on right now? 
-When might their energy shift?"""
+    """Get energy-based work recommendations (personalized if the user has an energy profile)"""
+    history = _energy_history(user_id, hour_of_day)
+    if not recent_activities and not history:
+        precomputed = energy_table.lookup(current_energy, hour_of_day)
+        if precomputed is not None:
+            return precomputed
+    
+    prompt = _advice_prompt(current_energy, hour_of_day, recent_activities, history)
+    response = await energy_advisor.arun(prompt, user_id=user_id or None)
     
-    response = await energy_advisor.arun(prompt)
+    if response.content and isinstance(response.content, EnergyAdvice):
+        return response.content
     
+    record_parse_failure(energy_advisor.name)
+    return _default_advice()
+
+
+async def advise_uncached(current_energy: str, hour_of_day: int) -> Optional[EnergyAdvice]:
+    """Ask the advisor directly (no table); None if the response didn't parse"""
+    response = await energy_advisor.arun(
+        _advice_prompt(current_energy, hour_of_day, ""), priority=Priority.BACKGROUND
+    )
     if response.content and isinstance(response.content, EnergyAdvice):
         return response.content
+    record_parse_failure(energy_advisor.name)
+    return None
+
+
+async def stream_energy_advice(
+    current_energy: str,
+    hour_of_day: int,
+    recent_activities: str = "",
+    user_id: str = "",
+) -> AsyncIterator[dict]:
+    """Stream energy advice as partial fields, then the complete advice
+    
+    Yields {"field": name, "delta": text} while the model writes (starting
+    with current_recommendation), then {"advice": EnergyAdvice}.
+    """
+    prompt = _advice_prompt(
+        current_energy, hour_of_day, recent_activities, _energy_history(user_id, hour_of_day)
+    )
+    parser = PartialJSONFields()
+    
+    async for chunk in stream_text(energy_advisor_stream, prompt):
+        for field, delta in parser.feed(chunk):
+            if field in EnergyAdvice.model_fields:
+                yield {"field": field, "delta": delta}
     
+    try:
+        advice = EnergyAdvice.model_validate(parser.fields)
+    except ValidationError:
+        record_parse_failure(energy_advisor_stream.name)
+        advice = _default_advice()
+    yield {"advice": advice}
+
+
+def _energy_history(user_id: str, hour_of_day: int) -> str:
+    profile = energy_profiles.get(user_id) if user_id else None
+    return profile.summary(hour_of_day) if profile is not None else ""
+
+
+def _advice_prompt(current_energy: str, hour_of_day: int, recent_activities: str, history: str = "") -> str:
+    history_line = f"\nTheir energy history: {history}" if history else ""
+    return f"""The user's current energy level is: {current_energy}
+Current time: {hour_of_day}:00
+Recent activities: {recent_activities or "Not specified"}{history_line}
+
+What type of work should they focus on right now? 
+When might their energy shift?"""
+
+
+def _default_advice() -> EnergyAdvice:
     return EnergyAdvice(
         current_recommendation="Take a short break to recharge",
         optimal_task_type="rest",
         reasoning="Unable to analyze current state",
         next_energy_shift=None
     )
+
+
+# Precomputed answers for requests without recent activities; the version
+# changes (and the table is rebuilt) whenever the instructions or prompt do
+energy_table = EnergyAdviceTable(
+    EnergyAdvice,
+    version=table_version(
+        ENERGY_INSTRUCTIONS,
+        "mistral-small-latest",
+        _advice_prompt("{current_energy}", 0, ""),
+    ),
+)
@@ -0,0 +1,179 @@
+"""
+Energy Advice Table
+
+Precomputed EnergyAdvisor answers for the (energy level x hour of day) grid.
+Most advice requests carry no recent activities, so their input is one of
+5 x 24 cells; those are served from a compact gzipped table built offline
+with several variants per cell. The table is stamped with a hash of the
+advisor's instructions and prompt, and is rebuilt when they change. Cells
+whose advice fails are left out of a build (those requests go to the model);
+a build that fails as a whole is logged and retried after
+BUILD_RETRY_SECONDS.
+
+Usage:
+    python -m agents.energy_table build --variants 3
+"""
+
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import random
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from pydantic import BaseModel
+
+
+ENERGY_LEVELS = ("exhausted", "low", "moderate", "high", "peak")
+HOURS = range(24)
+TABLE_PATH = Path(os.getenv("ENERGY_TABLE_PATH", "energy_advice_table.json.gz"))
+DEFAULT_VARIANTS = 3
+BUILD_CONCURRENCY = 8
+# How often a process without a table looks for one built by another worker
+RELOAD_CHECK_SECONDS = 30.0
+BUILD_RETRY_SECONDS = 300.0
+
+
+def table_version(*parts: str) -> str:
+    """Stable version stamp for the inputs that shape the advice"""
+    digest = hashlib.sha256("\x00".join(parts).encode()).hexdigest()
+    return digest[:16]
+
+
+def normalize_energy(current_energy: str) -> Optional[str]:
+    """Map an energy label like "Peak" or "low energy" onto a grid level"""
+    words = current_energy.strip().lower().split()
+    if words and words[0] in ENERGY_LEVELS:
+        return words[0]
+    return None
+
+
+class EnergyAdviceTable:
+    """Loads, serves and rebuilds the precomputed advice grid"""
+
+    def __init__(self, model: type[BaseModel], version: str, path: Path = TABLE_PATH):
+        self.model = model
+        self.version = version
+        self.path = Path(path)
+        self._cells: dict[str, list[BaseModel]] = {}
+        self._build_task: asyncio.Task | None = None
+        self._checked_at = time.monotonic()
+        self.load()
+
+    @property
+    def ready(self) -> bool:
+        return bool(self._cells)
+
+    def load(self) -> bool:
+        """Load the table from disk if it matches the current version"""
+        if not self.path.exists():
+            return False
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != self.version:
+            print(f"Energy advice table {self.path} is stale; ignoring it")
+            return False
+
+        fields = data["fields"]
+        self._cells = {
+            key: [self.model(**dict(zip(fields, row))) for row in rows]
+            for key, rows in data["cells"].items()
+        }
+        return True
+
+    def lookup(self, current_energy: str, hour_of_day: int) -> Optional[BaseModel]:
+        """Return a random precomputed variant for the cell, if available"""
+        level = normalize_energy(current_energy)
+        if level is None or not 0 <= hour_of_day <= 23:
+            return None
+        if not self._cells and time.monotonic() - self._checked_at > RELOAD_CHECK_SECONDS:
+            self._checked_at = time.monotonic()
+            self.load()
+        variants = self._cells.get(_cell_key(level, hour_of_day))
+        return random.choice(variants) if variants else None
+
+    async def build(
+        self,
+        advise: Callable[[str, int], Awaitable[Optional[BaseModel]]],
+        variants: int = DEFAULT_VARIANTS,
+        concurrency: int = BUILD_CONCURRENCY,
+    ) -> None:
+        """Generate every cell with the advisor and write the table"""
+        slots = asyncio.Semaphore(concurrency)
+
+        async def generate(level: str, hour: int) -> Optional[BaseModel]:
+            async with slots:
+                return await advise(level, hour)
+
+        cells: dict[str, list[BaseModel]] = {}
+        grid = [(level, hour) for level in ENERGY_LEVELS for hour in HOURS]
+        answers = await asyncio.gather(
+            *(generate(level, hour) for level, hour in grid for _ in range(variants)),
+            return_exceptions=True,
+        )
+        failures = [answer for answer in answers if isinstance(answer, BaseException)]
+        for index, answer in enumerate(answers):
+            level, hour = grid[index // variants]
+            if answer is not None and not isinstance(answer, BaseException):
+                cells.setdefault(_cell_key(level, hour), []).append(answer)
+        if failures:
+            print(f"Energy advice table: {len(failures)}/{len(answers)} answers failed, e.g. {failures[0]!r}")
+        if not cells:
+            raise RuntimeError("Energy advice table build produced no cells")
+
+        fields = list(self.model.model_fields)
+        data = {
+            "version": self.version,
+            "fields": fields,
+            "cells": {
+                key: [[getattr(advice, name) for name in fields] for advice in advices]
+                for key, advices in cells.items()
+            },
+        }
+        temporary = self.path.with_suffix(".tmp")
+        with gzip.open(temporary, "wt", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        temporary.replace(self.path)
+
+        self._cells = cells
+        print(f"Built energy advice table: {len(cells)}/{len(grid)} cells -> {self.path}")
+
+    def ensure_fresh(self, advise: Callable[[str, int], Awaitable[Optional[BaseModel]]]) -> None:
+        """Rebuild in the background when the table is missing or stale"""
+        if self.ready or self._build_task is not None:
+            return
+        loop = asyncio.get_running_loop()
+        self._build_task = loop.create_task(self.build(advise))
+
+        def done(task: asyncio.Task) -> None:
+            self._build_task = None
+            if task.cancelled() or task.exception() is None:
+                return
+            print(f"Energy advice table build failed: {task.exception()!r}; retrying in {BUILD_RETRY_SECONDS:.0f}s")
+            loop.call_later(BUILD_RETRY_SECONDS, self.ensure_fresh, advise)
+
+        self._build_task.add_done_callback(done)
+
+
+def _cell_key(level: str, hour: int) -> str:
+    return f"{level}|{hour}"
+
+
+def main() -> None:
+    from .energy_advisor import advise_uncached, energy_table
+
+    parser = argparse.ArgumentParser(description="Build the precomputed energy advice table")
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("--variants", type=int, default=DEFAULT_VARIANTS)
+    parser.add_argument("--concurrency", type=int, default=BUILD_CONCURRENCY)
+    args = parser.parse_args()
+
+    asyncio.run(energy_table.build(advise_uncached, args.variants, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+Fast-Path Task Classifier
+
+A lightweight in-process classifier that answers confident categorizations
+without calling the TaskCategorizer agent. It is a multinomial naive Bayes
+over hashed word and character n-grams, trained from the categorizations the
+LLM has already produced (logged in the shared service database).
+
+Usage:
+    python -m agents.fast_classifier train
+    python -m agents.fast_classifier evaluate
+"""
+
+import argparse
+import json
+import math
+import os
+import statistics
+import time
+import zlib
+from collections import Counter
+from pathlib import Path
+
+from core.storage import DB_FILE, Storage, get_storage
+
+from .categorization_cache import normalize_title
+
+
+MODEL_PATH = Path(os.getenv("FAST_CLASSIFIER_MODEL", "hyperfocus_fast_classifier.json"))
+CONFIDENCE_THRESHOLD = float(os.getenv("FAST_CLASSIFIER_THRESHOLD", "0.9"))
+MIN_TRAINING_SAMPLES = 200
+
+
+def extract_features(text: str, n_features: int) -> list[int]:
+    """Hash word unigrams, word bigrams and character trigrams into buckets"""
+    words = normalize_title(text).split()
+    tokens = [f"w:{word}" for word in words]
+    tokens += [f"b:{a}_{b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f"<{word}>"
+        tokens += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    return [zlib.crc32(token.encode()) % n_features for token in tokens]
+
+
+class HashedNaiveBayes:
+    """Multinomial naive Bayes over hashed text features"""
+
+    def __init__(self, labels: list[str], n_features: int = 2**18, alpha: float = 0.5):
+        self.labels = list(labels)
+        self.n_features = n_features
+        self.alpha = alpha
+        self.doc_counts = {label: 0 for label in self.labels}
+        self.feature_counts: dict[str, Counter] = {label: Counter() for label in self.labels}
+        self.feature_totals = {label: 0 for label in self.labels}
+
+    def fit(self, samples: list[tuple[str, str]]) -> "HashedNaiveBayes":
+        """Train on (text, label) pairs"""
+        for text, label in samples:
+            features = extract_features(text, self.n_features)
+            self.doc_counts[label] += 1
+            self.feature_counts[label].update(features)
+            self.feature_totals[label] += len(features)
+        return self
+
+    def predict(self, text: str) -> tuple[str, float]:
+        """Return the most likely label and its posterior probability"""
+        features = extract_features(text, self.n_features)
+        total_docs = sum(self.doc_counts.values())
+        if not features or not total_docs:
+            return self.labels[0], 0.0
+
+        scores = {}
+        for label in self.labels:
+            counts = self.feature_counts[label]
+            denominator = math.log(self.feature_totals[label] + self.alpha * self.n_features)
+            score = math.log((self.doc_counts[label] + 1) / (total_docs + len(self.labels)))
+            for feature in features:
+                score += math.log(counts.get(feature, 0) + self.alpha) - denominator
+            scores[label] = score
+
+        best = max(scores, key=scores.get)
+        normalizer = sum(math.exp(score - scores[best]) for score in scores.values())
+        return best, 1.0 / normalizer
+
+    def to_dict(self) -> dict:
+        return {
+            "labels": self.labels,
+            "n_features": self.n_features,
+            "alpha": self.alpha,
+            "doc_counts": self.doc_counts,
+            "feature_counts": {
+                label: {str(k): v for k, v in counts.items()}
+                for label, counts in self.feature_counts.items()
+            },
+            "feature_totals": self.feature_totals,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "HashedNaiveBayes":
+        model = cls(data["labels"], data["n_features"], data["alpha"])
+        model.doc_counts = data["doc_counts"]
+        model.feature_counts = {
+            label: Counter({int(k): v for k, v in counts.items()})
+            for label, counts in data["feature_counts"].items()
+        }
+        model.feature_totals = data["feature_totals"]
+        return model
+
+
+class CategorizationLog:
+    """Append-only log of LLM categorizations used as training data"""
+
+    def __init__(self, storage: Storage):
+        self.storage = storage
+        storage.ensure_schema(
+            """CREATE TABLE IF NOT EXISTS categorization_log (
+                task_title TEXT NOT NULL,
+                category TEXT NOT NULL,
+                suggested_time_of_day TEXT NOT NULL,
+                estimated_energy_required TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )"""
+        )
+
+    def record(self, task_title: str, result) -> None:
+        """Log one categorization produced by the LLM"""
+        self.storage.write_nowait(
+            "INSERT INTO categorization_log VALUES (?, ?, ?, ?, ?)",
+            (
+                task_title,
+                result.category.value,
+                result.suggested_time_of_day,
+                result.estimated_energy_required,
+                time.time(),
+            ),
+        )
+
+    def samples(self) -> list[tuple[str, str, str, str]]:
+        """Latest answer per normalized title: (title, category, time, energy)"""
+        rows = self.storage.query(
+            "SELECT task_title, category, suggested_time_of_day, estimated_energy_required "
+            "FROM categorization_log ORDER BY created_at"
+        )
+        latest = {normalize_title(row[0]): row for row in rows}
+        return list(latest.values())
+
+
+class FastClassifier:
+    """Confidence-gated local categorizer in front of the TaskCategorizer agent"""
+
+    def __init__(self, model_path: Path = MODEL_PATH, threshold: float = CONFIDENCE_THRESHOLD):
+        self.model_path = Path(model_path)
+        self.threshold = threshold
+        self.model: HashedNaiveBayes | None = None
+        self.defaults: dict[str, dict] = {}
+        self.answered = 0
+        self.deferred = 0
+        self.reload()
+
+    def reload(self) -> None:
+        """Load the trained model from disk, if one exists"""
+        if not self.model_path.exists():
+            self.model = None
+            return
+        data = json.loads(self.model_path.read_text())
+        self.model = HashedNaiveBayes.from_dict(data["model"])
+        self.defaults = data["defaults"]
+
+    def classify(self, task_title: str):
+        """Return a TaskCategorization when confident, otherwise None"""
+        from .task_categorizer import TaskCategorization, TaskType
+
+        if self.model is None:
+            return None
+
+        label, confidence = self.model.predict(task_title)
+        if confidence < self.threshold:
+            self.deferred += 1
+            return None
+
+        self.answered += 1
+        defaults = self.defaults.get(label, {})
+        return TaskCategorization(
+            category=TaskType(label),
+            reasoning=f"Matches similar tasks categorized before ({confidence:.0%} confidence)",
+            suggested_time_of_day=defaults.get("suggested_time_of_day", "morning"),
+            estimated_energy_required=defaults.get("estimated_energy_required", "moderate"),
+        )
+
+    def stats(self) -> dict:
+        return {
+            "trained": self.model is not None,
+            "threshold": self.threshold,
+            "answered": self.answered,
+            "deferred": self.deferred,
+        }
+
+
+def train(samples: list[tuple[str, str, str, str]]) -> dict:
+    """Train a model and the per-category time/energy defaults"""
+    from .task_categorizer import TaskType
+
+    labels = [task_type.value for task_type in TaskType]
+    model = HashedNaiveBayes(labels).fit([(title, category) for title, category, _, _ in samples])
+
+    defaults = {}
+    for label in labels:
+        rows = [sample for sample in samples if sample[1] == label]
+        if rows:
+            defaults[label] = {
+                "suggested_time_of_day": Counter(r[2] for r in rows).most_common(1)[0][0],
+                "estimated_energy_required": Counter(r[3] for r in rows).most_common(1)[0][0],
+            }
+    return {"model": model.to_dict(), "defaults": defaults, "trained_on": len(samples)}
+
+
+def evaluate(samples: list[tuple[str, str, str, str]], thresholds: list[float]) -> dict:
+    """Hold out a deterministic 20% split and measure agreement with the LLM"""
+    held_out, training = [], []
+    for sample in samples:
+        in_holdout = zlib.crc32(normalize_title(sample[0]).encode()) % 5 == 0
+        (held_out if in_holdout else training).append(sample)
+    model = HashedNaiveBayes.from_dict(train(training)["model"])
+
+    predictions = []
+    latencies_ms = []
+    for title, category, _, _ in held_out:
+        started = time.perf_counter()
+        label, confidence = model.predict(title)
+        latencies_ms.append((time.perf_counter() - started) * 1000)
+        predictions.append((label == category, confidence))
+
+    report = {"trained_on": len(training), "held_out": len(held_out), "thresholds": []}
+    if not held_out:
+        return report
+
+    quantiles = statistics.quantiles(latencies_ms, n=100) if len(latencies_ms) > 1 else latencies_ms * 99
+    report["latency_p50_ms"] = quantiles[49]
+    report["latency_p99_ms"] = quantiles[98]
+    for threshold in thresholds:
+        answered = [agrees for agrees, confidence in predictions if confidence >= threshold]
+        report["thresholds"].append({
+            "threshold": threshold,
+            "coverage": len(answered) / len(predictions),
+            "agreement": sum(answered) / len(answered) if answered else None,
+        })
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train or evaluate the fast-path task classifier")
+    parser.add_argument("command", choices=["train", "evaluate"])
+    parser.add_argument("--db", default=DB_FILE, help="SQLite file holding the categorization log")
+    parser.add_argument("--output", default=str(MODEL_PATH), help="Where to write the trained model")
+    args = parser.parse_args()
+
+    storage = get_storage() if args.db == DB_FILE else Storage(args.db)
+    samples = CategorizationLog(storage).samples()
+
+    if args.command == "train":
+        if len(samples) < MIN_TRAINING_SAMPLES:
+            print(f"Only {len(samples)} logged categorizations; need {MIN_TRAINING_SAMPLES} to train")
+            return
+        Path(args.output).write_text(json.dumps(train(samples)))
+        print(f"Trained on {len(samples)} categorizations -> {args.output}")
+        return
+
+    report = evaluate(samples, [0.5, 0.7, 0.8, 0.9, 0.95, 0.99])
+    print(f"Trained on {report['trained_on']}, evaluated on {report['held_out']} held-out titles")
+    if report["held_out"]:
+        print(f"Latency p50: {report['latency_p50_ms']:.3f} ms, p99: {report['latency_p99_ms']:.3f} ms")
+        print("threshold  coverage  agreement")
+        for row in report["thresholds"]:
+            agreement = f"{row['agreement']:.1%}" if row["agreement"] is not None else "-"
+            print(f"{row['threshold']:>9.2f}  {row['coverage']:>8.1%}  {agreement:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,18 +5,28 @@ Monitors focus sessions and provides real-time encouragement and distraction man
 Streams insights during Hyperfocus and Scatterfocus sessions.
 """
 
-from agno.agent import Agent
-from agno.models.mistral import MistralChat
+from pydantic import BaseModel
 from typing import AsyncIterator
-import asyncio
+import re
+import uuid
 
+from core.coalesce import coalesced
+from core.metrics import record_parse_failure
+from core.models import chat_model
+from core.llm_scheduler import DeadlineExceeded, Priority
+from core.registry import register_agent
+from core.storage import get_storage
+
+from .message_pool import Bucket, MessagePool
+from .session_scheduler import SessionMessages, SessionScheduler
+
+
+class MessageVariants(BaseModel):
+    """Several alternative phrasings of one guardian message"""
+    messages: list[str]
 
-# Focus Guardian Agent
-focus_guardian = Agent(
-    name="FocusGuardian",
-    model=MistralChat(id="mistral-small-latest"),
-    description="A supportive focus companion that provides encouragement during work sessions.",
-    instructions="""You are a focus guardian who helps users maintain concentration during work sessions.
+
+GUARDIAN_INSTRUCTIONS = """You are a focus guardian who helps users maintain concentration during work sessions.
 
 Your roles:
 1. **Session Start**: Set the right mindset for the work ahead
@@ -42,22 +52,163 @@ Message style:
 - Match the energy of the session type
 - Use occasional emojis sparingly
 
-Remember: You're a supportive companion, not a harsh taskmaster.""",
-    markdown=False,
+Remember: You're a supportive companion, not a harsh taskmaster."""
+
+
+# Focus Guardian Agent
+def _build_focus_guardian():
+    from agno.agent import Agent
+
+    return Agent(
+        name="FocusGuardian",
+        model=chat_model("mistral-small-latest"),
+        description="A supportive focus companion that provides encouragement during work sessions.",
+        instructions=GUARDIAN_INSTRUCTIONS,
+        markdown=False,
+    )
+
+
+focus_guardian = register_agent(
+    "FocusGuardian", _build_focus_guardian, hot=True, priority=Priority.SESSION
 )
 
 
+# Generates message variants in the background for the message pool
+def _build_focus_guardian_pool():
+    from agno.agent import Agent
+
+    return Agent(
+        name="FocusGuardianPool",
+        model=chat_model("mistral-small-latest"),
+        description="Writes varied focus companion messages ahead of time.",
+        response_model=MessageVariants,
+        instructions=GUARDIAN_INSTRUCTIONS,
+        markdown=False,
+    )
+
+
+focus_guardian_pool = register_agent(
+    "FocusGuardianPool", _build_focus_guardian_pool, priority=Priority.BACKGROUND
+)
+
+POOLED_MODES = ("hyperfocus", "scatterfocus")
+_ELAPSED_BUCKETS = ((15, "0-15"), (30, "15-30"), (60, "30-60"), (None, "60+"))
+_REMAINING_BUCKETS = ((5, "0-5"), (15, "5-15"), (30, "15-30"), (None, "30+"))
+_DURATION_BUCKETS = ((15, "0-15"), (45, "15-45"), (None, "45+"))
+_DISTRACTION_BUCKETS = ((1, "0"), (3, "1-2"), (None, "3+"))
+_RECOVERY_BUCKETS = ((2, "1"), (3, "2"), (4, "3"), (None, "4+"))
+_PLACEHOLDERS = {
+    "start": set(),
+    "check": {"minutes_elapsed", "minutes_remaining", "distraction_count"},
+    "distraction": {"distraction_count"},
+    "end": {"duration_minutes", "distraction_count"},
+}
+
+
+def _bucket(value: int, edges: tuple) -> str:
+    for upper, label in edges:
+        if upper is None or value < upper:
+            return label
+    return edges[-1][1]
+
+
+def _fill(message: str, **values) -> str:
+    for name, value in values.items():
+        message = message.replace("{" + name + "}", str(value))
+    return message
+
+
+def _describe_bucket(bucket: Bucket) -> str:
+    kind, mode, *rest = bucket
+    if kind == "start":
+        return f"""The user is starting a {mode} session.
+Task: Not specified
+
+Provide a brief, encouraging message to help them begin (1-2 sentences max)."""
+    if kind == "check":
+        elapsed, remaining, distractions = rest
+        return f"""The user is in a {mode} session.
+{elapsed} minutes elapsed, {remaining} minutes remaining. Distractions logged: {distractions}.
+
+Provide a brief, non-intrusive check-in (1 sentence max)."""
+    if kind == "distraction":
+        return f"""The user just logged a distraction during their {mode} session.
+This is distraction #{rest[0]} this session.
+
+Provide a brief, kind message to help them refocus (1-2 sentences max).
+Don't be judgmental - distractions happen!"""
+    completed, duration, distractions = rest
+    status = "completed" if completed == "completed" else "ended early"
+    return f"""The user {status} their {mode} session.
+Duration: {duration} minutes
+Distractions: {distractions}
+
+Provide a brief celebration/summary message (1-2 sentences).
+Be encouraging regardless of completion status."""
+
+
+async def _generate_pool_variants(bucket: Bucket, count: int) -> list[str]:
+    """Generate message variants for one pool bucket"""
+    allowed = _PLACEHOLDERS[bucket[0]]
+    placeholder_note = ""
+    if allowed:
+        names = ", ".join("{" + name + "}" for name in sorted(allowed))
+        placeholder_note = f"\nWhen mentioning exact numbers, write them as the placeholders {names}."
+    
+    prompt = f"""{_describe_bucket(bucket)}
+
+Write {count} different variants of this message.{placeholder_note}"""
+    
+    response = await focus_guardian_pool.arun(prompt)
+    if not (response.content and isinstance(response.content, MessageVariants)):
+        record_parse_failure(focus_guardian_pool.name)
+        return []
+    # Drop variants that invented placeholders we can't fill
+    return [
+        message for message in response.content.messages
+        if set(re.findall(r"\{(\w+)\}", message)) <= allowed
+    ]
+
+
+def all_pool_buckets() -> list[Bucket]:
+    """Every bucket the message pool can serve"""
+    buckets: list[Bucket] = []
+    for mode in POOLED_MODES:
+        buckets.append(("start", mode))
+        for _, elapsed in _ELAPSED_BUCKETS:
+            for _, remaining in _REMAINING_BUCKETS:
+                for _, distractions in _DISTRACTION_BUCKETS:
+                    buckets.append(("check", mode, elapsed, remaining, distractions))
+        for _, count in _RECOVERY_BUCKETS:
+            buckets.append(("distraction", mode, count))
+        for completed in ("completed", "ended_early"):
+            for _, duration in _DURATION_BUCKETS:
+                for _, distractions in _DISTRACTION_BUCKETS:
+                    buckets.append(("end", mode, completed, duration, distractions))
+    return buckets
+
+
+# Pre-generated variants so hot-path messages don't wait on the LLM
+message_pool = MessagePool(_generate_pool_variants, get_storage())
+
+
+@coalesced(normalize=("mode",))
 async def start_session_message(mode: str, task_title: str = "") -> str:
     """Generate a message for session start"""
+    if not task_title and mode.lower() in POOLED_MODES:
+        pooled = message_pool.take(("start", mode.lower()))
+        if pooled:
+            return pooled
+    
     prompt = f"""The user is starting a {mode} session.
 Task: {task_title or "Not specified"}
 
 Provide a brief, encouraging message to help them begin (1-2 sentences max)."""
     
-    response = await focus_guardian.arun(prompt)
-    return response.content or "Let's begin. You've got this! 💪"
+    return await _guardian_reply(prompt, "Let's begin. You've got this! 💪")
 
 
+@coalesced(normalize=("mode",))
 async def mid_session_check(
     mode: str,
     minutes_elapsed: int,
@@ -65,6 +216,22 @@ async def mid_session_check(
     distraction_count: int = 0
 ) -> str:
     """Generate a mid-session check-in message"""
+    if mode.lower() in POOLED_MODES:
+        pooled = message_pool.take((
+            "check",
+            mode.lower(),
+            _bucket(minutes_elapsed, _ELAPSED_BUCKETS),
+            _bucket(minutes_remaining, _REMAINING_BUCKETS),
+            _bucket(distraction_count, _DISTRACTION_BUCKETS),
+        ))
+        if pooled:
+            return _fill(
+                pooled,
+                minutes_elapsed=minutes_elapsed,
+                minutes_remaining=minutes_remaining,
+                distraction_count=distraction_count,
+            )
+    
     distraction_note = ""
     if distraction_count > 0:
         distraction_note = f" They've logged {distraction_count} distraction(s)."
@@ -74,22 +241,29 @@ async def mid_session_check(
 
 Provide a brief, non-intrusive check-in (1 sentence max)."""
     
-    response = await focus_guardian.arun(prompt)
-    return response.content or f"{minutes_remaining} minutes remaining. Keep going!"
+    return await _guardian_reply(prompt, f"{minutes_remaining} minutes remaining. Keep going!")
 
 
+@coalesced(normalize=("mode",))
 async def distraction_recovery(mode: str, distraction_count: int) -> str:
     """Generate a message to help recover from a distraction"""
+    if mode.lower() in POOLED_MODES:
+        pooled = message_pool.take(
+            ("distraction", mode.lower(), _bucket(distraction_count, _RECOVERY_BUCKETS))
+        )
+        if pooled:
+            return _fill(pooled, distraction_count=distraction_count)
+    
     prompt = f"""The user just logged a distraction during their {mode} session.
 This is distraction #{distraction_count} this session.
 
 Provide a brief, kind message to help them refocus (1-2 sentences max).
 Don't be judgmental - distractions happen!"""
     
-    response = await focus_guardian.arun(prompt)
-    return response.content or "No worries! Take a breath and gently return to your task. 🌿"
+    return await _guardian_reply(prompt, "No worries! Take a breath and gently return to your task. 🌿")
 
 
+@coalesced(normalize=("mode",))
 async def end_session_message(
     mode: str,
     completed: bool,
@@ -97,6 +271,21 @@ async def end_session_message(
     distraction_count: int
 ) -> str:
     """Generate a session completion message"""
+    if mode.lower() in POOLED_MODES:
+        pooled = message_pool.take((
+            "end",
+            mode.lower(),
+            "completed" if completed else "ended_early",
+            _bucket(duration_minutes, _DURATION_BUCKETS),
+            _bucket(distraction_count, _DISTRACTION_BUCKETS),
+        ))
+        if pooled:
+            return _fill(
+                pooled,
+                duration_minutes=duration_minutes,
+                distraction_count=distraction_count,
+            )
+    
     status = "completed" if completed else "ended early"
     
     prompt = f"""The user {status} their {mode} session.
@@ -106,33 +295,48 @@ Distractions: {distraction_count}
 Provide a brief celebration/summary message (1-2 sentences).
 Be encouraging regardless of completion status."""
     
-    response = await focus_guardian.arun(prompt)
-    return response.content or "Great session! Every minute of focus counts. 🎉"
+    return await _guardian_reply(prompt, "Great session! Every minute of focus counts. 🎉")
+
+
+async def _guardian_reply(prompt: str, fallback: str) -> str:
+    """A FocusGuardian message, or `fallback` if it is empty or the call was dropped as too late"""
+    try:
+        response = await focus_guardian.arun(prompt)
+    except DeadlineExceeded:
+        return fallback
+    return response.content or fallback
+
+
+# Central scheduler driving check-ins for all active sessions
+session_scheduler = SessionScheduler(
+    SessionMessages(
+        start=start_session_message,
+        check=mid_session_check,
+        distraction=distraction_recovery,
+        end=end_session_message,
+    ),
+    get_storage(),
+)
 
 
 async def stream_session_insights(
     mode: str,
     target_minutes: int,
+    session_id: str | None = None,
 ) -> AsyncIterator[str]:
-    """Stream periodic insights during a focus session"""
-    
-    # Initial message
-    yield await start_session_message(mode)
-    
-    # Check-in every 10 minutes
-    check_interval = 10 * 60  # seconds
-    checks_done = 0
-    max_checks = target_minutes // 10
+    """Stream periodic insights during a focus session
     
-    while checks_done < max_checks:
-        await asyncio.sleep(check_interval)
-        checks_done += 1
-        
-        minutes_elapsed = checks_done * 10
-        minutes_remaining = target_minutes - minutes_elapsed
-        
-        if minutes_remaining > 0:
-            yield await mid_session_check(mode, minutes_elapsed, minutes_remaining)
+    Check-ins are driven by the shared session scheduler; passing the id of an
+    existing session reattaches to it (e.g. after a reconnect or restart).
+    """
+    session_id = session_id or uuid.uuid4().hex
+    queue = await session_scheduler.open(session_id, mode, target_minutes)
     
-    # Final message
-    yield await end_session_message(mode, True, target_minutes, 0)
+    try:
+        while True:
+            message = await queue.get()
+            if message is None:
+                break
+            yield message
+    finally:
+        session_scheduler.close(session_id, queue)
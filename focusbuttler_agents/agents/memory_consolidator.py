@@ -0,0 +1,326 @@
+"""
+Memory Consolidator
+
+Background pipeline that turns completed coach and team runs into user
+memories, so user-facing runs no longer pay for a memory-extraction step.
+
+Behaviour:
+- Queue: each completed run is appended to the durable `memory_queue` table.
+- Flush: every MEMORY_FLUSH_SECONDS, or as soon as a user has
+  MEMORY_BATCH_SIZE pending runs, that user's runs are summarised into
+  memories with a single model call per batch. Only the leader worker
+  flushes; it sees runs queued by the other workers when it refreshes its
+  counts from the table, every MEMORY_REFRESH_SECONDS.
+- Backpressure: when MEMORY_MAX_PENDING runs are queued, new runs are
+  dropped (and counted) rather than slowing down responses. Every worker
+  refreshes its pending counts from the table on the same timer, so a
+  worker that never flushes still sees the queue drain.
+- Crash recovery: rows are only deleted after their memories are written.
+  Batches claimed by a process that died are released on the next flush
+  after their lease expires, and retried; a batch that fails MAX_ATTEMPTS
+  times is discarded. The pending counts behind backpressure are recounted
+  from the table whenever rows are discarded, so they cannot drift.
+"""
+
+import asyncio
+import os
+import time
+import uuid
+
+from pydantic import BaseModel
+from typing import Optional
+
+from core.metrics import record_parse_failure
+from core.models import chat_model
+from core.llm_scheduler import Priority
+from core.registry import register_agent
+from core.storage import Storage, get_storage
+
+from .context_builder import context_builder
+
+
+# "inline" restores agno's per-run memory extraction (used by the benchmark)
+INLINE_MEMORY = os.getenv("MEMORY_CONSOLIDATION", "deferred") == "inline"
+FLUSH_SECONDS = float(os.getenv("MEMORY_FLUSH_SECONDS", "60"))
+BATCH_SIZE = int(os.getenv("MEMORY_BATCH_SIZE", "8"))
+MAX_PENDING = int(os.getenv("MEMORY_MAX_PENDING", "50000"))
+REFRESH_SECONDS = float(os.getenv("MEMORY_REFRESH_SECONDS", "5"))
+MAX_CONCURRENT_USERS = 4
+MAX_ATTEMPTS = 3
+CLAIM_LEASE_SECONDS = 300
+MAX_EXISTING_MEMORIES = 50
+
+
+class ConsolidatedMemory(BaseModel):
+    """A durable fact about the user"""
+    memory: str
+    topics: list[str]
+    replaces_memory_id: Optional[str]  # id of an existing memory this updates
+
+
+class MemoryConsolidation(BaseModel):
+    """New or updated memories extracted from a batch of runs"""
+    memories: list[ConsolidatedMemory]
+
+
+def _build_memory_consolidator_agent():
+    from agno.agent import Agent
+
+    return Agent(
+        name="MemoryConsolidator",
+        model=chat_model("mistral-small-latest"),
+        description="Extracts durable user memories from recent coaching conversations.",
+        response_model=MemoryConsolidation,
+        instructions="""You maintain long-term memories about users of a Hyperfocus productivity coach.
+
+You receive the user's existing memories and several recent conversations.
+Return only memories that are NEW or that UPDATE an existing one:
+- Preferences, goals, recurring struggles, productive hours, work patterns
+- One short factual sentence per memory, written about "the user"
+- To update an existing memory, set replaces_memory_id to its id
+- Ignore small talk and one-off details
+- Return an empty list if nothing worth remembering was said""",
+        markdown=False,
+    )
+
+
+memory_consolidator_agent = register_agent(
+    "MemoryConsolidator", _build_memory_consolidator_agent, priority=Priority.BACKGROUND
+)
+
+
+class MemoryConsolidator:
+    """Durable queue of completed runs, consolidated per user in batches"""
+
+    def __init__(self, storage: Storage):
+        self.storage = storage
+        self._db = None
+        self._pending: dict[str, int] = {}
+        self._wakeup: asyncio.Event | None = None
+        self._loop_task: asyncio.Task | None = None
+        self._flush_lock = asyncio.Lock()
+        self._user_slots = asyncio.Semaphore(MAX_CONCURRENT_USERS)
+
+        self.queued = 0
+        self.dropped = 0
+        self.consolidated_runs = 0
+        self.model_calls = 0
+        self.failures = 0
+        self.discarded = 0
+        self.released_claims = 0
+
+        storage.ensure_schema(
+            """CREATE TABLE IF NOT EXISTS memory_queue (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                agent TEXT NOT NULL,
+                user_message TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                claimed_at REAL,
+                attempts INTEGER NOT NULL DEFAULT 0
+            )""",
+            "CREATE INDEX IF NOT EXISTS memory_queue_user ON memory_queue (user_id, id)",
+        )
+
+    def enqueue(self, user_id: str, agent: str, user_message: str, response: str) -> bool:
+        """Queue a completed run; returns False if it was dropped"""
+        if INLINE_MEMORY:
+            return False
+        if sum(self._pending.values()) >= MAX_PENDING:
+            self.dropped += 1
+            return False
+
+        self.storage.write_nowait(
+            "INSERT INTO memory_queue (user_id, agent, user_message, response, created_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (user_id, agent, user_message, response, time.time()),
+        )
+        self.queued += 1
+        self._pending[user_id] = self._pending.get(user_id, 0) + 1
+        if self._pending[user_id] >= BATCH_SIZE and self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    async def start(self, flush: bool = True) -> None:
+        """Recover queued runs and start the flush loop
+
+        With `flush=False` (workers other than the leader) only the pending
+        counts are kept fresh.
+        """
+        if self._loop_task is not None:
+            return
+        if flush:
+            await self._release_expired_claims()
+        await self._recount()
+        if flush:
+            self._wakeup = asyncio.Event()
+            self._loop_task = asyncio.create_task(self._run())
+        else:
+            self._loop_task = asyncio.create_task(self._refresh())
+
+    async def stop(self, timeout: float = 10.0, flush: bool = True) -> None:
+        """Stop the loop after a final best-effort flush; unflushed runs stay queued"""
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            self._loop_task = None
+        if not flush:
+            return
+        try:
+            await asyncio.wait_for(self.flush(), timeout)
+        except asyncio.TimeoutError:
+            print("Memory consolidation flush timed out; remaining runs stay queued")
+
+    async def flush(self) -> None:
+        """Consolidate everything currently queued"""
+        async with self._flush_lock:
+            await self.storage.write("SELECT 1")  # make queued inserts visible
+            await self._release_expired_claims()
+            rows = await self.storage.aquery(
+                "SELECT DISTINCT user_id FROM memory_queue WHERE claimed_at IS NULL"
+            )
+            await asyncio.gather(*(self._consolidate_user(user_id) for (user_id,) in rows))
+
+    def stats(self) -> dict:
+        return {
+            "pending": sum(self._pending.values()),
+            "queued": self.queued,
+            "dropped": self.dropped,
+            "consolidated_runs": self.consolidated_runs,
+            "model_calls": self.model_calls,
+            "failures": self.failures,
+            "discarded": self.discarded,
+            "released_claims": self.released_claims,
+        }
+
+    async def _run(self) -> None:
+        flushed_at = time.monotonic()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), min(FLUSH_SECONDS, REFRESH_SECONDS))
+            except asyncio.TimeoutError:
+                pass
+            woken = self._wakeup.is_set()
+            self._wakeup.clear()
+            try:
+                # Picks up runs the other workers queued
+                await self._recount()
+                full = any(count >= BATCH_SIZE for count in self._pending.values())
+                if woken or full or time.monotonic() - flushed_at >= FLUSH_SECONDS:
+                    flushed_at = time.monotonic()
+                    await self.flush()
+            except Exception as e:
+                print(f"Memory consolidation failed: {e}")
+
+    async def _refresh(self) -> None:
+        while True:
+            await asyncio.sleep(REFRESH_SECONDS)
+            try:
+                await self._recount()
+            except Exception as e:
+                print(f"Memory queue recount failed: {e}")
+
+    async def _consolidate_user(self, user_id: str) -> None:
+        async with self._user_slots:
+            while True:
+                rows = await self.storage.aquery(
+                    "SELECT id, agent, user_message, response FROM memory_queue "
+                    "WHERE user_id = ? AND claimed_at IS NULL ORDER BY id LIMIT ?",
+                    (user_id, BATCH_SIZE),
+                )
+                if not rows:
+                    return
+                ids = [row[0] for row in rows]
+                marks = ", ".join("?" * len(ids))
+                await self.storage.write(
+                    f"UPDATE memory_queue SET claimed_at = ? WHERE id IN ({marks})",
+                    (time.time(), *ids),
+                )
+
+                try:
+                    await self._consolidate_batch(user_id, rows)
+                except Exception as e:
+                    self.failures += 1
+                    print(f"Memory consolidation for {user_id} failed: {e}")
+                    await self.storage.write(
+                        f"UPDATE memory_queue SET claimed_at = NULL, attempts = attempts + 1 "
+                        f"WHERE id IN ({marks})",
+                        ids,
+                    )
+                    discarded = await self.storage.write(
+                        "DELETE FROM memory_queue WHERE attempts >= ?", (MAX_ATTEMPTS,)
+                    )
+                    if discarded:
+                        self.discarded += discarded
+                        await self._recount()
+                    return
+
+                await self.storage.write(f"DELETE FROM memory_queue WHERE id IN ({marks})", ids)
+                self.consolidated_runs += len(ids)
+                self._pending[user_id] = max(0, self._pending.get(user_id, 0) - len(ids))
+                if not self._pending[user_id]:
+                    del self._pending[user_id]
+
+    async def _release_expired_claims(self) -> int:
+        """Put back runs claimed longer than the lease ago (their process died)"""
+        released = await self.storage.write(
+            "UPDATE memory_queue SET claimed_at = NULL WHERE claimed_at < ?",
+            (time.time() - CLAIM_LEASE_SECONDS,),
+        )
+        self.released_claims += released
+        return released
+
+    async def _recount(self) -> None:
+        rows = await self.storage.aquery(
+            "SELECT user_id, COUNT(*) FROM memory_queue GROUP BY user_id"
+        )
+        self._pending = {user_id: count for user_id, count in rows}
+
+    async def _consolidate_batch(self, user_id: str, rows: list[tuple]) -> None:
+        from agno.db.schemas import UserMemory
+
+        db = self._agno_db()
+        existing = await asyncio.to_thread(
+            db.get_user_memories, user_id=user_id, limit=MAX_EXISTING_MEMORIES
+        )
+        known = "\n".join(f"- [{m.memory_id}] {m.memory}" for m in existing or []) or "None yet"
+        conversations = "\n\n".join(
+            f"[{agent}] User: {message}\nAssistant: {response}"
+            for _, agent, message, response in rows
+        )
+        prompt = f"""Existing memories:
+{known}
+
+Recent conversations:
+{conversations}"""
+
+        self.model_calls += 1
+        response = await memory_consolidator_agent.arun(prompt)
+        if not (response.content and isinstance(response.content, MemoryConsolidation)):
+            record_parse_failure(memory_consolidator_agent.name)
+            raise ValueError("Consolidation response did not parse")
+
+        # Only this user's memories may be replaced; any other id is a new memory
+        known_ids = {m.memory_id for m in existing or []}
+        for item in response.content.memories:
+            replaces = item.replaces_memory_id if item.replaces_memory_id in known_ids else None
+            await asyncio.to_thread(
+                db.upsert_user_memory,
+                UserMemory(
+                    memory=item.memory,
+                    memory_id=replaces or str(uuid.uuid4()),
+                    topics=item.topics,
+                    user_id=user_id,
+                    updated_at=int(time.time()),
+                ),
+            )
+        context_builder.invalidate(user_id)
+
+    def _agno_db(self):
+        if self._db is None:
+            self._db = self.storage.agno_db()
+        return self._db
+
+
+# Shared consolidator for the coach and the team
+memory_consolidator = MemoryConsolidator(get_storage())
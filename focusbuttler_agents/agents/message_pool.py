@@ -0,0 +1,147 @@
+"""
+Message Pool
+
+Pre-generated message variants for hot-path agent messages whose inputs come
+from a small discrete space (e.g. FocusGuardian session banners). Variants are
+generated in the background, persisted to SQLite, served instantly (each
+variant at most once) and topped up asynchronously as a bucket drains.
+Before generating, a drained bucket is reloaded from SQLite, so variants
+written by other workers are used first. Variants served while the reload
+is in flight are left out of what it reads, as their deletes may not have
+been written yet.
+"""
+
+import asyncio
+import random
+from typing import Awaitable, Callable, Iterable
+
+from core.storage import Storage
+
+
+Bucket = tuple[str, ...]
+
+VARIANTS_PER_BUCKET = 6
+LOW_WATERMARK = 2
+MAX_CONCURRENT_REFILLS = 4
+
+
+class MessagePool:
+    """Per-bucket pools of unused message variants with background top-up"""
+
+    def __init__(
+        self,
+        generate: Callable[[Bucket, int], Awaitable[list[str]]],
+        storage: Storage | None = None,
+        variants_per_bucket: int = VARIANTS_PER_BUCKET,
+        low_watermark: int = LOW_WATERMARK,
+        max_concurrent_refills: int = MAX_CONCURRENT_REFILLS,
+    ):
+        self.generate = generate
+        self.variants_per_bucket = variants_per_bucket
+        self.low_watermark = low_watermark
+
+        self._pools: dict[str, list[str]] = {}
+        self._refilling: dict[str, asyncio.Task] = {}
+        # Variants served per bucket while it is being reloaded
+        self._taken_during_reload: dict[str, list[str]] = {}
+        self._refill_slots = asyncio.Semaphore(max_concurrent_refills)
+
+        self.served = 0
+        self.empty = 0
+
+        self.storage = storage
+        if storage is not None:
+            storage.ensure_schema(
+                """CREATE TABLE IF NOT EXISTS message_pool (
+                    bucket TEXT NOT NULL,
+                    message TEXT NOT NULL
+                )"""
+            )
+            for bucket, message in storage.query("SELECT bucket, message FROM message_pool"):
+                self._pools.setdefault(bucket, []).append(message)
+
+    def take(self, bucket: Bucket) -> str | None:
+        """Serve a random unused variant, or None if the bucket is empty"""
+        key = _key(bucket)
+        pool = self._pools.get(key, [])
+
+        if len(pool) <= self.low_watermark:
+            self._schedule_refill(bucket)
+        if not pool:
+            self.empty += 1
+            return None
+
+        message = pool.pop(random.randrange(len(pool)))
+        self.served += 1
+        if key in self._taken_during_reload:
+            self._taken_during_reload[key].append(message)
+        if self.storage is not None:
+            self.storage.write_nowait(
+                "DELETE FROM message_pool WHERE rowid = "
+                "(SELECT rowid FROM message_pool WHERE bucket = ? AND message = ? LIMIT 1)",
+                (key, message),
+            )
+        return message
+
+    def warm(self, buckets: Iterable[Bucket]) -> None:
+        """Top up every bucket below the watermark in the background"""
+        for bucket in buckets:
+            if len(self._pools.get(_key(bucket), [])) <= self.low_watermark:
+                self._schedule_refill(bucket)
+
+    def stats(self) -> dict:
+        return {
+            "buckets": len(self._pools),
+            "available": sum(len(pool) for pool in self._pools.values()),
+            "served": self.served,
+            "empty": self.empty,
+            "refilling": len(self._refilling),
+        }
+
+    def _schedule_refill(self, bucket: Bucket) -> None:
+        key = _key(bucket)
+        if key in self._refilling:
+            return
+        try:
+            task = asyncio.get_running_loop().create_task(self._refill(bucket))
+        except RuntimeError:
+            return  # No event loop (e.g. offline scripts); refill on next async use
+        self._refilling[key] = task
+        task.add_done_callback(lambda _: self._refilling.pop(key, None))
+
+    async def _refill(self, bucket: Bucket) -> None:
+        key = _key(bucket)
+        if self.storage is not None:
+            taken = self._taken_during_reload[key] = []
+            try:
+                await self.storage.write("SELECT 1")  # make our own deletes visible
+                rows = await self.storage.aquery("SELECT message FROM message_pool WHERE bucket = ?", (key,))
+            finally:
+                del self._taken_during_reload[key]
+            messages = [message for (message,) in rows]
+            for message in taken:
+                if message in messages:
+                    messages.remove(message)
+            self._pools[key] = messages
+        missing = self.variants_per_bucket - len(self._pools.get(key, []))
+        if missing <= 0:
+            return
+
+        try:
+            async with self._refill_slots:
+                variants = await self.generate(bucket, missing)
+        except Exception as e:
+            print(f"Message pool refill failed for {key}: {e}")
+            return
+
+        variants = [v.strip() for v in variants if v and v.strip()][:missing]
+        self._pools.setdefault(key, []).extend(variants)
+        if self.storage is not None and variants:
+            self.storage.write_many_nowait(
+                "INSERT INTO message_pool (bucket, message) VALUES (?, ?)",
+                [(key, variant) for variant in variants],
+            )
+
+
+def _key(bucket: Bucket) -> str:
+    return "|".join(bucket)
@@ -0,0 +1,198 @@
+"""
+Model Cascade
+
+Coaching and team answers are first asked of a fast tier on
+`mistral-small-latest`. The answer is kept if it passes a cheap local quality
+check; otherwise (or when the caller asks for depth) the request goes to
+the `mistral-large-latest` tier. A latency budget caps the cascade: the
+fast tier is cut off when the budget runs out (and the caller falls back to
+its default answer), and the large tier is only tried if its typical latency
+still fits what is left of the budget, so a tight budget gets the fast answer.
+
+The fast tier does not read past runs or write memories inline, so an
+answer it gives that is then rejected never reaches later context; only
+the answer returned is recorded (by the caller).
+
+Per-tier call counts and latencies, which tier answered, and why answers
+were escalated are kept for `/v1/cascade/stats`. Set MODEL_CASCADE=0 to
+always use the large tier.
+"""
+
+import asyncio
+import os
+import re
+import time
+from collections import deque
+from typing import Any
+
+from core.metrics import metrics
+from core.registry import LazyRef
+
+
+SMALL = "small"
+LARGE = "large"
+TIERS = (SMALL, LARGE)
+
+CASCADE_ENABLED = os.getenv("MODEL_CASCADE", "1") == "1"
+MIN_WORDS = int(os.getenv("CASCADE_MIN_WORDS", "20"))
+# Assumed tier latency until enough calls have been timed
+EXPECTED_SECONDS = {
+    SMALL: float(os.getenv("CASCADE_SMALL_EXPECTED_MS", "1500")) / 1000,
+    LARGE: float(os.getenv("CASCADE_LARGE_EXPECTED_MS", "5000")) / 1000,
+}
+MIN_SAMPLES = 20
+LATENCY_WINDOW = 1000
+
+_HEDGING = re.compile(
+    r"\b(i'?m not sure|i am not sure|i don'?t know|i cannot help|i can'?t help|"
+    r"as an ai|unable to (help|answer|provide)|not enough information)\b"
+)
+_ACTION_CUES = re.compile(
+    r"(^\s*(?:[-*•]|\d+[.)])\s)|\b(try|start|schedule|block|set|take|plan|pick|"
+    r"choose|turn off|put|close|write|break|focus|protect|batch|move|limit|begin)\b",
+    re.M,
+)
+_STOPWORDS = frozenset(
+    "about after again also because been before being could does doing from have "
+    "into just keep more most much should some than that their them then there "
+    "these they this those very want what when where which while with would your".split()
+)
+
+cascade_seconds = metrics.histogram(
+    "hyperfocus_cascade_tier_seconds", "Latency of each cascade tier call", ("cascade", "tier")
+)
+cascade_answers_total = metrics.counter(
+    "hyperfocus_cascade_answers_total", "Cascade answers by the tier that produced them", ("cascade", "tier")
+)
+
+
+def quality_issue(question: str, answer: Any) -> str | None:
+    """Why a fast-tier answer should be escalated, or None if it is fine"""
+    text = str(answer or "").strip()
+    if not text:
+        return "empty"
+    lowered = text.lower()
+    if len(text.split()) < MIN_WORDS:
+        return "too_short"
+    if _HEDGING.search(lowered):
+        return "hedging"
+    if text.count("**") % 2 or text.count("```") % 2:
+        return "truncated"
+    keywords = {w[:5] for w in re.findall(r"[a-z']{4,}", question.lower()) if w not in _STOPWORDS}
+    if len(keywords) >= 3 and not any(k in lowered for k in keywords):
+        return "off_topic"
+    if not _ACTION_CUES.search(lowered):
+        return "not_actionable"
+    return None
+
+
+class ModelCascade:
+    """Fast tier first, large tier on a failed check or when depth is asked for"""
+
+    def __init__(self, name: str, small: LazyRef, large: LazyRef):
+        self.name = name
+        self.runners = {SMALL: small, LARGE: large}
+        self._latencies = {tier: deque(maxlen=LATENCY_WINDOW) for tier in TIERS}
+        self._end_to_end: deque = deque(maxlen=LATENCY_WINDOW)
+        self.answered = {tier: 0 for tier in TIERS}
+        self.escalations: dict[str, int] = {}
+        self.depth_requests = 0
+        self.kept_for_budget = 0
+        self.timeouts = 0
+
+    async def run(
+        self,
+        prompt: str,
+        depth: bool = False,
+        latency_budget_ms: int | None = None,
+        question: str | None = None,
+        **kwargs,
+    ) -> tuple[Any, str]:
+        """Answer `prompt`; returns (content, tier that answered)
+
+        `question` is what the quality check compares answers against when
+        the prompt also carries context (defaults to the prompt).
+        """
+        started = time.perf_counter()
+        budget = latency_budget_ms / 1000 if latency_budget_ms else None
+        if depth:
+            self.depth_requests += 1
+
+        if not CASCADE_ENABLED:
+            tiers = [LARGE]
+        elif depth and (budget is None or budget >= self.expected_seconds(LARGE)):
+            tiers = [LARGE]
+        else:
+            tiers = [SMALL, LARGE]
+
+        content, tier = None, tiers[0]
+        for tier in tiers:
+            timeout = None
+            if tier == SMALL and budget is not None:
+                timeout = max(0.0, budget - (time.perf_counter() - started))
+            try:
+                content = await self._call(tier, prompt, timeout, **kwargs)
+            except asyncio.TimeoutError:
+                # Out of budget: there is no time left for the large tier either
+                content = None
+                self.timeouts += 1
+                break
+            if tier == LARGE:
+                break
+            issue = quality_issue(question or prompt, content)
+            if issue is None:
+                break
+            remaining = None if budget is None else budget - (time.perf_counter() - started)
+            if content and remaining is not None and remaining < self.expected_seconds(LARGE):
+                self.kept_for_budget += 1
+                break
+            self.escalations[issue] = self.escalations.get(issue, 0) + 1
+
+        self.answered[tier] += 1
+        cascade_answers_total.inc(cascade=self.name, tier=tier)
+        self._end_to_end.append(time.perf_counter() - started)
+        return content, tier
+
+    def expected_seconds(self, tier: str) -> float:
+        """Typical latency of a tier: the observed median once there are enough calls"""
+        samples = self._latencies[tier]
+        if len(samples) < MIN_SAMPLES:
+            return EXPECTED_SECONDS[tier]
+        return _percentile(samples, 0.5)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": CASCADE_ENABLED,
+            "tiers": {
+                tier: {
+                    "calls": len(samples),
+                    "answered": self.answered[tier],
+                    "p50_ms": round(_percentile(samples, 0.5) * 1000, 1),
+                    "p95_ms": round(_percentile(samples, 0.95) * 1000, 1),
+                }
+                for tier, samples in self._latencies.items()
+            },
+            "end_to_end": {
+                "p50_ms": round(_percentile(self._end_to_end, 0.5) * 1000, 1),
+                "p95_ms": round(_percentile(self._end_to_end, 0.95) * 1000, 1),
+            },
+            "escalations": dict(self.escalations),
+            "depth_requests": self.depth_requests,
+            "kept_for_budget": self.kept_for_budget,
+            "timeouts": self.timeouts,
+        }
+
+    async def _call(self, tier: str, prompt: str, timeout: float | None, **kwargs) -> Any:
+        started = time.perf_counter()
+        response = await asyncio.wait_for(self.runners[tier].arun(prompt, **kwargs), timeout)
+        elapsed = time.perf_counter() - started
+        self._latencies[tier].append(elapsed)
+        cascade_seconds.observe(elapsed, cascade=self.name, tier=tier)
+        return response.content
+
+
+def _percentile(samples, q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
@@ -5,11 +5,21 @@ The main coaching agent for the Hyperfocus productivity system.
 Uses agentic memory to remember user patterns and provide personalized advice.
 """
 
-from agno.agent import Agent
-from agno.models.mistral import MistralChat
-from agno.db import SqliteDb
-from agno.memory import AgentMemory
+from functools import partial
 from pydantic import BaseModel
+from typing import AsyncIterator
+
+from core.coalesce import coalesced
+from core.models import chat_model
+from core.llm_scheduler import Priority
+from core.registry import register_agent
+from core.storage import get_storage
+from tools import distractions_per_session, energy_by_hour, search_hyperfocus_knowledge
+
+from .context_builder import CONTEXT_COMPACTION, context_builder
+from .memory_consolidator import INLINE_MEMORY, memory_consolidator
+from .model_cascade import ModelCascade
+from .streaming import stream_text
 
 
 class CoachingResponse(BaseModel):
@@ -19,21 +29,28 @@ class CoachingResponse(BaseModel):
     confidence: float
 
 
-# Productivity Coach with agentic memory
-productivity_coach = Agent(
-    name="HyperfocusCoach",
-    model=MistralChat(id="mistral-large-latest"),
-    db=SqliteDb(
-        db_file="hyperfocus_memory.db",
-        auto_upgrade_db=True,
-    ),
-    memory=AgentMemory(
-        create_user_memories=True,
-        update_user_memories_after_run=True,
-        memories_from_previous_runs=5,
-    ),
-    description="An intelligent productivity coach based on the Hyperfocus methodology.",
-    instructions="""You are a productivity coach trained in the Hyperfocus methodology by Chris Bailey.
+# Productivity Coach with agentic memory. Memories are read on every run but
+# written by the background memory consolidator, off the response path. The
+# cascade's fast tier (history=False) neither reads past runs nor writes
+# memories, since its answers may be rejected.
+def _build_productivity_coach(name: str, model_id: str, history: bool = True):
+    from agno.agent import Agent
+    from agno.memory import AgentMemory
+
+    return Agent(
+        name=name,
+        model=chat_model(model_id),
+        db=get_storage().agno_db(),
+        memory=AgentMemory(
+            create_user_memories=INLINE_MEMORY and history,
+            update_user_memories_after_run=INLINE_MEMORY and history,
+            # The context builder adds a budgeted selection of these instead
+            memories_from_previous_runs=5 if history and not CONTEXT_COMPACTION else 0,
+            add_memories_to_context=not CONTEXT_COMPACTION,
+        ),
+        tools=[search_hyperfocus_knowledge, distractions_per_session, energy_by_hour],
+        description="An intelligent productivity coach based on the Hyperfocus methodology.",
+        instructions="""You are a productivity coach trained in the Hyperfocus methodology by Chris Bailey.
 
 Your core principles:
 1. **Manage attention, not time** - Help users focus on what matters, not just what's urgent
@@ -53,17 +70,68 @@ Guidelines:
 - Warn about burnout from too much Hyperfocus
 - Encourage Scatterfocus breaks for creativity
 - Keep responses concise and actionable
+- Use search_hyperfocus_knowledge to ground advice in the book when helpful
 
 Always aim to help users work smarter, not harder.""",
-    markdown=True,
-    show_tool_calls=True,
+        markdown=True,
+        show_tool_calls=True,
+    )
+
+
+productivity_coach = register_agent(
+    "HyperfocusCoach",
+    partial(_build_productivity_coach, "HyperfocusCoach", "mistral-large-latest"),
+    hot=True,
+    priority=Priority.COACHING,
 )
 
+# Same coach on the small model, tried first by the cascade
+productivity_coach_fast = register_agent(
+    "HyperfocusCoachFast",
+    partial(_build_productivity_coach, "HyperfocusCoachFast", "mistral-small-latest", history=False),
+    hot=True,
+    priority=Priority.COACHING,
+)
 
-async def get_coaching(user_id: str, context: str) -> str:
-    """Get coaching advice for the given context"""
-    response = await productivity_coach.arun(
-        context,
+coaching_cascade = ModelCascade("coaching", productivity_coach_fast, productivity_coach)
+
+
+@coalesced()
+async def get_coaching(
+    user_id: str,
+    context: str,
+    depth: bool = False,
+    latency_budget_ms: int | None = None,
+) -> str:
+    """Get coaching advice for the given context
+    
+    Goes through the model cascade: `depth` asks for the large model, and
+    `latency_budget_ms` keeps the answer to the tier that fits.
+    """
+    content, _ = await coaching_cascade.run(
+        await context_builder.build(productivity_coach.name, user_id, context),
+        depth=depth,
+        latency_budget_ms=latency_budget_ms,
+        question=context,
         user_id=user_id,
     )
-    return response.content if response.content else "Stay focused on your purposeful work!"
+    if not content:
+        return "Stay focused on your purposeful work!"
+    _record_run(user_id, context, str(content))
+    return content
+
+
+async def stream_coaching(user_id: str, context: str) -> AsyncIterator[str]:
+    """Stream coaching advice token by token"""
+    tokens = []
+    prompt = await context_builder.build(productivity_coach.name, user_id, context)
+    async for token in stream_text(productivity_coach, prompt, user_id=user_id):
+        tokens.append(token)
+        yield token
+    if tokens:
+        _record_run(user_id, context, "".join(tokens))
+
+
+def _record_run(user_id: str, context: str, response: str) -> None:
+    context_builder.record_run(user_id, productivity_coach.name, context, response)
+    memory_consolidator.enqueue(user_id, productivity_coach.name, context, response)
@@ -0,0 +1,354 @@
+"""
+Focus Session Scheduler
+
+Central scheduler that drives FocusGuardian check-ins for every active focus
+session. Replaces one sleeping coroutine per session with a single timer heap:
+check-ins are jittered to spread LLM load, session state is persisted to SQLite
+so streams resume after a restart, and pause/resume/distraction events
+reschedule or cancel pending check-ins. A finished session nobody is
+listening to keeps its final messages for FINISHED_RETENTION_SECONDS, then
+is forgotten.
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import random
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Awaitable, Callable
+
+from core.storage import Storage
+
+
+CHECK_INTERVAL_SECONDS = 10 * 60
+CHECK_JITTER_SECONDS = 60
+MAX_CONCURRENT_CHECKINS = 32
+MAX_BUFFERED_MESSAGES = 5
+FINISHED_RETENTION_SECONDS = 60 * 60
+
+
+@dataclass
+class SessionState:
+    """Persisted state of one focus session"""
+    session_id: str
+    mode: str
+    target_minutes: int
+    started_at: float
+    paused_at: float | None = None
+    paused_seconds: float = 0.0
+    distraction_count: int = 0
+    checks_done: int = 0
+    next_check_at: float | None = None
+    finished: bool = False
+    finished_at: float | None = None
+    # Messages produced while no client was listening
+    undelivered: list[str] = field(default_factory=list)
+
+    def elapsed_seconds(self, now: float) -> float:
+        paused = self.paused_seconds
+        if self.paused_at is not None:
+            paused += now - self.paused_at
+        return max(0.0, now - self.started_at - paused)
+
+    def ends_at(self) -> float:
+        return self.started_at + self.paused_seconds + self.target_minutes * 60
+
+
+@dataclass
+class SessionMessages:
+    """FocusGuardian message generators used by the scheduler"""
+    start: Callable[[str], Awaitable[str]]
+    check: Callable[[str, int, int, int], Awaitable[str]]
+    distraction: Callable[[str, int], Awaitable[str]]
+    end: Callable[[str, bool, int, int], Awaitable[str]]
+
+
+class SessionScheduler:
+    """Timer heap driving check-ins for many concurrent focus sessions"""
+
+    def __init__(
+        self,
+        messages: SessionMessages,
+        storage: Storage | None = None,
+        check_interval: float = CHECK_INTERVAL_SECONDS,
+        jitter: float = CHECK_JITTER_SECONDS,
+        max_concurrent_checkins: int = MAX_CONCURRENT_CHECKINS,
+        finished_retention: float = FINISHED_RETENTION_SECONDS,
+    ):
+        self.messages = messages
+        self.check_interval = check_interval
+        self.jitter = jitter
+        self.finished_retention = finished_retention
+
+        self._sessions: dict[str, SessionState] = {}
+        self._subscribers: dict[str, asyncio.Queue] = {}
+        # Heap entries: (due_at, seq, session_id, generation); stale generations are skipped
+        self._heap: list[tuple[float, int, str, int]] = []
+        self._generations: dict[str, int] = {}
+        self._seq = itertools.count()
+        self._wakeup: asyncio.Event | None = None
+        self._driver: asyncio.Task | None = None
+        self._checkin_slots = asyncio.Semaphore(max_concurrent_checkins)
+        self._tasks: set[asyncio.Task] = set()
+
+        self.storage = storage
+        if storage is not None:
+            storage.ensure_schema(
+                """CREATE TABLE IF NOT EXISTS focus_session_schedule (
+                    session_id TEXT PRIMARY KEY,
+                    state TEXT NOT NULL
+                )"""
+            )
+
+    async def start(self) -> None:
+        """Start the driver and resume sessions persisted before a restart"""
+        if self._driver is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._driver = asyncio.create_task(self._run())
+
+        if self.storage is None:
+            return
+        now = time.time()
+        for (payload,) in await self.storage.aquery("SELECT state FROM focus_session_schedule"):
+            state = SessionState(**json.loads(payload))
+            self._sessions[state.session_id] = state
+            # Finished sessions are kept only until their last messages are delivered
+            if state.finished:
+                self._schedule(state, (state.finished_at or now) + self.finished_retention)
+            elif state.paused_at is None:
+                due = state.next_check_at or now
+                # Overdue check-ins are spread out rather than fired all at once
+                self._schedule(state, max(due, now + random.uniform(0, self.jitter)))
+
+    async def stop(self) -> None:
+        """Stop the driver; session state stays persisted"""
+        if self._driver is not None:
+            self._driver.cancel()
+            self._driver = None
+
+    async def open(self, session_id: str, mode: str, target_minutes: int) -> asyncio.Queue:
+        """Start (or reattach to) a session and return its message queue"""
+        await self.start()
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers[session_id] = queue
+
+        state = self._sessions.get(session_id)
+        if state is None:
+            state = SessionState(session_id, mode, target_minutes, started_at=time.time())
+            self._sessions[session_id] = state
+            self._schedule(state, self._next_due(state, time.time()))
+            self._save(state)
+            self._spawn(self._deliver_start(state))
+        else:
+            for message in state.undelivered:
+                queue.put_nowait(message)
+            state.undelivered.clear()
+            if state.finished:
+                queue.put_nowait(None)
+                self._forget(state)
+            else:
+                self._save(state)
+        return queue
+
+    def close(self, session_id: str, queue: asyncio.Queue) -> None:
+        """Detach a listener; the session itself keeps running"""
+        if self._subscribers.get(session_id) is queue:
+            del self._subscribers[session_id]
+
+    def pause(self, session_id: str) -> bool:
+        """Pause a session and cancel its pending check-in"""
+        state = self._sessions.get(session_id)
+        if state is None or state.finished or state.paused_at is not None:
+            return False
+        state.paused_at = time.time()
+        self._cancel(state)
+        self._save(state)
+        return True
+
+    def resume(self, session_id: str) -> bool:
+        """Resume a paused session and schedule its next check-in"""
+        state = self._sessions.get(session_id)
+        if state is None or state.finished or state.paused_at is None:
+            return False
+        now = time.time()
+        state.paused_seconds += now - state.paused_at
+        state.paused_at = None
+        self._schedule(state, self._next_due(state, now))
+        self._save(state)
+        return True
+
+    def distraction(self, session_id: str) -> bool:
+        """Log a distraction: send a recovery message and push back the next check-in"""
+        state = self._sessions.get(session_id)
+        if state is None or state.finished:
+            return False
+        state.distraction_count += 1
+        if state.paused_at is None:
+            self._schedule(state, self._next_due(state, time.time()))
+        self._save(state)
+        self._spawn(self._deliver_distraction(state))
+        return True
+
+    def end(self, session_id: str, completed: bool) -> bool:
+        """End a session early (or confirm completion) and send the final message"""
+        state = self._sessions.get(session_id)
+        if state is None or state.finished:
+            return False
+        self._spawn(self._finish(state, completed))
+        return True
+
+    def inspect(self, session_id: str) -> dict | None:
+        """Current state of a session, for debugging and the API"""
+        state = self._sessions.get(session_id)
+        if state is None:
+            return None
+        now = time.time()
+        return {
+            **asdict(state),
+            "minutes_elapsed": int(state.elapsed_seconds(now) // 60),
+            "listening": session_id in self._subscribers,
+        }
+
+    def stats(self) -> dict:
+        active = [s for s in self._sessions.values() if not s.finished]
+        return {
+            "active_sessions": len(active),
+            "finished_sessions": len(self._sessions) - len(active),
+            "paused_sessions": sum(1 for s in active if s.paused_at is not None),
+            "pending_timers": len(self._heap),
+            "listeners": len(self._subscribers),
+        }
+
+    # Scheduling
+
+    def _next_due(self, state: SessionState, now: float) -> float:
+        due = now + self.check_interval + random.uniform(-self.jitter, self.jitter)
+        return min(due, state.ends_at())
+
+    def _schedule(self, state: SessionState, due: float) -> None:
+        generation = self._generations.get(state.session_id, 0) + 1
+        self._generations[state.session_id] = generation
+        state.next_check_at = due
+        heapq.heappush(self._heap, (due, next(self._seq), state.session_id, generation))
+        if self._wakeup is not None and self._heap[0][2] == state.session_id:
+            self._wakeup.set()
+
+    def _cancel(self, state: SessionState) -> None:
+        self._generations[state.session_id] = self._generations.get(state.session_id, 0) + 1
+        state.next_check_at = None
+
+    async def _run(self) -> None:
+        while True:
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                _, _, session_id, generation = heapq.heappop(self._heap)
+                state = self._sessions.get(session_id)
+                if state is None or generation != self._generations.get(session_id):
+                    continue
+                state.next_check_at = None
+                if state.finished:
+                    # Retention is over and nobody came back for the last messages
+                    if session_id not in self._subscribers:
+                        self._forget(state)
+                    continue
+                self._spawn(self._check_in(state))
+
+            timeout = self._heap[0][0] - now if self._heap else None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _spawn(self, coro: Awaitable) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Focus session task {task.get_coro().__name__} failed: {task.exception()!r}")
+
+    # Check-ins
+
+    async def _check_in(self, state: SessionState) -> None:
+        now = time.time()
+        if now >= state.ends_at():
+            await self._finish(state, True)
+            return
+
+        state.checks_done += 1
+        minutes_elapsed = int(state.elapsed_seconds(now) // 60)
+        minutes_remaining = max(1, state.target_minutes - minutes_elapsed)
+        self._schedule(state, self._next_due(state, now))
+        self._save(state)
+
+        async with self._checkin_slots:
+            message = await self.messages.check(
+                state.mode, minutes_elapsed, minutes_remaining, state.distraction_count
+            )
+        self._publish(state, message)
+
+    async def _deliver_start(self, state: SessionState) -> None:
+        async with self._checkin_slots:
+            message = await self.messages.start(state.mode)
+        self._publish(state, message)
+
+    async def _deliver_distraction(self, state: SessionState) -> None:
+        async with self._checkin_slots:
+            message = await self.messages.distraction(state.mode, state.distraction_count)
+        self._publish(state, message)
+
+    async def _finish(self, state: SessionState, completed: bool) -> None:
+        if state.finished:
+            return
+        now = time.time()
+        state.finished = True
+        state.finished_at = now
+        self._cancel(state)
+        duration_minutes = int(state.elapsed_seconds(now) // 60)
+        self._save(state)
+
+        try:
+            async with self._checkin_slots:
+                message = await self.messages.end(
+                    state.mode, completed, duration_minutes, state.distraction_count
+                )
+            self._publish(state, message)
+        finally:
+            # Listeners must see the end of the stream even if the last message failed
+            queue = self._subscribers.get(state.session_id)
+            if queue is not None:
+                queue.put_nowait(None)
+                self._forget(state)
+            else:
+                self._schedule(state, now + self.finished_retention)
+
+    def _forget(self, state: SessionState) -> None:
+        self._sessions.pop(state.session_id, None)
+        self._generations.pop(state.session_id, None)
+        self._subscribers.pop(state.session_id, None)
+        if self.storage is not None:
+            self.storage.write_nowait(
+                "DELETE FROM focus_session_schedule WHERE session_id = ?", (state.session_id,)
+            )
+
+    def _publish(self, state: SessionState, message: str) -> None:
+        queue = self._subscribers.get(state.session_id)
+        if queue is not None:
+            queue.put_nowait(message)
+            return
+        state.undelivered = (state.undelivered + [message])[-MAX_BUFFERED_MESSAGES:]
+        self._save(state)
+
+    def _save(self, state: SessionState) -> None:
+        if self.storage is None:
+            return
+        self.storage.write_nowait(
+            "INSERT OR REPLACE INTO focus_session_schedule (session_id, state) VALUES (?, ?)",
+            (state.session_id, json.dumps(asdict(state))),
+        )
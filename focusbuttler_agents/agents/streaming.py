@@ -0,0 +1,125 @@
+"""
+Agent Streaming Helpers
+
+Token-level streaming for agent and team runs, plus an incremental parser
+that turns a streamed JSON object into per-field text deltas so structured
+responses can be shown before the model has finished writing them.
+"""
+
+import json
+from contextlib import aclosing
+from typing import Any, AsyncIterator
+
+
+# Run events that carry a content delta (agent and team runs)
+_CONTENT_EVENTS = {"RunContent", "TeamRunContent"}
+
+
+async def stream_text(runner: Any, prompt: str, **kwargs) -> AsyncIterator[str]:
+    """Yield text deltas from a streamed `arun` on an agent or team
+
+    Closing this iterator (e.g. when the client disconnects) closes the
+    upstream run, which cancels the model request.
+    """
+    async with aclosing(runner.arun(prompt, stream=True, **kwargs)) as events:
+        async for event in events:
+            if getattr(event, "event", None) not in _CONTENT_EVENTS:
+                continue
+            content = getattr(event, "content", None)
+            if isinstance(content, str) and content:
+                yield content
+
+
+class PartialJSONFields:
+    """Incrementally extract top-level fields from a streamed JSON object
+
+    `feed()` returns the (field, delta) pairs for string values decoded so
+    far; `fields` holds everything parsed, including non-string literals
+    once they are complete.
+    """
+
+    def __init__(self):
+        self.fields: dict[str, Any] = {}
+        self.done = False
+        self._state = "before_object"
+        self._key = ""
+        self._literal = ""
+        self._escape = ""
+
+    def feed(self, chunk: str) -> list[tuple[str, str]]:
+        deltas: dict[str, str] = {}
+
+        for char in chunk:
+            state = self._state
+
+            if state == "before_object":
+                if char == "{":
+                    self._state = "before_key"
+
+            elif state == "before_key":
+                if char == '"':
+                    self._key = ""
+                    self._state = "key"
+                elif char == "}":
+                    self._state = "done"
+                    self.done = True
+
+            elif state == "key":
+                if self._escape or char == "\\":
+                    self._key += char
+                    self._escape = "" if self._escape else char
+                elif char == '"':
+                    self._key = json.loads(f'"{self._key}"')
+                    self._state = "after_key"
+                else:
+                    self._key += char
+
+            elif state == "after_key":
+                if char == ":":
+                    self._state = "before_value"
+
+            elif state == "before_value":
+                if char == '"':
+                    self.fields[self._key] = ""
+                    self._state = "string"
+                elif not char.isspace():
+                    self._literal = char
+                    self._state = "literal"
+
+            elif state == "string":
+                if self._escape:
+                    self._escape += char
+                    if _escape_complete(self._escape):
+                        self._append(deltas, json.loads(f'"{self._escape}"'))
+                        self._escape = ""
+                elif char == "\\":
+                    self._escape = char
+                elif char == '"':
+                    self._state = "before_key"
+                else:
+                    self._append(deltas, char)
+
+            elif state == "literal":
+                if char in ",}":
+                    try:
+                        self.fields[self._key] = json.loads(self._literal.strip())
+                    except json.JSONDecodeError:
+                        self.fields[self._key] = None
+                    self._state = "before_key" if char == "," else "done"
+                    self.done = char == "}"
+                else:
+                    self._literal += char
+
+        return list(deltas.items())
+
+    def _append(self, deltas: dict[str, str], text: str) -> None:
+        self.fields[self._key] += text
+        deltas[self._key] = deltas.get(self._key, "") + text
+
+
+def _escape_complete(sequence: str) -> bool:
+    if len(sequence) < 2:
+        return False
+    if sequence[1] == "u":
+        return len(sequence) == 6
+    return True
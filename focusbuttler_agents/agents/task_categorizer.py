@@ -5,10 +5,19 @@ AI-powered task categorization using the Hyperfocus four quadrants methodology.
 Replaces the keyword-based categorization in the Flutter app with true AI understanding.
 """
 
-from agno.agent import Agent
-from agno.models.mistral import MistralChat
 from pydantic import BaseModel
 from enum import Enum
+import asyncio
+import os
+
+from core.coalesce import coalesced
+from core.metrics import record_parse_failure
+from core.models import chat_model
+from core.registry import register_agent
+from core.storage import get_storage
+
+from .categorization_cache import CategorizationCache
+from .fast_classifier import CategorizationLog, FastClassifier
 
 
 class TaskType(str, Enum):
@@ -27,13 +36,17 @@ class TaskCategorization(BaseModel):
     estimated_energy_required: str  # low, moderate, high, peak
 
 
-# Task Categorizer Agent
-task_categorizer = Agent(
-    name="TaskCategorizer",
-    model=MistralChat(id="mistral-small-latest"),
-    description="Expert at categorizing tasks using the Hyperfocus four quadrants methodology.",
-    response_model=TaskCategorization,
-    instructions="""You are a task categorization expert trained in the Hyperfocus methodology.
+class IndexedTaskCategorization(TaskCategorization):
+    """A categorization tagged with the position of its task in a batch"""
+    index: int
+
+
+class TaskCategorizationBatch(BaseModel):
+    """Structured response for a batch of tasks"""
+    items: list[IndexedTaskCategorization]
+
+
+CATEGORIZER_INSTRUCTIONS = """You are a task categorization expert trained in the Hyperfocus methodology.
 
 Categorize tasks into one of four quadrants:
 
@@ -64,13 +77,74 @@ Categorize tasks into one of four quadrants:
 Also suggest:
 - Best time of day based on energy requirements
 - Energy level needed (low, moderate, high, peak)
-- Brief reasoning for the categorization""",
-    markdown=False,
-)
+- Brief reasoning for the categorization"""
+
+
+# Task Categorizer Agent
+def _build_task_categorizer():
+    from agno.agent import Agent
+
+    return Agent(
+        name="TaskCategorizer",
+        model=chat_model("mistral-small-latest"),
+        description="Expert at categorizing tasks using the Hyperfocus four quadrants methodology.",
+        response_model=TaskCategorization,
+        instructions=CATEGORIZER_INSTRUCTIONS,
+        markdown=False,
+    )
+
+
+task_categorizer = register_agent("TaskCategorizer", _build_task_categorizer, hot=True)
+
+
+# Batch variant - many tasks per structured-output call
+def _build_task_batch_categorizer():
+    from agno.agent import Agent
+
+    return Agent(
+        name="TaskBatchCategorizer",
+        model=chat_model("mistral-small-latest"),
+        description="Categorizes lists of tasks using the Hyperfocus four quadrants methodology.",
+        response_model=TaskCategorizationBatch,
+        instructions=CATEGORIZER_INSTRUCTIONS + """
+
+You will receive a numbered list of tasks. Return exactly one item per task,
+with `index` set to the task's number from the list.""",
+        markdown=False,
+    )
+
+
+task_batch_categorizer = register_agent("TaskBatchCategorizer", _build_task_batch_categorizer, hot=True)
+
+# Batch tuning: tasks per LLM call and concurrent calls per batch request
+BATCH_CHUNK_SIZE = int(os.getenv("CATEGORIZE_BATCH_CHUNK_SIZE", "25"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("CATEGORIZE_BATCH_CONCURRENCY", "4"))
+BATCH_MAX_RETRIES = 2
+# A whole batch runs many chunk calls, so it gets a longer flight timeout than one task
+BATCH_TIMEOUT_SECONDS = float(os.getenv("CATEGORIZE_BATCH_TIMEOUT_SECONDS", "600"))
+if BATCH_CHUNK_SIZE < 1 or BATCH_MAX_CONCURRENCY < 1:
+    raise ValueError("CATEGORIZE_BATCH_CHUNK_SIZE and CATEGORIZE_BATCH_CONCURRENCY must be at least 1")
+
+
+# Repeat titles are served from here instead of a fresh LLM round trip
+categorization_cache = CategorizationCache(TaskCategorization, get_storage())
+
+# Confident local answers skip the LLM; LLM answers are logged to retrain it
+fast_classifier = FastClassifier()
+categorization_log = CategorizationLog(get_storage())
 
 
+@coalesced(normalize=("task_title",))
 async def categorize_task(task_title: str) -> TaskCategorization:
     """Categorize a task using AI"""
+    cached = await categorization_cache.aget(task_title)
+    if cached is not None:
+        return cached
+    
+    fast = fast_classifier.classify(task_title)
+    if fast is not None:
+        return fast
+    
     prompt = f"""Categorize this task: "{task_title}"
     
 Provide the category (purposeful, necessary, distracting, or unnecessary), 
@@ -79,9 +153,113 @@ your brief reasoning, suggested time of day, and energy level required."""
     response = await task_categorizer.arun(prompt)
     
     if response.content and isinstance(response.content, TaskCategorization):
+        categorization_cache.set(task_title, response.content)
+        categorization_log.record(task_title, response.content)
         return response.content
     
     # Fallback if parsing fails
+    record_parse_failure(task_categorizer.name)
+    return _default_categorization()
+
+
+@coalesced(timeout=BATCH_TIMEOUT_SECONDS, normalize=("task_titles",))
+async def categorize_tasks(
+    task_titles: list[str],
+    chunk_size: int = BATCH_CHUNK_SIZE,
+    max_concurrency: int = BATCH_MAX_CONCURRENCY,
+) -> list[TaskCategorization]:
+    """Categorize many tasks, packing them into as few LLM calls as possible"""
+    if chunk_size < 1 or max_concurrency < 1:
+        raise ValueError("chunk_size and max_concurrency must be at least 1")
+    
+    cached = await categorization_cache.aget_many(task_titles)
+    results: list[TaskCategorization | None] = [
+        result or fast_classifier.classify(title)
+        for title, result in zip(task_titles, cached)
+    ]
+    
+    # Deduplicate the misses so repeated titles in an import are asked once
+    pending: dict[str, list[int]] = {}
+    for position, title in enumerate(task_titles):
+        if results[position] is None:
+            pending.setdefault(title, []).append(position)
+    
+    semaphore = asyncio.Semaphore(max_concurrency)
+    titles = list(pending)
+    chunks = [titles[i:i + chunk_size] for i in range(0, len(titles), chunk_size)]
+    answered = await asyncio.gather(
+        *(_categorize_chunk(chunk, semaphore) for chunk in chunks)
+    )
+    
+    for chunk_results in answered:
+        for title, result in chunk_results.items():
+            for position in pending[title]:
+                results[position] = result
+    
+    return results
+
+
+async def _categorize_chunk(
+    chunk: list[str],
+    semaphore: asyncio.Semaphore,
+) -> dict[str, TaskCategorization]:
+    """Categorize one chunk, retrying only the items that failed to parse"""
+    resolved: dict[str, TaskCategorization] = {}
+    remaining = list(chunk)
+    
+    for _ in range(1 + BATCH_MAX_RETRIES):
+        if not remaining:
+            break
+        async with semaphore:
+            parsed = await _run_batch(remaining)
+        for index, result in parsed.items():
+            resolved[remaining[index]] = result
+            categorization_cache.set(remaining[index], result)
+            categorization_log.record(remaining[index], result)
+        remaining = [title for i, title in enumerate(remaining) if i not in parsed]
+    
+    # Whatever the batch agent kept dropping goes through the single-task path
+    async def single(title: str) -> TaskCategorization:
+        async with semaphore:
+            return await categorize_task(title)
+    
+    answers = await asyncio.gather(*(single(title) for title in remaining))
+    resolved.update(zip(remaining, answers))
+    return resolved
+
+
+async def _run_batch(task_titles: list[str]) -> dict[int, TaskCategorization]:
+    """Run one batch call and return the parsed items keyed by list position"""
+    numbered = "\n".join(
+        f"{number}. \"{title}\"" for number, title in enumerate(task_titles, start=1)
+    )
+    prompt = f"""Categorize each of these tasks:
+{numbered}
+
+For every task provide its index, the category (purposeful, necessary, distracting,
+or unnecessary), your brief reasoning, suggested time of day, and energy level required."""
+    
+    try:
+        response = await task_batch_categorizer.arun(prompt)
+    except Exception as e:
+        print(f"Batch categorization failed: {e}")
+        return {}
+    
+    if not (response.content and isinstance(response.content, TaskCategorizationBatch)):
+        record_parse_failure(task_batch_categorizer.name)
+        return {}
+    
+    parsed: dict[int, TaskCategorization] = {}
+    for item in response.content.items:
+        position = item.index - 1
+        if 0 <= position < len(task_titles) and position not in parsed:
+            parsed[position] = TaskCategorization(
+                **item.model_dump(exclude={"index"})
+            )
+    return parsed
+
+
+def _default_categorization() -> TaskCategorization:
     return TaskCategorization(
         category=TaskType.PURPOSEFUL,
         reasoning="Default categorization - please review",
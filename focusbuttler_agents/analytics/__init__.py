@@ -0,0 +1,11 @@
+"""Analytics module initialization"""
+
+from .energy_profile import EnergyProfile, energy_profiles
+from .event_store import Event, event_store
+
+__all__ = [
+    "Event",
+    "event_store",
+    "EnergyProfile",
+    "energy_profiles",
+]
@@ -0,0 +1,468 @@
+"""
+Energy Profiles
+
+Per-user energy profiles built from the app's energy check-ins (the
+Serverpod `EnergyEntry`: level, timestamp, hourOfDay) and focus session
+outcomes (`FocusSession`). Both are ingested in bulk, and every user's
+profile is recomputed in one vectorized NumPy pass: recency-weighted hourly
+and weekday means, a circular rolling mean over the day, the best and worst
+windows of the day, an ultradian cycle estimate from a periodogram of the
+check-ins, and focus session completion and length.
+
+Profiles are served from `/v1/energy-profile` and summarised into the
+EnergyAdvisor prompt.
+
+Usage:
+    python -m analytics.energy_profile rebuild
+    python -m analytics.energy_profile show USER_ID
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+
+import numpy as np
+from pydantic import BaseModel, ConfigDict
+from pydantic.alias_generators import to_camel
+
+from core.storage import Storage, get_storage
+
+
+# EnergyLevel in the Serverpod protocol, scored 0-4
+ENERGY_LEVELS = ("exhausted", "low", "moderate", "high", "peak")
+HOURS = 24
+WEEKDAYS = 7
+
+HISTORY_DAYS = float(os.getenv("ENERGY_PROFILE_HISTORY_DAYS", "180"))
+HALF_LIFE_DAYS = float(os.getenv("ENERGY_PROFILE_HALF_LIFE_DAYS", "30"))
+REFRESH_SECONDS = float(os.getenv("ENERGY_PROFILE_REFRESH_SECONDS", "60"))
+SMOOTHING_HOURS = 3  # Centred circular rolling mean
+PEAK_WINDOW_HOURS = int(os.getenv("ENERGY_PROFILE_PEAK_HOURS", "2"))
+ULTRADIAN_PERIODS_MINUTES = np.arange(80, 145, 5)
+MIN_ULTRADIAN_ENTRIES = 12
+MIN_ULTRADIAN_POWER = 0.2
+MIN_SESSIONS_PER_HOUR = 2
+
+
+class _CamelModel(BaseModel):
+    # Accept the Flutter/Serverpod JSON (camelCase) as well as snake_case
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+
+class EnergyEntryIn(_CamelModel):
+    """One energy check-in"""
+    user_id: str
+    level: str
+    timestamp: datetime
+    hour_of_day: Optional[int] = None
+
+
+class SessionOutcomeIn(_CamelModel):
+    """One finished focus session"""
+    user_id: str
+    mode: str
+    start_time: datetime
+    end_time: Optional[datetime] = None
+    target_duration_minutes: int
+    was_completed: bool
+    distraction_count: int = 0
+
+
+class EnergyProfile(BaseModel):
+    """A user's energy and focus patterns (levels scored 0 = exhausted to 4 = peak)"""
+    user_id: str
+    entries: int
+    sessions: int
+    hourly: list[Optional[float]]  # Smoothed mean level per hour of day
+    weekday: list[Optional[float]]  # Mean level per weekday, Monday first
+    peak_hours: Optional[tuple[int, int]]  # [start, end) of the best window
+    dip_hours: Optional[tuple[int, int]]  # [start, end) of the worst window
+    ultradian_minutes: Optional[int]
+    session_completion_rate: Optional[float]
+    typical_session_minutes: Optional[int]  # Median length of completed sessions
+    best_session_hour: Optional[int]  # Start hour with the best completion rate
+    updated_at: float
+
+    def summary(self, hour_of_day: Optional[int] = None) -> str:
+        """One compact line for the advisor prompt"""
+        parts = [f"{self.entries} check-ins, {self.sessions} focus sessions"]
+        if self.peak_hours:
+            parts.append(f"energy usually peaks {_span(self.peak_hours)}")
+        if self.dip_hours:
+            parts.append(f"dips {_span(self.dip_hours)}")
+        if hour_of_day is not None and self.hourly[hour_of_day % HOURS] is not None:
+            parts.append(f"typical level at {hour_of_day % HOURS}:00 is {level_name(self.hourly[hour_of_day % HOURS])}")
+        if self.ultradian_minutes:
+            parts.append(f"energy cycles roughly every {self.ultradian_minutes} min")
+        if self.session_completion_rate is not None:
+            parts.append(f"completes {self.session_completion_rate:.0%} of focus sessions")
+        if self.typical_session_minutes:
+            parts.append(f"completed sessions last about {self.typical_session_minutes} min")
+        if self.best_session_hour is not None:
+            parts.append(f"sessions go best when started around {self.best_session_hour}:00")
+        return "; ".join(parts)
+
+
+@dataclass
+class EntryArrays:
+    user: np.ndarray  # str
+    level: np.ndarray  # float, 0-4
+    ts: np.ndarray  # epoch seconds
+    hour: np.ndarray  # int, local hour of day
+    weekday: np.ndarray  # int, Monday = 0
+
+
+@dataclass
+class SessionArrays:
+    user: np.ndarray
+    minutes: np.ndarray
+    completed: np.ndarray  # bool
+    hour: np.ndarray  # Local start hour
+
+
+def level_score(level: str) -> Optional[int]:
+    name = level.strip().lower().removeprefix("energylevel.")
+    return ENERGY_LEVELS.index(name) if name in ENERGY_LEVELS else None
+
+
+def level_name(score: float) -> str:
+    return ENERGY_LEVELS[int(np.clip(round(score), 0, len(ENERGY_LEVELS) - 1))]
+
+
+def compute_profiles(entries: EntryArrays, sessions: SessionArrays, now: float) -> dict[str, EnergyProfile]:
+    """Profiles for every user in one pass (no per-user Python loop over the data)"""
+    users = np.unique(np.concatenate([entries.user, sessions.user]))
+    n = len(users)
+    if n == 0:
+        return {}
+    eu = np.searchsorted(users, entries.user)
+    su = np.searchsorted(users, sessions.user)
+
+    # Recency-weighted sums per (user, hour) and (user, weekday)
+    age_days = np.maximum(0.0, now - entries.ts) / 86400
+    weight = 0.5 ** (age_days / HALF_LIFE_DAYS)
+    hour_cells = eu * HOURS + entries.hour
+    hour_sum = np.bincount(hour_cells, weight * entries.level, n * HOURS).reshape(n, HOURS)
+    hour_weight = np.bincount(hour_cells, weight, n * HOURS).reshape(n, HOURS)
+    day_cells = eu * WEEKDAYS + entries.weekday
+    day_sum = np.bincount(day_cells, weight * entries.level, n * WEEKDAYS).reshape(n, WEEKDAYS)
+    day_weight = np.bincount(day_cells, weight, n * WEEKDAYS).reshape(n, WEEKDAYS)
+
+    hourly_raw = _ratio(hour_sum, hour_weight)
+    weekday = _ratio(day_sum, day_weight)
+    offsets = range(-(SMOOTHING_HOURS // 2), SMOOTHING_HOURS // 2 + 1)
+    hourly = _ratio(_circular_sum(hour_sum, offsets), _circular_sum(hour_weight, offsets))
+
+    peak_start, dip_start = _extreme_windows(hour_sum, hour_weight, PEAK_WINDOW_HOURS)
+    ultradian = _ultradian_minutes(entries, eu, hourly_raw, n)
+
+    entry_counts = np.bincount(eu, minlength=n)
+    session_counts = np.bincount(su, minlength=n)
+    completed_counts = np.bincount(su, sessions.completed.astype(float), n)
+    completion = _ratio(completed_counts, session_counts)
+    typical_minutes = _group_median(su[sessions.completed], sessions.minutes[sessions.completed], n)
+    best_hour = _best_session_hour(su, sessions, n)
+
+    profiles = {}
+    for i, user in enumerate(users.tolist()):
+        profiles[user] = EnergyProfile(
+            user_id=user,
+            entries=int(entry_counts[i]),
+            sessions=int(session_counts[i]),
+            hourly=_rounded(hourly[i]),
+            weekday=_rounded(weekday[i]),
+            peak_hours=_window(peak_start[i]),
+            dip_hours=_window(dip_start[i]),
+            ultradian_minutes=_optional_int(ultradian[i]),
+            session_completion_rate=None if np.isnan(completion[i]) else round(float(completion[i]), 3),
+            typical_session_minutes=_optional_int(typical_minutes[i]),
+            best_session_hour=_optional_int(best_hour[i]),
+            updated_at=now,
+        )
+    return profiles
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    out = np.full(numerator.shape, np.nan)
+    np.divide(numerator, denominator, out=out, where=denominator > 0)
+    return out
+
+
+def _circular_sum(values: np.ndarray, offsets: Iterable[int]) -> np.ndarray:
+    return sum(np.roll(values, -offset, axis=1) for offset in offsets)
+
+
+def _extreme_windows(hour_sum: np.ndarray, hour_weight: np.ndarray, width: int) -> tuple[np.ndarray, np.ndarray]:
+    """Start hour of each user's best and worst fully observed window (-1 if none)"""
+    offsets = range(width)
+    means = _ratio(_circular_sum(hour_sum, offsets), _circular_sum(hour_weight, offsets))
+    covered = _circular_sum((hour_weight > 0).astype(int), offsets) == width
+    highs = np.where(covered, means, -np.inf)
+    lows = np.where(covered, means, np.inf)
+    # A flat (or unobserved) profile has no meaningful peak or dip
+    valid = covered.any(axis=1) & (highs.max(axis=1) > lows.min(axis=1))
+    return np.where(valid, highs.argmax(axis=1), -1), np.where(valid, lows.argmin(axis=1), -1)
+
+
+def _ultradian_minutes(entries: EntryArrays, eu: np.ndarray, hourly_raw: np.ndarray, n: int) -> np.ndarray:
+    """Dominant 80-140 minute period in each user's check-ins (NaN if none stands out)
+
+    A Schuster periodogram of the check-ins after removing the user's
+    hour-of-day mean, evaluated for all users at once per candidate period.
+    """
+    counts = np.bincount(eu, minlength=n)
+    result = np.full(n, np.nan)
+    if len(eu) == 0:
+        return result
+    residual = entries.level - hourly_raw[eu, entries.hour]
+    residual = np.nan_to_num(residual)
+    energy = np.bincount(eu, residual ** 2, n)
+    minutes = entries.ts / 60
+    powers = np.empty((n, len(ULTRADIAN_PERIODS_MINUTES)))
+    for j, period in enumerate(ULTRADIAN_PERIODS_MINUTES):
+        phase = 2 * np.pi * minutes / period
+        real = np.bincount(eu, residual * np.cos(phase), n)
+        imag = np.bincount(eu, residual * np.sin(phase), n)
+        powers[:, j] = _ratio(real ** 2 + imag ** 2, counts * energy)
+    powers = np.nan_to_num(powers)
+    best = powers.argmax(axis=1)
+    strong = (powers.max(axis=1) >= MIN_ULTRADIAN_POWER) & (counts >= MIN_ULTRADIAN_ENTRIES)
+    result[strong] = ULTRADIAN_PERIODS_MINUTES[best[strong]]
+    return result
+
+
+def _group_median(groups: np.ndarray, values: np.ndarray, n: int) -> np.ndarray:
+    """Median of values per group id (NaN for empty groups)"""
+    result = np.full(n, np.nan)
+    if len(groups) == 0:
+        return result
+    order = np.lexsort((values, groups))
+    groups, values = groups[order], values[order]
+    counts = np.bincount(groups, minlength=n)
+    starts = np.cumsum(counts) - counts
+    present = counts > 0
+    low = starts[present] + (counts[present] - 1) // 2
+    high = starts[present] + counts[present] // 2
+    result[present] = (values[low] + values[high]) / 2
+    return result
+
+
+def _best_session_hour(su: np.ndarray, sessions: SessionArrays, n: int) -> np.ndarray:
+    cells = su * HOURS + sessions.hour
+    total = np.bincount(cells, minlength=n * HOURS).reshape(n, HOURS)
+    completed = np.bincount(cells, sessions.completed.astype(float), n * HOURS).reshape(n, HOURS)
+    rate = np.where(total >= MIN_SESSIONS_PER_HOUR, _ratio(completed, total), -1.0)
+    best = rate.argmax(axis=1).astype(float)
+    best[rate.max(axis=1) < 0] = np.nan
+    return best
+
+
+def _rounded(values: np.ndarray) -> list[Optional[float]]:
+    return [None if np.isnan(v) else round(float(v), 2) for v in values]
+
+
+def _optional_int(value: float) -> Optional[int]:
+    return None if np.isnan(value) else int(value)
+
+
+def _window(start: int) -> Optional[tuple[int, int]]:
+    return None if start < 0 else (int(start), int((start + PEAK_WINDOW_HOURS) % HOURS))
+
+
+def _span(hours: tuple[int, int]) -> str:
+    return f"{hours[0]}:00-{hours[1]}:00"
+
+
+class EnergyProfileStore:
+    """Stores check-ins and session outcomes and keeps every profile up to date"""
+
+    def __init__(self, storage: Storage):
+        self.storage = storage
+        self._profiles: dict[str, EnergyProfile] = {}
+        self._dirty = True
+        # Row counts at the last refresh; other workers' ingests change them
+        self._version: tuple | None = None
+        self._loop_task: asyncio.Task | None = None
+        self.refreshes = 0
+        self.last_refresh_seconds: float | None = None
+        storage.ensure_schema(
+            """CREATE TABLE IF NOT EXISTS energy_entries (
+                user_id TEXT NOT NULL,
+                level INTEGER NOT NULL,
+                ts REAL NOT NULL,
+                hour INTEGER NOT NULL,
+                weekday INTEGER NOT NULL
+            )""",
+            "CREATE INDEX IF NOT EXISTS energy_entries_ts ON energy_entries (ts)",
+            """CREATE TABLE IF NOT EXISTS session_outcomes (
+                user_id TEXT NOT NULL,
+                mode TEXT NOT NULL,
+                started_at REAL NOT NULL,
+                minutes REAL NOT NULL,
+                completed INTEGER NOT NULL,
+                distractions INTEGER NOT NULL,
+                hour INTEGER NOT NULL
+            )""",
+            "CREATE INDEX IF NOT EXISTS session_outcomes_started ON session_outcomes (started_at)",
+        )
+
+    def ingest_entries(self, entries: Iterable[EnergyEntryIn]) -> int:
+        """Queue check-ins for storage; entries with an unknown level are skipped"""
+        rows = []
+        for entry in entries:
+            score = level_score(entry.level)
+            if score is None:
+                continue
+            local = _local_time(entry.timestamp, entry.hour_of_day)
+            rows.append((entry.user_id, score, _epoch(entry.timestamp), local.hour, local.weekday()))
+        if rows:
+            self.storage.write_many_nowait("INSERT INTO energy_entries VALUES (?, ?, ?, ?, ?)", rows)
+            self._dirty = True
+        return len(rows)
+
+    def ingest_sessions(self, sessions: Iterable[SessionOutcomeIn]) -> int:
+        rows = []
+        for session in sessions:
+            started = _epoch(session.start_time)
+            minutes = (
+                (_epoch(session.end_time) - started) / 60
+                if session.end_time is not None else float(session.target_duration_minutes)
+            )
+            rows.append((
+                session.user_id, session.mode.lower(), started, max(0.0, minutes),
+                int(session.was_completed), session.distraction_count, session.start_time.hour,
+            ))
+        if rows:
+            self.storage.write_many_nowait("INSERT INTO session_outcomes VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self._dirty = True
+        return len(rows)
+
+    def get(self, user_id: str) -> Optional[EnergyProfile]:
+        return self._profiles.get(user_id)
+
+    def refresh(self) -> int:
+        """Recompute every profile from storage; returns the number of users"""
+        started = time.perf_counter()
+        self._dirty = False
+        self.storage.writer.flush()
+        self._version = self._data_version()
+        now = time.time()
+        since = now - HISTORY_DAYS * 86400
+        entry_rows = self.storage.query(
+            "SELECT user_id, level, ts, hour, weekday FROM energy_entries WHERE ts >= ?", (since,)
+        )
+        session_rows = self.storage.query(
+            "SELECT user_id, minutes, completed, hour FROM session_outcomes WHERE started_at >= ?", (since,)
+        )
+        self._profiles = compute_profiles(_entry_arrays(entry_rows), _session_arrays(session_rows), now)
+        self.refreshes += 1
+        self.last_refresh_seconds = time.perf_counter() - started
+        return len(self._profiles)
+
+    async def start(self) -> None:
+        """Compute profiles in the background, then again whenever new data has arrived"""
+        if self._loop_task is None:
+            self._loop_task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            self._loop_task = None
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self._profiles),
+            "refreshes": self.refreshes,
+            "last_refresh_seconds": self.last_refresh_seconds,
+            "pending_changes": self._dirty,
+        }
+
+    def _data_version(self) -> tuple:
+        return self.storage.query(
+            "SELECT (SELECT MAX(rowid) FROM energy_entries), (SELECT MAX(rowid) FROM session_outcomes)"
+        )[0]
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                if not self._dirty and await asyncio.to_thread(self._data_version) != self._version:
+                    self._dirty = True
+                if self._dirty:
+                    await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                self._dirty = True
+                print(f"Energy profile refresh failed: {e}")
+            await asyncio.sleep(REFRESH_SECONDS)
+
+
+def _epoch(moment: datetime) -> float:
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def _local_time(moment: datetime, hour_of_day: Optional[int]) -> datetime:
+    """The check-in's wall-clock time, so its hour and weekday fall on the same day
+
+    The app sends its local `hourOfDay` next to the timestamp; the difference
+    to the timestamp's own hour is the client's offset (taken as -11 to +12
+    hours), which also moves the weekday across midnight.
+    """
+    if hour_of_day is None:
+        return moment
+    offset = (hour_of_day - moment.hour + 11) % HOURS - 11
+    return moment + timedelta(hours=offset)
+
+
+def _entry_arrays(rows: list[tuple]) -> EntryArrays:
+    users, levels, ts, hours, weekdays = zip(*rows) if rows else ((),) * 5
+    return EntryArrays(
+        user=np.array(users, dtype=str),
+        level=np.array(levels, dtype=float),
+        ts=np.array(ts, dtype=float),
+        hour=np.array(hours, dtype=np.int64),
+        weekday=np.array(weekdays, dtype=np.int64),
+    )
+
+
+def _session_arrays(rows: list[tuple]) -> SessionArrays:
+    users, minutes, completed, hours = zip(*rows) if rows else ((),) * 4
+    return SessionArrays(
+        user=np.array(users, dtype=str),
+        minutes=np.array(minutes, dtype=float),
+        completed=np.array(completed, dtype=bool),
+        hour=np.array(hours, dtype=np.int64),
+    )
+
+
+# Process-wide profile store
+energy_profiles = EnergyProfileStore(get_storage())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Per-user energy profiles")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("rebuild", help="Recompute all profiles and report timing")
+    show = sub.add_parser("show", help="Print one user's profile")
+    show.add_argument("user_id")
+    args = parser.parse_args()
+
+    users = energy_profiles.refresh()
+    if args.command == "rebuild":
+        print(f"Computed {users} profiles in {energy_profiles.last_refresh_seconds:.3f}s")
+    else:
+        profile = energy_profiles.get(args.user_id)
+        if profile is None:
+            print(f"No energy data for {args.user_id}")
+            return
+        print(json.dumps(profile.model_dump(), indent=2))
+        print(profile.summary())
+
+
+if __name__ == "__main__":
+    main()
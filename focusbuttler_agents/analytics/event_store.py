@@ -0,0 +1,387 @@
+"""
+Event Store
+
+Append-only columnar store for session, distraction and energy events.
+Events arrive as NDJSON on `/v1/events` and are validated line by line as
+the body streams in. They are written in chunks as Parquet part files,
+partitioned by UTC day and user (`day=2026-10-18/user=<id>/part-*.parquet`).
+A background job compacts each partition's small parts into one sorted
+file. Range scans only open the partitions in the requested days for the
+requested user, and back the agent tools in `tools/event_tools.py`.
+
+Compaction swaps files under an exclusive `flock` on `<root>/.lock`, and
+scans list and read files under a shared one, so a scan in any worker
+process never sees both a compacted file and the parts it replaced.
+
+pyarrow is imported on first use to keep server start-up fast.
+
+Usage:
+    python -m analytics.event_store compact
+    python -m analytics.event_store distractions USER_ID --days 14
+"""
+
+import argparse
+import asyncio
+import fcntl
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Iterable, Literal, Optional
+from urllib.parse import quote
+
+from pydantic import BaseModel, ConfigDict, ValidationError, model_validator
+from pydantic.alias_generators import to_camel
+
+from .energy_profile import level_score
+
+
+EVENT_STORE_DIR = Path(os.getenv("EVENT_STORE_DIR", "hyperfocus_events"))
+INGEST_CHUNK_ROWS = int(os.getenv("EVENT_INGEST_CHUNK_ROWS", "5000"))
+MAX_LINE_BYTES = 64 * 1024
+MAX_REPORTED_ERRORS = 20
+COMPACT_SECONDS = float(os.getenv("EVENT_COMPACT_SECONDS", "300"))
+COMPACT_MIN_PARTS = int(os.getenv("EVENT_COMPACT_MIN_PARTS", "4"))
+
+EventType = Literal["session_start", "session_end", "distraction", "energy"]
+
+
+class Event(BaseModel):
+    """One app event; camelCase (app JSON) and snake_case keys are both accepted"""
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True, extra="forbid")
+
+    user_id: str
+    type: EventType
+    timestamp: datetime
+    session_id: Optional[str] = None
+    mode: Optional[str] = None  # hyperfocus / scatterfocus
+    energy_level: Optional[str] = None  # EnergyLevel name, for energy events
+    duration_minutes: Optional[float] = None  # For session_end
+    completed: Optional[bool] = None  # For session_end
+    attributes: Optional[dict[str, Any]] = None
+
+    @model_validator(mode="after")
+    def _check_type_fields(self):
+        if self.type == "energy" and (self.energy_level is None or level_score(self.energy_level) is None):
+            raise ValueError("energy events need a valid energy_level")
+        if self.type in ("session_start", "session_end") and not self.session_id:
+            raise ValueError(f"{self.type} events need a session_id")
+        if self.type == "session_end" and (self.duration_minutes is None or self.completed is None):
+            raise ValueError("session_end events need duration_minutes and completed")
+        return self
+
+
+def _arrow():
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    return pa, pc, pq
+
+
+def event_schema():
+    pa, _, _ = _arrow()
+    return pa.schema([
+        ("user_id", pa.string()),
+        ("type", pa.string()),
+        ("ts", pa.timestamp("ms", tz="UTC")),
+        ("session_id", pa.string()),
+        ("mode", pa.string()),
+        ("energy_level", pa.int8()),
+        ("duration_minutes", pa.float64()),
+        ("completed", pa.bool_()),
+        ("attributes", pa.string()),
+    ])
+
+
+class NDJSONIngest:
+    """Incremental NDJSON parser: feed body chunks, collect validated events"""
+
+    def __init__(self):
+        self._partial = b""
+        self._skipping = False
+        self.line_number = 0
+        self.rejected = 0
+        self.errors: list[dict] = []
+
+    def feed(self, chunk: bytes) -> list[Event]:
+        lines = (self._partial + chunk).split(b"\n")
+        self._partial = lines.pop()
+        if len(self._partial) > MAX_LINE_BYTES:
+            # Over-long line: drop what we have and skip to the next newline
+            if not self._skipping:
+                self._reject(self.line_number + 1, "line too long")
+            self._skipping = True
+            self._partial = b""
+        events = []
+        for line in lines:
+            if self._skipping:
+                self._skipping = False
+                self.line_number += 1
+                continue
+            event = self._parse(line)
+            if event is not None:
+                events.append(event)
+        return events
+
+    def close(self) -> list[Event]:
+        """Parse a final line without a trailing newline"""
+        line, self._partial = self._partial, b""
+        if self._skipping or not line.strip():
+            return []
+        event = self._parse(line)
+        return [event] if event is not None else []
+
+    def _parse(self, line: bytes) -> Optional[Event]:
+        self.line_number += 1
+        if not line.strip():
+            return None
+        try:
+            return Event.model_validate_json(line)
+        except ValidationError as e:
+            error = e.errors(include_url=False)[0]
+            location = ".".join(str(part) for part in error["loc"])
+            self._reject(self.line_number, f"{location}: {error['msg']}" if location else error["msg"])
+            return None
+
+    def _reject(self, line_number: int, error: str) -> None:
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line_number, "error": error})
+
+
+class EventStore:
+    """Day/user-partitioned Parquet files with background compaction"""
+
+    def __init__(self, root: Path = EVENT_STORE_DIR):
+        self.root = Path(root)
+        self._compact_task: asyncio.Task | None = None
+        self.events_written = 0
+        self.parts_written = 0
+        self.compactions = 0
+
+    # Writing
+
+    def append(self, events: Iterable[Event]) -> int:
+        """Write events as one new part file per touched partition"""
+        pa, _, pq = _arrow()
+        partitions: dict[tuple[str, str], list[dict]] = {}
+        for event in events:
+            ts = _utc(event.timestamp)
+            partitions.setdefault((ts.date().isoformat(), event.user_id), []).append({
+                "user_id": event.user_id,
+                "type": event.type,
+                "ts": ts,
+                "session_id": event.session_id,
+                "mode": event.mode.lower() if event.mode else None,
+                "energy_level": level_score(event.energy_level) if event.energy_level else None,
+                "duration_minutes": event.duration_minutes,
+                "completed": event.completed,
+                "attributes": json.dumps(event.attributes) if event.attributes else None,
+            })
+        written = 0
+        schema = event_schema()
+        for (day, user_id), rows in partitions.items():
+            directory = self._partition(day, user_id)
+            directory.mkdir(parents=True, exist_ok=True)
+            table = pa.Table.from_pylist(rows, schema=schema)
+            self._write_atomic(pq, table, directory / f"part-{time.time_ns()}-{uuid.uuid4().hex[:8]}.parquet")
+            written += len(rows)
+            self.parts_written += 1
+        self.events_written += written
+        return written
+
+    async def aappend(self, events: list[Event]) -> int:
+        return await asyncio.to_thread(self.append, events)
+
+    # Compaction
+
+    def compact(self, min_parts: int = COMPACT_MIN_PARTS) -> int:
+        """Merge small parts; past days are always merged down to one file"""
+        pa, _, pq = _arrow()
+        today = datetime.now(timezone.utc).date().isoformat()
+        compacted = 0
+        for directory in self._partitions():
+            files = self._files(directory)
+            needed = min_parts if directory.parent.name == f"day={today}" else 2
+            if len(files) < max(2, needed):
+                continue
+            table = pa.concat_tables([pq.read_table(f) for f in files]).sort_by("ts")
+            target = directory / f"compacted-{time.time_ns()}.parquet"
+            tmp = directory / f".tmp-{target.name}"
+            pq.write_table(table, tmp)
+            with self._locked(exclusive=True):
+                os.replace(tmp, target)
+                for f in files:
+                    f.unlink(missing_ok=True)
+            compacted += 1
+        self.compactions += compacted
+        return compacted
+
+    async def start(self) -> None:
+        """Compact partitions in the background"""
+        if self._compact_task is None:
+            self._compact_task = asyncio.create_task(self._compact_loop())
+
+    async def stop(self) -> None:
+        if self._compact_task is not None:
+            self._compact_task.cancel()
+            self._compact_task = None
+
+    async def _compact_loop(self) -> None:
+        while True:
+            await asyncio.sleep(COMPACT_SECONDS)
+            try:
+                await asyncio.to_thread(self.compact)
+            except Exception as e:
+                print(f"Event store compaction failed: {e}")
+
+    # Reading
+
+    def scan(
+        self,
+        user_id: Optional[str],
+        since: datetime,
+        until: Optional[datetime] = None,
+        types: Optional[Iterable[str]] = None,
+    ):
+        """Events in [since, until) as an Arrow table, reading only matching partitions"""
+        pa, pc, pq = _arrow()
+        since = _utc(since)
+        until = _utc(until) if until is not None else datetime.now(timezone.utc) + timedelta(seconds=1)
+        directories = [
+            d for d in self._partitions(since.date(), until.date())
+            if user_id is None or d.name == f"user={quote(user_id, safe='')}"
+        ]
+        tables = self._read(pq, directories)
+        if not tables:
+            return event_schema().empty_table()
+        table = pa.concat_tables(tables)
+        mask = pc.and_(pc.greater_equal(table["ts"], pa.scalar(since, pa.timestamp("ms", tz="UTC"))),
+                       pc.less(table["ts"], pa.scalar(until, pa.timestamp("ms", tz="UTC"))))
+        if types is not None:
+            mask = pc.and_(mask, pc.is_in(table["type"], value_set=pa.array(list(types))))
+        return table.filter(mask).sort_by("ts")
+
+    def distractions_per_session(self, user_id: str, days: int = 14) -> list[dict]:
+        """Each session in the window with its mode, outcome and distraction count"""
+        table = self.scan(user_id, _days_ago(days), types=("session_start", "session_end", "distraction"))
+        sessions: dict[str, dict] = {}
+        for row in table.select(["type", "ts", "session_id", "mode", "duration_minutes", "completed"]).to_pylist():
+            if not row["session_id"]:
+                continue
+            session = sessions.setdefault(row["session_id"], {
+                "session_id": row["session_id"], "started_at": None, "mode": None,
+                "completed": None, "duration_minutes": None, "distractions": 0,
+            })
+            if row["type"] == "session_start":
+                session["started_at"] = row["ts"].isoformat()
+                session["mode"] = row["mode"]
+            elif row["type"] == "session_end":
+                session["completed"] = row["completed"]
+                session["duration_minutes"] = row["duration_minutes"]
+            else:
+                session["distractions"] += 1
+        return list(sessions.values())
+
+    def energy_by_hour(self, user_id: str, days: int = 14) -> dict[int, float]:
+        """Mean logged energy (0 = exhausted to 4 = peak) per UTC hour of day"""
+        _, pc, _ = _arrow()
+        table = self.scan(user_id, _days_ago(days), types=("energy",))
+        table = table.filter(pc.is_valid(table["energy_level"]))
+        if table.num_rows == 0:
+            return {}
+        hours = table.append_column("hour", pc.hour(table["ts"]))
+        grouped = hours.group_by("hour").aggregate([("energy_level", "mean")])
+        return {
+            int(hour): round(mean, 2)
+            for hour, mean in sorted(zip(grouped["hour"].to_pylist(), grouped["energy_level_mean"].to_pylist()))
+        }
+
+    def _read(self, pq, directories: list[Path]) -> list:
+        """Read every part file, with compaction in every process held off"""
+        if not directories:
+            return []
+        with self._locked(exclusive=False):
+            return [pq.read_table(f) for d in directories for f in self._files(d)]
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        """Cross-process lock: exclusive to swap files, shared to list and read them"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / ".lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+
+    def stats(self) -> dict:
+        partitions = list(self._partitions())
+        return {
+            "partitions": len(partitions),
+            "files": sum(len(self._files(d)) for d in partitions),
+            "events_written": self.events_written,
+            "parts_written": self.parts_written,
+            "compactions": self.compactions,
+        }
+
+    # Layout
+
+    def _partition(self, day: str, user_id: str) -> Path:
+        return self.root / f"day={day}" / f"user={quote(user_id, safe='')}"
+
+    def _partitions(self, first: Optional[date] = None, last: Optional[date] = None) -> list[Path]:
+        if not self.root.exists():
+            return []
+        days = sorted(d for d in self.root.iterdir() if d.is_dir() and d.name.startswith("day="))
+        if first is not None:
+            days = [d for d in days if first.isoformat() <= d.name[4:] <= last.isoformat()]
+        return [u for d in days for u in sorted(d.iterdir()) if u.is_dir()]
+
+    @staticmethod
+    def _files(directory: Path) -> list[Path]:
+        return sorted(f for f in directory.glob("*.parquet") if not f.name.startswith("."))
+
+    @staticmethod
+    def _write_atomic(pq, table, path: Path) -> None:
+        tmp = path.with_name(f".tmp-{path.name}")
+        pq.write_table(table, tmp)
+        os.replace(tmp, path)
+
+
+def _utc(moment: datetime) -> datetime:
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+
+def _days_ago(days: int) -> datetime:
+    return datetime.now(timezone.utc) - timedelta(days=days)
+
+
+# Process-wide event store
+event_store = EventStore()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Columnar event store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    compact = sub.add_parser("compact", help="Merge small part files now")
+    compact.add_argument("--min-parts", type=int, default=2)
+    distractions = sub.add_parser("distractions", help="Distractions per session for a user")
+    distractions.add_argument("user_id")
+    distractions.add_argument("--days", type=int, default=14)
+    sub.add_parser("stats", help="Partition and file counts")
+    args = parser.parse_args()
+
+    if args.command == "compact":
+        print(f"Compacted {event_store.compact(args.min_parts)} partitions")
+    elif args.command == "distractions":
+        print(json.dumps(event_store.distractions_per_session(args.user_id, args.days), indent=2))
+    else:
+        print(json.dumps(event_store.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
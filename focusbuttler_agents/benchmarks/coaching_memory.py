@@ -0,0 +1,100 @@
+"""
+Coaching Memory Benchmark
+
+Measures /v1/coaching latency with inline memory extraction (agno updates
+user memories before the run returns) against deferred consolidation
+(runs are only queued for the background memory consolidator).
+
+Each mode runs in its own process against a fresh database, because the
+memory mode is fixed when the agents are constructed.
+
+Usage:
+    python -m benchmarks.coaching_memory --requests 40 --concurrency 4
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+CONTEXTS = (
+    "I keep checking email during my morning deep work block.",
+    "I prefer writing in the early morning and meetings after lunch.",
+    "My energy crashes around 3pm every day, what should I schedule then?",
+    "I finished a 90 minute hyperfocus session on the quarterly report.",
+    "Social media keeps pulling me away when I start a hard task.",
+)
+
+
+def percentile(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def _measure(requests: int, concurrency: int, users: int) -> list[float]:
+    from agents import get_coaching
+
+    slots = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int) -> None:
+        async with slots:
+            start = time.perf_counter()
+            await get_coaching(f"bench-user-{i % users}", CONTEXTS[i % len(CONTEXTS)])
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return latencies
+
+
+def run_mode(mode: str, args: argparse.Namespace) -> dict:
+    """Run the measurement in a child process with MEMORY_CONSOLIDATION=mode"""
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            **os.environ,
+            "MEMORY_CONSOLIDATION": mode,
+            "HYPERFOCUS_DB_FILE": str(Path(tmp) / "bench.db"),
+        }
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.coaching_memory", "--child",
+             "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+             "--users", str(args.users)],
+            env=env, capture_output=True, text=True, check=True,
+        ).stdout
+    latencies = json.loads(output.strip().splitlines()[-1])
+    return {
+        "mode": mode,
+        "p50": statistics.median(latencies),
+        "p95": percentile(latencies, 0.95),
+        "max": max(latencies),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark /v1/coaching with inline vs deferred memory")
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(_measure(args.requests, args.concurrency, args.users))))
+        return
+
+    results = [run_mode(mode, args) for mode in ("inline", "deferred")]
+    for result in results:
+        print(f"{result['mode']:>9}: p50 {result['p50']:.2f}s  p95 {result['p95']:.2f}s  max {result['max']:.2f}s")
+    inline, deferred = results
+    print(f"p95 reduction: {1 - deferred['p95'] / inline['p95']:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+Fake Mistral Model
+
+A deterministic, offline stand-in for MistralChat used by the benchmarks.
+Responses are derived from a hash of the prompt, so the same request always
+gets the same answer. Latency follows a configurable profile: a lognormal
+time-to-first-token, a token rate for the rest of the response, and an
+optional error rate. Structured outputs (TaskCategorization, EnergyAdvice,
+batches, message variants, ...) are generated from the requested pydantic
+schema, and streaming yields the response in token-sized chunks.
+
+Enable it for the whole service with HYPERFOCUS_FAKE_MODEL (see core.models).
+Requests replayed from a recorded trace (benchmarks/replay.py) carry their
+recorded model latencies, one per model invocation; each invocation of a
+model takes the next one recorded for it instead of a draw from the profile.
+"""
+
+import asyncio
+import importlib
+import json
+import math
+import random
+import re
+import time
+import zlib
+from dataclasses import asdict, dataclass, field
+from enum import Enum
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Iterator, Optional, Union, get_args, get_origin
+
+from agno.models.base import Model
+from agno.models.response import ModelResponse
+from pydantic import BaseModel
+
+from core.traffic import replay_latency
+
+
+@dataclass
+class LatencyProfile:
+    """How slow and how chatty the fake model is"""
+    first_token_median_ms: float = 400.0
+    first_token_p95_ms: float = 1200.0
+    tokens_per_second: float = 60.0
+    response_tokens: int = 80
+    error_rate: float = 0.0
+    # Per-model overrides, e.g. {"mistral-large-latest": {"tokens_per_second": 30}}
+    models: dict = field(default_factory=dict)
+
+    def for_model(self, model_id: str) -> "LatencyProfile":
+        overrides = self.models.get(model_id)
+        if not overrides:
+            return self
+        return LatencyProfile(**{**asdict(self), **overrides, "models": {}})
+
+
+PROFILES = {
+    "instant": LatencyProfile(0.0, 0.0, 1e9, 40),
+    "fast": LatencyProfile(50.0, 150.0, 400.0, 60),
+    "default": LatencyProfile(
+        models={"mistral-large-latest": {"first_token_median_ms": 900.0, "first_token_p95_ms": 2500.0, "tokens_per_second": 35.0}},
+    ),
+    "slow": LatencyProfile(1500.0, 5000.0, 20.0, 120),
+    "flaky": LatencyProfile(error_rate=0.05),
+}
+
+# Markers for agents that write JSON themselves rather than via response_model
+JSON_PROMPT_SCHEMAS = {
+    '"current_recommendation"': "agents.energy_advisor:EnergyAdvice",
+}
+
+_FIELD_CHOICES = {
+    "suggested_time_of_day": ("morning", "afternoon", "evening"),
+    "estimated_energy_required": ("low", "moderate", "high", "peak"),
+    "optimal_task_type": ("purposeful", "necessary", "creative", "rest"),
+    "suggestion_type": ("encouragement", "suggestion", "warning", "pattern"),
+}
+_SENTENCES = (
+    "Protect the next block of time for your most purposeful task.",
+    "Close the tabs you don't need and put your phone out of reach.",
+    "Your energy is a good match for deep, focused work right now.",
+    "Take a short scatterfocus break and let your mind wander.",
+    "Batch the small necessary tasks together later in the day.",
+    "Notice the distraction, let it go, and return to the task.",
+    "Set a clear intention for what done looks like this session.",
+    "A brief walk will help you recharge before the next session.",
+)
+_NUMBERED_LINE = re.compile(r"^\s*(\d+)[.)]\s", re.M)
+
+# Latency and failure draws are seeded too, so repeated runs see the same sequence
+_latency_rng = random.Random(0)
+
+
+def load_profile(name: str) -> LatencyProfile:
+    """A named profile, or a profile loaded from a JSON file"""
+    if name in PROFILES:
+        return PROFILES[name]
+    if name in ("1", "true"):
+        return PROFILES["default"]
+    return LatencyProfile(**json.loads(Path(name).read_text()))
+
+
+class FakeModelError(Exception):
+    """Injected failure (profile error_rate)"""
+
+
+@dataclass
+class FakeChat(Model):
+    """Offline MistralChat replacement with deterministic output"""
+    id: str = "mistral-small-latest"
+    name: str = "FakeChat"
+    provider: str = "Fake"
+    supports_native_structured_outputs: bool = True
+    profile: LatencyProfile = field(default_factory=LatencyProfile)
+
+    def invoke(self, messages: list, assistant_message: Any = None, response_format: Any = None, **kwargs) -> ModelResponse:
+        text, parsed = self._respond(messages, response_format)
+        time.sleep(sum(self._timings(text)[:2]))
+        return self._parse_provider_response((text, parsed))
+
+    async def ainvoke(self, messages: list, assistant_message: Any = None, response_format: Any = None, **kwargs) -> ModelResponse:
+        text, parsed = self._respond(messages, response_format)
+        await asyncio.sleep(sum(self._timings(text)[:2]))
+        return self._parse_provider_response((text, parsed))
+
+    def invoke_stream(self, messages: list, assistant_message: Any = None, response_format: Any = None, **kwargs) -> Iterator[ModelResponse]:
+        text, _ = self._respond(messages, response_format)
+        first, _, per_chunk = self._timings(text)
+        due = time.perf_counter() + first
+        time.sleep(first)
+        for chunk in _chunks(text):
+            yield self._parse_provider_response_delta(chunk)
+            # Sleep to a deadline so tiny per-chunk sleeps don't add up to more
+            due += per_chunk(chunk)
+            time.sleep(max(0.0, due - time.perf_counter()))
+
+    async def ainvoke_stream(self, messages: list, assistant_message: Any = None, response_format: Any = None, **kwargs) -> AsyncIterator[ModelResponse]:
+        text, _ = self._respond(messages, response_format)
+        first, _, per_chunk = self._timings(text)
+        due = time.perf_counter() + first
+        await asyncio.sleep(first)
+        for chunk in _chunks(text):
+            yield self._parse_provider_response_delta(chunk)
+            due += per_chunk(chunk)
+            await asyncio.sleep(max(0.0, due - time.perf_counter()))
+
+    def _timings(self, text: str) -> tuple[float, float, Callable[[str], float]]:
+        """(time to first token, generation time, delay after each streamed chunk)
+
+        Called once per invocation, so a replayed request uses up one
+        recorded invocation of this model per call.
+        """
+        replayed = replay_latency(self.id)
+        if replayed is None:
+            return self._first_token_seconds(), self._generation_seconds(text), self._generation_seconds
+        total, first = replayed
+        first = total if first is None else min(first, total)
+        chunks = max(1, len(_chunks(text)))
+        return first, total - first, lambda chunk: (total - first) / chunks
+
+    def _parse_provider_response(self, response: Any, **kwargs) -> ModelResponse:
+        text, parsed = response
+        model_response = ModelResponse(role="assistant", content=text)
+        if parsed is not None:
+            model_response.parsed = parsed
+        return model_response
+
+    def _parse_provider_response_delta(self, response: Any) -> ModelResponse:
+        return ModelResponse(role="assistant", content=response)
+
+    def _respond(self, messages: list, response_format: Any) -> tuple[str, Optional[BaseModel]]:
+        system = next((_text(m) for m in messages if getattr(m, "role", "") == "system"), "")
+        prompt = next((_text(m) for m in reversed(messages) if getattr(m, "role", "") == "user"), "")
+        rng = random.Random(zlib.crc32(f"{self.id}\x00{prompt}".encode()))
+
+        if _latency_rng.random() < self.profile.for_model(self.id).error_rate:
+            raise FakeModelError(f"Injected failure for {self.id}")
+
+        schema = response_format if isinstance(response_format, type) and issubclass(response_format, BaseModel) else None
+        if schema is None:
+            for marker, target in JSON_PROMPT_SCHEMAS.items():
+                if marker in system:
+                    schema = _import(target)
+        if schema is not None:
+            parsed = schema.model_validate(_fake_value(schema, rng, prompt))
+            return parsed.model_dump_json(), parsed if schema is response_format else None
+
+        count = max(1, self.profile.for_model(self.id).response_tokens // 12)
+        return " ".join(rng.choice(_SENTENCES) for _ in range(count)), None
+
+    def _first_token_seconds(self) -> float:
+        profile = self.profile.for_model(self.id)
+        if profile.first_token_median_ms <= 0:
+            return 0.0
+        # Lognormal with the configured median and 95th percentile
+        sigma = max(0.0, math.log(max(profile.first_token_p95_ms, profile.first_token_median_ms) / profile.first_token_median_ms) / 1.645)
+        return profile.first_token_median_ms * math.exp(sigma * _latency_rng.gauss(0, 1)) / 1000
+
+    def _generation_seconds(self, text: str) -> float:
+        return _token_count(text) / self.profile.for_model(self.id).tokens_per_second
+
+
+def _fake_value(annotation: Any, rng: random.Random, prompt: str, name: str = "") -> Any:
+    """A plausible value for a type annotation, driven by rng"""
+    origin = get_origin(annotation)
+    if origin is Union:
+        options = [arg for arg in get_args(annotation) if arg is not type(None)]
+        return _fake_value(options[0], rng, prompt, name)
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return {
+            field_name: _fake_value(info.annotation, rng, prompt, field_name)
+            for field_name, info in annotation.model_fields.items()
+        }
+    if origin is list:
+        (item,) = get_args(annotation) or (str,)
+        if isinstance(item, type) and issubclass(item, BaseModel):
+            numbers = [int(n) for n in _NUMBERED_LINE.findall(prompt)] or list(range(1, 4))
+            values = []
+            for number in numbers:
+                value = _fake_value(item, rng, prompt)
+                if "index" in item.model_fields:
+                    value["index"] = number
+                values.append(value)
+            return values
+        count = int(m.group(1)) if (m := re.search(r"\b(\d+)\s+(?:variants|messages|items)", prompt)) else 3
+        return [_fake_value(item, rng, prompt, name) for _ in range(count)]
+    if isinstance(annotation, type) and issubclass(annotation, Enum):
+        return rng.choice(list(annotation)).value
+    if annotation is bool:
+        return rng.random() < 0.5
+    if annotation is int:
+        return rng.randint(0, 10)
+    if annotation is float:
+        return round(rng.uniform(0.5, 1.0), 2)
+    if name in _FIELD_CHOICES:
+        return rng.choice(_FIELD_CHOICES[name])
+    return rng.choice(_SENTENCES)
+
+
+def _text(message: Any) -> str:
+    content = getattr(message, "content", "")
+    return content if isinstance(content, str) else str(content or "")
+
+
+def _token_count(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _chunks(text: str) -> list[str]:
+    """Split text into roughly token-sized pieces (whitespace kept)"""
+    return re.findall(r"\S{1,4}\s*|\s+", text)
+
+
+def _import(target: str) -> type[BaseModel]:
+    module, _, attr = target.partition(":")
+    return getattr(importlib.import_module(module), attr)
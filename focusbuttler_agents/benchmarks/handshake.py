@@ -0,0 +1,192 @@
+"""
+Connection Warm-up Benchmark
+
+Measures the connection setup that the shared transport (core.http_transport)
+saves, against a local HTTPS stub of the chat completions API (uvicorn with a
+throwaway self-signed certificate, made with the `openssl` CLI):
+
+- cold: a new client per call, as when every model has its own pool or the
+  pool went idle, so each call pays DNS, TCP and TLS setup
+- warm: one shared client whose pool was pre-established
+- idle: calls made after the server's keep-alive timeout has passed, with
+  and without the keep-warm loop
+
+The stub speaks HTTP/1.1, so HTTP/2 multiplexing is not measured here. Over
+a real network each handshake also costs round trips, so the savings are
+larger than on localhost.
+
+Usage:
+    python -m benchmarks.handshake
+    python -m benchmarks.handshake --calls 200 --idle-rounds 5 --server-keepalive 2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import ssl
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from core.http_transport import SharedTransport
+
+
+COMPLETION = json.dumps({
+    "id": "stub",
+    "object": "chat.completion",
+    "model": "mistral-small-latest",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+}).encode()
+REQUEST = {"model": "mistral-small-latest", "messages": [{"role": "user", "content": "hi"}]}
+
+
+async def stub_app(scope, receive, send) -> None:
+    """Answers every request with a fixed chat completion"""
+    if scope["type"] != "http":
+        return
+    while (await receive()).get("more_body"):
+        pass
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(COMPLETION)).encode())],
+    })
+    await send({"type": "http.response.body", "body": COMPLETION})
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def make_certificate(workdir: Path) -> tuple[Path, Path]:
+    key, cert = workdir / "stub.key", workdir / "stub.crt"
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-keyout", str(key), "-out", str(cert), "-subj", "/CN=localhost",
+         "-addext", "subjectAltName=DNS:localhost,IP:127.0.0.1"],
+        check=True, capture_output=True,
+    )
+    return key, cert
+
+
+def start_stub(port: int, key: Path, cert: Path, keepalive: float, context: ssl.SSLContext) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.handshake:stub_app", "--host", "127.0.0.1",
+         "--port", str(port), "--ssl-keyfile", str(key), "--ssl-certfile", str(cert),
+         "--timeout-keep-alive", str(keepalive), "--lifespan", "off", "--log-level", "warning"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Stub server exited with {server.returncode}")
+        try:
+            httpx.get(f"https://localhost:{port}/", verify=context, timeout=1.0)
+            return server
+        except httpx.TransportError:
+            time.sleep(0.1)
+    server.send_signal(signal.SIGTERM)
+    raise RuntimeError("Stub server did not start")
+
+
+async def _timed(client: httpx.AsyncClient, url: str) -> float:
+    started = time.perf_counter()
+    response = await client.post(url, json=REQUEST)
+    response.raise_for_status()
+    return time.perf_counter() - started
+
+
+async def cold(url: str, context: ssl.SSLContext, calls: int) -> list[float]:
+    samples = []
+    for _ in range(calls):
+        async with httpx.AsyncClient(verify=context) as client:
+            samples.append(await _timed(client, url))
+    return samples
+
+
+async def warm(base_url: str, url: str, context: ssl.SSLContext, calls: int) -> list[float]:
+    transport = SharedTransport(base_url, verify=context)
+    await transport.warm()
+    try:
+        return [await _timed(transport.async_client, url) for _ in range(calls)]
+    finally:
+        await transport.stop()
+
+
+async def idle(base_url: str, url: str, context: ssl.SSLContext, rounds: int, keepalive: float, keep_warm: bool) -> list[float]:
+    """One call after each idle period longer than the server's keep-alive timeout"""
+    transport = SharedTransport(base_url, verify=context, keep_warm_seconds=keepalive / 2)
+    if keep_warm:
+        await transport.start()
+    await transport.warm()
+    samples = []
+    try:
+        for _ in range(rounds):
+            await asyncio.sleep(keepalive * 1.5)
+            samples.append(await _timed(transport.async_client, url))
+    finally:
+        await transport.stop()
+    return samples
+
+
+def _ms(samples: list[float]) -> tuple[float, float]:
+    return statistics.median(samples) * 1000, statistics.fmean(samples) * 1000
+
+
+async def run(port: int, context: ssl.SSLContext, args) -> dict:
+    base_url = f"https://localhost:{port}"
+    url = base_url + "/v1/chat/completions"
+    await cold(url, context, 3)  # Warm up the interpreter and the server
+    results = {
+        "cold": await cold(url, context, args.calls),
+        "warm": await warm(base_url, url, context, args.calls),
+        "idle, no keep-warm": await idle(base_url, url, context, args.idle_rounds, args.server_keepalive, False),
+        "idle, keep-warm": await idle(base_url, url, context, args.idle_rounds, args.server_keepalive, True),
+    }
+    return {name: dict(zip(("p50_ms", "mean_ms"), _ms(samples))) for name, samples in results.items()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Handshake latency saved by the shared, pre-warmed transport")
+    parser.add_argument("--calls", type=int, default=100, help="Sequential calls for the cold and warm runs")
+    parser.add_argument("--idle-rounds", type=int, default=3)
+    parser.add_argument("--server-keepalive", type=int, default=2, help="Stub keep-alive timeout (seconds)")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="hyperfocus-handshake-"))
+    key, cert = make_certificate(workdir)
+    context = ssl.create_default_context(cafile=str(cert))
+    port = _free_port()
+    server = start_stub(port, key, cert, args.server_keepalive, context)
+    try:
+        results = asyncio.run(run(port, context, args))
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(10)
+        for path in (key, cert):
+            os.unlink(path)
+        workdir.rmdir()
+
+    print(f"{'run':<20} {'p50 ms':>8} {'mean ms':>8}")
+    for name, result in results.items():
+        print(f"{name:<20} {result['p50_ms']:>8.2f} {result['mean_ms']:>8.2f}")
+    saved = results["cold"]["p50_ms"] - results["warm"]["p50_ms"]
+    print(f"Connection setup saved per call: {saved:.2f} ms (p50)")
+    if args.json:
+        Path(args.json).write_text(json.dumps({"results": results, "saved_p50_ms": saved}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+"""
+Offline Load Test
+
+Load-tests the FastAPI endpoints in `main.py` in-process, with every agent
+running on the deterministic fake model (no network, no API key). Each
+scenario is driven at a fixed concurrency for a number of requests and
+reports throughput, latency percentiles, time-to-first-byte for streaming
+endpoints, errors (including streams that end in an `error` event), and
+event-loop lag sampled while the scenario runs. Scenarios that need several
+requests, like a focus session from start to end, drive them with a `flow`.
+
+Usage:
+    python -m benchmarks.load                                # all scenarios
+    python -m benchmarks.load --scenario categorize --concurrency 64 --requests 2000
+    python -m benchmarks.load --profile slow --json results.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional
+
+
+TASK_TITLES = (
+    "Write the quarterly report", "Reply to emails", "Daily standup", "Scroll Twitter",
+    "Refactor the billing module", "Book dentist appointment", "Plan next sprint",
+    "Read industry news", "Prepare investor deck", "Clean up old files",
+)
+CONTEXTS = (
+    "I keep checking email during deep work.",
+    "My energy crashes around 3pm.",
+    "I finished a 90 minute hyperfocus session.",
+    "How do I plan my week around my goals?",
+)
+ENERGY_LEVELS = ("exhausted", "low", "moderate", "high", "peak")
+
+
+@dataclass
+class Scenario:
+    method: str
+    path: str
+    request: Callable[[int, int], dict]  # (request number, distinct inputs) -> httpx kwargs
+    stream: bool = False
+    # Drives a multi-request scenario instead: (client, request number, distinct inputs) -> status
+    flow: Optional[Callable[[Any, int, int], Awaitable[int]]] = None
+
+
+def _pick(values: tuple, i: int, distinct: int) -> str:
+    n = i % distinct
+    return values[n % len(values)] + ("" if n < len(values) else f" #{n // len(values)}")
+
+
+def _plan(i: int, distinct: int, count: int = 20) -> dict:
+    """A day plan request with a mix of categorized tasks"""
+    types = ("purposeful", "necessary", "necessary", "distracting", "unnecessary")
+    return {
+        "userId": f"user-{i % 50}",
+        "narrative": i % 10 == 0,
+        "tasks": [
+            {
+                "title": _pick(TASK_TITLES, i + k, distinct),
+                "taskType": types[k % len(types)],
+                "estimatedEnergyRequired": ENERGY_LEVELS[1 + k % 4],
+                "estimatedMinutes": 15 * (1 + k % 6),
+            }
+            for k in range(count)
+        ],
+    }
+
+
+def _event_lines(i: int, count: int = 100) -> bytes:
+    """One NDJSON upload: a focus session with distractions and an energy check-in"""
+    user, session = f"user-{i % 50}", f"bench-session-{i}"
+    start = time.time() - (i % 14) * 86400
+    events = [{"userId": user, "type": "session_start", "timestamp": start, "sessionId": session, "mode": "hyperfocus"}]
+    events += [
+        {"userId": user, "type": "distraction", "timestamp": start + 60 * k, "sessionId": session}
+        for k in range(1, count - 2)
+    ]
+    events += [
+        {"userId": user, "type": "energy", "timestamp": start, "energyLevel": ENERGY_LEVELS[i % 5]},
+        {"userId": user, "type": "session_end", "timestamp": start + 5400, "sessionId": session,
+         "durationMinutes": 90, "completed": i % 3 != 0},
+    ]
+    return "\n".join(json.dumps(e) for e in events).encode()
+
+
+async def _focus_session(client, i: int, distinct: int) -> int:
+    """Open a session stream, log a distraction, end the session and read the stream to its end"""
+    session = f"bench-focus-{i}"
+    stream = asyncio.create_task(client.post(
+        "/v1/sessions/start",
+        params={"mode": ("hyperfocus", "scatterfocus")[i % 2], "target_minutes": 25, "session_id": session},
+    ))
+    # Wait for the stream to open the session (the transport may buffer its events)
+    while (await client.get(f"/v1/sessions/{session}")).status_code == 404:
+        if stream.done():
+            break
+        await asyncio.sleep(0.005)
+    await client.post(f"/v1/sessions/{session}/distraction")
+    await client.post(f"/v1/sessions/{session}/end", params={"completed": i % 3 != 0})
+    response = await stream
+    return 500 if "event: error" in response.text else response.status_code
+
+
+SCENARIOS = {
+    "health": Scenario("GET", "/health", lambda i, d: {}),
+    "categorize": Scenario(
+        "POST", "/v1/categorize", lambda i, d: {"params": {"task_title": _pick(TASK_TITLES, i, d)}}
+    ),
+    "categorize_batch": Scenario(
+        "POST", "/v1/categorize/batch",
+        lambda i, d: {"json": [_pick(TASK_TITLES, i * 10 + k, d) for k in range(10)]},
+    ),
+    "coaching": Scenario(
+        "POST", "/v1/coaching",
+        lambda i, d: {"params": {"user_id": f"user-{i % 50}", "context": _pick(CONTEXTS, i, d)}},
+    ),
+    "coaching_stream": Scenario(
+        "POST", "/v1/coaching/stream",
+        lambda i, d: {"params": {"user_id": f"user-{i % 50}", "context": _pick(CONTEXTS, i, d)}},
+        stream=True,
+    ),
+    "team_advice": Scenario(
+        "POST", "/v1/team-advice",
+        lambda i, d: {"params": {"user_id": f"user-{i % 50}", "question": _pick(CONTEXTS, i, d)}},
+    ),
+    "coaching_depth": Scenario(
+        "POST", "/v1/coaching",
+        lambda i, d: {"params": {"user_id": f"user-{i % 50}", "context": _pick(CONTEXTS, i, d), "depth": True}},
+    ),
+    "coaching_budget": Scenario(
+        "POST", "/v1/coaching",
+        lambda i, d: {"params": {
+            "user_id": f"user-{i % 50}", "context": _pick(CONTEXTS, i, d), "latency_budget_ms": 2000,
+        }},
+    ),
+    "team_advice_stream": Scenario(
+        "POST", "/v1/team-advice/stream",
+        lambda i, d: {"params": {"user_id": f"user-{i % 50}", "question": _pick(CONTEXTS, i, d)}},
+        stream=True,
+    ),
+    "energy_advice": Scenario(
+        "POST", "/v1/energy-advice",
+        lambda i, d: {"params": {"current_energy": ENERGY_LEVELS[i % 5], "hour_of_day": i % 24}},
+    ),
+    "energy_advice_activities": Scenario(
+        "POST", "/v1/energy-advice",
+        lambda i, d: {"params": {
+            "current_energy": ENERGY_LEVELS[i % 5], "hour_of_day": i % 24,
+            "recent_activities": _pick(TASK_TITLES, i, d),
+        }},
+    ),
+    "energy_advice_stream": Scenario(
+        "POST", "/v1/energy-advice/stream",
+        lambda i, d: {"params": {
+            "current_energy": ENERGY_LEVELS[i % 5], "hour_of_day": i % 24,
+            "recent_activities": _pick(TASK_TITLES, i, d),
+        }},
+        stream=True,
+    ),
+    "energy_advice_profile": Scenario(
+        "POST", "/v1/energy-advice",
+        lambda i, d: {"params": {
+            "current_energy": ENERGY_LEVELS[i % 5], "hour_of_day": i % 24, "user_id": f"user-{i % 50}",
+        }},
+    ),
+    "plan": Scenario("POST", "/v1/plan", lambda i, d: {"json": _plan(i, d)}),
+    "energy_profile": Scenario("GET", "/v1/energy-profile", lambda i, d: {"params": {"user_id": f"user-{i % 50}"}}),
+    "events_ingest": Scenario(
+        "POST", "/v1/events",
+        lambda i, d: {"content": _event_lines(i), "headers": {"Content-Type": "application/x-ndjson"}},
+    ),
+    "event_stats": Scenario("GET", "/v1/events/stats", lambda i, d: {}),
+    "knowledge_search": Scenario(
+        "GET", "/v1/knowledge/search", lambda i, d: {"params": {"query": _pick(CONTEXTS, i, d)}}
+    ),
+    "focus_session": Scenario("POST", "/v1/sessions/start", lambda i, d: {}, flow=_focus_session),
+    "session_state": Scenario("GET", "/v1/sessions/{session}", lambda i, d: {"session": f"bench-{i % d}"}),
+    "cache_stats": Scenario("GET", "/v1/categorize/cache-stats", lambda i, d: {}),
+    "session_stats": Scenario("GET", "/v1/sessions/stats", lambda i, d: {}),
+    "message_pool_stats": Scenario("GET", "/v1/sessions/message-pool", lambda i, d: {}),
+    "memory_stats": Scenario("GET", "/v1/memory/stats", lambda i, d: {}),
+    "context_stats": Scenario("GET", "/v1/context/stats", lambda i, d: {}),
+    "routing_stats": Scenario("GET", "/v1/team-advice/routing-stats", lambda i, d: {}),
+    "coalescing_stats": Scenario("GET", "/v1/coalescing/stats", lambda i, d: {}),
+    "registry_stats": Scenario("GET", "/v1/agents/registry", lambda i, d: {}),
+    "cascade_stats": Scenario("GET", "/v1/cascade/stats", lambda i, d: {}),
+    "scheduler_stats": Scenario("GET", "/v1/llm/scheduler", lambda i, d: {}),
+    "transport_stats": Scenario("GET", "/v1/llm/transport", lambda i, d: {}),
+    "metrics": Scenario("GET", "/metrics", lambda i, d: {}),
+}
+
+
+class LoopLagProbe:
+    """Samples how late the event loop wakes a task that sleeps for `interval`"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples_ms: list[float] = []
+        self._task: asyncio.Task | None = None
+
+    async def __aenter__(self) -> "LoopLagProbe":
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples_ms.append(max(0.0, (loop.time() - started - self.interval) * 1000))
+
+
+def percentile(samples: list[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run_scenario(client, scenario: Scenario, requests: int, concurrency: int, distinct: int) -> dict:
+    """Drive one scenario and summarise it"""
+    latencies: list[float] = []
+    first_bytes: list[float] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def one(i: int) -> None:
+        nonlocal errors
+        kwargs = scenario.request(i, distinct)
+        path = scenario.path.format(session=kwargs.pop("session", ""))
+        started = time.perf_counter()
+        try:
+            if scenario.flow is not None:
+                status = await scenario.flow(client, i, distinct)
+            elif scenario.stream:
+                async with client.stream(scenario.method, path, **kwargs) as response:
+                    first = None
+                    status = response.status_code
+                    async for line in response.aiter_lines():
+                        if first is None:
+                            first = time.perf_counter() - started
+                        if line == "event: error":
+                            status = 500
+                    first_bytes.append(first if first is not None else time.perf_counter() - started)
+            else:
+                status = (await client.request(scenario.method, path, **kwargs)).status_code
+        except Exception:
+            errors += 1
+            return
+        if status >= 500:
+            errors += 1
+        latencies.append(time.perf_counter() - started)
+
+    async def worker() -> None:
+        for i in counter:
+            await one(i)
+
+    async with LoopLagProbe() as probe:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    result = {
+        "requests": requests,
+        "errors": errors,
+        "req_per_s": requests / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "loop_lag_p50_ms": percentile(probe.samples_ms, 0.50),
+        "loop_lag_p99_ms": percentile(probe.samples_ms, 0.99),
+        "loop_lag_max_ms": max(probe.samples_ms, default=0.0),
+    }
+    if scenario.stream:
+        result["ttfb_p50_ms"] = statistics.median(first_bytes) * 1000 if first_bytes else 0.0
+    return result
+
+
+async def run(names: list[str], requests: int, concurrency: int, distinct: int) -> dict[str, dict]:
+    import httpx
+
+    from main import app
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            for name in names:
+                results[name] = await run_scenario(client, SCENARIOS[name], requests, concurrency, distinct)
+                _print_row(name, results[name])
+    return results
+
+
+def _print_row(name: str, r: dict) -> None:
+    ttfb = f"{r['ttfb_p50_ms']:>8.1f}" if "ttfb_p50_ms" in r else f"{'-':>8}"
+    print(
+        f"{name:<26} {r['req_per_s']:>8.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} "
+        f"{r['p99_ms']:>8.1f} {ttfb} {r['loop_lag_p99_ms']:>8.1f} {r['loop_lag_max_ms']:>8.1f} {r['errors']:>6}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline load test of the HyperfocusOS endpoints")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Repeatable; default all")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--distinct", type=int, default=100, help="Distinct inputs per scenario (cache hit rate)")
+    parser.add_argument("--profile", default="default", help="Fake model profile name or JSON file")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    # Must be set before the service is imported
+    workdir = tempfile.mkdtemp(prefix="hyperfocus-bench-")
+    os.environ["HYPERFOCUS_FAKE_MODEL"] = args.profile
+    os.environ.setdefault("HYPERFOCUS_DB_FILE", str(Path(workdir) / "bench.db"))
+    os.environ.setdefault("EVENT_STORE_DIR", str(Path(workdir) / "events"))
+    os.environ.setdefault("ENERGY_TABLE_AUTOBUILD", "0")
+
+    print(f"{'scenario':<26} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'ttfb':>8} {'lag p99':>8} {'lag max':>8} {'errors':>6}")
+    results = asyncio.run(run(args.scenario or list(SCENARIOS), args.requests, args.concurrency, args.distinct))
+    if args.json:
+        Path(args.json).write_text(json.dumps(
+            {"profile": args.profile, "concurrency": args.concurrency, "results": results}, indent=2
+        ))
+
+
+if __name__ == "__main__":
+    main()
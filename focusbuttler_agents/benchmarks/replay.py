@@ -0,0 +1,264 @@
+"""
+Trace Replay
+
+Re-issues traffic recorded by core.traffic against the service, at the
+recorded arrival times sped up 1x-50x, so caching, routing and scheduling
+changes can be compared on realistic load shapes (such as the morning
+check-in spike) instead of synthetic uniform load.
+
+Unless --url is given, a fresh server is started on an empty database with
+the fake model (benchmarks.workers.start_server). Each request carries its
+recorded model latencies, and the fake model sleeps for exactly those. Model
+calls the recording did not have, such as cache misses that used to be
+hits, draw from a latency profile fitted to the trace's recorded calls per
+model. Model latencies are not sped up; only arrivals are.
+
+Replay is open-loop: requests are sent when they are due, whether or not
+earlier ones have finished. If the client itself falls behind, the schedule
+lag is reported. Request bodies too large to have been recorded are
+synthesized for `/v1/events` and skipped otherwise.
+
+Usage:
+    python -m benchmarks.replay trace.jsonl.gz --describe
+    python -m benchmarks.replay trace.jsonl.gz --speed 10
+    python -m benchmarks.replay trace.w0.jsonl.gz trace.w1.jsonl.gz --speed 20 --workers 4 --start-minute 420 --minutes 120
+    python -m benchmarks.replay trace.jsonl.gz --url http://localhost:7777 --speed 5
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+
+from core.traffic import REPLAY_HEADER, read_trace
+
+from .load import _event_lines
+from .workers import _free_port, start_server, stop_server
+
+
+EVENT_LINE_BYTES = 140  # Typical size of one NDJSON event, for synthesized uploads
+DEFAULT_EVENTS = 100  # Events in a synthesized upload of unknown size
+MAX_LAG_MS = 50.0
+
+
+def select(records: list[dict], start_minute: float, minutes: float | None, route: str | None) -> list[dict]:
+    """Records in a window (minutes from the start of the trace) on matching routes"""
+    if not records:
+        return []
+    begin = records[0]["ts"] + start_minute * 60
+    end = begin + minutes * 60 if minutes is not None else float("inf")
+    pattern = re.compile(route) if route else None
+    return [
+        record for record in records
+        if begin <= record["ts"] < end and (pattern is None or pattern.search(record["route"]))
+    ]
+
+
+def fitted_profile(records: list[dict]) -> dict:
+    """A fake model latency profile with each model's recorded median and p95"""
+    by_model: dict[str, list[float]] = defaultdict(list)
+    for record in records:
+        for _, model, ms, _, status in record["llm"]:
+            if status == "ok":
+                by_model[model].append(ms)
+    overall = sorted(ms for samples in by_model.values() for ms in samples) or [0.0]
+    models = {}
+    for model, samples in by_model.items():
+        samples.sort()
+        models[model] = {"first_token_median_ms": _quantile(samples, 0.5), "first_token_p95_ms": _quantile(samples, 0.95)}
+    return {
+        "first_token_median_ms": _quantile(overall, 0.5),
+        "first_token_p95_ms": _quantile(overall, 0.95),
+        "tokens_per_second": 1e9,  # Recorded latencies already include generation
+        "models": models,
+    }
+
+
+def _quantile(ordered: list[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def request_kwargs(record: dict, i: int) -> dict | None:
+    """httpx request arguments for a record, or None if its body can't be replayed"""
+    kwargs = {
+        "params": record["query"],
+        "headers": {REPLAY_HEADER: json.dumps(record["llm"], separators=(",", ":"))},
+    }
+    if "json" in record:
+        kwargs["json"] = record["json"]
+    elif "ndjson" in record:
+        kwargs["content"] = "".join(json.dumps(line) + "\n" for line in record["ndjson"]).encode()
+        kwargs["headers"]["Content-Type"] = "application/x-ndjson"
+    elif record.get("body_bytes"):
+        if record["route"] != "/v1/events":
+            return None
+        size = record["body_bytes"]
+        kwargs["content"] = _event_lines(i, max(3, size // EVENT_LINE_BYTES) if size > 0 else DEFAULT_EVENTS)
+        kwargs["headers"]["Content-Type"] = "application/x-ndjson"
+    return kwargs
+
+
+async def replay(records: list[dict], base_url: str, speed: float, connections: int) -> dict:
+    """Send every record at its (sped-up) arrival time; returns per-request results"""
+    results: list[dict] = []
+    lags: list[float] = []
+    skipped = 0
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits) as client:
+
+        async def send(record: dict, kwargs: dict) -> None:
+            started = time.perf_counter()
+            try:
+                response = await client.request(record["method"], record["path"], **kwargs)
+                status = response.status_code
+            except httpx.HTTPError:
+                status = 0
+            results.append({
+                "route": f"{record['method']} {record['route']}",
+                "ms": (time.perf_counter() - started) * 1000,
+                "status": status,
+                "recorded_ms": record["ms"],
+                "recorded_status": record["status"],
+            })
+
+        first = records[0]["ts"]
+        origin = time.perf_counter() + 0.5
+        tasks = []
+        for i, record in enumerate(records):
+            kwargs = request_kwargs(record, i)
+            if kwargs is None:
+                skipped += 1
+                continue
+            delay = origin + (record["ts"] - first) / speed - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            lags.append(max(0.0, -delay) * 1000)
+            tasks.append(asyncio.create_task(send(record, kwargs)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - origin
+
+    return {"results": results, "lags_ms": lags, "skipped": skipped, "seconds": elapsed}
+
+
+def summarize(run: dict, speed: float, trace_seconds: float) -> dict:
+    by_route: dict[str, list[dict]] = defaultdict(list)
+    for result in run["results"]:
+        by_route[result["route"]].append(result)
+
+    def row(results: list[dict]) -> dict:
+        replayed = sorted(r["ms"] for r in results)
+        recorded = sorted(r["recorded_ms"] for r in results)
+        return {
+            "requests": len(results),
+            "recorded_p50_ms": _quantile(recorded, 0.5),
+            "recorded_p99_ms": _quantile(recorded, 0.99),
+            "p50_ms": _quantile(replayed, 0.5),
+            "p95_ms": _quantile(replayed, 0.95),
+            "p99_ms": _quantile(replayed, 0.99),
+            "max_ms": replayed[-1] if replayed else 0.0,
+            "errors": sum(1 for r in results if r["status"] == 0 or r["status"] >= 500),
+            "status_changed": sum(1 for r in results if r["status"] != r["recorded_status"]),
+        }
+
+    lags = sorted(run["lags_ms"])
+    return {
+        "speed": speed,
+        "requests": len(run["results"]),
+        "skipped": run["skipped"],
+        "seconds": run["seconds"],
+        "target_req_per_s": len(run["results"]) * speed / trace_seconds if trace_seconds else 0.0,
+        "req_per_s": len(run["results"]) / run["seconds"] if run["seconds"] else 0.0,
+        "lag_p99_ms": _quantile(lags, 0.99),
+        "all": row(run["results"]),
+        "routes": {route: row(results) for route, results in sorted(by_route.items())},
+    }
+
+
+def describe(records: list[dict]) -> None:
+    """Print the trace's shape: size, routes, model calls and its busiest minutes"""
+    if not records:
+        print("Empty trace")
+        return
+    first, last = records[0]["ts"], records[-1]["ts"]
+    print(f"{len(records)} requests over {(last - first) / 60:.1f} min from {datetime.fromtimestamp(first):%Y-%m-%d %H:%M}")
+    print(f"{'route':<48} {'count':>7} {'p50 ms':>8} {'p99 ms':>8} {'llm/req':>8}")
+    by_route: dict[str, list[dict]] = defaultdict(list)
+    for record in records:
+        by_route[f"{record['method']} {record['route']}"].append(record)
+    for route, group in sorted(by_route.items(), key=lambda item: -len(item[1])):
+        ms = sorted(record["ms"] for record in group)
+        calls = sum(len(record["llm"]) for record in group) / len(group)
+        print(f"{route:<48} {len(group):>7} {_quantile(ms, 0.5):>8.1f} {_quantile(ms, 0.99):>8.1f} {calls:>8.2f}")
+    per_minute = Counter(int((record["ts"] - first) // 60) for record in records)
+    print("Busiest minutes (offset from start, local time, requests):")
+    for minute, count in per_minute.most_common(10):
+        print(f"  +{minute:<6} {datetime.fromtimestamp(first + minute * 60):%H:%M} {count:>7}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay recorded traffic against the service")
+    parser.add_argument("traces", nargs="+", help="Trace files (one per worker is fine)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Arrival speed-up, 1-50")
+    parser.add_argument("--start-minute", type=float, default=0.0, help="Window start, minutes from the trace start")
+    parser.add_argument("--minutes", type=float, help="Window length (default: to the end)")
+    parser.add_argument("--route", help="Only routes matching this regex")
+    parser.add_argument("--url", help="Replay against a running service instead of starting one")
+    parser.add_argument("--workers", type=int, default=1, help="Workers for the started server")
+    parser.add_argument("--connections", type=int, default=512, help="Client connection limit")
+    parser.add_argument("--describe", action="store_true", help="Only print the trace's shape")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+    if not 1 <= args.speed <= 50:
+        parser.error("--speed must be between 1 and 50")
+
+    records = select(read_trace(args.traces), args.start_minute, args.minutes, args.route)
+    if args.describe:
+        describe(records)
+        return
+    if not records:
+        print("No requests in the selected window")
+        return
+    trace_seconds = records[-1]["ts"] - records[0]["ts"]
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        workdir = Path(tempfile.mkdtemp(prefix="hyperfocus-replay-"))
+        profile = workdir / "profile.json"
+        profile.write_text(json.dumps(fitted_profile(records)))
+        port = _free_port()
+        server = start_server(args.workers, port, str(profile), workdir)
+        base_url = f"http://127.0.0.1:{port}"
+    try:
+        print(f"Replaying {len(records)} requests ({trace_seconds / 60:.1f} min) at {args.speed:g}x against {base_url}")
+        summary = summarize(asyncio.run(replay(records, base_url, args.speed, args.connections)), args.speed, trace_seconds)
+    finally:
+        if server is not None:
+            stop_server(server)
+
+    print(f"{'route':<48} {'count':>7} {'rec p50':>8} {'rec p99':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6}")
+    for route, row in [*summary["routes"].items(), ("all", summary["all"])]:
+        print(
+            f"{route:<48} {row['requests']:>7} {row['recorded_p50_ms']:>8.1f} {row['recorded_p99_ms']:>8.1f} "
+            f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['errors']:>6}"
+        )
+    print(
+        f"{summary['req_per_s']:.1f} req/s (target {summary['target_req_per_s']:.1f}); "
+        f"{summary['all']['status_changed']} status changes; {summary['skipped']} skipped"
+    )
+    if summary["lag_p99_ms"] > MAX_LAG_MS:
+        print(f"Warning: the client fell behind schedule (p99 lag {summary['lag_p99_ms']:.0f} ms); lower --speed")
+    if args.json:
+        Path(args.json).write_text(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Startup Benchmark
+
+Records cold-start cost for the AgentOS process with lazy agents against
+eager construction (LAZY_AGENTS=0):
+- import time of `main` in a fresh interpreter
+- time-to-healthy: from spawning uvicorn until `/health` answers 200
+
+Usage:
+    python -m benchmarks.startup --runs 5
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+
+
+def _env(lazy: bool) -> dict:
+    return {
+        **os.environ,
+        "LAZY_AGENTS": "1" if lazy else "0",
+        "ENERGY_TABLE_AUTOBUILD": "0",
+        "AGENT_WARMUP": "0",
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def import_seconds(lazy: bool) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        env=_env(lazy), capture_output=True, text=True, check=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def time_to_healthy(lazy: bool, timeout: float = 60.0) -> float:
+    port = _free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        env=_env(lazy), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(timeout=1.0) as client:
+            while time.perf_counter() - started < timeout:
+                if server.poll() is not None:
+                    raise RuntimeError("Server exited before becoming healthy")
+                try:
+                    if client.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                        return time.perf_counter() - started
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.02)
+        raise TimeoutError(f"/health not ready after {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark import time and time-to-healthy")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print("mode    import p50  healthy p50  healthy max")
+    for lazy in (False, True):
+        imports = [import_seconds(lazy) for _ in range(args.runs)]
+        healthy = [time_to_healthy(lazy) for _ in range(args.runs)]
+        mode = "lazy" if lazy else "eager"
+        print(
+            f"{mode:<6}  {statistics.median(imports):>9.2f}s  "
+            f"{statistics.median(healthy):>10.2f}s  {max(healthy):>10.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
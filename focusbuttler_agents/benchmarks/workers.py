@@ -0,0 +1,166 @@
+"""
+Worker Scaling Benchmark
+
+Measures throughput of the multi-worker server (core.workers) at 1, 2, 4 and
+8 workers with every agent on the deterministic fake model. For each worker
+count a fresh server is started on a new database, and several client
+processes drive the load-test scenarios over HTTP for a fixed time. The
+report shows req/s, p50/p99 latency and speedup over one worker.
+
+Scaling is bounded by the cores available: run it on a machine with at
+least as many cores as workers plus client processes.
+
+Usage:
+    python -m benchmarks.workers
+    python -m benchmarks.workers --workers 1 2 4 --scenario categorize --seconds 20
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from .load import SCENARIOS
+
+
+DEFAULT_SCENARIOS = ("categorize", "energy_advice_activities", "knowledge_search")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(workers: int, port: int, profile: str, workdir: Path) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "HYPERFOCUS_FAKE_MODEL": profile,
+        "HYPERFOCUS_DB_FILE": str(workdir / "bench.db"),
+        "EVENT_STORE_DIR": str(workdir / "events"),
+        "ENERGY_TABLE_AUTOBUILD": "0",
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "core.workers", "--workers", str(workers), "--host", "127.0.0.1", "--port", str(port)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 60
+    with httpx.Client(timeout=1.0) as client:
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise RuntimeError(f"Server with {workers} workers exited with {server.returncode}")
+            try:
+                if client.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                    return server
+            except httpx.TransportError:
+                pass
+            time.sleep(0.1)
+    stop_server(server)
+    raise RuntimeError(f"Server with {workers} workers did not become healthy")
+
+
+def stop_server(server: subprocess.Popen) -> None:
+    server.send_signal(signal.SIGTERM)
+    try:
+        server.wait(30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+
+def _client(args: tuple) -> dict:
+    """One client process: `concurrency` loops hitting the scenario until time is up"""
+    name, port, concurrency, seconds, distinct, offset = args
+    scenario = SCENARIOS[name]
+
+    async def drive() -> dict:
+        latencies, errors = [], 0
+        counter = iter(range(offset, offset + 10**9))
+        deadline = time.perf_counter() + seconds
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60, limits=limits) as client:
+
+            async def loop() -> None:
+                nonlocal errors
+                while time.perf_counter() < deadline:
+                    kwargs = scenario.request(next(counter), distinct)
+                    path = scenario.path.format(session=kwargs.pop("session", ""))
+                    started = time.perf_counter()
+                    try:
+                        response = await client.request(scenario.method, path, **kwargs)
+                        if response.status_code >= 400:
+                            errors += 1
+                    except httpx.HTTPError:
+                        errors += 1
+                    latencies.append(time.perf_counter() - started)
+
+            await asyncio.gather(*(loop() for _ in range(concurrency)))
+        return {"latencies": latencies, "errors": errors}
+
+    return asyncio.run(drive())
+
+
+def measure(name: str, port: int, clients: int, concurrency: int, seconds: float, distinct: int) -> dict:
+    jobs = [(name, port, concurrency, seconds, distinct, i * 10**6) for i in range(clients)]
+    with multiprocessing.get_context("spawn").Pool(clients) as pool:
+        results = pool.map(_client, jobs)
+    latencies = sorted(l for r in results for l in r["latencies"])
+    return {
+        "requests": len(latencies),
+        "req_per_s": len(latencies) / seconds,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p99_ms": latencies[int(0.99 * (len(latencies) - 1))] * 1000 if latencies else 0.0,
+        "errors": sum(r["errors"] for r in results),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="req/s scaling of the multi-worker server")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Repeatable")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Load duration per scenario")
+    parser.add_argument("--clients", type=int, default=4, help="Client processes")
+    parser.add_argument("--concurrency", type=int, default=32, help="In-flight requests per client")
+    parser.add_argument("--distinct", type=int, default=100_000, help="Distinct inputs (cache hit rate)")
+    parser.add_argument("--profile", default="instant", help="Fake model profile name or JSON file")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+    scenarios = args.scenario or list(DEFAULT_SCENARIOS)
+
+    print(f"{os.cpu_count()} cores; fake model profile {args.profile!r}")
+    print(f"{'scenario':<26} {'workers':>7} {'req/s':>9} {'speedup':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>6}")
+    results: dict[str, dict[int, dict]] = {name: {} for name in scenarios}
+    for workers in args.workers:
+        port = _free_port()
+        workdir = Path(tempfile.mkdtemp(prefix="hyperfocus-workers-bench-"))
+        server = start_server(workers, port, args.profile, workdir)
+        try:
+            for name in scenarios:
+                measure(name, port, 1, 2, 1.0, args.distinct)  # warm-up
+                result = measure(name, port, args.clients, args.concurrency, args.seconds, args.distinct)
+                baseline = results[name].get(args.workers[0], result)["req_per_s"]
+                result["speedup"] = result["req_per_s"] / baseline if baseline else 0.0
+                results[name][workers] = result
+                print(
+                    f"{name:<26} {workers:>7} {result['req_per_s']:>9.1f} {result['speedup']:>7.2f}x "
+                    f"{result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['errors']:>6}"
+                )
+        finally:
+            stop_server(server)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({"profile": args.profile, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""Core module initialization"""
+
+from .coalesce import SingleFlight, coalesced, coalescing_stats
+from .http_transport import http_transport
+from .llm_scheduler import DeadlineExceeded, Priority, llm_scheduler
+from .metrics import metrics, record_parse_failure, span, start_trace
+from .registry import LazyRef, agent_registry, register_agent, register_team
+from .storage import Storage, get_storage
+
+__all__ = [
+    "Storage",
+    "get_storage",
+    "SingleFlight",
+    "coalesced",
+    "coalescing_stats",
+    "http_transport",
+    "LazyRef",
+    "agent_registry",
+    "register_agent",
+    "register_team",
+    "DeadlineExceeded",
+    "Priority",
+    "llm_scheduler",
+    "metrics",
+    "record_parse_failure",
+    "span",
+    "start_trace",
+]
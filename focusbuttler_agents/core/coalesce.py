@@ -0,0 +1,165 @@
+"""
+Single-Flight Request Coalescing
+
+Concurrent identical calls to an agent helper share one in-flight execution:
+the first caller starts the call and every caller that arrives before it
+finishes awaits the same result. Client retries and multi-device users then
+cost one LLM call instead of several.
+
+Calls are keyed on their bound arguments with defaults applied, so
+positional and keyword calls coalesce. Values are compared exactly, except
+for the string fields a helper names in `normalize`, which are casefolded
+with whitespace collapsed: `@coalesced(normalize=("task_title",))` makes
+`categorize_task("Reply to emails ")` and
+`categorize_task(task_title="reply to emails")` share a flight. Identifiers
+are never normalised, so callers with ids that differ only in case never
+share a result.
+
+Cancellation: a caller that disconnects only stops waiting; the shared call
+keeps running for the remaining callers and is cancelled once nobody is
+left waiting. A flight timeout bounds the shared call itself, so one hung
+request cannot pin every caller behind it.
+"""
+
+import asyncio
+import functools
+import inspect
+import json
+import os
+from typing import Any, Awaitable, Callable, TypeVar
+
+
+T = TypeVar("T")
+
+FLIGHT_TIMEOUT_SECONDS = float(os.getenv("COALESCE_TIMEOUT_SECONDS", "120"))
+
+# Keyed exactly even if a helper asks for them to be normalised
+_IDENTIFIER_FIELDS = frozenset({"user_id", "session_id"})
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls that share a key"""
+
+    def __init__(self, name: str, timeout: float | None = None):
+        self.name = name
+        self.timeout = timeout
+        self._flights: dict[str, _Flight] = {}
+
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.abandoned = 0
+        self.timeouts = 0
+
+    async def do(self, key: str, call: Callable[[], Awaitable[T]]) -> T:
+        """Run call() for key, or join the execution already in flight"""
+        self.calls += 1
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.get_running_loop().create_task(self._execute(call)))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._release(key, flight))
+            self.executions += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                # Last caller gone: stop the call and let new callers start fresh
+                self._release(key, flight)
+                flight.task.cancel()
+                self.abandoned += 1
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "abandoned": self.abandoned,
+            "timeouts": self.timeouts,
+            "in_flight": len(self._flights),
+        }
+
+    async def _execute(self, call: Callable[[], Awaitable[T]]) -> T:
+        if self.timeout is None:
+            return await call()
+        try:
+            return await asyncio.wait_for(call(), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+
+    def _release(self, key: str, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+
+_groups: dict[str, SingleFlight] = {}
+
+
+def coalesced(
+    name: str | None = None,
+    timeout: float | None = FLIGHT_TIMEOUT_SECONDS,
+    normalize: tuple[str, ...] = (),
+):
+    """Decorator: coalesce concurrent identical calls to an async function
+
+    `normalize` names the string (or list of string) parameters that are
+    casefolded and whitespace-collapsed before keying; all others, and ids
+    such as `user_id` in any case, are keyed exactly.
+    """
+
+    def decorate(func: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        group = _groups.setdefault(name or func.__name__, SingleFlight(name or func.__name__, timeout))
+        signature = inspect.signature(func)
+        unknown = set(normalize) - set(signature.parameters)
+        if unknown:
+            raise ValueError(f"{func.__name__} has no parameters {sorted(unknown)} to normalise")
+        folded = frozenset(normalize) - _IDENTIFIER_FIELDS
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs) -> T:
+            return await group.do(_call_key(signature, folded, args, kwargs), lambda: func(*args, **kwargs))
+
+        wrapper.single_flight = group
+        return wrapper
+
+    return decorate
+
+
+def coalescing_stats() -> dict[str, dict]:
+    """Counters for every coalesced function, by name"""
+    return {name: group.stats() for name, group in _groups.items()}
+
+
+def _call_key(signature: inspect.Signature, normalize: frozenset, args: tuple, kwargs: dict) -> str:
+    """The single-flight key of a call: its bound arguments, `normalize` fields folded"""
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    arguments = {
+        name: _fold(value) if name in normalize else value
+        for name, value in bound.arguments.items()
+    }
+    return json.dumps(arguments, sort_keys=True, default=str)
+
+
+def _fold(value: Any) -> Any:
+    if isinstance(value, str):
+        return " ".join(value.split()).casefold()
+    if isinstance(value, (list, tuple)):
+        return [_fold(item) for item in value]
+    return value
@@ -0,0 +1,172 @@
+"""
+Shared HTTP Transport
+
+One process-wide pair of httpx clients (async and sync) for every model
+client, so agents and teams share their keep-alive connections and TLS
+sessions instead of each MistralChat opening its own pool. Connections are
+HTTP/2 when the `h2` package is installed, so many concurrent calls multiplex
+over a single connection.
+
+At startup the pool is pre-established (`HTTP_WARM_CONNECTIONS` parallel
+requests, so there are that many open HTTP/1.1 connections, or one HTTP/2
+connection). A background loop then sends a cheap request whenever the pool
+has been idle for `HTTP_KEEP_WARM_SECONDS`, keeping connections open past
+the server's and load balancer's idle timeouts. The first call after a quiet
+period therefore does not pay for DNS, TCP and TLS setup again.
+
+`benchmarks/handshake.py` measures the saving against a local HTTPS stub.
+"""
+
+import asyncio
+import os
+import time
+
+import httpx
+
+
+MISTRAL_BASE_URL = os.getenv("MISTRAL_BASE_URL", "https://api.mistral.ai")
+POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "64"))
+KEEPALIVE_SECONDS = float(os.getenv("HTTP_KEEPALIVE_SECONDS", "120"))
+KEEP_WARM_SECONDS = float(os.getenv("HTTP_KEEP_WARM_SECONDS", "30"))
+WARM_CONNECTIONS = int(os.getenv("HTTP_WARM_CONNECTIONS", "4"))
+WARM_PATH = os.getenv("HTTP_WARM_PATH", "/")
+HTTP2 = os.getenv("HTTP_HTTP2", "1") == "1"
+CONNECT_TIMEOUT_SECONDS = 10.0
+READ_TIMEOUT_SECONDS = float(os.getenv("HTTP_READ_TIMEOUT_SECONDS", "120"))
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class SharedTransport:
+    """Lazily created, shared httpx clients plus connection warm-up"""
+
+    def __init__(
+        self,
+        base_url: str = MISTRAL_BASE_URL,
+        pool_size: int = POOL_SIZE,
+        http2: bool = HTTP2,
+        keep_warm_seconds: float = KEEP_WARM_SECONDS,
+        warm_connections: int = WARM_CONNECTIONS,
+        verify=True,
+    ):
+        self.base_url = base_url
+        self.pool_size = pool_size
+        self.http2 = http2 and _http2_available()
+        self.keep_warm_seconds = keep_warm_seconds
+        self.warm_connections = warm_connections
+        self.verify = verify
+        self._async_client: httpx.AsyncClient | None = None
+        self._sync_client: httpx.Client | None = None
+        self._loop_task: asyncio.Task | None = None
+        self._last_request = 0.0
+        self.requests = 0
+        self.warm_pings = 0
+        self.warm_failures = 0
+        self.last_warm_ms: float | None = None
+
+    def _options(self) -> dict:
+        return {
+            "http2": self.http2,
+            "verify": self.verify,
+            "limits": httpx.Limits(
+                max_connections=self.pool_size,
+                max_keepalive_connections=self.pool_size,
+                keepalive_expiry=KEEPALIVE_SECONDS,
+            ),
+            "timeout": httpx.Timeout(READ_TIMEOUT_SECONDS, connect=CONNECT_TIMEOUT_SECONDS),
+        }
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        # Created on first use, inside the running worker and its event loop
+        if self._async_client is None:
+            async def on_request(request: httpx.Request) -> None:
+                self._touch()
+
+            self._async_client = httpx.AsyncClient(
+                **self._options(), event_hooks={"request": [on_request]}
+            )
+        return self._async_client
+
+    @property
+    def sync_client(self) -> httpx.Client:
+        if self._sync_client is None:
+            self._sync_client = httpx.Client(
+                **self._options(), event_hooks={"request": [lambda request: self._touch()]}
+            )
+        return self._sync_client
+
+    def client_params(self) -> dict:
+        """Keyword arguments that make a Mistral SDK client use the shared clients"""
+        return {"client": self.sync_client, "async_client": self.async_client}
+
+    def _touch(self) -> None:
+        self.requests += 1
+        self._last_request = time.monotonic()
+
+    async def warm(self, connections: int | None = None) -> float:
+        """Open (or refresh) pooled connections with parallel cheap requests; returns seconds taken"""
+        started = time.perf_counter()
+        url = self.base_url.rstrip("/") + WARM_PATH
+        results = await asyncio.gather(
+            *(self.async_client.head(url) for _ in range(connections or self.warm_connections)),
+            return_exceptions=True,
+        )
+        elapsed = time.perf_counter() - started
+        self.warm_pings += 1
+        failures = [r for r in results if isinstance(r, Exception)]
+        if failures:
+            self.warm_failures += 1
+            print(f"HTTP warm-up to {self.base_url} failed: {failures[0]!r}")
+        else:
+            self.last_warm_ms = elapsed * 1000
+        return elapsed
+
+    async def start(self) -> None:
+        """Pre-establish connections in the background and keep them warm"""
+        if self._loop_task is None:
+            self._loop_task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            self._loop_task = None
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+        if self._sync_client is not None:
+            self._sync_client.close()
+            self._sync_client = None
+
+    async def _loop(self) -> None:
+        await self.warm()
+        while True:
+            idle = time.monotonic() - self._last_request
+            await asyncio.sleep(max(0.0, self.keep_warm_seconds - idle))
+            if time.monotonic() - self._last_request >= self.keep_warm_seconds:
+                await self.warm()
+
+    def stats(self) -> dict:
+        pool = getattr(getattr(self._async_client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", [])
+        return {
+            "base_url": self.base_url,
+            "http2": self.http2,
+            "pool_size": self.pool_size,
+            "open_connections": len(connections),
+            "requests": self.requests,
+            "warm_pings": self.warm_pings,
+            "warm_failures": self.warm_failures,
+            "last_warm_ms": self.last_warm_ms,
+            "keep_warm_seconds": self.keep_warm_seconds,
+        }
+
+
+# Process-wide transport shared by every model client
+http_transport = SharedTransport()
@@ -0,0 +1,399 @@
+"""
+LLM Call Scheduler
+
+Every agent and team run goes through one scheduler (via the agent registry),
+so calls share per-model budgets instead of hitting Mistral unbounded. Each
+model has a concurrency limit and a tokens-per-minute budget. Waiting calls
+are started by priority class: session messages first, then quick task calls
+(categorization, energy advice), then coaching, then background work. A call
+that is still queued when its deadline passes is dropped with
+DeadlineExceeded rather than sent late, so a burst of coaching can't hold up
+a distraction-recovery message.
+
+A 429 from the provider (told apart by status code or exception type, never
+by the message text) halves the model's concurrency, pauses the model with
+exponential backoff (or the provider's Retry-After) and requeues the call;
+the limit grows back by one slot after each run of successful calls.
+
+Budgets can be overridden with LLM_BUDGETS, a JSON object such as
+{"mistral-large-latest": {"concurrency": 4, "tokens_per_minute": 100000}}.
+With several serving workers (core.workers) each gets an equal share,
+rounded down; every worker keeps at least one concurrent call, so with more
+workers than a model's concurrency the total can exceed it by that much.
+Set LLM_SCHEDULER=0 to call the models directly.
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import time
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+from .metrics import metrics, span, token_usage
+
+
+SCHEDULER_ENABLED = os.getenv("LLM_SCHEDULER", "1") == "1"
+RESERVED_OUTPUT_TOKENS = int(os.getenv("LLM_RESERVED_OUTPUT_TOKENS", "600"))
+MAX_RATE_LIMIT_RETRIES = int(os.getenv("LLM_RATE_LIMIT_RETRIES", "3"))
+BACKOFF_INITIAL_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 30.0
+# Provider exception types that always mean a 429 (agno, OpenAI-style SDKs)
+RATE_LIMIT_ERRORS = frozenset({"ModelRateLimitError", "RateLimitError"})
+
+
+class Priority(IntEnum):
+    """Lower values are started first"""
+    SESSION = 0  # Focus session messages (start, check-in, distraction recovery, end)
+    TASK = 1  # Categorization and energy advice
+    COACHING = 2  # Coach and team
+    BACKGROUND = 3  # Message pool, memory consolidation, energy table builds
+
+
+# How long a call may wait for a slot before it is dropped (0 = no deadline)
+DEADLINE_SECONDS = {
+    Priority.SESSION: float(os.getenv("LLM_SESSION_DEADLINE_SECONDS", "15")),
+    Priority.TASK: float(os.getenv("LLM_TASK_DEADLINE_SECONDS", "30")),
+    Priority.COACHING: float(os.getenv("LLM_COACHING_DEADLINE_SECONDS", "60")),
+    Priority.BACKGROUND: 0.0,
+}
+
+
+@dataclass
+class ModelBudget:
+    concurrency: int
+    tokens_per_minute: int = 0  # 0 = unlimited
+
+
+DEFAULT_BUDGETS = {
+    "mistral-large-latest": ModelBudget(concurrency=4, tokens_per_minute=100_000),
+    "mistral-small-latest": ModelBudget(concurrency=16, tokens_per_minute=400_000),
+}
+FALLBACK_BUDGET = ModelBudget(concurrency=8)
+
+llm_queue_seconds = metrics.histogram(
+    "hyperfocus_llm_queue_seconds", "Time LLM calls waited for a slot", ("model", "priority")
+)
+llm_dropped_total = metrics.counter(
+    "hyperfocus_llm_dropped_total", "LLM calls dropped because their deadline passed", ("model", "priority")
+)
+llm_rate_limited_total = metrics.counter(
+    "hyperfocus_llm_rate_limited_total", "429 responses from the model provider", ("model",)
+)
+llm_concurrency_limit = metrics.gauge(
+    "hyperfocus_llm_concurrency_limit", "Current (adaptive) concurrency limit per model", ("model",)
+)
+
+
+class DeadlineExceeded(TimeoutError):
+    """An LLM call was still queued when its deadline passed"""
+
+
+class _Waiter:
+    __slots__ = ("future", "tokens", "deadline")
+
+    def __init__(self, future: asyncio.Future, tokens: float, deadline: float | None):
+        self.future = future
+        self.tokens = tokens
+        self.deadline = deadline
+
+
+class ModelLane:
+    """Slots, token bucket and priority queue for one model"""
+
+    def __init__(self, model: str, budget: ModelBudget):
+        self.model = model
+        self.budget = budget
+        self.limit = budget.concurrency
+        self.active = 0
+        self.started = 0
+        self.dropped = 0
+        self.rate_limits = 0
+        self._queue: list[tuple[int, int, _Waiter]] = []
+        self._seq = itertools.count()
+        self._tokens = float(budget.tokens_per_minute)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._backoff = BACKOFF_INITIAL_SECONDS
+        self._successes = 0
+        self._timer: asyncio.TimerHandle | None = None
+        llm_concurrency_limit.set(self.limit, model=model)
+
+    async def acquire(self, priority: Priority, tokens: float, deadline: float | None) -> None:
+        """Wait for a slot (and token budget); raises DeadlineExceeded if it comes too late"""
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), tokens, deadline)
+        heapq.heappush(self._queue, (priority, next(self._seq), waiter))
+        self._dispatch()
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        started = time.perf_counter()
+        try:
+            with span("queue"):
+                await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except DeadlineExceeded:
+            raise
+        except BaseException as e:
+            if waiter.future.done() and not waiter.future.cancelled():
+                if waiter.future.exception() is None:
+                    self.release(tokens)  # Granted just as we gave up
+            else:
+                waiter.future.cancel()
+                self._dispatch()  # It may have been blocking the head of the queue
+            if isinstance(e, TimeoutError):
+                self._drop(priority)
+                raise DeadlineExceeded(f"{self.model} call not started before its deadline") from None
+            raise
+        finally:
+            llm_queue_seconds.observe(
+                time.perf_counter() - started, model=self.model, priority=priority.name.lower()
+            )
+
+    def release(self, charged: float, used: float | None = None) -> None:
+        """Free a slot, settling the token estimate against actual usage if known"""
+        self.active -= 1
+        if used is not None and self.budget.tokens_per_minute:
+            # Settle what was actually taken from the bucket, not the raw estimate
+            self._tokens = min(float(self.budget.tokens_per_minute), self._tokens + self._charge(charged) - used)
+        self._dispatch()
+
+    def succeeded(self) -> None:
+        self._backoff = BACKOFF_INITIAL_SECONDS
+        if self.limit >= self.budget.concurrency:
+            return
+        self._successes += 1
+        if self._successes >= self.limit:
+            self._successes = 0
+            self.limit += 1
+            llm_concurrency_limit.set(self.limit, model=self.model)
+
+    def rate_limited(self, retry_after: float | None) -> None:
+        """Back off after a 429: halve concurrency and pause new calls"""
+        self.rate_limits += 1
+        llm_rate_limited_total.inc(model=self.model)
+        self.limit = max(1, self.limit // 2)
+        self._successes = 0
+        llm_concurrency_limit.set(self.limit, model=self.model)
+        delay = retry_after if retry_after is not None else self._backoff
+        self._backoff = min(BACKOFF_MAX_SECONDS, self._backoff * 2)
+        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+
+    def stats(self) -> dict:
+        queued = {p.name.lower(): 0 for p in Priority}
+        for priority, _, waiter in self._queue:
+            if not waiter.future.done():
+                queued[Priority(priority).name.lower()] += 1
+        return {
+            "limit": self.limit,
+            "max_concurrency": self.budget.concurrency,
+            "active": self.active,
+            "queued": queued,
+            "tokens_per_minute": self.budget.tokens_per_minute,
+            "tokens_available": round(self._tokens) if self.budget.tokens_per_minute else None,
+            "paused_seconds": max(0.0, round(self._paused_until - time.monotonic(), 2)),
+            "started": self.started,
+            "dropped": self.dropped,
+            "rate_limits": self.rate_limits,
+        }
+
+    def _dispatch(self) -> None:
+        now = time.monotonic()
+        self._refill(now)
+        while self._queue and self.active < self.limit:
+            priority, _, waiter = self._queue[0]
+            if waiter.future.done():
+                heapq.heappop(self._queue)
+                continue
+            if waiter.deadline is not None and now >= waiter.deadline:
+                heapq.heappop(self._queue)
+                self._drop(Priority(priority))
+                waiter.future.set_exception(
+                    DeadlineExceeded(f"{self.model} call not started before its deadline")
+                )
+                continue
+            if now < self._paused_until:
+                self._wake_in(self._paused_until - now)
+                return
+            tokens = self._charge(waiter.tokens)
+            if self.budget.tokens_per_minute and self._tokens < tokens:
+                self._wake_in((tokens - self._tokens) * 60 / self.budget.tokens_per_minute)
+                return
+            heapq.heappop(self._queue)
+            if self.budget.tokens_per_minute:
+                self._tokens -= tokens
+            self.active += 1
+            self.started += 1
+            waiter.future.set_result(None)
+
+    def _charge(self, tokens: float) -> float:
+        """What a call reserves from the bucket: its estimate, capped at one minute's budget"""
+        return min(tokens, float(self.budget.tokens_per_minute))
+
+    def _refill(self, now: float) -> None:
+        if self.budget.tokens_per_minute:
+            elapsed = now - self._refilled_at
+            self._tokens = min(
+                float(self.budget.tokens_per_minute),
+                self._tokens + elapsed * self.budget.tokens_per_minute / 60,
+            )
+        self._refilled_at = now
+
+    def _wake_in(self, seconds: float) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_later(max(0.0, seconds), self._on_timer)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._dispatch()
+
+    def _drop(self, priority: Priority) -> None:
+        self.dropped += 1
+        llm_dropped_total.inc(model=self.model, priority=priority.name.lower())
+
+
+class LLMScheduler:
+    """Routes agent runs through a lane per model"""
+
+    def __init__(self, budgets: dict[str, ModelBudget] | None = None):
+        self.budgets = budgets if budgets is not None else _load_budgets()
+        self._lanes: dict[str, ModelLane] = {}
+
+    def lane(self, model: str) -> ModelLane:
+        lane = self._lanes.get(model)
+        if lane is None:
+            from .workers import worker_count
+
+            budget = _worker_share(self.budgets.get(model, FALLBACK_BUDGET), worker_count())
+            lane = self._lanes[model] = ModelLane(model, budget)
+        return lane
+
+    def run(self, model: str, priority: Priority, call: Callable[[], Any], prompt: Any = "", stream: bool = False):
+        """Run `call()` (an agent's arun) once the model has capacity
+
+        Keeps the shape of arun: an async iterator when streaming, an
+        awaitable otherwise.
+        """
+        if not SCHEDULER_ENABLED:
+            return call()
+        seconds = DEADLINE_SECONDS[priority]
+        deadline = time.monotonic() + seconds if seconds > 0 else None
+        tokens = estimate_tokens(prompt)
+        if stream:
+            return self._run_stream(self.lane(model), priority, deadline, tokens, call)
+        return self._run_call(self.lane(model), priority, deadline, tokens, call)
+
+    def stats(self) -> dict:
+        return {model: lane.stats() for model, lane in self._lanes.items()}
+
+    async def _run_call(self, lane: ModelLane, priority: Priority, deadline: float | None, tokens: float, call: Callable[[], Awaitable]):
+        for attempt in range(1 + MAX_RATE_LIMIT_RETRIES):
+            await lane.acquire(priority, tokens, deadline)
+            try:
+                response = await call()
+            except Exception as e:
+                rate_limited = _is_rate_limit(e)
+                if rate_limited:
+                    lane.rate_limited(_retry_after(e))  # Pause before the slot is handed on
+                lane.release(tokens)
+                if not rate_limited or attempt == MAX_RATE_LIMIT_RETRIES:
+                    raise
+                continue
+            except BaseException:
+                lane.release(tokens)
+                raise
+            lane.release(tokens, _tokens_used(getattr(response, "metrics", None)))
+            lane.succeeded()
+            return response
+
+    async def _run_stream(self, lane: ModelLane, priority: Priority, deadline: float | None, tokens: float, call: Callable[[], AsyncIterator]) -> AsyncIterator:
+        for attempt in range(1 + MAX_RATE_LIMIT_RETRIES):
+            await lane.acquire(priority, tokens, deadline)
+            yielded = False
+            run_metrics = None
+            try:
+                events = call()
+                try:
+                    async for event in events:
+                        yielded = True
+                        run_metrics = getattr(event, "metrics", None) or run_metrics
+                        yield event
+                finally:
+                    aclose = getattr(events, "aclose", None)
+                    if aclose is not None:
+                        await aclose()
+            except Exception as e:
+                rate_limited = _is_rate_limit(e)
+                if rate_limited:
+                    lane.rate_limited(_retry_after(e))
+                lane.release(tokens)
+                # Only retry before anything reached the caller
+                if yielded or not rate_limited or attempt == MAX_RATE_LIMIT_RETRIES:
+                    raise
+                continue
+            except BaseException:
+                lane.release(tokens)
+                raise
+            lane.release(tokens, _tokens_used(run_metrics))
+            lane.succeeded()
+            return
+
+
+def estimate_tokens(prompt: Any) -> float:
+    """Rough token cost of a call before it runs (prompt plus a reserved reply)"""
+    text = prompt if isinstance(prompt, str) else str(prompt or "")
+    return len(text) / 4 + RESERVED_OUTPUT_TOKENS
+
+
+def _tokens_used(run_metrics: Any) -> float | None:
+    if run_metrics is None:
+        return None
+    input_tokens, output_tokens = token_usage(run_metrics)
+    return input_tokens + output_tokens or None
+
+
+def _is_rate_limit(error: BaseException) -> bool:
+    """A 429 from the provider, here or in the error it was raised from"""
+    while error is not None:
+        if type(error).__name__ in RATE_LIMIT_ERRORS:
+            return True
+        for source in (error, getattr(error, "response", None)):
+            if getattr(source, "status_code", None) == 429:
+                return True
+        error = error.__cause__
+    return False
+
+
+def _retry_after(error: BaseException) -> float | None:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _load_budgets() -> dict[str, ModelBudget]:
+    budgets = dict(DEFAULT_BUDGETS)
+    for model, budget in json.loads(os.getenv("LLM_BUDGETS", "{}")).items():
+        budgets[model] = ModelBudget(**budget)
+    return budgets
+
+
+def _worker_share(budget: ModelBudget, workers: int) -> ModelBudget:
+    """One worker's part of a model budget: floor of an even split, at least 1 call
+
+    Rounding down keeps the workers' total within the budget whenever the
+    concurrency is at least the worker count (concurrency 4 over 8 workers
+    still allows 8, one each, since a worker can't run a fraction of a call).
+    """
+    if workers <= 1:
+        return budget
+    return ModelBudget(
+        concurrency=max(1, budget.concurrency // workers),
+        tokens_per_minute=max(1, budget.tokens_per_minute // workers) if budget.tokens_per_minute else 0,
+    )
+
+
+# Process-wide scheduler
+llm_scheduler = LLMScheduler()
@@ -0,0 +1,332 @@
+"""
+Metrics and Tracing
+
+Dependency-free Prometheus instrumentation for the service: counters,
+gauges and histograms with labels, rendered in the Prometheus text format
+for `/metrics`. Every agent and team run goes through `instrument_run`
+(via the agent registry), which records latency per agent and model, token
+counts, failures and in-flight runs.
+
+Tracing is opt-in per request: when a trace is active (see `start_trace`),
+time spent in the model, user memory and storage is accumulated into
+spans and reported back as a `Server-Timing` header. Model time is taken
+around each model invocation (core.models), not around whole agent runs,
+which also read and write memory.
+"""
+
+import asyncio
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Iterator
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DB_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+
+_INFINITY = 'le="+Inf"'
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, Any]) -> tuple:
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def _label_text(self, key: tuple, extra: str = "") -> str:
+        pairs = [f'{label}="{_escape(value)}"' for label, value in zip(self.labels, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> Iterator[str]:
+        for key, value in list(self._values.items()):
+            yield f"{self.name}{self._label_text(key)} {_number(value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = buckets
+        self._values: dict[tuple, list] = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, upper in enumerate(self.buckets):
+                if value <= upper:
+                    row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> Iterator[str]:
+        for key, row in list(self._values.items()):
+            for upper, count in zip(self.buckets, row):
+                bound = 'le="' + _number(upper) + '"'
+                yield f"{self.name}_bucket{self._label_text(key, bound)} {count}"
+            yield f"{self.name}_bucket{self._label_text(key, _INFINITY)} {row[-1]}"
+            yield f"{self.name}_sum{self._label_text(key)} {_number(row[-2])}"
+            yield f"{self.name}_count{self._label_text(key)} {row[-1]}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def counter(self, name: str, help: str, labels: tuple[str, ...] = ()) -> Counter:
+        return self._add(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: tuple[str, ...] = ()) -> Gauge:
+        return self._add(Gauge(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def _add(self, metric):
+        return self._metrics.setdefault(metric.name, metric)
+
+
+metrics = MetricsRegistry()
+
+agent_run_seconds = metrics.histogram(
+    "hyperfocus_agent_run_seconds", "Agent and team run latency", ("agent", "model", "stream")
+)
+agent_runs_total = metrics.counter(
+    "hyperfocus_agent_runs_total", "Agent and team runs by outcome", ("agent", "model", "status")
+)
+agent_runs_in_flight = metrics.gauge(
+    "hyperfocus_agent_runs_in_flight", "Agent and team runs currently executing", ("agent",)
+)
+agent_input_tokens = metrics.counter(
+    "hyperfocus_agent_input_tokens_total", "Prompt tokens sent to the model", ("agent", "model")
+)
+agent_output_tokens = metrics.counter(
+    "hyperfocus_agent_output_tokens_total", "Completion tokens received from the model", ("agent", "model")
+)
+structured_output_failures = metrics.counter(
+    "hyperfocus_structured_output_failures_total",
+    "Runs whose structured output did not parse and fell back to a default",
+    ("agent",),
+)
+db_seconds = metrics.histogram(
+    "hyperfocus_db_seconds", "Time spent in SQLite", ("operation",), DB_BUCKETS
+)
+http_request_seconds = metrics.histogram(
+    "hyperfocus_http_request_seconds", "HTTP request latency", ("method", "route", "status")
+)
+http_requests_in_flight = metrics.gauge(
+    "hyperfocus_http_requests_in_flight", "HTTP requests currently being served"
+)
+
+
+def record_parse_failure(agent: str) -> None:
+    """Count a structured response that fell back to the default answer"""
+    structured_output_failures.inc(agent=agent)
+
+
+# -- Tracing ---------------------------------------------------------------
+
+class Trace:
+    """Time per span kind (model, memory, storage, ...) for one request"""
+
+    def __init__(self):
+        self.spans: dict[str, float] = {}
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, kind: str, seconds: float) -> None:
+        with self._lock:
+            self.spans[kind] = self.spans.get(kind, 0.0) + seconds
+
+    def server_timing(self) -> str:
+        total = time.perf_counter() - self.started
+        parts = [f"{kind};dur={seconds * 1000:.1f}" for kind, seconds in self.spans.items()]
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+
+_trace: ContextVar[Trace | None] = ContextVar("hyperfocus_trace", default=None)
+
+
+def start_trace() -> Trace:
+    trace = Trace()
+    _trace.set(trace)
+    return trace
+
+
+@contextmanager
+def span(kind: str) -> Iterator[None]:
+    """Attribute the enclosed time to `kind` on the active trace, if any"""
+    trace = _trace.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(kind, time.perf_counter() - started)
+
+
+# -- Agent runs -------------------------------------------------------------
+
+def instrument_run(agent: str, model: str, arun, args: tuple, kwargs: dict):
+    """Call `arun(*args, **kwargs)` with metrics, keeping its shape
+
+    Streaming runs return an async iterator, other runs an awaitable.
+    """
+    if kwargs.get("stream"):
+        return _instrument_stream(agent, model, arun(*args, **kwargs))
+    return _instrument_call(agent, model, arun, args, kwargs)
+
+
+def instrument_member(agent: Any) -> Any:
+    """Instrument the runs a team makes of a member agent (which skip its LazyRef)
+
+    The member must be an instance of its own: the team's runs of it are
+    already scheduled as part of the team run, and only they go through here.
+    """
+    arun = agent.arun
+    model = getattr(getattr(agent, "model", None), "id", "") or ""
+
+    def instrumented_arun(*args, **kwargs):
+        return instrument_run(agent.name, model, arun, args, kwargs)
+
+    agent.arun = instrumented_arun
+    return agent
+
+
+async def _instrument_call(agent: str, model: str, arun, args: tuple, kwargs: dict):
+    status = "error"
+    agent_runs_in_flight.inc(agent=agent)
+    started = time.perf_counter()
+    try:
+        response = await arun(*args, **kwargs)
+        status = "ok"
+        _record_tokens(agent, model, getattr(response, "metrics", None))
+        return response
+    except BaseException as e:
+        status = "cancelled" if _is_cancel(e) else "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        agent_runs_in_flight.dec(agent=agent)
+        agent_run_seconds.observe(elapsed, agent=agent, model=model, stream="false")
+        agent_runs_total.inc(agent=agent, model=model, status=status)
+
+
+async def _instrument_stream(agent: str, model: str, events: AsyncIterator) -> AsyncIterator:
+    status = "error"
+    run_metrics = None
+    agent_runs_in_flight.inc(agent=agent)
+    started = time.perf_counter()
+    try:
+        async for event in events:
+            run_metrics = getattr(event, "metrics", None) or run_metrics
+            yield event
+        status = "ok"
+    except BaseException as e:
+        status = "cancelled" if _is_cancel(e) else "error"
+        raise
+    finally:
+        aclose = getattr(events, "aclose", None)
+        if aclose is not None:
+            await aclose()
+        elapsed = time.perf_counter() - started
+        agent_runs_in_flight.dec(agent=agent)
+        agent_run_seconds.observe(elapsed, agent=agent, model=model, stream="true")
+        agent_runs_total.inc(agent=agent, model=model, status=status)
+        _record_tokens(agent, model, run_metrics)
+
+
+def token_usage(run_metrics: Any) -> tuple[float, float]:
+    """(input, output) tokens from an agno run's metrics"""
+    return (
+        _token_total(getattr(run_metrics, "input_tokens", 0)),
+        _token_total(getattr(run_metrics, "output_tokens", 0)),
+    )
+
+
+def _record_tokens(agent: str, model: str, run_metrics: Any) -> None:
+    if run_metrics is None:
+        return
+    input_tokens, output_tokens = token_usage(run_metrics)
+    if input_tokens:
+        agent_input_tokens.inc(input_tokens, agent=agent, model=model)
+    if output_tokens:
+        agent_output_tokens.inc(output_tokens, agent=agent, model=model)
+
+
+def _token_total(value: Any) -> float:
+    # Older agno versions report per-message lists
+    if isinstance(value, list):
+        return float(sum(v or 0 for v in value))
+    return float(value or 0)
+
+
+def _is_cancel(error: BaseException) -> bool:
+    return isinstance(error, (asyncio.CancelledError, GeneratorExit))
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
@@ -0,0 +1,121 @@
+"""
+Chat Model Factory
+
+Every agent and the team get their chat model from `chat_model`, so the
+provider can be swapped in one place. Set HYPERFOCUS_FAKE_MODEL to a latency
+profile name (e.g. "default", "fast", "slow") or a JSON profile file to run
+the whole service against the deterministic offline stub in
+`benchmarks.fake_model` instead of the Mistral API.
+
+Every Mistral client uses the process-wide connection pool in
+core.http_transport. Each model invocation is timed where it happens
+(`InstrumentedModel`): it counts as the request's "model" span, and is noted
+on the traffic trace. Agent runs spend time outside the model too, in memory
+and storage, which have spans of their own.
+"""
+
+import asyncio
+import os
+import time
+from functools import lru_cache
+from typing import AsyncIterator, Iterator, Optional
+
+from .metrics import span
+from .traffic import record_model_call
+
+
+FAKE_MODEL = os.getenv("HYPERFOCUS_FAKE_MODEL", "")
+
+
+def chat_model(model_id: str):
+    """The chat model for a model id (Mistral, or the offline stub)"""
+    if FAKE_MODEL:
+        from benchmarks.fake_model import FakeChat, load_profile
+
+        return _instrumented(FakeChat)(id=model_id, profile=load_profile(FAKE_MODEL))
+
+    from agno.models.mistral import MistralChat
+
+    from .http_transport import http_transport
+
+    return _instrumented(MistralChat)(id=model_id, client_params=http_transport.client_params())
+
+
+class InstrumentedModel:
+    """Mixin for agno models that times every invocation as a "model" span and for the trace"""
+
+    def invoke(self, *args, **kwargs):
+        started = time.perf_counter()
+        status = "error"
+        try:
+            with span("model"):
+                response = super().invoke(*args, **kwargs)
+            status = "ok"
+            return response
+        except BaseException as e:
+            status = _status(e)
+            raise
+        finally:
+            self._note_invocation(kwargs, time.perf_counter() - started, None, status)
+
+    async def ainvoke(self, *args, **kwargs):
+        started = time.perf_counter()
+        status = "error"
+        try:
+            with span("model"):
+                response = await super().ainvoke(*args, **kwargs)
+            status = "ok"
+            return response
+        except BaseException as e:
+            status = _status(e)
+            raise
+        finally:
+            self._note_invocation(kwargs, time.perf_counter() - started, None, status)
+
+    def invoke_stream(self, *args, **kwargs) -> Iterator:
+        started = time.perf_counter()
+        first_token = None
+        status = "error"
+        try:
+            with span("model"):
+                for delta in super().invoke_stream(*args, **kwargs):
+                    if first_token is None and getattr(delta, "content", None):
+                        first_token = time.perf_counter() - started
+                    yield delta
+            status = "ok"
+        except BaseException as e:
+            status = _status(e)
+            raise
+        finally:
+            self._note_invocation(kwargs, time.perf_counter() - started, first_token, status)
+
+    async def ainvoke_stream(self, *args, **kwargs) -> AsyncIterator:
+        started = time.perf_counter()
+        first_token = None
+        status = "error"
+        try:
+            with span("model"):
+                async for delta in super().ainvoke_stream(*args, **kwargs):
+                    if first_token is None and getattr(delta, "content", None):
+                        first_token = time.perf_counter() - started
+                    yield delta
+            status = "ok"
+        except BaseException as e:
+            status = _status(e)
+            raise
+        finally:
+            self._note_invocation(kwargs, time.perf_counter() - started, first_token, status)
+
+    def _note_invocation(self, kwargs: dict, seconds: float, first_token: Optional[float], status: str) -> None:
+        run = kwargs.get("run_response")
+        agent = getattr(run, "agent_name", None) or getattr(run, "team_name", None) or ""
+        record_model_call(agent, self.id, seconds, first_token, status)
+
+
+def _status(error: BaseException) -> str:
+    return "cancelled" if isinstance(error, (asyncio.CancelledError, GeneratorExit)) else "error"
+
+
+@lru_cache(maxsize=None)
+def _instrumented(model_class: type) -> type:
+    return type(model_class.__name__, (InstrumentedModel, model_class), {"__module__": model_class.__module__})
@@ -0,0 +1,192 @@
+"""
+Lazy Agent Registry
+
+Agents and teams are registered with a factory instead of being built at
+import time. Each registration returns a LazyRef that stands in for the
+agent: its name is known up front, and the agent (together with agno, the
+Mistral SDK and its database connection) is built on first real use.
+The registry can enumerate every agent and team and warm the hot ones in
+the background once the server is up. Runs made through a LazyRef's `arun`
+go through the LLM scheduler at the agent's priority and are instrumented
+for /metrics.
+
+A LazyRef only forwards attribute reads. AgentOS configures the agents it
+is given (it sets their db and other attributes), so it must get the built
+agents (`LazyRef.get`); `LazyASGIApp` builds it, and with it those agents,
+on the first request that reaches its routes.
+
+Set LAZY_AGENTS=0 to build everything at registration time (the previous
+behaviour, used by the startup benchmark for comparison).
+"""
+
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Callable, Generic, Iterable, TypeVar
+
+from .llm_scheduler import Priority, llm_scheduler
+from .metrics import instrument_run
+
+
+T = TypeVar("T")
+
+LAZY_AGENTS = os.getenv("LAZY_AGENTS", "1") == "1"
+
+
+class LazyRef(Generic[T]):
+    """Proxy for an agent or team that is built on first attribute access"""
+
+    def __init__(self, name: str, kind: str, factory: Callable[[], T], hot: bool, priority: Priority):
+        self._name = name
+        self._kind = kind
+        self._factory = factory
+        self._hot = hot
+        self._priority = priority
+        self._instance: T | None = None
+        self._build_seconds: float | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def built(self) -> bool:
+        return self._instance is not None
+
+    def get(self) -> T:
+        """The underlying agent, building it if needed"""
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    started = time.perf_counter()
+                    self._instance = self._factory()
+                    self._build_seconds = time.perf_counter() - started
+        return self._instance
+
+    def build(self) -> T:
+        """A new instance of its own, not the shared one (e.g. for a team member)"""
+        return self._factory()
+
+    def arun(self, *args, priority: Priority | None = None, **kwargs):
+        """The agent's `arun`, scheduled (see core.llm_scheduler) and instrumented
+
+        `priority` overrides the agent's default priority class for this call.
+        """
+        instance = self.get()
+        model = getattr(getattr(instance, "model", None), "id", "") or ""
+        return llm_scheduler.run(
+            model,
+            self._priority if priority is None else priority,
+            lambda: instrument_run(self._name, model, instance.arun, args, kwargs),
+            prompt=args[0] if args else kwargs.get("input", ""),
+            stream=bool(kwargs.get("stream")),
+        )
+
+    def __getattr__(self, attr: str) -> Any:
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        return getattr(self.get(), attr)
+
+    def __repr__(self) -> str:
+        state = "built" if self.built else "lazy"
+        return f"<LazyRef {self._kind} {self._name} ({state})>"
+
+
+class LazyASGIApp:
+    """ASGI app built by `factory` (in a thread) on the first request it serves
+
+    Mounted sub-apps get no lifespan events, so the built app must not need
+    its own startup.
+    """
+
+    def __init__(self, factory: Callable[[], Any]):
+        self._factory = factory
+        self._app = None
+        self._lock: asyncio.Lock | None = None
+
+    @property
+    def built(self) -> bool:
+        return self._app is not None
+
+    async def get(self) -> Any:
+        if self._app is None:
+            if self._lock is None:
+                self._lock = asyncio.Lock()
+            async with self._lock:
+                if self._app is None:
+                    self._app = await asyncio.to_thread(self._factory)
+        return self._app
+
+    async def __call__(self, scope, receive, send) -> None:
+        app = await self.get()
+        await app(scope, receive, send)
+
+
+class AgentRegistry:
+    """Every agent and team in the service, by name"""
+
+    def __init__(self):
+        self._refs: dict[str, LazyRef] = {}
+
+    def register(
+        self,
+        name: str,
+        factory: Callable[[], T],
+        kind: str = "agent",
+        hot: bool = False,
+        priority: Priority = Priority.TASK,
+    ) -> LazyRef[T]:
+        """Register a factory; hot agents are pre-built by warm()"""
+        ref = LazyRef(name, kind, factory, hot, priority)
+        self._refs[name] = ref
+        if not LAZY_AGENTS:
+            ref.get()
+        return ref
+
+    def get(self, name: str) -> Any:
+        return self._refs[name].get()
+
+    def refs(self, kind: str | None = None) -> list[LazyRef]:
+        """Registered references, optionally only agents or only teams"""
+        return [ref for ref in self._refs.values() if kind is None or ref._kind == kind]
+
+    async def warm(self, names: Iterable[str] | None = None) -> None:
+        """Build the hot (or the named) agents in a worker thread"""
+        refs = [self._refs[name] for name in names] if names is not None else [
+            ref for ref in self._refs.values() if ref._hot
+        ]
+        for ref in refs:
+            try:
+                await asyncio.to_thread(ref.get)
+            except Exception as e:
+                print(f"Warm-up of {ref.name} failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            name: {
+                "kind": ref._kind,
+                "hot": ref._hot,
+                "priority": ref._priority.name.lower(),
+                "built": ref.built,
+                "build_seconds": ref._build_seconds,
+            }
+            for name, ref in self._refs.items()
+        }
+
+
+# Process-wide registry
+agent_registry = AgentRegistry()
+
+
+def register_agent(
+    name: str, factory: Callable[[], T], hot: bool = False, priority: Priority = Priority.TASK
+) -> LazyRef[T]:
+    return agent_registry.register(name, factory, "agent", hot, priority)
+
+
+def register_team(
+    name: str, factory: Callable[[], T], hot: bool = False, priority: Priority = Priority.COACHING
+) -> LazyRef[T]:
+    return agent_registry.register(name, factory, "team", hot, priority)
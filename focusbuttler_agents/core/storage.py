@@ -0,0 +1,468 @@
+"""
+Shared SQLite Storage
+
+One SQLite database for every agent, the team and the service's own caches.
+The database runs in WAL mode with tuned pragmas; reads use a bounded pool of
+connections and the service's own writes go through a single writer thread
+that batches statements into one transaction, so their commits and fsyncs
+happen off the event loop; async code reads with `aquery`. A batch that
+fails as a whole (for example SQLITE_BUSY past the busy timeout) fails the
+futures of its statements and the writer carries on with the next batch.
+
+agno's session and memory tables are the exception: agno writes them through
+its own SQLAlchemy engine (`agno_db`), synchronously, from the agent run on
+the event loop, and those commits still contend with the writer thread for
+the database lock.
+
+In multi-worker mode (see core.workers) that writer runs in the supervisor:
+each worker's writer sends its batches over a Unix socket with RemoteWriter
+and gets the results back. If the socket breaks, the worker reconnects on
+its next batch, retrying a few times with backoff; batches that could not
+be delivered fail rather than block. The writers of the file are therefore
+the supervisor's writer thread plus agno's engine in every worker (see
+below), which SQLite serialises with its lock and busy timeout.
+
+Usage:
+    python -m core.storage migrate        # merge the legacy per-agent files
+"""
+
+import argparse
+import asyncio
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from multiprocessing.connection import Client, Listener
+from contextlib import contextmanager
+from functools import lru_cache, wraps
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+from .metrics import db_seconds, span
+
+
+DB_FILE = os.getenv("HYPERFOCUS_DB_FILE", "hyperfocus.db")
+READ_POOL_SIZE = int(os.getenv("HYPERFOCUS_DB_POOL_SIZE", "8"))
+WRITE_BATCH_SIZE = 256
+WRITE_BATCH_WAIT_SECONDS = 0.005
+# Set by core.workers in worker processes: commit through the supervisor's writer
+WRITER_SOCKET = os.getenv("HYPERFOCUS_WRITER_SOCKET", "")
+RECONNECT_ATTEMPTS = 5
+RECONNECT_DELAY_SECONDS = 0.05
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA cache_size=-20000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+)
+
+# Files written by earlier versions, merged by `migrate`
+LEGACY_DB_FILES = (
+    "hyperfocus_sessions.db",
+    "hyperfocus_memory.db",
+    "hyperfocus_team_memory.db",
+    "hyperfocus_categorization_cache.db",
+    "hyperfocus_focus_sessions.db",
+    "hyperfocus_message_pool.db",
+)
+
+
+def apply_pragmas(conn) -> None:
+    cursor = conn.cursor()
+    for pragma in PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+
+def connect(db_file: str) -> sqlite3.Connection:
+    """Open a connection with the shared pragmas applied"""
+    conn = sqlite3.connect(db_file, check_same_thread=False, timeout=5.0)
+    apply_pragmas(conn)
+    return conn
+
+
+class ConnectionPool:
+    """Bounded pool of read connections"""
+
+    def __init__(self, db_file: str, size: int = READ_POOL_SIZE):
+        self.db_file = db_file
+        self._idle: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        self._slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = connect(self.db_file)
+            try:
+                yield conn
+            finally:
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+
+class BatchWriter:
+    """Single writer thread that commits queued statements in batches"""
+
+    def __init__(self, db_file: str):
+        self.db_file = db_file
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, sql: str, params: Any = (), many: bool = False) -> Future:
+        """Queue a statement; the future resolves once it is committed"""
+        future: Future = Future()
+        self._queue.put((sql, params, many, future))
+        return future
+
+    def flush(self, timeout: float | None = None) -> None:
+        """Block until everything queued so far is committed"""
+        self.submit("SELECT 1").result(timeout)
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+
+    def _open(self):
+        conn = connect(self.db_file)
+        conn.isolation_level = None  # transactions are managed per batch
+        return conn
+
+    def _run(self) -> None:
+        conn = self._open()
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            try:
+                while len(batch) < WRITE_BATCH_SIZE:
+                    item = self._queue.get(timeout=WRITE_BATCH_WAIT_SECONDS)
+                    if item is None:
+                        self._queue.put(None)
+                        break
+                    batch.append(item)
+            except queue.Empty:
+                pass
+            self._commit(conn, batch)
+        if conn is not None:
+            conn.close()
+
+    def _commit(self, conn: sqlite3.Connection, batch: list) -> None:
+        try:
+            with db_seconds.time(operation="commit"):
+                results = self._execute(conn, batch)
+        except Exception as e:
+            # The whole batch failed (BEGIN or COMMIT hit SQLITE_BUSY, the writer
+            # went away...): fail every statement in it and keep serving the queue
+            print(f"Write batch of {len(batch)} statements failed: {e}")
+            error = _db_error(e)
+            results = [(future, None, error) for *_, future in batch]
+        for future, rowcount, error in results:
+            _settle(future, rowcount, error)
+
+    def _execute(self, conn: sqlite3.Connection, batch: list) -> list:
+        results = []
+        conn.execute("BEGIN")
+        try:
+            for sql, params, many, future in batch:
+                try:
+                    if many:
+                        cursor = conn.executemany(sql, params)
+                    else:
+                        cursor = conn.execute(sql, params)
+                    results.append((future, cursor.rowcount, None))
+                except Exception as e:
+                    results.append((future, None, _db_error(e)))
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        return results
+
+
+def _db_error(error: Exception) -> sqlite3.Error:
+    """The error as a sqlite3.Error, which callers catch and WriteServer can send back"""
+    if isinstance(error, sqlite3.Error):
+        return error
+    return sqlite3.OperationalError(f"{type(error).__name__}: {error}")
+
+
+def _settle(future: Future, result: Any, error: Exception | None) -> None:
+    # A future cancelled by its awaiting task can no longer take a result
+    if future.cancelled():
+        return
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
+
+
+class RemoteWriter(BatchWriter):
+    """BatchWriter that commits through a WriteServer in another process
+
+    The connection is opened on the first batch and reopened after it breaks.
+    A batch whose send failed is sent again on the new connection, since the
+    server only acts on complete messages; one whose reply was lost fails,
+    because it may already be committed.
+    """
+
+    def __init__(self, address: str):
+        self.address = address
+        self._client = None
+        self.connections = 0
+        super().__init__(db_file="")
+
+    def _open(self):
+        return None  # Connected lazily by _connected
+
+    def _connected(self):
+        if self._client is None:
+            for attempt in range(RECONNECT_ATTEMPTS):
+                try:
+                    self._client = Client(self.address, family="AF_UNIX")
+                    break
+                except OSError:
+                    if attempt == RECONNECT_ATTEMPTS - 1:
+                        raise
+                    time.sleep(RECONNECT_DELAY_SECONDS * 2 ** attempt)
+            self.connections += 1
+        return self._client
+
+    def _disconnect(self) -> None:
+        if self._client is not None:
+            try:
+                self._client.close()
+            except OSError:
+                pass
+            self._client = None
+
+    def _execute(self, conn, batch: list) -> list:
+        statements = [(sql, params, many) for sql, params, many, _ in batch]
+        try:
+            try:
+                self._connected().send(statements)
+            except OSError:
+                self._disconnect()
+                self._connected().send(statements)
+            outcomes = self._client.recv()
+        except (EOFError, OSError) as e:
+            self._disconnect()
+            error = sqlite3.OperationalError(f"Database writer unavailable: {e}")
+            return [(future, None, error) for *_, future in batch]
+        return [(future, rowcount, error) for (*_, future), (rowcount, error) in zip(batch, outcomes)]
+
+    def close(self) -> None:
+        super().close()
+        self._disconnect()
+
+
+class WriteServer:
+    """Accepts batches from RemoteWriters and commits them with a local BatchWriter"""
+
+    def __init__(self, writer: BatchWriter, address: str):
+        self.writer = writer
+        self.address = address
+        self._listener = Listener(address, family="AF_UNIX")
+        threading.Thread(target=self._accept, name="sqlite-write-server", daemon=True).start()
+
+    def close(self) -> None:
+        self._listener.close()
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(conn,), name="sqlite-write-client", daemon=True).start()
+
+    def _serve(self, conn) -> None:
+        with conn:
+            while True:
+                try:
+                    statements = conn.recv()
+                except (EOFError, OSError):
+                    return
+                futures = [self.writer.submit(sql, params, many) for sql, params, many in statements]
+                outcomes = []
+                for future in futures:
+                    try:
+                        outcomes.append((future.result(), None))
+                    except Exception as e:
+                        outcomes.append((None, _db_error(e)))
+                conn.send(outcomes)
+
+
+class Storage:
+    """Pooled reads and batched single-writer writes on one database"""
+
+    def __init__(self, db_file: str = DB_FILE, pool_size: int = READ_POOL_SIZE, writer_socket: str = WRITER_SOCKET):
+        self.db_file = db_file
+        self.pool_size = pool_size
+        self.readers = ConnectionPool(db_file, pool_size)
+        self.writer = RemoteWriter(writer_socket) if writer_socket else BatchWriter(db_file)
+        self._engine = None
+
+    def ensure_schema(self, *statements: str) -> None:
+        """Create tables/indexes synchronously (call at construction time)"""
+        for future in [self.writer.submit(sql) for sql in statements]:
+            future.result()
+
+    def query(self, sql: str, params: Any = ()) -> list[tuple]:
+        with span("storage"), db_seconds.time(operation="query"):
+            with self.readers.connection() as conn:
+                return conn.execute(sql, params).fetchall()
+
+    async def aquery(self, sql: str, params: Any = ()) -> list[tuple]:
+        return await asyncio.to_thread(self.query, sql, params)
+
+    def write_nowait(self, sql: str, params: Any = ()) -> Future:
+        return self.writer.submit(sql, params)
+
+    def write_many_nowait(self, sql: str, rows: Iterable[Any]) -> Future:
+        return self.writer.submit(sql, list(rows), many=True)
+
+    async def write(self, sql: str, params: Any = ()) -> int:
+        with span("storage"):
+            return await asyncio.wrap_future(self.writer.submit(sql, params))
+
+    def agno_db(self, **tables):
+        """An agno SqliteDb on this database, with pooled, tuned connections
+
+        agno commits through this engine itself, in every worker, not through
+        the writer thread. Its user memory reads and writes count as the
+        request's "memory" span.
+        """
+        return _memory_traced_sqlite_db()(db_engine=self._sqlalchemy_engine(), auto_upgrade_db=True, **tables)
+
+    def _sqlalchemy_engine(self):
+        if self._engine is None:
+            from sqlalchemy import create_engine, event
+
+            self._engine = create_engine(
+                f"sqlite:///{self.db_file}",
+                pool_size=self.pool_size,
+                max_overflow=0,
+                connect_args={"check_same_thread": False, "timeout": 5.0},
+            )
+            event.listen(self._engine, "connect", lambda conn, _: apply_pragmas(conn))
+        return self._engine
+
+
+# agno SqliteDb methods that read or write user memories
+_MEMORY_METHODS = (
+    "get_user_memory",
+    "get_user_memories",
+    "upsert_user_memory",
+    "delete_user_memory",
+    "delete_user_memories",
+)
+
+
+@lru_cache(maxsize=None)
+def _memory_traced_sqlite_db() -> type:
+    from agno.db import SqliteDb
+
+    def traced(name: str):
+        method = getattr(SqliteDb, name)
+
+        @wraps(method)
+        def call(self, *args, **kwargs):
+            with span("memory"):
+                return method(self, *args, **kwargs)
+        return call
+
+    return type("SqliteDb", (SqliteDb,), {
+        "__module__": __name__,
+        **{name: traced(name) for name in _MEMORY_METHODS if hasattr(SqliteDb, name)},
+    })
+
+
+_storage: Storage | None = None
+_storage_lock = threading.Lock()
+
+
+def get_storage() -> Storage:
+    """The process-wide storage backend"""
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            _storage = Storage()
+        return _storage
+
+
+def migrate(sources: Iterable[str], target: str = DB_FILE) -> dict[str, int]:
+    """Merge tables from legacy database files into the shared database
+
+    Tables are created in the target when missing and rows are copied with
+    INSERT OR IGNORE, so re-running is safe for keyed tables. Source files
+    are left untouched.
+    """
+    copied: dict[str, int] = {}
+    conn = connect(target)
+
+    for source in sources:
+        if not Path(source).exists() or Path(source).resolve() == Path(target).resolve():
+            continue
+        conn.execute("ATTACH DATABASE ? AS legacy", (source,))
+        try:
+            objects = conn.execute(
+                "SELECT type, name, sql FROM legacy.sqlite_master "
+                "WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' ORDER BY type DESC"
+            ).fetchall()
+            existing = {row[0] for row in conn.execute("SELECT name FROM main.sqlite_master")}
+
+            with conn:
+                for kind, name, sql in objects:
+                    if kind == "table":
+                        if name not in existing:
+                            conn.execute(sql)
+                        target_columns = {row[1] for row in conn.execute(f'PRAGMA main.table_info("{name}")')}
+                        columns = [
+                            row[1] for row in conn.execute(f'PRAGMA legacy.table_info("{name}")')
+                            if row[1] in target_columns
+                        ]
+                        column_list = ", ".join(f'"{column}"' for column in columns)
+                        cursor = conn.execute(
+                            f'INSERT OR IGNORE INTO main."{name}" ({column_list}) '
+                            f'SELECT {column_list} FROM legacy."{name}"'
+                        )
+                        copied[f"{source}:{name}"] = cursor.rowcount
+                    elif kind == "index" and name not in existing:
+                        conn.execute(sql)
+        finally:
+            conn.execute("DETACH DATABASE legacy")
+
+    conn.close()
+    return copied
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Shared SQLite storage maintenance")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = subcommands.add_parser("migrate", help="Merge legacy database files")
+    migrate_parser.add_argument("sources", nargs="*", default=list(LEGACY_DB_FILES))
+    migrate_parser.add_argument("--target", default=DB_FILE)
+    args = parser.parse_args()
+
+    for table, rows in migrate(args.sources, args.target).items():
+        print(f"{table}: {rows} rows")
+
+
+if __name__ == "__main__":
+    main()
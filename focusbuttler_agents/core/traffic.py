@@ -0,0 +1,292 @@
+"""
+Traffic Recording
+
+Captures anonymised traces of real traffic so its load shape can be replayed
+later (see benchmarks/replay.py). When TRAFFIC_RECORD_FILE is set, a sample
+of API requests (TRAFFIC_RECORD_SAMPLE) is written to a gzipped JSON-lines
+trace, one line per request. Each line holds the arrival time, method, route
+and path, query and body, status and duration, and every model invocation
+the request made: agent, model, latency and, for streams, time to first
+token. Invocations are noted by the model itself (see core.models), so an
+agent run that calls the model several times, such as for tool calls, is
+recorded as several calls.
+
+Values are anonymised before they are buffered:
+- User and session ids become stable pseudonyms. These are keys ending in
+  `user_id` or `session_id` in either case, and `{session_id}` path segments.
+- In free text, a small allow-list of task-type and category words (energy
+  levels, task types, focus modes, ...) is kept and every other word becomes
+  a keyed hash. Equal inputs stay equal, so caching and coalescing behave as
+  recorded, and lengths survive.
+- Numbers, booleans, timestamps and enum values such as energy levels, task
+  types and modes are kept.
+
+The hash key is TRAFFIC_RECORD_SALT. If it is unset, a random key is made
+when the app is imported; the multi-worker supervisor makes one and passes
+it to every worker.
+Bodies over TRAFFIC_RECORD_MAX_BODY_BYTES are not read, so streaming uploads
+keep streaming, and only their size is recorded. Lines are appended from a
+thread every TRAFFIC_RECORD_FLUSH_SECONDS. In multi-worker mode each worker
+writes its own file (`trace.w1.jsonl.gz`, ...).
+
+A replayed request carries its recorded model latencies in the REPLAY_HEADER
+header. With the fake model, `replay_latency` hands them to its invocations
+of each model in order, one recorded invocation each.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Optional
+
+
+RECORD_FILE = os.getenv("TRAFFIC_RECORD_FILE", "")
+SAMPLE = float(os.getenv("TRAFFIC_RECORD_SAMPLE", "1"))
+MAX_BODY_BYTES = int(os.getenv("TRAFFIC_RECORD_MAX_BODY_BYTES", str(64 * 1024)))
+FLUSH_SECONDS = float(os.getenv("TRAFFIC_RECORD_FLUSH_SECONDS", "5"))
+SALT = os.getenv("TRAFFIC_RECORD_SALT", "").encode() or os.urandom(16)
+REPLAY_HEADER = "x-replay-model-ms"
+TRACE_VERSION = 1
+
+# Task-type and category words; every other word is hashed
+_KEEP_VALUES = frozenset(
+    "exhausted low moderate high peak purposeful necessary distracting unnecessary "
+    "creative rest hyperfocus scatterfocus morning afternoon evening session_start "
+    "session_end distraction energy".split()
+)
+_TIMESTAMP = re.compile(r"^\d{4}-\d{2}-\d{2}([T ][\d:.]+)?(Z|[+-]\d{2}:?\d{2})?$")
+_WORD = re.compile(r"[^\W_]+")
+_MAX_KEPT_DIGITS = 4
+
+_model_calls: ContextVar[Optional[list]] = ContextVar("hyperfocus_model_calls", default=None)
+_replay: ContextVar[Optional[dict]] = ContextVar("hyperfocus_replay", default=None)
+
+
+def record_model_call(agent: str, model: str, seconds: float, first_token_seconds: Optional[float], status: str) -> None:
+    """Note a model invocation on the request being recorded, if any"""
+    calls = _model_calls.get()
+    if calls is not None:
+        first = None if first_token_seconds is None else round(first_token_seconds * 1000, 1)
+        calls.append([agent, model, round(seconds * 1000, 1), first, status])
+
+
+def use_replay_latencies(header: str) -> None:
+    """Queue the recorded model latencies of a replayed request (REPLAY_HEADER value)"""
+    try:
+        calls = json.loads(header)
+    except ValueError:
+        return
+    queues: dict[str, list] = {}
+    for call in calls:
+        queues.setdefault(call[1], []).append((call[2] / 1000, None if call[3] is None else call[3] / 1000))
+    _replay.set(queues)
+
+
+def replay_latency(model: str) -> Optional[tuple[float, Optional[float]]]:
+    """(seconds, first-token seconds) of the next recorded call to `model`, if replaying"""
+    queues = _replay.get()
+    if queues and queues.get(model):
+        return queues[model].pop(0)
+    return None
+
+
+class Anonymizer:
+    """Keyed, deterministic pseudonyms for ids and free text"""
+
+    def __init__(self, salt: bytes = SALT):
+        self.salt = salt
+
+    def _digest(self, kind: str, value: str) -> str:
+        return hashlib.blake2b(f"{kind}\x00{value}".encode(), key=self.salt[:64], digest_size=6).hexdigest()
+
+    def identifier(self, kind: str, value: str) -> str:
+        return f"{kind[0]}-{self._digest(kind, value)}"
+
+    def value(self, key: str, value: Any) -> Any:
+        """Anonymise a value found under `key` (JSON body field or query parameter)"""
+        if isinstance(value, dict):
+            return {k: self.value(k, v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.value(key, v) for v in value]
+        if not isinstance(value, str):
+            return value
+        normalized = key.lower().replace("_", "")
+        if normalized.endswith("userid"):
+            return self.identifier("user", value)
+        if normalized.endswith("sessionid"):
+            return self.identifier("session", value)
+        return self.text(value)
+
+    def text(self, text: str) -> str:
+        if text.lower() in _KEEP_VALUES or _TIMESTAMP.match(text):
+            return text
+        return _WORD.sub(lambda m: self._word(m.group()), text)
+
+    def _word(self, word: str) -> str:
+        lower = word.lower()
+        if lower.isdigit():
+            return word if len(lower) <= _MAX_KEPT_DIGITS else "9" * len(lower)
+        if lower in _KEEP_VALUES:
+            return word
+        return "x" + self._digest("word", lower)
+
+
+class TrafficRecorder:
+    """Buffers anonymised request records and appends them to the trace file"""
+
+    def __init__(self, path: str = RECORD_FILE, sample: float = SAMPLE):
+        self.path = path
+        self.sample = sample
+        self.anonymizer = Anonymizer()
+        self._buffer: list[str] = []
+        self._lock = threading.Lock()
+        self._flush_task: asyncio.Task | None = None
+        self._rng = random.Random()
+        self.recorded = 0
+        self.flushes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def sampled(self) -> bool:
+        """Whether to record the request that is starting"""
+        return self.enabled and self._rng.random() < self.sample
+
+    def begin(self) -> list:
+        """Collect this request's model invocations; returns the list they are appended to"""
+        calls: list = []
+        _model_calls.set(calls)
+        return calls
+
+    def record(
+        self,
+        *,
+        arrived: float,
+        method: str,
+        route: str,
+        path_params: dict,
+        query: list[tuple[str, str]],
+        content_type: str,
+        body: Optional[bytes],
+        body_bytes: int,
+        status: int,
+        seconds: float,
+        calls: list,
+    ) -> None:
+        anonymize = self.anonymizer
+        params = {k: anonymize.value(k, str(v)) for k, v in path_params.items()}
+        record = {
+            "ts": round(arrived, 3),
+            "method": method,
+            "route": route,
+            "path": _fill(route, params),
+            "query": [[k, anonymize.value(k, v)] for k, v in query],
+            "status": status,
+            "ms": round(seconds * 1000, 1),
+            "llm": calls,
+        }
+        if body_bytes:
+            record["body_bytes"] = body_bytes
+            if body is not None:
+                record.update(_body(anonymize, content_type, body))
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._buffer.append(line)
+            self.recorded += 1
+
+    def flush(self) -> int:
+        """Append buffered records to this process's trace file; returns the count"""
+        with self._lock:
+            lines, self._buffer = self._buffer, []
+        if not lines:
+            return 0
+        path = self.file()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        new = not path.exists()
+        # Each flush is a complete gzip member; gzip readers concatenate them
+        with gzip.open(path, "at") as f:
+            if new:
+                f.write(json.dumps({"version": TRACE_VERSION, "sample": self.sample}) + "\n")
+            f.writelines(lines)
+        self.flushes += 1
+        return len(lines)
+
+    def file(self) -> Path:
+        from .workers import worker_count, worker_index
+
+        path = Path(self.path)
+        if worker_count() > 1:
+            stem = path.name.split(".")[0]
+            path = path.with_name(f"{stem}.w{worker_index()}{path.name[len(stem):]}")
+        return path
+
+    async def start(self) -> None:
+        if self.enabled and self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        if self.enabled:
+            await asyncio.to_thread(self.flush)
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(FLUSH_SECONDS)
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                print(f"Traffic trace flush failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "file": str(self.file()) if self.enabled else None,
+            "sample": self.sample,
+            "recorded": self.recorded,
+            "buffered": len(self._buffer),
+            "flushes": self.flushes,
+        }
+
+
+def _fill(route: str, params: dict) -> str:
+    """The route template with (anonymised) path parameters filled in"""
+    return re.sub(r"\{(\w+)(?::\w+)?\}", lambda m: str(params.get(m.group(1), m.group(0))), route)
+
+
+def _body(anonymize: Anonymizer, content_type: str, body: bytes) -> dict:
+    try:
+        if "ndjson" in content_type:
+            lines = [json.loads(line) for line in body.splitlines() if line.strip()]
+            return {"ndjson": [anonymize.value("", line) for line in lines]}
+        if "json" in content_type:
+            return {"json": anonymize.value("", json.loads(body))}
+    except ValueError:
+        pass
+    return {}
+
+
+# Process-wide recorder (inactive unless TRAFFIC_RECORD_FILE is set)
+traffic_recorder = TrafficRecorder()
+
+
+def read_trace(paths: list[str]) -> list[dict]:
+    """Records from one or more trace files, ordered by arrival"""
+    records = []
+    for path in paths:
+        with gzip.open(path, "rt") as f:
+            for line in f:
+                record = json.loads(line)
+                if "version" not in record:
+                    records.append(record)
+    records.sort(key=lambda record: record["ts"])
+    return records
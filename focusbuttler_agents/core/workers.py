@@ -0,0 +1,233 @@
+"""
+Multi-Worker Serving
+
+Runs the service as several uvicorn workers on one listening socket, so a
+container can use more than one core. Per-process state and the SQLite
+database stay safe this way:
+
+- The supervisor does not import the app. It opens the sockets, runs the
+  database writer and starts each worker as a fresh interpreter
+  (`python -m core.workers --worker N`) that inherits the sockets. Workers
+  are never forked from the supervisor, whose writer threads could hold a
+  lock at the moment of the fork and leave it held forever in the child.
+  Each worker imports the app itself; the memory-mapped BM25 index and the
+  SQLite file are still shared through the page cache.
+- The service's SQLite writes from every worker go to the one writer thread
+  in the supervisor (see RemoteWriter in core.storage). agno's session and
+  memory tables are the exception: each worker's agno SqliteDb commits them
+  directly, and SQLite's lock and busy timeout serialise those commits with
+  the supervisor's. Reads go straight to the WAL database, which is
+  memory-mapped, so the page cache is shared. Caches with a SQLite tier,
+  like categorizations, the message pool and energy data, are therefore
+  shared between workers.
+- Worker 0 is the leader. It alone runs the jobs that must run once: memory
+  consolidation, rebuilding the energy table, event compaction, and the focus
+  session scheduler. Other workers forward `/v1/sessions/...` requests to
+  the leader over a private Unix socket.
+- Each worker gets an equal share of every model's LLM budget (rounded
+  down, at least one call).
+
+A worker that dies is restarted. SIGTERM or SIGINT stops all workers
+gracefully.
+
+Usage:
+    python -m core.workers --workers 4 --port 7777
+"""
+
+import argparse
+import importlib
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from .storage import WriteServer, get_storage
+
+
+WORKERS = int(os.getenv("HYPERFOCUS_WORKERS", "1"))
+# Routes whose state lives in the leader's process
+LEADER_ROUTES = ("/v1/sessions/",)
+FORWARD_TIMEOUT_SECONDS = 30.0
+RESTART_DELAY_SECONDS = 1.0
+POLL_SECONDS = 0.2
+
+# Set by the supervisor in each worker's environment
+_worker_count = int(os.getenv("HYPERFOCUS_WORKER_COUNT", "1"))
+_worker_index = int(os.getenv("HYPERFOCUS_WORKER_INDEX", "0"))
+_leader_address: str | None = os.getenv("HYPERFOCUS_LEADER_SOCKET") or None
+_leader_client = None
+
+
+def worker_count() -> int:
+    """Number of serving processes (1 unless started through serve())"""
+    return _worker_count
+
+
+def worker_index() -> int:
+    """This process's worker number (0 is the leader)"""
+    return _worker_index
+
+
+def is_leader() -> bool:
+    """Whether this process runs the once-per-deployment background jobs"""
+    return _worker_index == 0
+
+
+def owned_by_leader(path: str) -> bool:
+    """Whether a request must be handled by the leader rather than this worker"""
+    return _worker_count > 1 and not is_leader() and path.startswith(LEADER_ROUTES)
+
+
+async def forward_to_leader(request):
+    """Replay a request against the leader's private socket
+
+    Event streams (focus sessions) are relayed as they arrive.
+    """
+    import httpx
+    from starlette.background import BackgroundTask
+    from starlette.responses import Response, StreamingResponse
+
+    global _leader_client
+    if _leader_client is None:
+        _leader_client = httpx.AsyncClient(
+            transport=httpx.AsyncHTTPTransport(uds=_leader_address),
+            base_url="http://leader",
+            timeout=FORWARD_TIMEOUT_SECONDS,
+        )
+    upstream = _leader_client.build_request(
+        request.method,
+        request.url.path,
+        params=request.query_params,
+        content=await request.body(),
+        headers={k: v for k, v in request.headers.items() if k.lower() not in ("host", "content-length")},
+    )
+    response = await _leader_client.send(upstream, stream=True)
+    media_type = response.headers.get("content-type")
+    if media_type and media_type.startswith("text/event-stream"):
+        return StreamingResponse(
+            response.aiter_raw(),
+            status_code=response.status_code,
+            media_type=media_type,
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            background=BackgroundTask(response.aclose),
+        )
+    try:
+        content = await response.aread()
+    finally:
+        await response.aclose()
+    return Response(content, status_code=response.status_code, media_type=media_type)
+
+
+def serve(app_path: str = "main:app", workers: int = WORKERS, host: str = "0.0.0.0", port: int = 7777) -> None:
+    """Start `workers` servers on a shared socket and supervise them"""
+    count = max(1, workers)
+    runtime = Path(tempfile.mkdtemp(prefix="hyperfocus-workers-"))
+    storage = get_storage()
+    write_server = WriteServer(storage.writer, str(runtime / "writer.sock"))
+
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, port))
+    listener.listen(2048)
+    leader_address = str(runtime / "leader.sock")
+    leader = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    leader.bind(leader_address)
+    leader.listen(256)
+
+    env = {
+        **os.environ,
+        "HYPERFOCUS_WORKER_COUNT": str(count),
+        "HYPERFOCUS_WRITER_SOCKET": write_server.address,
+        "HYPERFOCUS_LEADER_SOCKET": leader_address,
+    }
+    # Workers must pseudonymise recorded traffic with the same key
+    env.setdefault("TRAFFIC_RECORD_SALT", os.urandom(16).hex())
+
+    children: dict[int, subprocess.Popen] = {}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for child in children.values():
+            if child.poll() is None:
+                child.send_signal(signal.SIGTERM)
+
+    def spawn(index: int) -> None:
+        fds = [listener.fileno(), leader.fileno()] if index == 0 else [listener.fileno()]
+        children[index] = subprocess.Popen(
+            [sys.executable, "-m", "core.workers", "--app", app_path, "--worker", str(index),
+             "--fds", ",".join(map(str, fds))],
+            env={**env, "HYPERFOCUS_WORKER_INDEX": str(index)},
+            pass_fds=fds,
+        )
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    print(f"Serving {app_path} on {host}:{port} with {count} workers")
+    for index in range(count):
+        spawn(index)
+
+    while children:
+        time.sleep(POLL_SECONDS)
+        for index, child in list(children.items()):
+            if child.poll() is None:
+                continue
+            del children[index]
+            if not stopping:
+                print(f"Worker {index} (pid {child.pid}) exited with status {child.returncode}; restarting")
+                time.sleep(RESTART_DELAY_SECONDS)
+                spawn(index)
+
+    write_server.close()
+    storage.writer.close()
+    shutil.rmtree(runtime, ignore_errors=True)
+
+
+def _run_worker(app_path: str, index: int, fds: list[int]) -> None:
+    """Serve the app on the sockets inherited from the supervisor"""
+    import asyncio
+
+    import uvicorn
+
+    module, _, attr = app_path.partition(":")
+    app = getattr(importlib.import_module(module), attr)
+    sockets = [socket.socket(fileno=fd) for fd in fds]
+
+    code = 0
+    try:
+        server = uvicorn.Server(uvicorn.Config(app, log_level=os.getenv("LOG_LEVEL", "warning")))
+        asyncio.run(server.serve(sockets=sockets))
+    except BaseException as e:
+        print(f"Worker {index} failed: {e}", file=sys.stderr)
+        code = 1
+    finally:
+        get_storage().writer.close()
+    sys.exit(code)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve the app with several workers")
+    parser.add_argument("--app", default="main:app")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "7777")))
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--fds", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    # Through the package module, so the app reads the same worker state
+    from core import workers
+
+    if args.worker is not None:
+        workers._run_worker(args.app, args.worker, [int(fd) for fd in args.fds.split(",")])
+    else:
+        workers.serve(args.app, args.workers, args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
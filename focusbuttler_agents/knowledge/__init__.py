@@ -2,14 +2,24 @@
 
 from .productivity_kb import (
     create_hyperfocus_kb,
+    get_hyperfocus_kb,
     load_hyperfocus_concepts,
     get_concept,
     HYPERFOCUS_CONCEPTS,
 )
+from .ingest import ingest, IngestReport
+from .bm25_index import BM25Index, get_index, rebuild_index, hybrid_search
 
 __all__ = [
     "create_hyperfocus_kb",
+    "get_hyperfocus_kb",
     "load_hyperfocus_concepts",
     "get_concept",
     "HYPERFOCUS_CONCEPTS",
+    "ingest",
+    "IngestReport",
+    "BM25Index",
+    "get_index",
+    "rebuild_index",
+    "hybrid_search",
 ]
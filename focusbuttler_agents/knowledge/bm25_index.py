@@ -0,0 +1,290 @@
+"""
+BM25 Retrieval Index
+
+In-process lexical retrieval over the fallback HYPERFOCUS_CONCEPTS and the
+extracted book chunks. The inverted index is serialised to a compact binary
+file whose postings and documents are memory-mapped, so loading is cheap
+and queries run in well under a millisecond without LanceDb or an embedder.
+It also acts as a pre-filter / hybrid re-ranker in front of the vector
+search.
+
+Usage:
+    python -m knowledge.bm25_index build
+    python -m knowledge.bm25_index search "how do I stop checking email"
+"""
+
+import argparse
+import heapq
+import json
+import math
+import mmap
+import re
+import struct
+from collections import Counter
+from pathlib import Path
+
+
+INDEX_PATH = Path("./hyperfocus_kb/bm25.idx")
+MAGIC = b"BM25v2\x00\x00"
+K1 = 1.2
+B = 0.75
+RRF_K = 60
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by do does for from has have how i if in into is it its "
+    "me my no not of on or so that the their them then there these they this to was we "
+    "what when where which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase word tokens without stopwords, with plural 's' stripped"""
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        if token in _STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    """Inverted index with BM25 scoring over a memory-mapped file
+
+    File layout: magic, header length (uint32), JSON header (document ids,
+    term -> [offset, count]), padding to 8 bytes, then the sections: document
+    offsets (uint64, one more than there are documents), document lengths
+    (uint32), postings as pairs of uint32 (document number, term frequency)
+    and the documents as concatenated JSON. Documents are decoded only when
+    a search returns them, so loading does not parse the corpus.
+    """
+
+    def __init__(self, header: dict, mapped: mmap.mmap | memoryview, start: int):
+        self.ids: list[str] = header["ids"]
+        self.terms: dict[str, list[int]] = header["terms"]
+        count = len(self.ids)
+        view = memoryview(mapped)
+        self._offsets = view[start:start + 8 * (count + 1)].cast("Q")
+        start += 8 * (count + 1)
+        self.lengths = view[start:start + 4 * count].cast("I")
+        start += 4 * count
+        self._postings = view[start:start + 4 * header["postings"]].cast("I")
+        self._documents = view[start + 4 * header["postings"]:]
+        self._mapped = mapped
+        self.average_length = sum(self.lengths) / count if count else 0.0
+        self._numbers = {doc_id: number for number, doc_id in enumerate(self.ids)}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @staticmethod
+    def write(documents: list[dict], path: Path = INDEX_PATH) -> None:
+        """Build the index for documents ({"id", "title", "text", ...}) and save it"""
+        postings: dict[str, list[tuple[int, int]]] = {}
+        lengths = []
+        for number, doc in enumerate(documents):
+            tokens = tokenize(f"{doc.get('title', '')} {doc['text']}")
+            lengths.append(len(tokens))
+            for term, frequency in Counter(tokens).items():
+                postings.setdefault(term, []).append((number, frequency))
+
+        terms = {}
+        blob = bytearray()
+        for term in sorted(postings):
+            entries = postings[term]
+            terms[term] = [len(blob) // 4, len(entries)]
+            for number, frequency in entries:
+                blob += struct.pack("<II", number, frequency)
+
+        encoded = [json.dumps(doc, separators=(",", ":")).encode() for doc in documents]
+        offsets = [0]
+        for document in encoded:
+            offsets.append(offsets[-1] + len(document))
+
+        header = json.dumps(
+            {"ids": [doc["id"] for doc in documents], "terms": terms, "postings": len(blob) // 4},
+            separators=(",", ":"),
+        ).encode()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_suffix(".tmp")
+        with open(temporary, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<I", len(header)))
+            f.write(header)
+            f.write(b"\x00" * (-f.tell() % 8))  # align the sections for their typed views
+            f.write(struct.pack(f"<{len(offsets)}Q", *offsets))
+            f.write(struct.pack(f"<{len(lengths)}I", *lengths))
+            f.write(blob)
+            f.writelines(encoded)
+        temporary.replace(path)
+
+    @classmethod
+    def load(cls, path: Path = INDEX_PATH) -> "BM25Index":
+        """Memory-map an index file written by `write`"""
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if mapped[:len(MAGIC)] != MAGIC:
+            mapped.close()
+            raise ValueError(f"{path} is not a {MAGIC[:6].decode()} index")
+        header_length = struct.unpack_from("<I", mapped, len(MAGIC))[0]
+        header_start = len(MAGIC) + 4
+        header = json.loads(mapped[header_start:header_start + header_length])
+        start = header_start + header_length
+        return cls(header, mapped, start + -start % 8)
+
+    def document(self, number: int) -> dict:
+        return json.loads(bytes(self._documents[self._offsets[number]:self._offsets[number + 1]]))
+
+    def search(self, query: str, limit: int = 5) -> list[tuple[dict, float]]:
+        """Top documents for a query as (document, score) pairs"""
+        scores: dict[int, float] = {}
+        total = len(self.ids)
+
+        for term in set(tokenize(query)):
+            entry = self.terms.get(term)
+            if entry is None:
+                continue
+            offset, count = entry
+            idf = math.log(1 + (total - count + 0.5) / (count + 0.5))
+            for position in range(offset, offset + 2 * count, 2):
+                number = self._postings[position]
+                frequency = self._postings[position + 1]
+                norm = K1 * (1 - B + B * self.lengths[number] / self.average_length)
+                scores[number] = scores.get(number, 0.0) + idf * frequency * (K1 + 1) / (frequency + norm)
+
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [(self.document(number), score) for number, score in best]
+
+    def get(self, doc_id: str) -> dict | None:
+        number = self._numbers.get(doc_id)
+        return self.document(number) if number is not None else None
+
+
+def collect_documents(include_book: bool = True) -> list[dict]:
+    """Fallback concepts plus (optionally) the extracted book and source chunks"""
+    from .ingest import discover_sources, extract_chunks
+    from .productivity_kb import BOOK_PATH, HYPERFOCUS_CONCEPTS, SOURCES_DIR
+
+    documents = [
+        {
+            "id": f"concept:{name}",
+            "title": name.replace("_", " "),
+            "text": text.strip(),
+            "source": "concept",
+            "chunk": name,
+        }
+        for name, text in HYPERFOCUS_CONCEPTS.items()
+    ]
+    if include_book:
+        sources = discover_sources([BOOK_PATH, SOURCES_DIR])
+        for source, chunks in extract_chunks(sources).items():
+            documents += [
+                {
+                    "id": chunk.doc_id,
+                    "title": f"{Path(source).stem} {chunk.position}",
+                    "text": chunk.text,
+                    "source": chunk.source,
+                    "chunk": chunk.key,
+                }
+                for chunk in chunks
+            ]
+    return documents
+
+
+_index: BM25Index | None = None
+
+
+def get_index() -> BM25Index:
+    """The shared index, loaded from disk or built from the concepts on first use"""
+    global _index
+    if _index is None:
+        if not INDEX_PATH.exists():
+            BM25Index.write(collect_documents(include_book=False))
+        try:
+            _index = BM25Index.load()
+        except ValueError as e:
+            print(f"{e}; rebuilding from the concepts (run `python -m knowledge.bm25_index build` for the book)")
+            BM25Index.write(collect_documents(include_book=False))
+            _index = BM25Index.load()
+    return _index
+
+
+def rebuild_index(include_book: bool = True) -> BM25Index:
+    """Rebuild the index file (e.g. after ingestion changed the sources)"""
+    global _index
+    BM25Index.write(collect_documents(include_book))
+    _index = BM25Index.load()
+    return _index
+
+
+def hybrid_search(query: str, kb=None, limit: int = 5, candidates: int = 20) -> list[dict]:
+    """Lexical search, fused with vector search when a knowledge base is given
+
+    Results are merged with reciprocal rank fusion, so documents that both
+    retrievers agree on rank first. A document is matched across the two by
+    its source and chunk key, which ingestion stores in each row's metadata.
+    The vector search embeds the query, so this blocks; call it from a thread.
+    """
+    lexical = get_index().search(query, candidates)
+    if kb is None:
+        return [doc for doc, _ in lexical[:limit]]
+
+    try:
+        vector = kb.search(query=query, max_results=candidates)
+    except Exception as e:
+        print(f"Vector search failed, using lexical results: {e}")
+        return [doc for doc, _ in lexical[:limit]]
+
+    fused: dict[str, float] = {}
+    documents: dict[str, dict] = {}
+    for rank, (doc, _) in enumerate(lexical):
+        key = _fusion_key(doc, doc["id"])
+        fused[key] = fused.get(key, 0.0) + 1 / (RRF_K + rank + 1)
+        documents[key] = doc
+    for rank, result in enumerate(vector):
+        meta_data = result.meta_data or {}
+        doc_id = result.id or result.content[:64]
+        key = _fusion_key(meta_data, doc_id)
+        fused[key] = fused.get(key, 0.0) + 1 / (RRF_K + rank + 1)
+        documents.setdefault(key, {
+            "id": doc_id,
+            "title": result.name or "",
+            "text": result.content,
+            "source": meta_data.get("source"),
+            "chunk": meta_data.get("chunk"),
+        })
+
+    best = heapq.nlargest(limit, fused.items(), key=lambda item: item[1])
+    return [documents[key] for key, _ in best]
+
+
+def _fusion_key(fields: dict, fallback: str) -> str:
+    """Source and chunk key, shared by the lexical documents and the vector rows"""
+    if fields.get("source") and fields.get("chunk"):
+        return f"{fields['source']}#{fields['chunk']}"
+    return fallback
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build or query the BM25 knowledge index")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    build = subcommands.add_parser("build")
+    build.add_argument("--concepts-only", action="store_true")
+    search = subcommands.add_parser("search")
+    search.add_argument("query")
+    search.add_argument("--limit", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        index = rebuild_index(include_book=not args.concepts_only)
+        print(f"Indexed {len(index)} documents, {len(index.terms)} terms -> {INDEX_PATH}")
+        return
+
+    for doc, score in get_index().search(args.query, args.limit):
+        print(f"{score:6.2f}  {doc['title']}: {doc['text'][:80]!r}")
+
+
+if __name__ == "__main__":
+    main()
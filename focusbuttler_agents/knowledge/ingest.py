@@ -0,0 +1,278 @@
+"""
+Incremental Knowledge Ingestion
+
+Content-hashed ingestion of the Hyperfocus book (and any other PDF or
+markdown sources) into the knowledge base. A manifest records a hash per
+source file and per chunk (a PDF page or a markdown section), so unchanged
+files are skipped, changed chunks are re-embedded and stale rows deleted.
+A chunk is identified by its content, not its position: inserting a page or
+section embeds just that chunk, and the ones after it keep their rows. The
+position ("p12", "s3") is kept as metadata only. The vector store derives
+its own row ids, so rows are found for deletion by the metadata every chunk
+is stored with (source, chunk key and sha256).
+PDF pages are extracted in parallel in a process pool; each worker process
+opens a PDF once and reuses it for every page range it is given.
+
+Usage:
+    python -m knowledge.ingest [PATH ...]
+"""
+
+import argparse
+import functools
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+
+MANIFEST_PATH = Path("./hyperfocus_kb/manifest.json")
+# Bumped when chunk identity changes; older manifests re-ingest every file once
+MANIFEST_VERSION = 2
+SUPPORTED_SUFFIXES = {".pdf", ".md", ".markdown"}
+PAGES_PER_TASK = 16
+
+
+@dataclass
+class Chunk:
+    """One unit of embedded content"""
+    source: str
+    position: str  # "p12" for a PDF page, "s3" for a markdown section
+    text: str
+    occurrence: int = 0  # Earlier chunks in the source with the same text
+
+    @property
+    def content_hash(self) -> str:
+        return hashlib.sha256(self.text.encode()).hexdigest()
+
+    @property
+    def key(self) -> str:
+        """Identity within the source: the content hash, numbered for repeated text"""
+        key = self.content_hash[:16]
+        return f"{key}.{self.occurrence}" if self.occurrence else key
+
+    @property
+    def doc_id(self) -> str:
+        return hashlib.sha256(f"{self.source}:{self.key}".encode()).hexdigest()[:32]
+
+    @property
+    def meta_data(self) -> dict:
+        """Stored with the row; source, chunk and sha256 identify it for deletion"""
+        return {"source": self.source, "chunk": self.key, "sha256": self.content_hash, "position": self.position}
+
+
+@dataclass
+class IngestReport:
+    """What an ingestion run changed"""
+    files_skipped: int = 0
+    files_ingested: int = 0
+    files_removed: int = 0
+    chunks_added: int = 0
+    chunks_unchanged: int = 0
+    chunks_deleted: int = 0
+    chunks_not_found: int = 0  # Stale chunks with no row left to delete
+    errors: list[str] = field(default_factory=list)
+
+
+def file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def discover_sources(paths: list[Path]) -> list[Path]:
+    """Expand directories into the supported files they contain"""
+    sources = []
+    for path in paths:
+        if path.is_dir():
+            sources += sorted(
+                p for p in path.rglob("*") if p.suffix.lower() in SUPPORTED_SUFFIXES
+            )
+        elif path.exists() and path.suffix.lower() in SUPPORTED_SUFFIXES:
+            sources.append(path)
+    return sources
+
+
+@functools.lru_cache(maxsize=4)
+def _pdf_reader(path: str):
+    """One parsed PDF per worker process, shared by the page ranges it extracts"""
+    from pypdf import PdfReader
+
+    return PdfReader(path)
+
+
+def _extract_pdf_pages(path: str, page_numbers: list[int]) -> list[tuple[int, str]]:
+    """Worker: extract text for a range of pages from one PDF"""
+    reader = _pdf_reader(path)
+    return [(number, reader.pages[number].extract_text() or "") for number in page_numbers]
+
+
+def _delete_rows(kb, meta_data: dict, report: IngestReport) -> None:
+    """Delete the rows matching `meta_data`, counting them as deleted or not found"""
+    if kb.vector_db.delete_by_metadata(meta_data):
+        report.chunks_deleted += 1
+    else:
+        report.chunks_not_found += 1
+
+
+def _split_markdown(text: str) -> list[str]:
+    """Split markdown into sections at headings"""
+    sections = re.split(r"(?m)^(?=#{1,6}\s)", text)
+    return [section.strip() for section in sections if section.strip()]
+
+
+def _numbered(chunks: list[Chunk]) -> list[Chunk]:
+    """Number repeated texts within a source so every chunk key is unique"""
+    seen: dict[str, int] = {}
+    for chunk in chunks:
+        chunk.occurrence = seen.get(chunk.content_hash, 0)
+        seen[chunk.content_hash] = chunk.occurrence + 1
+    return chunks
+
+
+def extract_chunks(sources: list[Path], max_workers: int | None = None) -> dict[str, list[Chunk]]:
+    """Extract chunks for every source; PDF pages are read in a process pool"""
+    from pypdf import PdfReader
+
+    chunks: dict[str, list[Chunk]] = {str(path): [] for path in sources}
+    pdf_jobs = []
+
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+        for path in sources:
+            if path.suffix.lower() == ".pdf":
+                page_count = len(PdfReader(path).pages)
+                for start in range(0, page_count, PAGES_PER_TASK):
+                    pages = list(range(start, min(start + PAGES_PER_TASK, page_count)))
+                    pdf_jobs.append((str(path), pool.submit(_extract_pdf_pages, str(path), pages)))
+            else:
+                sections = _split_markdown(path.read_text(encoding="utf-8"))
+                chunks[str(path)] = [
+                    Chunk(str(path), f"s{number}", section)
+                    for number, section in enumerate(sections, start=1)
+                ]
+
+        for source, job in pdf_jobs:
+            chunks[source] += [
+                Chunk(source, f"p{number + 1}", text)
+                for number, text in job.result()
+                if text.strip()
+            ]
+
+    return {source: _numbered(source_chunks) for source, source_chunks in chunks.items()}
+
+
+def load_manifest(path: Path = MANIFEST_PATH) -> dict:
+    if not path.exists():
+        return {"version": MANIFEST_VERSION, "files": {}}
+    return json.loads(path.read_text())
+
+
+def save_manifest(manifest: dict, path: Path = MANIFEST_PATH) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_suffix(".tmp")
+    temporary.write_text(json.dumps(manifest, indent=1))
+    temporary.replace(path)
+
+
+def ingest(
+    kb,
+    paths: list[Path],
+    prune: bool = True,
+    manifest_path: Path = MANIFEST_PATH,
+    max_workers: int | None = None,
+) -> IngestReport:
+    """Bring the knowledge base in line with the given sources
+
+    With `prune`, files recorded in the manifest that are no longer among
+    the sources have their rows deleted.
+    """
+    from agno.knowledge.document import Document
+
+    report = IngestReport()
+    manifest = load_manifest(manifest_path)
+    recorded: dict = manifest["files"]
+    current_version = manifest.get("version") == MANIFEST_VERSION
+    manifest["version"] = MANIFEST_VERSION
+    sources = discover_sources(paths)
+
+    changed = []
+    hashes = {}
+    for path in sources:
+        hashes[str(path)] = file_hash(path)
+        if current_version and recorded.get(str(path), {}).get("sha256") == hashes[str(path)]:
+            report.files_skipped += 1
+        else:
+            changed.append(path)
+
+    extracted = extract_chunks(changed, max_workers) if changed else {}
+
+    for source, chunks in extracted.items():
+        previous: dict[str, dict] = recorded.get(source, {}).get("chunks", {})
+        current = {chunk.doc_id: chunk for chunk in chunks}
+
+        stale = [doc_id for doc_id in previous if doc_id not in current]
+        added = [chunk for doc_id, chunk in current.items() if doc_id not in previous]
+
+        try:
+            for doc_id in stale:
+                _delete_rows(kb, {"source": source, **previous[doc_id]}, report)
+            if added:
+                kb.load_documents([
+                    Document(
+                        id=chunk.doc_id,
+                        name=Path(source).stem,
+                        content=chunk.text,
+                        meta_data=chunk.meta_data,
+                    )
+                    for chunk in added
+                ])
+        except Exception as e:
+            report.errors.append(f"{source}: {e}")
+            continue
+
+        recorded[source] = {
+            "sha256": hashes[source],
+            "chunks": {
+                doc_id: {"chunk": chunk.key, "sha256": chunk.content_hash}
+                for doc_id, chunk in current.items()
+            },
+        }
+        report.files_ingested += 1
+        report.chunks_added += len(added)
+        report.chunks_unchanged += len(current) - len(added)
+
+    if prune:
+        for source in [s for s in recorded if s not in hashes]:
+            try:
+                for chunk in recorded[source]["chunks"].values():
+                    _delete_rows(kb, {"source": source, **chunk}, report)
+            except Exception as e:
+                report.errors.append(f"{source}: {e}")
+                continue
+            recorded.pop(source)
+            report.files_removed += 1
+
+    save_manifest(manifest, manifest_path)
+    return report
+
+
+def main() -> None:
+    from .productivity_kb import BOOK_PATH, SOURCES_DIR, create_hyperfocus_kb
+
+    parser = argparse.ArgumentParser(description="Incrementally ingest knowledge sources")
+    parser.add_argument("paths", nargs="*", type=Path, default=[BOOK_PATH, SOURCES_DIR])
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--no-prune", action="store_true", help="Keep rows for sources not listed")
+    args = parser.parse_args()
+
+    kb = create_hyperfocus_kb(require_book=False)
+    report = ingest(kb, args.paths, prune=not args.no_prune, max_workers=args.workers)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
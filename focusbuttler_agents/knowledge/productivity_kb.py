@@ -5,22 +5,34 @@ RAG system using concepts from the Hyperfocus book by Chris Bailey.
 Provides grounded, methodology-aware responses.
 """
 
-from agno.knowledge import Knowledge
-from agno.knowledge.pdf import PDFReader
-from agno.vectordb.lancedb import LanceDb
 from pathlib import Path
+from typing import TYPE_CHECKING
+import os
+
+from .bm25_index import get_index, rebuild_index
+from .ingest import MANIFEST_PATH, ingest
+
+if TYPE_CHECKING:
+    from agno.knowledge import Knowledge
 
 
 # Path to the Hyperfocus book PDF (if available)
 BOOK_PATH = Path(__file__).parent.parent.parent / "Hyperfocus The New Science of Attention, Productivity, and Creativity.pdf"
 
+# Optional directory of extra PDF/markdown sources ingested alongside the book
+SOURCES_DIR = Path(os.getenv("KNOWLEDGE_SOURCES_DIR", Path(__file__).parent / "sources"))
 
-def create_hyperfocus_kb() -> Knowledge | None:
+
+def create_hyperfocus_kb(require_book: bool = True) -> "Knowledge | None":
     """Create the Hyperfocus knowledge base if the book is available"""
-    if not BOOK_PATH.exists():
+    if require_book and not BOOK_PATH.exists():
         print(f"Note: Hyperfocus book not found at {BOOK_PATH}")
         return None
     
+    # Imported here so LanceDb is only loaded when the vector store is used
+    from agno.knowledge import Knowledge
+    from agno.vectordb.lancedb import LanceDb
+    
     knowledge = Knowledge(
         vector_db=LanceDb(
             uri="./hyperfocus_kb",
@@ -31,16 +43,38 @@ def create_hyperfocus_kb() -> Knowledge | None:
     return knowledge
 
 
-def load_hyperfocus_concepts() -> Knowledge | None:
-    """Load the Hyperfocus book into the knowledge base"""
+_kb: "Knowledge | None" = None
+
+
+def get_hyperfocus_kb() -> "Knowledge | None":
+    """The shared knowledge base for search, or None if nothing was ingested yet"""
+    global _kb
+    if _kb is None and MANIFEST_PATH.exists():
+        _kb = create_hyperfocus_kb(require_book=False)
+    return _kb
+
+
+def load_hyperfocus_concepts() -> "Knowledge | None":
+    """Load the Hyperfocus book (and any extra sources) into the knowledge base
+    
+    Ingestion is incremental: unchanged files are skipped and only changed
+    pages are re-embedded.
+    """
     kb = create_hyperfocus_kb()
     
     if kb and BOOK_PATH.exists():
         try:
-            pdf_reader = PDFReader()
-            documents = pdf_reader.read(BOOK_PATH)
-            kb.load_documents(documents)
-            print(f"Loaded {len(documents)} pages from Hyperfocus book")
+            report = ingest(kb, [BOOK_PATH, SOURCES_DIR])
+            print(
+                f"Knowledge base: {report.files_ingested} files ingested, "
+                f"{report.files_skipped} unchanged, {report.chunks_added} chunks embedded, "
+                f"{report.chunks_deleted} stale chunks removed"
+                + (f", {report.chunks_not_found} not found" if report.chunks_not_found else "")
+            )
+            for error in report.errors:
+                print(f"Error loading knowledge source: {error}")
+            if report.files_ingested or report.files_removed:
+                rebuild_index()
         except Exception as e:
             print(f"Error loading book: {e}")
             return None
@@ -122,7 +156,13 @@ HYPERFOCUS_CONCEPTS = {
 
 def get_concept(concept_name: str) -> str:
     """Get a Hyperfocus concept explanation"""
-    return HYPERFOCUS_CONCEPTS.get(
-        concept_name.lower(),
-        "Concept not found. Try: hyperfocus, scatterfocus, four_quadrants, attention_space, meta_awareness"
-    )
+    concept = HYPERFOCUS_CONCEPTS.get(concept_name.lower())
+    if concept:
+        return concept
+    
+    # Fall back to the closest concept by BM25 score
+    for doc, _ in get_index().search(concept_name, limit=5):
+        if doc["id"].startswith("concept:"):
+            return doc["text"]
+    
+    return "Concept not found. Try: hyperfocus, scatterfocus, four_quadrants, attention_space, meta_awareness"
@@ -5,14 +5,17 @@ Main entry point for the Agno AgentOS serving the Hyperfocus productivity agents
 Provides 50+ API endpoints with SSE streaming for the Flutter app.
 """
 
+import asyncio
 import os
+import time
+import uuid
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-from agno.agent.os import AgentOS
-from agno.db import SqliteDb
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 from agents import (
     productivity_coach,
@@ -20,30 +23,262 @@ from agents import (
     energy_advisor,
     focus_guardian,
     categorize_task,
+    categorize_tasks,
+    categorization_cache,
+    fast_classifier,
     get_coaching,
+    stream_coaching,
+    coaching_cascade,
     get_energy_advice,
+    stream_energy_advice,
+    advise_uncached,
+    energy_table,
+    session_scheduler,
+    stream_session_insights,
+    message_pool,
+    memory_consolidator,
+    context_builder,
+    all_pool_buckets,
+    plan_day,
+    PlanRequest,
     TaskType,
 )
-from teams import hyperfocus_team
-
-
-# Create the AgentOS application
-app = AgentOS(
-    name="HyperfocusOS",
-    agents=[
-        productivity_coach,
-        task_categorizer,
-        energy_advisor,
-        focus_guardian,
-    ],
-    teams=[
-        hyperfocus_team,
-    ],
-    db=SqliteDb(
-        db_file="hyperfocus_sessions.db",
-        auto_upgrade_db=True,
-    ),
-)
+from teams import hyperfocus_team, team_advice, stream_team_advice, intent_router, team_cascade
+from analytics import energy_profiles, event_store
+from analytics.energy_profile import EnergyEntryIn, SessionOutcomeIn
+from analytics.event_store import INGEST_CHUNK_ROWS, NDJSONIngest
+from knowledge import get_hyperfocus_kb, hybrid_search
+from core.coalesce import coalescing_stats
+from core.http_transport import http_transport
+from core.llm_scheduler import DeadlineExceeded, llm_scheduler
+from core.metrics import http_request_seconds, http_requests_in_flight, metrics, start_trace
+from core.models import FAKE_MODEL
+from core.registry import LazyASGIApp, agent_registry
+from core.storage import get_storage
+from core.traffic import MAX_BODY_BYTES, REPLAY_HEADER, traffic_recorder, use_replay_latencies
+from core.workers import forward_to_leader, is_leader, owned_by_leader
+from sse import sse_response
+
+
+def _build_agent_os():
+    """The AgentOS app, with the built agents and team (it configures them)"""
+    from agno.agent.os import AgentOS
+
+    return AgentOS(
+        name="HyperfocusOS",
+        agents=[
+            productivity_coach.get(),
+            task_categorizer.get(),
+            energy_advisor.get(),
+            focus_guardian.get(),
+        ],
+        teams=[
+            hyperfocus_team.get(),
+        ],
+        db=get_storage().agno_db(),
+    )
+
+
+# The service routes below are served without agno. Agents and teams are lazy
+# registry entries, built on first use (or by the warm-up below), and the
+# AgentOS routes are mounted last, built on the first request to one of them.
+app = FastAPI(title="HyperfocusOS")
+agent_os = LazyASGIApp(_build_agent_os)
+
+
+_warmup_tasks: set[asyncio.Task] = set()
+
+TRACE_ALL_REQUESTS = os.getenv("HYPERFOCUS_TRACING", "0") == "1"
+
+
+@app.middleware("http")
+async def record_traffic(request: Request, call_next):
+    """Anonymised traces of sampled requests for replay (see core.traffic)
+    
+    Replayed requests carry their recorded model latencies, which the fake
+    model then uses. Registered first so it runs innermost: a request
+    forwarded to the leader is recorded once, by the leader.
+    """
+    replayed = request.headers.get(REPLAY_HEADER)
+    if replayed and FAKE_MODEL:
+        use_replay_latencies(replayed)
+    if not traffic_recorder.sampled():
+        return await call_next(request)
+
+    arrived = time.time()
+    started = time.perf_counter()
+    calls = traffic_recorder.begin()
+    length = request.headers.get("content-length")
+    body_bytes = int(length) if length else -1  # -1: streamed without a length
+    body = await request.body() if 0 < body_bytes <= MAX_BODY_BYTES else None
+    response = await call_next(request)
+    route = getattr(request.scope.get("route"), "path", None)
+    if route is None:
+        return response
+
+    original = response.body_iterator
+
+    async def body_then_record():
+        # Streamed responses call the model while the body is sent
+        try:
+            async for chunk in original:
+                yield chunk
+        finally:
+            traffic_recorder.record(
+                arrived=arrived,
+                method=request.method,
+                route=route,
+                path_params=request.scope.get("path_params", {}),
+                query=request.query_params.multi_items(),
+                content_type=request.headers.get("content-type", ""),
+                body=body,
+                body_bytes=body_bytes if request.method in ("POST", "PUT", "PATCH") else 0,
+                status=response.status_code,
+                seconds=time.perf_counter() - started,
+                calls=calls,
+            )
+
+    response.body_iterator = body_then_record()
+    return response
+
+
+@app.middleware("http")
+async def forward_leader_routes(request: Request, call_next):
+    """In multi-worker mode, focus session requests are served by the leader worker"""
+    if owned_by_leader(request.url.path):
+        return await forward_to_leader(request)
+    return await call_next(request)
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Request latency by route, and Server-Timing spans for traced requests"""
+    trace = start_trace() if TRACE_ALL_REQUESTS or request.headers.get("x-trace") == "1" else None
+    http_requests_in_flight.inc()
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        # A stream's work happens after its headers are sent, so it gets no partial timing
+        streaming = response.headers.get("content-type", "").startswith("text/event-stream")
+        if trace is not None and not streaming:
+            response.headers["Server-Timing"] = trace.server_timing()
+        return response
+    finally:
+        http_requests_in_flight.dec()
+        # Label by route template, not the raw path, to keep cardinality bounded
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        http_request_seconds.observe(
+            time.perf_counter() - started, method=request.method, route=route, status=status
+        )
+
+
+@app.on_event("startup")
+async def warm_hot_agents():
+    """Build the hot agents in the background once the server is accepting requests"""
+    if os.getenv("AGENT_WARMUP", "1") != "1":
+        return
+    
+    async def warm():
+        await asyncio.sleep(float(os.getenv("AGENT_WARMUP_DELAY_SECONDS", "1")))
+        await agent_registry.warm()
+    
+    task = asyncio.create_task(warm())
+    _warmup_tasks.add(task)
+    task.add_done_callback(_warmup_tasks.discard)
+
+
+@app.on_event("startup")
+async def warm_http_transport():
+    """Open the shared model API connections now and keep them warm while idle"""
+    if not FAKE_MODEL and os.getenv("HTTP_WARMUP", "1") == "1":
+        await http_transport.start()
+
+
+@app.on_event("startup")
+async def start_traffic_recording():
+    """Flush recorded request traces in the background (TRAFFIC_RECORD_FILE)"""
+    await traffic_recorder.start()
+
+
+@app.on_event("startup")
+async def resume_focus_sessions():
+    """Resume check-ins for focus sessions that were active before a restart"""
+    if is_leader():
+        await session_scheduler.start()
+
+
+@app.on_event("startup")
+async def warm_message_pool():
+    """Top up FocusGuardian message pools in the background"""
+    if is_leader():
+        message_pool.warm(all_pool_buckets())
+
+
+@app.on_event("startup")
+async def refresh_energy_table():
+    """Rebuild the precomputed energy advice table if it is missing or stale"""
+    if is_leader() and os.getenv("ENERGY_TABLE_AUTOBUILD", "1") == "1":
+        energy_table.ensure_fresh(advise_uncached)
+
+
+@app.on_event("startup")
+async def start_energy_profiles():
+    """Compute per-user energy profiles in the background and keep them fresh"""
+    await energy_profiles.start()
+
+
+@app.on_event("startup")
+async def start_event_compaction():
+    """Compact the event store's small part files in the background"""
+    if is_leader():
+        await event_store.start()
+
+
+@app.on_event("startup")
+async def start_memory_consolidation():
+    """Recover queued runs and start consolidating user memories in the background
+
+    Other workers only queue runs, and keep their pending counts fresh.
+    """
+    await memory_consolidator.start(flush=is_leader())
+
+
+@app.on_event("shutdown")
+async def flush_traffic_recording():
+    await traffic_recorder.stop()
+
+
+@app.on_event("shutdown")
+async def close_http_transport():
+    await http_transport.stop()
+
+
+@app.on_event("shutdown")
+async def stop_energy_profiles():
+    await energy_profiles.stop()
+
+
+@app.on_event("shutdown")
+async def stop_event_compaction():
+    await event_store.stop()
+
+
+@app.on_event("shutdown")
+async def flush_memory_consolidation():
+    """Consolidate queued runs before exiting; anything left is retried on restart"""
+    await memory_consolidator.stop(flush=is_leader())
+
+
+@app.exception_handler(DeadlineExceeded)
+async def llm_deadline_exceeded(request: Request, exc: DeadlineExceeded):
+    """The model was too busy to start this request in time"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "The assistant is busy, please try again shortly"},
+        headers={"Retry-After": "5"},
+    )
 
 
 # Additional custom endpoints for direct Flutter integration
@@ -53,33 +288,310 @@ async def health_check():
     return {"status": "healthy", "service": "HyperfocusOS"}
 
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus metrics (text exposition format)"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.post("/v1/categorize")
 async def categorize_task_endpoint(task_title: str):
     """Quick task categorization endpoint"""
     result = await categorize_task(task_title)
-    return {
-        "category": result.category.value,
-        "reasoning": result.reasoning,
-        "suggested_time": result.suggested_time_of_day,
-        "energy_required": result.estimated_energy_required,
-    }
+    return _categorization_payload(result)
+
+
+@app.post("/v1/categorize/batch")
+async def categorize_batch_endpoint(task_titles: list[str]):
+    """Categorize many tasks with batched LLM calls (results keep input order)"""
+    results = await categorize_tasks(task_titles)
+    return {"results": [_categorization_payload(result) for result in results]}
+
+
+@app.get("/v1/categorize/cache-stats")
+async def categorization_cache_stats():
+    """Hit/miss counters for the categorization cache and fast-path classifier"""
+    return {**categorization_cache.stats(), "fast_path": fast_classifier.stats()}
 
 
 @app.post("/v1/coaching")
-async def get_coaching_endpoint(user_id: str, context: str):
-    """Get coaching advice"""
-    advice = await get_coaching(user_id, context)
+async def get_coaching_endpoint(
+    user_id: str,
+    context: str,
+    depth: bool = False,
+    latency_budget_ms: int | None = None,
+):
+    """Get coaching advice (small model first unless depth is requested)"""
+    advice = await get_coaching(user_id, context, depth, latency_budget_ms)
     return {"advice": advice}
 
 
+@app.post("/v1/coaching/stream")
+async def stream_coaching_endpoint(request: Request, user_id: str, context: str):
+    """Stream coaching advice as SSE `token` events"""
+    async def events():
+        async for token in stream_coaching(user_id, context):
+            yield "token", {"text": token}
+    
+    return sse_response(request, events())
+
+
+@app.post("/v1/team-advice")
+async def team_advice_endpoint(
+    user_id: str,
+    question: str,
+    depth: bool = False,
+    latency_budget_ms: int | None = None,
+):
+    """Get coordinated advice from the Hyperfocus team"""
+    advice = await team_advice(user_id, question, depth, latency_budget_ms)
+    return {"advice": advice}
+
+
+@app.post("/v1/team-advice/stream")
+async def stream_team_advice_endpoint(request: Request, user_id: str, question: str):
+    """Stream team advice as SSE `token` events"""
+    async def events():
+        async for token in stream_team_advice(user_id, question):
+            yield "token", {"text": token}
+    
+    return sse_response(request, events())
+
+
+@app.get("/v1/team-advice/routing-stats")
+async def team_routing_stats():
+    """How team questions were routed and the latency saved per class"""
+    return intent_router.stats()
+
+
+@app.get("/v1/cascade/stats")
+async def cascade_stats():
+    """Per-tier calls and latency, which tier answered, and escalation reasons"""
+    return {"coaching": coaching_cascade.stats(), "team": team_cascade.stats()}
+
+
 @app.post("/v1/energy-advice")
 async def get_energy_advice_endpoint(
     current_energy: str,
     hour_of_day: int,
-    recent_activities: str = ""
+    recent_activities: str = "",
+    user_id: str = "",
 ):
     """Get energy-based work recommendations"""
-    result = await get_energy_advice(current_energy, hour_of_day, recent_activities)
+    result = await get_energy_advice(current_energy, hour_of_day, recent_activities, user_id)
+    return _energy_advice_payload(result)
+
+
+@app.post("/v1/energy-advice/stream")
+async def stream_energy_advice_endpoint(
+    request: Request,
+    current_energy: str,
+    hour_of_day: int,
+    recent_activities: str = "",
+    user_id: str = "",
+):
+    """Stream energy advice as SSE `field` deltas followed by the full `advice`"""
+    async def events():
+        async for update in stream_energy_advice(current_energy, hour_of_day, recent_activities, user_id):
+            if "advice" in update:
+                yield "advice", _energy_advice_payload(update["advice"])
+            else:
+                yield "field", update
+    
+    return sse_response(request, events())
+
+
+@app.post("/v1/plan")
+async def plan_day_endpoint(request: PlanRequest):
+    """Schedule categorized tasks into Hyperfocus and Scatterfocus blocks over the user's energy curve
+    
+    Scheduling is local; the model is called at most once, for the summary.
+    """
+    return await plan_day(request)
+
+
+@app.post("/v1/energy-profile/entries")
+async def ingest_energy_entries(entries: list[EnergyEntryIn]):
+    """Bulk-ingest energy check-ins (Serverpod EnergyEntry JSON plus userId)"""
+    return {"accepted": energy_profiles.ingest_entries(entries)}
+
+
+@app.post("/v1/energy-profile/sessions")
+async def ingest_session_outcomes(sessions: list[SessionOutcomeIn]):
+    """Bulk-ingest finished focus sessions (Serverpod FocusSession JSON plus userId)"""
+    return {"accepted": energy_profiles.ingest_sessions(sessions)}
+
+
+@app.get("/v1/energy-profile/stats")
+async def energy_profile_stats():
+    """Profiled users and refresh timing"""
+    return energy_profiles.stats()
+
+
+@app.get("/v1/energy-profile")
+async def get_energy_profile(user_id: str):
+    """A user's hourly/weekday energy profile, peak and dip windows, and session patterns"""
+    profile = energy_profiles.get(user_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="No energy profile for this user yet")
+    return {**profile.model_dump(), "summary": profile.summary()}
+
+
+@app.post("/v1/events")
+async def ingest_events(request: Request):
+    """Stream NDJSON events into the columnar event store
+    
+    Lines are validated as the body arrives and written every
+    INGEST_CHUNK_ROWS events, so large uploads are never held in memory.
+    Invalid lines are skipped and reported (the first few) in the response.
+    """
+    ingest = NDJSONIngest()
+    pending = []
+    accepted = 0
+    async for chunk in request.stream():
+        pending.extend(ingest.feed(chunk))
+        if len(pending) >= INGEST_CHUNK_ROWS:
+            accepted += await event_store.aappend(pending)
+            pending = []
+    pending.extend(ingest.close())
+    if pending:
+        accepted += await event_store.aappend(pending)
+    return {"accepted": accepted, "rejected": ingest.rejected, "errors": ingest.errors}
+
+
+@app.get("/v1/events/stats")
+async def event_store_stats():
+    """Partitions, part files and compactions in the event store"""
+    return await asyncio.to_thread(event_store.stats)
+
+
+def _categorization_payload(result) -> dict:
+    return {
+        "category": result.category.value,
+        "reasoning": result.reasoning,
+        "suggested_time": result.suggested_time_of_day,
+        "energy_required": result.estimated_energy_required,
+    }
+
+
+@app.get("/v1/knowledge/search")
+async def knowledge_search(query: str, limit: int = 5):
+    """Hybrid (lexical and vector) search over the Hyperfocus concepts and book chunks"""
+    kb = await asyncio.to_thread(get_hyperfocus_kb)
+    return {"results": await asyncio.to_thread(hybrid_search, query, kb, limit)}
+
+
+@app.get("/v1/memory/stats")
+async def memory_consolidation_stats():
+    """Queue depth and throughput of background memory consolidation"""
+    return memory_consolidator.stats()
+
+
+@app.get("/v1/context/stats")
+async def context_compaction_stats():
+    """Prompt tokens before and after context compaction, per agent"""
+    return context_builder.stats()
+
+
+@app.get("/v1/agents/registry")
+async def agent_registry_stats():
+    """Which agents and teams have been built, and how long each took"""
+    return agent_registry.stats()
+
+
+@app.get("/v1/llm/scheduler")
+async def llm_scheduler_stats():
+    """Per-model concurrency, token budget, queue depth by priority, drops and 429s"""
+    return llm_scheduler.stats()
+
+
+@app.get("/v1/traffic/recorder")
+async def traffic_recorder_stats():
+    """Whether requests are being recorded, where to, and how many"""
+    return traffic_recorder.stats()
+
+
+@app.get("/v1/llm/transport")
+async def http_transport_stats():
+    """Shared model API connection pool: protocol, open connections and keep-warm pings"""
+    return http_transport.stats()
+
+
+@app.get("/v1/coalescing/stats")
+async def request_coalescing_stats():
+    """How many agent calls were served by an identical in-flight request"""
+    return coalescing_stats()
+
+
+@app.get("/v1/sessions/stats")
+async def session_scheduler_stats():
+    """Counts of active, paused and listening focus sessions"""
+    return session_scheduler.stats()
+
+
+@app.get("/v1/sessions/message-pool")
+async def message_pool_stats():
+    """Availability and usage of pre-generated FocusGuardian messages"""
+    return message_pool.stats()
+
+
+@app.post("/v1/sessions/start")
+async def start_session_endpoint(
+    request: Request,
+    mode: str = "hyperfocus",
+    target_minutes: int = 25,
+    session_id: str | None = None,
+):
+    """Start (or reattach to) a focus session and stream its messages as SSE
+
+    The first event, `session`, carries the id for the pause, resume,
+    distraction and end routes; FocusGuardian messages follow as `message`
+    events until the session ends.
+    """
+    session_id = session_id or uuid.uuid4().hex
+
+    async def events():
+        yield "session", {"session_id": session_id}
+        async for message in stream_session_insights(mode, target_minutes, session_id):
+            yield "message", {"text": message}
+
+    return sse_response(request, events())
+
+
+@app.get("/v1/sessions/{session_id}")
+async def get_session_state(session_id: str):
+    """Inspect the scheduled state of a focus session"""
+    state = session_scheduler.inspect(session_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return state
+
+
+@app.post("/v1/sessions/{session_id}/pause")
+async def pause_session(session_id: str):
+    """Pause a session; its pending check-in is cancelled"""
+    return {"ok": session_scheduler.pause(session_id)}
+
+
+@app.post("/v1/sessions/{session_id}/resume")
+async def resume_session(session_id: str):
+    """Resume a paused session"""
+    return {"ok": session_scheduler.resume(session_id)}
+
+
+@app.post("/v1/sessions/{session_id}/distraction")
+async def log_session_distraction(session_id: str):
+    """Log a distraction; a recovery message is sent and the next check-in pushed back"""
+    return {"ok": session_scheduler.distraction(session_id)}
+
+
+@app.post("/v1/sessions/{session_id}/end")
+async def end_session(session_id: str, completed: bool = False):
+    """End a session and send the closing message"""
+    return {"ok": session_scheduler.end(session_id, completed)}
+
+
+def _energy_advice_payload(result) -> dict:
     return {
         "recommendation": result.current_recommendation,
         "optimal_task_type": result.optimal_task_type,
@@ -88,6 +600,10 @@ async def get_energy_advice_endpoint(
     }
 
 
+# Last, so the service routes above take precedence
+app.mount("/", agent_os)
+
+
 if __name__ == "__main__":
     import uvicorn
     
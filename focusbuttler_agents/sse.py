@@ -0,0 +1,78 @@
+"""
+Server-Sent Events
+
+Helpers for streaming agent output to the Flutter app as SSE, with
+heartbeats to keep idle connections open and cancellation of the upstream
+generation when the client disconnects.
+"""
+
+import asyncio
+import json
+from contextlib import suppress
+from typing import Any, AsyncIterator
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+
+HEARTBEAT_SECONDS = 15.0
+
+
+def format_event(event: str, data: Any) -> str:
+    """Encode one SSE event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def sse_response(
+    request: Request,
+    events: AsyncIterator[tuple[str, Any]],
+    heartbeat_seconds: float = HEARTBEAT_SECONDS,
+) -> StreamingResponse:
+    """Stream (event, data) pairs as an SSE response"""
+    return StreamingResponse(
+        _event_stream(request, events, heartbeat_seconds),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+async def _event_stream(
+    request: Request,
+    events: AsyncIterator[tuple[str, Any]],
+    heartbeat_seconds: float,
+) -> AsyncIterator[str]:
+    iterator = aiter(events)
+    pending = asyncio.ensure_future(anext(iterator))
+
+    try:
+        while True:
+            done, _ = await asyncio.wait({pending}, timeout=heartbeat_seconds)
+            if await request.is_disconnected():
+                break
+            if not done:
+                # Comment lines keep proxies and the client from timing out
+                yield ": heartbeat\n\n"
+                continue
+
+            try:
+                event, data = pending.result()
+            except StopAsyncIteration:
+                yield format_event("done", {})
+                break
+            except Exception as e:
+                yield format_event("error", {"detail": str(e)})
+                break
+
+            yield format_event(event, data)
+            pending = asyncio.ensure_future(anext(iterator))
+    finally:
+        # Client went away (or we finished): stop the upstream generation
+        pending.cancel()
+        with suppress(asyncio.CancelledError, StopAsyncIteration, Exception):
+            await pending
+        with suppress(Exception):
+            await iterator.aclose()
@@ -1,8 +1,19 @@
 """Teams module initialization"""
 
-from .hyperfocus_team import hyperfocus_team, team_advice
+from .hyperfocus_team import (
+    hyperfocus_team,
+    hyperfocus_team_fast,
+    team_advice,
+    stream_team_advice,
+    intent_router,
+    team_cascade,
+)
 
 __all__ = [
     "hyperfocus_team",
+    "hyperfocus_team_fast",
     "team_advice",
+    "stream_team_advice",
+    "intent_router",
+    "team_cascade",
 ]
@@ -5,36 +5,53 @@ A coordinated multi-agent team for comprehensive productivity coaching.
 The ProductivityCoach leads, delegating to specialized agents as needed.
 """
 
-from agno.team import Team
-from agno.models.mistral import MistralChat
-from agno.db import SqliteDb
-from agno.memory import AgentMemory
+import time
+from functools import partial
+from typing import AsyncIterator
 
-from agents.productivity_coach import productivity_coach
-from agents.energy_advisor import energy_advisor
+from agents.model_cascade import ModelCascade
+from agents.productivity_coach import productivity_coach, productivity_coach_fast
+from agents.energy_advisor import EnergyAdvice, energy_advisor, energy_advisor_stream
 from agents.focus_guardian import focus_guardian
+from agents.context_builder import CONTEXT_COMPACTION, context_builder
+from agents.memory_consolidator import INLINE_MEMORY, memory_consolidator
+from agents.streaming import PartialJSONFields, stream_text
+from core.coalesce import coalesced
+from core.llm_scheduler import Priority
+from core.metrics import instrument_member
+from core.models import chat_model
+from core.registry import register_team
+from core.storage import get_storage
 
+from .intent_router import ENERGY, FOCUS, IntentRouter, RoutingLog
 
-# Hyperfocus Team - coordinated multi-agent team
-hyperfocus_team = Team(
-    name="HyperfocusTeam",
-    mode="coordinate",  # Leader coordinates the team
-    model=MistralChat(id="mistral-large-latest"),
-    leader=productivity_coach,
-    members=[
-        energy_advisor,
-        focus_guardian,
-    ],
-    db=SqliteDb(
-        db_file="hyperfocus_team_memory.db",
-        auto_upgrade_db=True,
-    ),
-    memory=AgentMemory(
-        create_user_memories=True,
-        update_user_memories_after_run=True,
-    ),
-    description="A coordinated team of productivity experts for comprehensive coaching.",
-    instructions="""You are a team of productivity experts working together to help users 
+
+# Hyperfocus Team - coordinated multi-agent team (history=False for the
+# cascade's fast tier, whose answers may be rejected)
+def _build_hyperfocus_team(name: str, model_id: str, leader, history: bool = True):
+    from agno.memory import AgentMemory
+    from agno.team import Team
+
+    return Team(
+        name=name,
+        mode="coordinate",  # Leader coordinates the team
+        model=chat_model(model_id),
+        leader=leader.get(),
+        # Members of their own, so the team's runs of them are instrumented once
+        members=[
+            instrument_member(energy_advisor.build()),
+            instrument_member(focus_guardian.build()),
+        ],
+        db=get_storage().agno_db(),
+        # Memories are written by the background memory consolidator
+        memory=AgentMemory(
+            create_user_memories=INLINE_MEMORY and history,
+            update_user_memories_after_run=INLINE_MEMORY and history,
+            **({} if history else {"memories_from_previous_runs": 0}),
+            add_memories_to_context=not CONTEXT_COMPACTION,
+        ),
+        description="A coordinated team of productivity experts for comprehensive coaching.",
+        instructions="""You are a team of productivity experts working together to help users 
 master the Hyperfocus methodology.
 
 Your team includes:
@@ -53,15 +70,119 @@ Remember:
 - Build on each other's insights
 - Remember user patterns across sessions
 - Be encouraging but honest""",
-    markdown=True,
-    show_tool_calls=True,
+        markdown=True,
+        show_tool_calls=True,
+    )
+
+
+hyperfocus_team = register_team(
+    "HyperfocusTeam",
+    partial(_build_hyperfocus_team, "HyperfocusTeam", "mistral-large-latest", productivity_coach),
+)
+
+# The same team led on the small model, tried first by the cascade
+hyperfocus_team_fast = register_team(
+    "HyperfocusTeamFast",
+    partial(
+        _build_hyperfocus_team, "HyperfocusTeamFast", "mistral-small-latest", productivity_coach_fast, history=False
+    ),
 )
 
+team_cascade = ModelCascade("team", hyperfocus_team_fast, hyperfocus_team)
 
-async def team_advice(user_id: str, question: str) -> str:
-    """Get coordinated team advice for a user question"""
-    response = await hyperfocus_team.arun(
-        question,
-        user_id=user_id,
-    )
-    return response.content or "Focus on your most purposeful task right now."
+
+# Sends clear single-domain questions straight to a member, skipping the leader turn
+intent_router = IntentRouter(log=RoutingLog(get_storage()))
+
+_ENERGY_TEXT_FIELDS = ("current_recommendation", "reasoning", "next_energy_shift")
+
+
+@coalesced()
+async def team_advice(
+    user_id: str,
+    question: str,
+    depth: bool = False,
+    latency_budget_ms: int | None = None,
+) -> str:
+    """Get coordinated team advice for a user question
+    
+    Questions for the whole team go through the model cascade (see
+    get_coaching); routed single-member questions are already on the small model.
+    Either way the prompt carries the same user context.
+    """
+    started = time.perf_counter()
+    route, source = intent_router.route(question)
+    prompt = await context_builder.build(hyperfocus_team.name, user_id, question)
+    
+    if route == ENERGY:
+        response = await energy_advisor.arun(prompt, user_id=user_id, priority=Priority.COACHING)
+        content = response.content
+        if isinstance(content, EnergyAdvice):
+            content = _energy_advice_text(content)
+    elif route == FOCUS:
+        response = await focus_guardian.arun(prompt, user_id=user_id, priority=Priority.COACHING)
+        content = response.content
+    else:
+        content, _ = await team_cascade.run(
+            prompt,
+            depth=depth,
+            latency_budget_ms=latency_budget_ms,
+            question=question,
+            user_id=user_id,
+        )
+    
+    intent_router.record(question, route, source, time.perf_counter() - started)
+    if not content:
+        return "Focus on your most purposeful task right now."
+    _record_run(user_id, question, str(content))
+    return content
+
+
+async def stream_team_advice(user_id: str, question: str) -> AsyncIterator[str]:
+    """Stream coordinated team advice token by token"""
+    started = time.perf_counter()
+    route, source = intent_router.route(question)
+    prompt = await context_builder.build(hyperfocus_team.name, user_id, question)
+    
+    if route == ENERGY:
+        tokens = _stream_energy_text(prompt, user_id)
+    elif route == FOCUS:
+        tokens = stream_text(focus_guardian, prompt, user_id=user_id, priority=Priority.COACHING)
+    else:
+        tokens = stream_text(hyperfocus_team, prompt, user_id=user_id)
+    
+    text = []
+    async for token in tokens:
+        text.append(token)
+        yield token
+    
+    intent_router.record(question, route, source, time.perf_counter() - started)
+    if text:
+        _record_run(user_id, question, "".join(text))
+
+
+def _record_run(user_id: str, question: str, response: str) -> None:
+    context_builder.record_run(user_id, hyperfocus_team.name, question, response)
+    memory_consolidator.enqueue(user_id, hyperfocus_team.name, question, response)
+
+
+async def _stream_energy_text(prompt: str, user_id: str) -> AsyncIterator[str]:
+    parser = PartialJSONFields()
+    current = None
+    async for chunk in stream_text(
+        energy_advisor_stream, prompt, user_id=user_id, priority=Priority.COACHING
+    ):
+        for field, delta in parser.feed(chunk):
+            if field not in _ENERGY_TEXT_FIELDS:
+                continue
+            if current is not None and field != current:
+                yield "\n\n"
+            current = field
+            yield delta
+
+
+def _energy_advice_text(advice: EnergyAdvice) -> str:
+    parts = [advice.current_recommendation, advice.reasoning]
+    if advice.next_energy_shift:
+        parts.append(f"Next energy shift: {advice.next_energy_shift}")
+    return "\n\n".join(parts)
@@ -0,0 +1,302 @@
+"""
+Team Intent Router
+
+Local pre-routing for HyperfocusTeam questions. Clear single-domain questions
+(energy/scheduling, or focus sessions/distractions) are sent straight to the
+matching member agent; ambiguous or holistic questions still go to the team
+leader. Routing uses keyword rules first and a small hashed naive Bayes
+classifier for questions the rules cannot place.
+
+Usage:
+    python -m teams.intent_router train       # seed examples + labelled file
+    python -m teams.intent_router evaluate    # routing accuracy per class
+    python -m teams.intent_router report      # latency saved per class
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+import zlib
+from pathlib import Path
+
+from agents.categorization_cache import normalize_title
+from agents.fast_classifier import HashedNaiveBayes
+from core.storage import DB_FILE, Storage, get_storage
+
+
+ENERGY = "energy"
+FOCUS = "focus"
+TEAM = "team"
+ROUTES = (ENERGY, FOCUS, TEAM)
+
+MODEL_PATH = Path(os.getenv("TEAM_ROUTER_MODEL", "hyperfocus_intent_router.json"))
+CONFIDENCE_THRESHOLD = float(os.getenv("TEAM_ROUTER_THRESHOLD", "0.85"))
+
+_ENERGY_RULE = re.compile(
+    r"\b(energy|energi[sz]ed|tired|exhausted|fatigue[d]?|sleepy|slump|drained|nap|"
+    r"caffeine|coffee|peak hours?|circadian|best time|what time|when should i|"
+    r"schedule|morning|afternoon|evening|after lunch)\b"
+)
+_FOCUS_RULE = re.compile(
+    r"\b(distract\w*|session|interrupt\w*|notifications?|phone|social media|"
+    r"concentrat\w*|pomodoro|on track|on task|procrastinat\w*|mind wander\w*|"
+    r"keep checking|lost focus|stay focused|refocus)\b"
+)
+_HOLISTIC_RULE = re.compile(
+    r"\b(overall|week|weekly|strategy|habits?|goals?|priorit\w*|balance|"
+    r"everything|routine|whole day|long term)\b"
+)
+
+# Hand-labelled questions the classifier always learns from
+SEED_EXAMPLES = (
+    ("I feel drained after lunch, what should I work on?", ENERGY),
+    ("When is my best time for deep work?", ENERGY),
+    ("I'm exhausted but have a report due", ENERGY),
+    ("Should I do creative work when my energy is low?", ENERGY),
+    ("What kind of task fits a mid afternoon slump?", ENERGY),
+    ("I only slept five hours, how should I plan today?", ENERGY),
+    ("Is it better to answer email early or late in the day?", ENERGY),
+    ("My energy peaks at 10am, what do I put there?", ENERGY),
+    ("I feel sluggish, should I take a break?", ENERGY),
+    ("When should I schedule meetings?", ENERGY),
+    ("What should I do with a low energy hour?", ENERGY),
+    ("I crash every day around 3pm", ENERGY),
+    ("Is late evening good for writing?", ENERGY),
+    ("I have lots of energy right now, what is the best use of it?", ENERGY),
+    ("How do I match tasks to how awake I feel?", ENERGY),
+    ("I keep getting distracted by Slack", FOCUS),
+    ("How do I get back on task after an interruption?", FOCUS),
+    ("My phone keeps pulling me out of my focus session", FOCUS),
+    ("I lost focus ten minutes into my session", FOCUS),
+    ("How can I stop checking social media while working?", FOCUS),
+    ("I procrastinate every time I open the document", FOCUS),
+    ("My mind keeps wandering during deep work", FOCUS),
+    ("How long should a hyperfocus session be?", FOCUS),
+    ("Colleagues interrupt me constantly, what can I do?", FOCUS),
+    ("I can't concentrate with the noise in the office", FOCUS),
+    ("How do I handle notifications during deep work?", FOCUS),
+    ("I got pulled into the news again", FOCUS),
+    ("Give me something to refocus after a distraction", FOCUS),
+    ("How do I resist opening email mid task?", FOCUS),
+    ("What should I do when a random thought breaks my flow?", FOCUS),
+    ("How do I become more productive overall?", TEAM),
+    ("Help me plan my week around my goals", TEAM),
+    ("I'm overwhelmed with work and feel burned out, where do I start?", TEAM),
+    ("What habits should I build to work smarter?", TEAM),
+    ("How do I balance deep work with meetings and family?", TEAM),
+    ("Review my day and tell me what to improve", TEAM),
+    ("What is the difference between hyperfocus and scatterfocus?", TEAM),
+    ("How should I prioritise my projects this quarter?", TEAM),
+    ("Build me a routine for a productive morning and afternoon", TEAM),
+    ("Why do I never finish my most important tasks?", TEAM),
+    ("I'm tired and distracted, how do I save this day?", TEAM),
+    ("How do I set better intentions?", TEAM),
+    ("Give me a strategy for my thesis", TEAM),
+    ("What does the book say about purposeful work?", TEAM),
+    ("Help me think through my career goals", TEAM),
+)
+
+
+def rule_route(question: str) -> str | None:
+    """Route with keyword rules; None when no rule applies"""
+    text = normalize_title(question)
+    if _HOLISTIC_RULE.search(text):
+        return TEAM
+    energy = bool(_ENERGY_RULE.search(text))
+    focus = bool(_FOCUS_RULE.search(text))
+    if energy and focus:
+        return TEAM
+    if energy:
+        return ENERGY
+    if focus:
+        return FOCUS
+    return None
+
+
+def train(samples: list[tuple[str, str]]) -> dict:
+    """Train the routing classifier on (question, route) pairs"""
+    model = HashedNaiveBayes(list(ROUTES), n_features=2**16).fit(samples)
+    return {"model": model.to_dict(), "trained_on": len(samples)}
+
+
+class RoutingLog:
+    """Routed questions with the route taken and end-to-end latency"""
+
+    def __init__(self, storage: Storage):
+        self.storage = storage
+        storage.ensure_schema(
+            """CREATE TABLE IF NOT EXISTS team_routing_log (
+                question TEXT NOT NULL,
+                route TEXT NOT NULL,
+                source TEXT NOT NULL,
+                latency_seconds REAL NOT NULL,
+                created_at REAL NOT NULL
+            )"""
+        )
+
+    def record(self, question: str, route: str, source: str, latency_seconds: float) -> None:
+        self.storage.write_nowait(
+            "INSERT INTO team_routing_log VALUES (?, ?, ?, ?, ?)",
+            (question, route, source, latency_seconds, time.time()),
+        )
+
+    def latency_by_route(self) -> dict[str, dict]:
+        """Request count and mean latency per route"""
+        rows = self.storage.query(
+            "SELECT route, COUNT(*), AVG(latency_seconds) FROM team_routing_log GROUP BY route"
+        )
+        return {route: {"requests": count, "mean_seconds": mean} for route, count, mean in rows}
+
+
+class IntentRouter:
+    """Rules first, then a confidence-gated classifier; unsure means the leader"""
+
+    def __init__(
+        self,
+        model_path: Path = MODEL_PATH,
+        threshold: float = CONFIDENCE_THRESHOLD,
+        log: RoutingLog | None = None,
+        model: HashedNaiveBayes | None = None,
+    ):
+        self.model_path = Path(model_path)
+        self.threshold = threshold
+        self.log = log
+        self.model = model
+        self.counts = {f"{route}:{source}": 0 for route in ROUTES for source in ("rule", "model", "default")}
+        self.latency = {route: [0, 0.0] for route in ROUTES}
+        if model is None:
+            self.reload()
+
+    def reload(self) -> None:
+        """Load the trained model, falling back to one trained on the seeds"""
+        if self.model_path.exists():
+            data = json.loads(self.model_path.read_text())
+        else:
+            data = train(list(SEED_EXAMPLES))
+        self.model = HashedNaiveBayes.from_dict(data["model"])
+
+    def route(self, question: str) -> tuple[str, str]:
+        """Return (route, source) where source is rule, model or default"""
+        route = rule_route(question)
+        source = "rule"
+        if route is None:
+            label, confidence = self.model.predict(question)
+            route, source = (label, "model") if confidence >= self.threshold else (TEAM, "default")
+        self.counts[f"{route}:{source}"] += 1
+        return route, source
+
+    def record(self, question: str, route: str, source: str, latency_seconds: float) -> None:
+        """Track end-to-end latency for a routed question"""
+        self.latency[route][0] += 1
+        self.latency[route][1] += latency_seconds
+        if self.log is not None:
+            self.log.record(question, route, source, latency_seconds)
+
+    def stats(self) -> dict:
+        """Routing counts and latency saved per class versus the leader path"""
+        means = {
+            route: total / count if count else None
+            for route, (count, total) in self.latency.items()
+        }
+        return {
+            "routes": self.counts,
+            "mean_latency_seconds": means,
+            "latency_saved_seconds": _savings(means),
+        }
+
+
+def _savings(means: dict[str, float | None]) -> dict[str, float | None]:
+    leader = means.get(TEAM)
+    return {
+        route: leader - mean if leader is not None and mean is not None else None
+        for route, mean in means.items() if route != TEAM
+    }
+
+
+def evaluate(
+    samples: list[tuple[str, str]],
+    extra_training: list[tuple[str, str]] = (),
+    threshold: float = CONFIDENCE_THRESHOLD,
+) -> dict:
+    """Hold out a deterministic 20% split and measure routing accuracy per class
+
+    Accuracy counts a question as correct only when it reaches its labelled
+    route. Dispatch precision covers the questions sent straight to a member:
+    sending a question to the leader is never wrong, only slower.
+    """
+    held_out, training = [], list(extra_training)
+    for sample in samples:
+        in_holdout = zlib.crc32(normalize_title(sample[0]).encode()) % 5 == 0
+        (held_out if in_holdout else training).append(sample)
+    model = HashedNaiveBayes.from_dict(train(training)["model"])
+    router = IntentRouter(threshold=threshold, model=model)
+
+    per_class = {route: {"questions": 0, "correct": 0, "dispatched": 0, "misrouted": 0} for route in ROUTES}
+    for question, expected in held_out:
+        route, _ = router.route(question)
+        row = per_class[expected]
+        row["questions"] += 1
+        row["correct"] += route == expected
+        if route != TEAM:
+            per_class[route]["dispatched"] += 1
+            per_class[route]["misrouted"] += route != expected
+
+    for row in per_class.values():
+        row["accuracy"] = row["correct"] / row["questions"] if row["questions"] else None
+        row["dispatch_precision"] = (
+            1 - row["misrouted"] / row["dispatched"] if row["dispatched"] else None
+        )
+    return {"trained_on": len(training), "held_out": len(held_out), "classes": per_class}
+
+
+def load_labels(path: str | None) -> list[tuple[str, str]]:
+    """Labelled questions from a JSONL file of {"question", "route"} objects"""
+    if not path:
+        return []
+    samples = []
+    for line in Path(path).read_text().splitlines():
+        if line.strip():
+            item = json.loads(line)
+            if item["route"] in ROUTES:
+                samples.append((item["question"], item["route"]))
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train, evaluate or report on the team intent router")
+    parser.add_argument("command", choices=["train", "evaluate", "report"])
+    parser.add_argument("--labels", help="JSONL file of labelled questions")
+    parser.add_argument("--db", default=DB_FILE, help="SQLite file holding the routing log")
+    parser.add_argument("--output", default=str(MODEL_PATH), help="Where to write the trained model")
+    args = parser.parse_args()
+
+    if args.command == "train":
+        samples = list(SEED_EXAMPLES) + load_labels(args.labels)
+        Path(args.output).write_text(json.dumps(train(samples)))
+        print(f"Trained on {len(samples)} questions -> {args.output}")
+        return
+
+    if args.command == "evaluate":
+        labels = load_labels(args.labels)
+        report = evaluate(labels, list(SEED_EXAMPLES)) if labels else evaluate(list(SEED_EXAMPLES))
+        print(f"Trained on {report['trained_on']}, evaluated on {report['held_out']} held-out questions")
+        print("class    questions  accuracy  dispatched  precision")
+        for route, row in report["classes"].items():
+            accuracy = f"{row['accuracy']:.1%}" if row["accuracy"] is not None else "-"
+            precision = f"{row['dispatch_precision']:.1%}" if row["dispatch_precision"] is not None else "-"
+            print(f"{route:<8} {row['questions']:>9}  {accuracy:>8}  {row['dispatched']:>10}  {precision:>9}")
+        return
+
+    storage = get_storage() if args.db == DB_FILE else Storage(args.db)
+    by_route = RoutingLog(storage).latency_by_route()
+    saved = _savings({route: row["mean_seconds"] for route, row in by_route.items()})
+    print("route    requests  mean latency  saved vs leader")
+    for route, row in sorted(by_route.items()):
+        delta = f"{saved[route]:.2f}s" if saved.get(route) is not None else "-"
+        print(f"{route:<8} {row['requests']:>8}  {row['mean_seconds']:>11.2f}s  {delta:>15}")
+
+
+if __name__ == "__main__":
+    main()
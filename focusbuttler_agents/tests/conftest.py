@@ -0,0 +1,11 @@
+"""Shared test setup: keep storage local to the test run"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Set before any app module is imported, since settings are read at import time
+os.environ.setdefault("HYPERFOCUS_DB_FILE", str(Path(tempfile.mkdtemp(prefix="hyperfocus-tests-")) / "test.db"))
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
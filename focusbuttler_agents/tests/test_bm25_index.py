@@ -0,0 +1,41 @@
+from types import SimpleNamespace
+
+import knowledge.bm25_index as bm25
+from knowledge.bm25_index import BM25Index
+
+DOCUMENTS = [
+    {"id": "a", "title": "book p1", "text": "Checking email breaks hyperfocus", "source": "book.pdf", "chunk": "p1"},
+    {"id": "b", "title": "book p2", "text": "Scatterfocus lets the mind wander", "source": "book.pdf", "chunk": "p2"},
+    {"id": "c", "title": "book p3", "text": "Email batching keeps attention space clear", "source": "book.pdf", "chunk": "p3"},
+]
+
+
+def test_index_round_trips_documents_outside_the_header(tmp_path):
+    path = tmp_path / "bm25.idx"
+    BM25Index.write(DOCUMENTS, path)
+    index = BM25Index.load(path)
+
+    assert len(index) == 3
+    assert set(index.ids) == {"a", "b", "c"}
+    assert index.get("b") == DOCUMENTS[1]
+    results = index.search("email", 5)
+    assert {doc["id"] for doc, _ in results} == {"a", "c"}
+    assert b"Scatterfocus" not in path.read_bytes()[:200]
+
+
+def test_hybrid_search_fuses_rows_on_source_and_chunk(tmp_path, monkeypatch):
+    path = tmp_path / "bm25.idx"
+    BM25Index.write(DOCUMENTS, path)
+    monkeypatch.setattr(bm25, "_index", BM25Index.load(path))
+
+    def row(chunk, text):
+        # Vector rows have their own ids; only the metadata matches
+        return SimpleNamespace(
+            id=f"lance-{chunk}", name="book", content=text, meta_data={"source": "book.pdf", "chunk": chunk, "sha256": "x"}
+        )
+
+    kb = SimpleNamespace(search=lambda query, max_results: [row("p3", DOCUMENTS[2]["text"]), row("p2", DOCUMENTS[1]["text"])])
+    results = bm25.hybrid_search("email", kb, limit=3)
+    # p3 is found by both and ranks first; p2 only by the vector search
+    assert [doc["id"] for doc in results] == ["c", "a", "lance-p2"]
+    assert results[2]["chunk"] == "p2"
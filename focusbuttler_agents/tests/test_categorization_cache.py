@@ -0,0 +1,89 @@
+import asyncio
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from agents.categorization_cache import CategorizationCache
+from agents.task_categorizer import TaskCategorization, TaskType
+from core.storage import Storage
+
+# `agents.categorization_cache` is also the name of the shared cache
+module = sys.modules["agents.categorization_cache"]
+
+
+def _answer(category=TaskType.NECESSARY):
+    return TaskCategorization(
+        category=category,
+        reasoning="Test",
+        suggested_time_of_day="afternoon",
+        estimated_energy_required="low",
+    )
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(module, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def test_results_survive_a_restart(tmp_path, clock):
+    storage = Storage(str(tmp_path / "cache.db"))
+    CategorizationCache(TaskCategorization, storage).set("Reply to emails!", _answer())
+    storage.writer.flush()
+
+    restarted = CategorizationCache(TaskCategorization, storage)
+    first = restarted.get("reply to   EMAILS")
+    second = asyncio.run(restarted.aget("Reply to emails"))
+
+    assert first == _answer()
+    assert second == _answer()
+    # Read from SQLite once, then served from memory
+    assert restarted.stats()["disk_hits"] == 1
+    assert restarted.stats()["hits"] == 2
+
+
+def test_expired_entries_are_dropped_from_both_tiers(tmp_path, clock):
+    storage = Storage(str(tmp_path / "cache.db"))
+    cache = CategorizationCache(TaskCategorization, storage, ttl_seconds=60)
+    cache.set("Standup", _answer())
+    storage.writer.flush()
+
+    clock[0] += 59
+    assert cache.get("Standup") is not None
+    clock[0] += 1
+    assert cache.get("Standup") is None
+    storage.writer.flush()
+
+    assert storage.query("SELECT COUNT(*) FROM categorization_cache")[0][0] == 0
+    assert cache.stats()["memory_entries"] == 0
+    assert asyncio.run(CategorizationCache(TaskCategorization, storage, ttl_seconds=60).aget("Standup")) is None
+
+
+def test_least_recently_used_entries_are_evicted_from_memory(tmp_path, clock):
+    storage = Storage(str(tmp_path / "cache.db"))
+    cache = CategorizationCache(TaskCategorization, storage, max_entries=2)
+    cache.set("a", _answer(TaskType.PURPOSEFUL))
+    cache.set("b", _answer(TaskType.NECESSARY))
+    cache.get("a")  # Now "b" is the least recently used
+    cache.set("c", _answer(TaskType.DISTRACTING))
+    storage.writer.flush()
+
+    assert list(cache._memory) == ["a", "c"]
+    # The evicted entry is still on disk
+    assert cache.get("b").category is TaskType.NECESSARY
+    assert cache.stats()["disk_hits"] == 1
+    assert list(cache._memory) == ["c", "b"]
+
+
+def test_batch_lookups_count_each_title(tmp_path, clock):
+    storage = Storage(str(tmp_path / "cache.db"))
+    CategorizationCache(TaskCategorization, storage).set("Standup", _answer())
+    storage.writer.flush()
+    cache = CategorizationCache(TaskCategorization, storage)
+
+    results = asyncio.run(cache.aget_many(["Standup", "standup.", "Write essay"]))
+
+    assert results == [_answer(), _answer(), None]
+    assert (cache.stats()["hits"], cache.stats()["misses"], cache.stats()["disk_hits"]) == (2, 1, 1)
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from core.coalesce import coalesced
+
+
+def _counting():
+    calls = []
+
+    async def run(*args):
+        calls.append(args)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    return calls, run
+
+
+async def _together(*calls):
+    return await asyncio.gather(*calls)
+
+
+def test_normalised_fields_share_a_flight():
+    calls, run = _counting()
+
+    @coalesced(name="test_titles", normalize=("title",))
+    async def categorize(title: str, user_id: str = ""):
+        return await run(title, user_id)
+
+    results = asyncio.run(_together(categorize("Reply to emails "), categorize(title="reply  to EMAILS")))
+    assert len(calls) == 1
+    assert results == [1, 1]
+
+
+def test_identifiers_are_keyed_exactly():
+    calls, run = _counting()
+
+    # Even when a helper asks for it, user_id is never folded
+    @coalesced(name="test_users", normalize=("question", "user_id"))
+    async def advice(user_id: str, question: str):
+        return await run(user_id, question)
+
+    asyncio.run(_together(advice("Alice", "What next?"), advice("alice", "what next?")))
+    assert sorted(call[0] for call in calls) == ["Alice", "alice"]
+
+
+def test_free_text_is_keyed_exactly_by_default():
+    calls, run = _counting()
+
+    @coalesced(name="test_free_text")
+    async def coaching(user_id: str, context: str):
+        return await run(user_id, context)
+
+    asyncio.run(_together(coaching("u1", "Tired"), coaching("u1", "tired"), coaching("u1", "Tired")))
+    assert len(calls) == 2
+
+
+def test_unknown_normalised_field_is_rejected():
+    with pytest.raises(ValueError):
+        @coalesced(name="test_unknown", normalize=("missing",))
+        async def helper(title: str):
+            return title
+
+
+def test_flight_timeout_is_per_helper():
+    @coalesced(name="test_timeout", timeout=0.01)
+    async def slow():
+        await asyncio.sleep(1)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(slow())
+    assert slow.single_flight.timeouts == 1
@@ -0,0 +1,39 @@
+import asyncio
+import sys
+from types import SimpleNamespace
+
+from agents.context_builder import ContextBuilder
+from core.storage import Storage
+
+# `agents.context_builder` is also the name of the shared builder
+module = sys.modules["agents.context_builder"]
+
+
+class FakeMemoryDb:
+    def __init__(self, memories):
+        self.memories = memories
+
+    def get_user_memories(self, user_id, limit):
+        return [SimpleNamespace(memory=text, updated_at=0) for text in self.memories]
+
+
+def test_invalidation_reaches_the_other_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(module, "worker_count", lambda: 2)
+    storage = Storage(str(tmp_path / "context.db"))
+    db = FakeMemoryDb(["Works best in the morning"])
+    # Two builders on one database stand in for two workers
+    first, second = ContextBuilder(storage), ContextBuilder(storage)
+    first._db = second._db = db
+
+    async def memories(builder):
+        loaded, _ = await builder._user_memories("u1")
+        return [memory.text for memory in loaded]
+
+    async def scenario():
+        assert await memories(second) == ["Works best in the morning"]
+        db.memories = ["Works best in the evening"]
+        first.invalidate("u1")
+        storage.writer.flush()
+        return await memories(second)
+
+    assert asyncio.run(scenario()) == ["Works best in the evening"]
@@ -0,0 +1,88 @@
+import asyncio
+import sys
+
+import numpy as np
+
+from agents.day_planner import (
+    HOURS,
+    HYPERFOCUS,
+    SCHEDULED,
+    TASK_TYPES,
+    UNSCHEDULED,
+    PlanRequest,
+    plan_batch,
+    plan_day,
+)
+from agents.task_categorizer import TaskType
+
+module = sys.modules["agents.day_planner"]
+
+# A flat curve makes every 90-minute window a Hyperfocus block:
+# 09:00, 10:45, 12:30, 14:15 and a 60-minute one at 16:00
+FLAT = np.full((1, HOURS), 3.0)
+PURPOSEFUL = TASK_TYPES.index(TaskType.PURPOSEFUL)
+
+
+def _plan(minutes, curves=FLAT):
+    n = len(minutes)
+    return plan_batch(np.zeros(n), np.full(n, PURPOSEFUL), np.full(n, 3.0), np.array(minutes), curves)
+
+
+def _pieces(batch, task):
+    mine = batch.segment_task == task
+    return batch.segment_block[mine], batch.segment_start[mine], batch.segment_minutes[mine]
+
+
+def test_tasks_that_fit_a_block_are_placed_whole():
+    batch = _plan([80, 60, 20, 45, 70])
+    for task in range(5):
+        blocks, _, minutes = _pieces(batch, task)
+        assert len(blocks) == 1
+        assert minutes[0] == [80, 60, 20, 45, 70][task]
+    assert (batch.status == SCHEDULED).all()
+
+    # Pieces in a block follow each other and end inside it
+    for block in np.unique(batch.segment_block):
+        mine = np.flatnonzero(batch.segment_block == block)
+        mine = mine[np.argsort(batch.segment_start[mine])]
+        ends = batch.segment_start[mine] + batch.segment_minutes[mine]
+        assert batch.segment_start[mine[0]] == batch.block_start[block]
+        assert (batch.segment_start[mine[1:]] == ends[:-1]).all()
+        assert ends[-1] <= batch.block_start[block] + batch.block_minutes[block]
+
+
+def test_short_task_goes_into_a_block_with_room_instead_of_splitting():
+    batch = _plan([80, 80, 80, 80, 20])
+    blocks, _, minutes = _pieces(batch, 4)
+    assert list(minutes) == [20]
+    assert batch.block_kind[blocks[0]] == HYPERFOCUS
+
+
+def test_only_tasks_longer_than_every_block_are_split_into_adjacent_blocks():
+    batch = _plan([200, 30])
+    blocks, starts, minutes = _pieces(batch, 0)
+    assert minutes.sum() == 200
+    assert len(blocks) == 3
+    hyperfocus = np.flatnonzero(batch.block_kind == HYPERFOCUS)
+    positions = np.searchsorted(hyperfocus, blocks[np.argsort(starts)])
+    assert (np.diff(positions) == 1).all()
+    assert len(_pieces(batch, 1)[0]) == 1
+
+
+def test_task_that_fits_no_block_whole_is_left_unscheduled():
+    # 40 free minutes remain in each 90-minute block, and 10 in the last one
+    batch = _plan([50, 50, 50, 50, 50, 45])
+    assert batch.status[5] == UNSCHEDULED
+    assert len(_pieces(batch, 5)[0]) == 0
+
+
+def test_plan_day_falls_back_to_the_template_when_the_narrator_fails(monkeypatch):
+    class Broken:
+        async def arun(self, prompt):
+            raise RuntimeError("model unavailable")
+
+    monkeypatch.setattr(module, "day_plan_narrator", Broken())
+    request = PlanRequest(tasks=[{"title": "Email", "taskType": "necessary", "estimatedMinutes": 20}])
+    plan = asyncio.run(plan_day(request))
+    assert plan.summary_source == "template"
+    assert plan.summary
@@ -0,0 +1,103 @@
+from datetime import datetime, time, timedelta, timezone
+
+import numpy as np
+
+from analytics.energy_profile import (
+    EnergyEntryIn,
+    EnergyProfileStore,
+    _entry_arrays,
+    _session_arrays,
+    compute_profiles,
+)
+from core.storage import Storage
+
+NOW = datetime(2026, 3, 9, 12, tzinfo=timezone.utc).timestamp()
+
+
+def _entries(user, levels_by_hour, days=3):
+    """Hourly check-ins over the last few days; hours not listed are moderate"""
+    rows = []
+    for day in range(days):
+        for hour in range(24):
+            ts = NOW - (day + 1) * 86400 + hour * 3600
+            rows.append((user, levels_by_hour.get(hour, 2), ts, hour, day % 7))
+    return rows
+
+
+def test_peak_and_dip_windows_wrap_around_midnight():
+    rows = _entries("owl", {23: 4, 0: 4, 14: 0, 15: 0}) + _entries("flat", {})
+    profiles = compute_profiles(_entry_arrays(rows), _session_arrays([]), NOW)
+
+    owl = profiles["owl"]
+    assert owl.peak_hours == (23, 1)
+    assert owl.dip_hours == (14, 16)
+    assert owl.hourly[23] > owl.hourly[12] > owl.hourly[14]
+    assert owl.entries == 72
+    # A flat profile has no peak or dip
+    assert profiles["flat"].peak_hours is None
+    assert profiles["flat"].dip_hours is None
+
+
+def test_session_medians_completion_and_best_hour():
+    rows = [
+        # user, minutes, completed, start hour
+        ("odd", 25, True, 9), ("odd", 50, True, 9), ("odd", 90, True, 14), ("odd", 5, False, 14),
+        ("even", 20, True, 10), ("even", 40, True, 10), ("even", 30, False, 16), ("even", 60, True, 16),
+        ("quitter", 10, False, 8),
+    ]
+    profiles = compute_profiles(_entry_arrays([]), _session_arrays(rows), NOW)
+
+    # Medians of completed sessions only, grouped per user
+    assert profiles["odd"].typical_session_minutes == 50
+    assert profiles["even"].typical_session_minutes == 40
+    assert profiles["quitter"].typical_session_minutes is None
+    assert profiles["odd"].session_completion_rate == 0.75
+    assert profiles["quitter"].session_completion_rate == 0.0
+    assert profiles["odd"].best_session_hour == 9
+    assert profiles["even"].best_session_hour == 10
+    assert profiles["quitter"].best_session_hour is None  # Too few sessions at any hour
+
+
+def test_ultradian_cycle_is_found_in_the_check_ins():
+    rows = []
+    for k in range(600):
+        ts = NOW - 3 * 86400 + k * 600
+        level = round(float(np.clip(2 + 1.5 * np.sin(2 * np.pi * ts / 60 / 100), 0, 4)))
+        rows.append(("cyclic", level, ts, int(ts // 3600 % 24), 0))
+    rows += _entries("flat", {})
+    profiles = compute_profiles(_entry_arrays(rows), _session_arrays([]), NOW)
+
+    assert profiles["cyclic"].ultradian_minutes == 100
+    assert profiles["flat"].ultradian_minutes is None
+
+
+def test_users_without_data_have_no_profile(tmp_path):
+    assert compute_profiles(_entry_arrays([]), _session_arrays([]), NOW) == {}
+
+    store = EnergyProfileStore(Storage(str(tmp_path / "energy.db")))
+    assert store.refresh() == 0
+    assert store.get("nobody") is None
+
+    sessions_only = compute_profiles(_entry_arrays([]), _session_arrays([("u", 25, True, 9)]), NOW)["u"]
+    assert sessions_only.entries == 0
+    assert sessions_only.hourly == [None] * 24
+    assert sessions_only.peak_hours is None
+    assert sessions_only.ultradian_minutes is None
+
+
+def test_hour_and_weekday_come_from_the_same_local_day(tmp_path):
+    store = EnergyProfileStore(Storage(str(tmp_path / "energy.db")))
+    today = datetime.now(timezone.utc).date()
+    # Late last Monday in UTC, already 1am Tuesday for a user at UTC+2
+    monday = datetime.combine(today - timedelta(days=today.weekday() + 7), time(23, 30), timezone.utc)
+    store.ingest_entries([
+        EnergyEntryIn(userId="east", level="EnergyLevel.high", timestamp=monday, hourOfDay=1),
+        EnergyEntryIn(userId="west", level="low", timestamp=monday, hourOfDay=17),
+        EnergyEntryIn(userId="utc", level="peak", timestamp=monday),
+    ])
+    store.refresh()
+
+    east, west, utc = store.get("east"), store.get("west"), store.get("utc")
+    assert east.hourly[1] == 3.0 and east.weekday[1] == 3.0  # Tuesday
+    assert west.hourly[17] == 1.0 and west.weekday[0] == 1.0  # Still Monday
+    assert utc.hourly[23] == 4.0 and utc.weekday[0] == 4.0
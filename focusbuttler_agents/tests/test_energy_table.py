@@ -0,0 +1,75 @@
+import asyncio
+import sys
+from types import SimpleNamespace
+
+from agents.energy_advisor import EnergyAdvice
+from agents.energy_table import EnergyAdviceTable
+
+# `agents.energy_advisor` and `agents.energy_table` are also instance names
+advisor_module = sys.modules["agents.energy_advisor"]
+table_module = sys.modules["agents.energy_table"]
+
+
+def _advice(level):
+    return EnergyAdvice(
+        current_recommendation=f"Work suited to {level} energy",
+        optimal_task_type="purposeful",
+        reasoning="Test",
+        next_energy_shift=None,
+    )
+
+
+def test_build_keeps_the_cells_that_succeeded(tmp_path, capsys):
+    path = tmp_path / "table.json.gz"
+
+    async def advise(level, hour):
+        if level == "low":
+            raise RuntimeError("model down")
+        return _advice(level)
+
+    table = EnergyAdviceTable(EnergyAdvice, "v1", path)
+    asyncio.run(table.build(advise, variants=2))
+
+    assert table.lookup("peak", 9).current_recommendation == "Work suited to peak energy"
+    assert table.lookup("low", 9) is None
+    assert "48/240 answers failed" in capsys.readouterr().out
+    # The good cells were written
+    assert EnergyAdviceTable(EnergyAdvice, "v1", path).lookup("moderate", 14) is not None
+
+
+def test_failed_build_is_logged_cleared_and_retried(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(table_module, "BUILD_RETRY_SECONDS", 0.01)
+    calls = 0
+
+    async def advise(level, hour):
+        nonlocal calls
+        calls += 1
+        raise RuntimeError("model down")
+
+    table = EnergyAdviceTable(EnergyAdvice, "v1", tmp_path / "table.json.gz")
+
+    async def scenario():
+        table.ensure_fresh(advise)
+        while calls <= 120:  # One build asks for every cell once
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+
+    asyncio.run(scenario())
+    assert not table.ready
+    assert "Energy advice table build failed" in capsys.readouterr().out
+
+
+def test_cells_missing_from_the_table_fall_back_to_the_model(tmp_path, monkeypatch):
+    prompts = []
+
+    async def arun(prompt, **kwargs):
+        prompts.append(prompt)
+        return SimpleNamespace(content=_advice("live"))
+
+    monkeypatch.setattr(advisor_module, "energy_table", EnergyAdviceTable(EnergyAdvice, "v1", tmp_path / "none.json.gz"))
+    monkeypatch.setattr(advisor_module, "energy_advisor", SimpleNamespace(name="EnergyAdvisor", arun=arun))
+
+    advice = asyncio.run(advisor_module.get_energy_advice("peak", 9))
+
+    assert advice.current_recommendation == "Work suited to live energy"
+    assert len(prompts) == 1
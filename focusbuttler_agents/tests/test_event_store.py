@@ -0,0 +1,52 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from analytics.event_store import Event, EventStore, NDJSONIngest
+
+
+def _events(user_id, count):
+    start = datetime.now(timezone.utc) - timedelta(minutes=count)
+    return [Event(user_id=user_id, type="distraction", timestamp=start + timedelta(minutes=i)) for i in range(count)]
+
+
+def test_compaction_keeps_every_event_once(tmp_path):
+    store = EventStore(tmp_path)
+    for _ in range(4):
+        store.append(_events("u1", 5))
+    assert store.compact(min_parts=2) == 1
+    assert store.scan("u1", datetime.now(timezone.utc) - timedelta(days=1)).num_rows == 20
+
+
+def test_scan_waits_for_a_compaction_swap_in_another_process(tmp_path):
+    # Two stores on one root stand in for two workers: flock is per open file
+    compacting, reading = EventStore(tmp_path), EventStore(tmp_path)
+    reading.append(_events("u1", 3))
+    scanned = []
+
+    def scan():
+        scanned.append(reading.scan("u1", datetime.now(timezone.utc) - timedelta(days=1)).num_rows)
+
+    with compacting._locked(exclusive=True):
+        thread = threading.Thread(target=scan)
+        thread.start()
+        time.sleep(0.2)
+        assert scanned == []
+    thread.join(5)
+    assert scanned == [3]
+
+
+def test_ingest_rejects_events_missing_their_type_fields():
+    ingest = NDJSONIngest()
+    lines = [
+        {"userId": "u1", "type": "energy", "timestamp": "2026-10-18T09:00:00Z"},
+        {"userId": "u1", "type": "energy", "timestamp": "2026-10-18T09:00:00Z", "energyLevel": "peak"},
+        {"userId": "u1", "type": "session_start", "timestamp": "2026-10-18T09:00:00Z"},
+        {"userId": "u1", "type": "session_end", "timestamp": "2026-10-18T10:00:00Z", "sessionId": "s1"},
+        {"userId": "u1", "type": "session_end", "timestamp": "2026-10-18T10:00:00Z", "sessionId": "s1",
+         "durationMinutes": 60, "completed": True},
+    ]
+    events = ingest.feed("\n".join(json.dumps(line) for line in lines).encode()) + ingest.close()
+    assert [event.type for event in events] == ["energy", "session_end"]
+    assert [error["line"] for error in ingest.errors] == [1, 3, 4]
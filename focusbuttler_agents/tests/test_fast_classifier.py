@@ -0,0 +1,87 @@
+import asyncio
+import json
+import sys
+from types import SimpleNamespace
+
+from agents.categorization_cache import CategorizationCache
+from agents.fast_classifier import FastClassifier, train
+from agents.task_categorizer import TaskCategorization, TaskType
+
+# `agents.task_categorizer` is also the name of the categorizer agent
+module = sys.modules["agents.task_categorizer"]
+
+SAMPLES = [
+    (f"{verb} {thing}", category, time_of_day, energy)
+    for category, time_of_day, energy, verbs, things in [
+        ("purposeful", "morning", "high", ["write", "draft", "design"], ["chapter", "proposal", "architecture", "essay"]),
+        ("necessary", "afternoon", "low", ["file", "pay", "renew"], ["invoices", "taxes", "insurance", "expenses"]),
+        ("distracting", "evening", "low", ["scroll", "check", "browse"], ["twitter", "instagram", "reddit", "news"]),
+    ]
+    for verb in verbs
+    for thing in things
+]
+
+
+def _classifier(tmp_path, threshold):
+    path = tmp_path / "classifier.json"
+    path.write_text(json.dumps(train(SAMPLES)))
+    return FastClassifier(path, threshold=threshold)
+
+
+def test_confident_titles_are_answered_with_the_category_defaults(tmp_path):
+    classifier = _classifier(tmp_path, threshold=0.9)
+
+    result = classifier.classify("Write proposal")
+
+    assert result.category is TaskType.PURPOSEFUL
+    assert result.suggested_time_of_day == "morning"
+    assert result.estimated_energy_required == "high"
+    assert classifier.stats()["answered"] == 1
+
+
+def test_titles_below_the_threshold_are_deferred(tmp_path):
+    title = "plan the week"  # Nothing like the training titles
+    _, confidence = _classifier(tmp_path, threshold=0.0).model.predict(title)
+    assert confidence < 0.9
+
+    assert _classifier(tmp_path, threshold=confidence).classify(title) is not None
+    strict = _classifier(tmp_path, threshold=confidence + 0.01)
+    assert strict.classify(title) is None
+    assert strict.stats()["deferred"] == 1
+
+
+def test_untrained_classifier_answers_nothing(tmp_path):
+    classifier = FastClassifier(tmp_path / "missing.json")
+
+    assert classifier.classify("Write proposal") is None
+    assert classifier.stats()["trained"] is False
+
+
+def test_categorizer_agent_answers_what_the_classifier_defers(tmp_path, monkeypatch):
+    answer = TaskCategorization(
+        category=TaskType.UNNECESSARY,
+        reasoning="Busywork",
+        suggested_time_of_day="afternoon",
+        estimated_energy_required="low",
+    )
+    prompts, logged = [], []
+
+    async def arun(prompt, **kwargs):
+        prompts.append(prompt)
+        return SimpleNamespace(content=answer)
+
+    monkeypatch.setattr(module, "fast_classifier", _classifier(tmp_path, threshold=1.01))
+    monkeypatch.setattr(module, "categorization_cache", CategorizationCache(TaskCategorization))
+    monkeypatch.setattr(module, "categorization_log", SimpleNamespace(record=lambda title, result: logged.append(title)))
+    monkeypatch.setattr(module, "task_categorizer", SimpleNamespace(name="TaskCategorizer", arun=arun))
+
+    assert asyncio.run(module.categorize_task("Reorganise the sock drawer")) is answer
+    assert len(prompts) == 1
+    # The agent's answer is cached and logged as training data
+    assert logged == ["Reorganise the sock drawer"]
+    assert module.categorization_cache.get("reorganise the sock drawer") is answer
+
+    # A confident classifier keeps the agent out of the way
+    monkeypatch.setattr(module, "fast_classifier", _classifier(tmp_path, threshold=0.9))
+    assert asyncio.run(module.categorize_task("Check instagram")).category is TaskType.DISTRACTING
+    assert len(prompts) == 1
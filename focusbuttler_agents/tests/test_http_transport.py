@@ -0,0 +1,48 @@
+import asyncio
+import socket
+
+import main
+from core import models
+from core.http_transport import SharedTransport, http_transport
+
+
+def _closed_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_model_clients_share_one_http_client(monkeypatch):
+    monkeypatch.setattr(models, "FAKE_MODEL", "")
+    monkeypatch.setenv("MISTRAL_API_KEY", "test")
+
+    small = models.chat_model("mistral-small-latest").get_client().sdk_configuration
+    large = models.chat_model("mistral-large-latest").get_client().sdk_configuration
+
+    assert small.client is large.client is http_transport.sync_client
+    assert small.async_client is large.async_client is http_transport.async_client
+
+
+def test_shutdown_stops_warming_and_closes_the_clients(monkeypatch, capsys):
+    transport = SharedTransport(base_url=f"http://127.0.0.1:{_closed_port()}", http2=False, warm_connections=2)
+    monkeypatch.setattr(main, "http_transport", transport)
+
+    async def scenario():
+        await transport.start()
+        while not transport.warm_pings:
+            await asyncio.sleep(0.01)
+        loop_task = transport._loop_task
+        async_client, sync_client = transport.async_client, transport.sync_client
+
+        await main.close_http_transport()
+        await asyncio.sleep(0)
+        return loop_task, async_client, sync_client
+
+    loop_task, async_client, sync_client = asyncio.run(scenario())
+
+    assert loop_task.cancelled()
+    assert async_client.is_closed and sync_client.is_closed
+    assert transport.warm_failures == 1  # Nothing listens there
+    assert "HTTP warm-up" in capsys.readouterr().out
+    # A later model client gets a fresh pool rather than a closed one
+    assert transport._async_client is None and transport._sync_client is None
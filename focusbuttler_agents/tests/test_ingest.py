@@ -0,0 +1,89 @@
+import json
+
+from knowledge.ingest import ingest
+
+
+class FakeVectorDb:
+    """Rows keyed by their metadata, as the vector store's own ids can't be predicted"""
+
+    def __init__(self):
+        self.rows: list[dict] = []
+
+    def delete_by_metadata(self, metadata: dict) -> bool:
+        matched = [row for row in self.rows if metadata.items() <= row.items()]
+        self.rows = [row for row in self.rows if row not in matched]
+        return bool(matched)
+
+
+class FakeKnowledge:
+    def __init__(self):
+        self.vector_db = FakeVectorDb()
+
+    def load_documents(self, documents) -> None:
+        self.vector_db.rows += [dict(document.meta_data) for document in documents]
+
+
+def _sections(vector_db) -> list[str]:
+    return sorted(row["position"] for row in vector_db.rows)
+
+
+def test_changed_section_replaces_its_row(tmp_path):
+    kb, manifest = FakeKnowledge(), tmp_path / "manifest.json"
+    source = tmp_path / "notes.md"
+    source.write_text("# One\nfirst\n# Two\nsecond\n")
+    first = ingest(kb, [source], manifest_path=manifest)
+    assert (first.chunks_added, _sections(kb.vector_db)) == (2, ["s1", "s2"])
+
+    source.write_text("# One\nfirst\n# Two\nsecond, edited\n")
+    second = ingest(kb, [source], manifest_path=manifest)
+    assert (second.chunks_added, second.chunks_deleted, second.chunks_unchanged) == (1, 1, 1)
+    assert len(kb.vector_db.rows) == 2
+    recorded = json.loads(manifest.read_text())["files"][str(source)]["chunks"].values()
+    assert {row["sha256"] for row in kb.vector_db.rows} == {chunk["sha256"] for chunk in recorded}
+
+
+def test_inserted_section_is_the_only_chunk_embedded(tmp_path):
+    kb, manifest = FakeKnowledge(), tmp_path / "manifest.json"
+    source = tmp_path / "notes.md"
+    source.write_text("# One\nfirst\n# Two\nsecond\n# Three\nthird\n")
+    ingest(kb, [source], manifest_path=manifest)
+
+    source.write_text("# Zero\nnew\n# One\nfirst\n# Two\nsecond\n# Three\nthird\n")
+    report = ingest(kb, [source], manifest_path=manifest)
+    assert (report.chunks_added, report.chunks_deleted, report.chunks_unchanged) == (1, 0, 3)
+    assert len(kb.vector_db.rows) == 4
+
+
+def test_repeated_sections_get_a_row_each(tmp_path):
+    kb, manifest = FakeKnowledge(), tmp_path / "manifest.json"
+    source = tmp_path / "notes.md"
+    source.write_text("# Break\nwalk\n# Break\nwalk\n")
+    assert ingest(kb, [source], manifest_path=manifest).chunks_added == 2
+
+    source.write_text("# Break\nwalk\n")
+    report = ingest(kb, [source], manifest_path=manifest)
+    assert (report.chunks_deleted, report.chunks_unchanged, len(kb.vector_db.rows)) == (1, 1, 1)
+
+
+def test_rows_already_gone_are_not_counted_as_deleted(tmp_path):
+    kb, manifest = FakeKnowledge(), tmp_path / "manifest.json"
+    source = tmp_path / "notes.md"
+    source.write_text("# One\nfirst\n")
+    ingest(kb, [source], manifest_path=manifest)
+    kb.vector_db.rows.clear()
+
+    source.write_text("# One\nchanged\n")
+    report = ingest(kb, [source], manifest_path=manifest)
+    assert (report.chunks_deleted, report.chunks_not_found) == (0, 1)
+
+
+def test_pruned_source_deletes_its_rows(tmp_path):
+    kb, manifest = FakeKnowledge(), tmp_path / "manifest.json"
+    kept, dropped = tmp_path / "kept.md", tmp_path / "dropped.md"
+    kept.write_text("# Kept\ntext\n")
+    dropped.write_text("# A\na\n# B\nb\n")
+    ingest(kb, [kept, dropped], manifest_path=manifest)
+
+    report = ingest(kb, [kept], manifest_path=manifest)
+    assert (report.files_removed, report.chunks_deleted) == (1, 2)
+    assert [row["source"] for row in kb.vector_db.rows] == [str(kept)]
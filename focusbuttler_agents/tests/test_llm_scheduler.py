@@ -0,0 +1,36 @@
+import asyncio
+from types import SimpleNamespace
+
+from core.llm_scheduler import ModelBudget, ModelLane, Priority, _is_rate_limit
+
+
+class ModelRateLimitError(Exception):
+    pass
+
+
+class ProviderError(Exception):
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def test_rate_limits_are_told_by_status_code_or_type_not_message():
+    assert _is_rate_limit(ProviderError("Too many requests", status_code=429))
+    assert _is_rate_limit(ModelRateLimitError("slow down"))
+    wrapped = RuntimeError("model failed")
+    wrapped.__cause__ = ProviderError("busy", status_code=429)
+    assert _is_rate_limit(wrapped)
+    assert not _is_rate_limit(ValueError("Task 429 failed: rate limit of 5 reached"))
+    assert not _is_rate_limit(ProviderError("server error", status_code=500))
+
+
+def test_release_settles_the_clamped_reservation():
+    async def scenario():
+        lane = ModelLane("m", ModelBudget(concurrency=1, tokens_per_minute=1000))
+        # The estimate is more than a minute's budget, so only 1000 are taken
+        await lane.acquire(Priority.TASK, 5000, None)
+        lane.release(5000, used=800)
+        return lane._tokens
+
+    # 1000 taken, 800 used: only the unused 200 comes back
+    assert asyncio.run(scenario()) < 210
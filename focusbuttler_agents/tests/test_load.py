@@ -0,0 +1,63 @@
+import asyncio
+import dataclasses
+import importlib
+import sys
+
+import pytest
+
+import main
+from agents.session_scheduler import SessionMessages, SessionScheduler
+from benchmarks import load
+from core import models
+
+# `agents.focus_guardian` is also the name of the FocusGuardian agent
+focus_guardian_module = sys.modules["agents.focus_guardian"]
+
+# The agents are built with the agno 2.x API (agents/productivity_coach.py)
+AGENTS_BUILD = hasattr(importlib.import_module("agno.memory"), "AgentMemory")
+
+
+@pytest.fixture
+def sessions(tmp_path, monkeypatch):
+    """The app on the fake model, with a scheduler of its own; returns the messages it sent"""
+    # The knowledge index and event store write relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(models, "FAKE_MODEL", "instant")
+    monkeypatch.setattr(main, "FAKE_MODEL", "instant")
+    monkeypatch.setenv("ENERGY_TABLE_AUTOBUILD", "0")
+    sent = []
+    messages = focus_guardian_module.session_scheduler.messages
+
+    def recorded(kind):
+        async def message(*args):
+            sent.append(kind)
+            return await getattr(messages, kind)(*args)
+        return message
+
+    scheduler = SessionScheduler(SessionMessages(**{
+        field.name: recorded(field.name) for field in dataclasses.fields(SessionMessages)
+    }))
+    monkeypatch.setattr(main, "session_scheduler", scheduler)
+    monkeypatch.setattr(focus_guardian_module, "session_scheduler", scheduler)
+    return sent
+
+
+def _run(names):
+    return asyncio.run(load.run(names, requests=4, concurrency=2, distinct=2))
+
+
+def test_focus_session_scenario_opens_and_ends_sessions(sessions):
+    results = _run(["focus_session"])
+
+    assert results["focus_session"]["errors"] == 0
+    assert sorted(sessions) == ["distraction"] * 4 + ["end"] * 4 + ["start"] * 4
+    assert main.session_scheduler.stats()["active_sessions"] == 0
+
+
+@pytest.mark.skipif(not AGENTS_BUILD, reason="The installed agno cannot build the agents")
+def test_every_scenario_runs_against_the_app(sessions):
+    results = _run(list(load.SCENARIOS))
+
+    assert set(results) == set(load.SCENARIOS)
+    # Streams that end in an error event count as errors too
+    assert {name: result["errors"] for name, result in results.items() if result["errors"]} == {}
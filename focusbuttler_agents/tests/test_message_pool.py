@@ -0,0 +1,62 @@
+import asyncio
+
+from agents.message_pool import MessagePool
+from core.storage import Storage
+
+BUCKET = ("start", "hyperfocus")
+
+
+def _pool(storage, generated):
+    async def generate(bucket, count):
+        generated.append((bucket, count))
+        return [f"{'|'.join(bucket)} variant {len(generated)}.{i}" for i in range(count)]
+
+    return MessagePool(generate, storage, variants_per_bucket=4, low_watermark=1)
+
+
+def test_warming_fills_every_bucket_once_and_persists_it(tmp_path):
+    storage = Storage(str(tmp_path / "pool.db"))
+    generated = []
+    pool = _pool(storage, generated)
+    buckets = [BUCKET, ("start", "scatterfocus")]
+
+    async def scenario():
+        pool.warm(buckets)
+        await asyncio.gather(*pool._refilling.values())
+        pool.warm(buckets)  # Already full
+        assert not pool._refilling
+        await storage.write("SELECT 1")
+
+    asyncio.run(scenario())
+    assert sorted(generated) == sorted((bucket, 4) for bucket in buckets)
+    assert pool.stats()["available"] == 8
+    # Another worker (or a restart) loads the variants from SQLite
+    assert _pool(storage, []).stats()["available"] == 8
+
+
+def test_variant_served_during_a_reload_is_not_served_again(tmp_path, monkeypatch):
+    storage = Storage(str(tmp_path / "pool.db"))
+    pool = _pool(storage, [])
+    served = []
+
+    async def scenario():
+        pool.warm([BUCKET])
+        await asyncio.gather(*pool._refilling.values())
+        read = storage.aquery
+
+        async def aquery(sql, params=()):
+            rows = await read(sql, params)
+            # Served after the read, before the reload replaces the pool;
+            # its DELETE is still queued
+            served.append(pool.take(BUCKET))
+            return rows
+
+        monkeypatch.setattr(storage, "aquery", aquery)
+        await pool._refill(BUCKET)
+        monkeypatch.undo()
+        served.extend(pool.take(BUCKET) for _ in range(pool.stats()["available"]))
+
+    asyncio.run(scenario())
+    # Three old variants and one new one left after the first was served
+    assert len(served) == 5
+    assert len(set(served)) == len(served)
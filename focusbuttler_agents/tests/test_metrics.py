@@ -0,0 +1,47 @@
+import asyncio
+from types import SimpleNamespace
+
+import agno.db
+from agno.models.message import Message
+
+from benchmarks.fake_model import PROFILES, FakeChat
+from core import storage
+from core.metrics import agent_runs_total, instrument_member, start_trace
+from core.models import _instrumented
+
+
+class FakeSqliteDb:
+    """Stands in for agno's SqliteDb, which the traced subclass extends"""
+
+    def __init__(self, **kwargs):
+        pass
+
+    def get_user_memories(self, user_id=None, limit=None):
+        return []
+
+
+def test_spans_time_model_calls_and_memory_reads_separately(tmp_path, monkeypatch):
+    monkeypatch.setattr(agno.db, "SqliteDb", FakeSqliteDb, raising=False)
+    storage._memory_traced_sqlite_db.cache_clear()
+    model = _instrumented(FakeChat)(id="mistral-small-latest", profile=PROFILES["fast"])
+    db = storage.Storage(str(tmp_path / "trace.db")).agno_db()
+
+    async def run():
+        trace = start_trace()
+        await asyncio.to_thread(db.get_user_memories, user_id="u1")
+        await model.ainvoke(messages=[Message(role="user", content="Plan my morning")])
+        return trace
+
+    spans = asyncio.run(run()).spans
+    storage._memory_traced_sqlite_db.cache_clear()
+    assert set(spans) == {"memory", "model"}
+    assert spans["model"] > spans["memory"] > 0
+
+
+def test_team_member_runs_are_counted_under_the_member():
+    async def arun(message, **kwargs):
+        return SimpleNamespace(content="ok", metrics=None)
+
+    member = instrument_member(SimpleNamespace(name="MemberUnderTest", model=SimpleNamespace(id="m"), arun=arun))
+    asyncio.run(member.arun("How is my energy?"))
+    assert agent_runs_total._values[("MemberUnderTest", "m", "ok")] == 1
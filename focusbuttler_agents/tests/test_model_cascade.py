@@ -0,0 +1,45 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from agents.model_cascade import LARGE, SMALL, ModelCascade
+
+GOOD_ANSWER = (
+    "Start by blocking the next ninety minutes for your report, close every tab you "
+    "do not need, put your phone in another room and take a short walk when the block ends."
+)
+
+
+class Runner:
+    def __init__(self, seconds, content=GOOD_ANSWER):
+        self.seconds = seconds
+        self.content = content
+        self.calls = 0
+
+    async def arun(self, prompt, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.seconds)
+        return SimpleNamespace(content=self.content)
+
+
+def test_small_tier_is_cut_off_at_the_latency_budget():
+    small, large = Runner(1.0), Runner(0.0)
+    cascade = ModelCascade("test", small, large)
+
+    started = time.perf_counter()
+    content, tier = asyncio.run(cascade.run("How do I focus on my report?", latency_budget_ms=50))
+
+    assert time.perf_counter() - started < 0.5
+    assert (content, tier) == (None, SMALL)
+    assert large.calls == 0
+    assert cascade.stats()["timeouts"] == 1
+
+
+def test_rejected_small_answer_escalates_within_budget():
+    small, large = Runner(0.0, "I'm not sure."), Runner(0.0)
+    cascade = ModelCascade("test", small, large)
+
+    content, tier = asyncio.run(cascade.run("How do I focus on my report?", latency_budget_ms=60_000))
+
+    assert (content, tier) == (GOOD_ANSWER, LARGE)
+    assert cascade.escalations == {"too_short": 1}
@@ -0,0 +1,31 @@
+import asyncio
+
+from core.registry import LazyASGIApp
+
+
+def test_lazy_asgi_app_is_built_once_on_first_request():
+    builds = []
+
+    async def inner(scope, receive, send):
+        await send({"path": scope["path"]})
+
+    def factory():
+        builds.append(1)
+        return inner
+
+    app = LazyASGIApp(factory)
+    assert not app.built
+
+    async def serve():
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        await asyncio.gather(*(app({"type": "http", "path": f"/{i}"}, None, send) for i in range(3)))
+        return sent
+
+    sent = asyncio.run(serve())
+    assert app.built
+    assert len(builds) == 1
+    assert sorted(message["path"] for message in sent) == ["/0", "/1", "/2"]
@@ -0,0 +1,62 @@
+import asyncio
+
+from agents.session_scheduler import SessionMessages, SessionScheduler
+
+
+def _messages(end=None):
+    async def start(mode):
+        return f"start {mode}"
+
+    async def check(mode, elapsed, remaining, distractions):
+        return "check"
+
+    async def distraction(mode, count):
+        return "distraction"
+
+    async def finish(mode, completed, minutes, distractions):
+        if end is not None:
+            raise end
+        return "end"
+
+    return SessionMessages(start, check, distraction, finish)
+
+
+async def _drain(queue):
+    messages = []
+    while (message := await asyncio.wait_for(queue.get(), 1)) is not None:
+        messages.append(message)
+    return messages
+
+
+def test_listener_gets_end_of_stream_when_the_last_message_fails(capsys):
+    async def scenario():
+        scheduler = SessionScheduler(_messages(end=RuntimeError("model down")))
+        queue = await scheduler.open("s1", "hyperfocus", 25)
+        scheduler.end("s1", completed=False)
+        messages = await _drain(queue)
+        await scheduler.stop()
+        return messages, scheduler
+
+    messages, scheduler = asyncio.run(scenario())
+    assert messages == ["start hyperfocus"]
+    assert scheduler.inspect("s1") is None
+    assert "_finish failed: RuntimeError('model down')" in capsys.readouterr().out
+
+
+def test_finished_session_without_listener_is_evicted():
+    async def scenario():
+        scheduler = SessionScheduler(_messages(), finished_retention=0.05)
+        queue = await scheduler.open("s1", "scatterfocus", 25)
+        await asyncio.wait_for(queue.get(), 1)
+        scheduler.close("s1", queue)
+        scheduler.end("s1", completed=True)
+        await asyncio.sleep(0.01)
+        kept = scheduler.inspect("s1")
+        await asyncio.sleep(0.1)
+        await scheduler.stop()
+        return kept, scheduler
+
+    kept, scheduler = asyncio.run(scenario())
+    assert kept["finished"] and kept["undelivered"] == ["end"]
+    assert scheduler.inspect("s1") is None
+    assert scheduler.stats()["finished_sessions"] == 0
@@ -0,0 +1,63 @@
+import asyncio
+import sys
+
+import httpx
+
+import main
+from agents.session_scheduler import SessionMessages, SessionScheduler
+from sse import format_event
+
+# `agents.focus_guardian` is also the name of the FocusGuardian agent
+focus_guardian_module = sys.modules["agents.focus_guardian"]
+
+
+def _messages():
+    async def start(mode):
+        return f"start {mode}"
+
+    async def check(mode, elapsed, remaining, distractions):
+        return "check"
+
+    async def distraction(mode, count):
+        return "distraction"
+
+    async def end(mode, completed, minutes, distractions):
+        return "completed" if completed else "ended early"
+
+    return SessionMessages(start, check, distraction, end)
+
+
+def test_session_is_opened_paused_and_ended_over_http(monkeypatch):
+    scheduler = SessionScheduler(_messages())
+    monkeypatch.setattr(main, "session_scheduler", scheduler)
+    monkeypatch.setattr(focus_guardian_module, "session_scheduler", scheduler)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            stream = asyncio.create_task(client.post(
+                "/v1/sessions/start", params={"mode": "hyperfocus", "target_minutes": 25, "session_id": "s1"}
+            ))
+            while scheduler.inspect("s1") is None:
+                await asyncio.sleep(0.01)
+
+            paused = await client.post("/v1/sessions/s1/pause")
+            state = await client.get("/v1/sessions/s1")
+            ended = await client.post("/v1/sessions/s1/end", params={"completed": True})
+            response = await asyncio.wait_for(stream, 5)
+        await scheduler.stop()
+        return paused.json(), state.json(), ended.json(), response
+
+    paused, state, ended, response = asyncio.run(scenario())
+
+    assert paused == {"ok": True}
+    assert state["paused_at"] is not None
+    assert ended == {"ok": True}
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.text == "".join([
+        format_event("session", {"session_id": "s1"}),
+        format_event("message", {"text": "start hyperfocus"}),
+        format_event("message", {"text": "completed"}),
+        format_event("done", {}),
+    ])
+    assert scheduler.inspect("s1") is None
@@ -0,0 +1,80 @@
+import sqlite3
+
+import pytest
+
+from core import storage as storage_module
+from core.storage import BatchWriter, RemoteWriter, WriteServer
+
+
+class QuickBusyWriter(BatchWriter):
+    """Gives up on a locked database after 50 ms instead of the usual 5 s"""
+
+    def _open(self):
+        conn = super()._open()
+        conn.execute("PRAGMA busy_timeout=50")
+        return conn
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    path = str(tmp_path / "writer.db")
+    sqlite3.connect(path).executescript("PRAGMA journal_mode=WAL; CREATE TABLE t (x INTEGER)")
+    return path
+
+
+def test_busy_batch_fails_its_futures_and_writer_recovers(db_file):
+    writer = QuickBusyWriter(db_file)
+    blocker = sqlite3.connect(db_file, isolation_level=None)
+    blocker.execute("BEGIN EXCLUSIVE")
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            writer.submit("INSERT INTO t VALUES (1)").result(timeout=5)
+    finally:
+        blocker.execute("ROLLBACK")
+
+    assert writer.submit("INSERT INTO t VALUES (2)").result(timeout=5) == 1
+    writer.flush(timeout=5)
+    assert sqlite3.connect(db_file).execute("SELECT x FROM t").fetchall() == [(2,)]
+    writer.close()
+
+
+def test_bad_statement_fails_alone(db_file):
+    writer = BatchWriter(db_file)
+    good = writer.submit("INSERT INTO t VALUES (1)")
+    bad = writer.submit("INSERT INTO missing VALUES (1)")
+    with pytest.raises(sqlite3.OperationalError):
+        bad.result(timeout=5)
+    assert good.result(timeout=5) == 1
+    writer.close()
+
+
+def test_cancelled_future_does_not_stop_the_writer(db_file):
+    writer = BatchWriter(db_file)
+    cancelled = writer.submit("INSERT INTO t VALUES (1)")
+    cancelled.cancel()
+    assert writer.submit("INSERT INTO t VALUES (2)").result(timeout=5) == 1
+    writer.close()
+
+
+def test_remote_writer_reconnects_after_the_server_returns(db_file, tmp_path, monkeypatch):
+    monkeypatch.setattr(storage_module, "RECONNECT_DELAY_SECONDS", 0.001)
+    local = BatchWriter(db_file)
+    address = str(tmp_path / "writer.sock")
+    server = WriteServer(local, address)
+    remote = RemoteWriter(address)
+    assert remote.submit("INSERT INTO t VALUES (1)").result(timeout=5) == 1
+
+    # The supervisor's writer goes away: the batch fails instead of hanging
+    server.close()
+    remote._client.close()
+    with pytest.raises(sqlite3.OperationalError):
+        remote.submit("INSERT INTO t VALUES (2)").result(timeout=5)
+
+    server = WriteServer(local, address)
+    assert remote.submit("INSERT INTO t VALUES (3)").result(timeout=5) == 1
+    assert remote.connections == 2
+    remote.close()
+    server.close()
+    local.flush(timeout=5)
+    assert sqlite3.connect(db_file).execute("SELECT x FROM t ORDER BY x").fetchall() == [(1,), (3,)]
+    local.close()
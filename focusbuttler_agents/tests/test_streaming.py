@@ -0,0 +1,196 @@
+import asyncio
+import json
+import sys
+from types import SimpleNamespace
+
+import httpx
+
+import main
+from agents.streaming import PartialJSONFields, stream_text
+from sse import _event_stream, format_event
+from teams.intent_router import TEAM
+
+# These modules share their names with the agents they define
+coach_module = sys.modules["agents.productivity_coach"]
+advisor_module = sys.modules["agents.energy_advisor"]
+team_module = sys.modules["teams.hyperfocus_team"]
+
+
+class FakeRunner:
+    """Streams `chunks` as run content events, then raises `error` or hangs if asked"""
+
+    def __init__(self, chunks, error=None, hang=False, name="Fake"):
+        self.name = name
+        self.chunks = chunks
+        self.error = error
+        self.hang = hang
+        self.prompts = []
+        self.closed = False
+
+    async def arun(self, prompt, stream=False, **kwargs):
+        self.prompts.append(prompt)
+        try:
+            yield SimpleNamespace(event="RunStarted", content=None)
+            for chunk in self.chunks:
+                yield SimpleNamespace(event="RunContent", content=chunk)
+                await asyncio.sleep(0)
+            if self.error is not None:
+                raise self.error
+            if self.hang:
+                await asyncio.Event().wait()
+            yield SimpleNamespace(event="RunCompleted", content="".join(self.chunks))
+        finally:
+            self.closed = True
+
+
+class FakeRequest:
+    def __init__(self, disconnect_after=None):
+        self.disconnect_after = disconnect_after
+        self.checks = 0
+
+    async def is_disconnected(self):
+        self.checks += 1
+        return self.disconnect_after is not None and self.checks > self.disconnect_after
+
+
+class FakeContextBuilder:
+    async def build(self, agent_name, user_id, message):
+        return message
+
+    def record_run(self, *args):
+        pass
+
+
+def _post(path, params):
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(path, params=params)
+
+    return asyncio.run(scenario())
+
+
+def _events(body):
+    """(event, data) pairs from an SSE body"""
+    events = []
+    for block in body.split("\n\n"):
+        if block.startswith("event: "):
+            event, data = block.split("\n")
+            events.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+def test_events_are_framed_as_sse():
+    assert format_event("token", {"text": "Hi\nthere"}) == 'event: token\ndata: {"text": "Hi\\nthere"}\n\n'
+
+
+def test_partial_json_fields_survive_chunks_split_mid_escape():
+    parser = PartialJSONFields()
+    deltas = []
+    for chunk in ['{"message": "Take a ', 'break \\', 'u2014 then', ' \\"focus\\""', ', "confidence": 0.', '9}']:
+        deltas += parser.feed(chunk)
+
+    assert "".join(delta for field, delta in deltas) == 'Take a break — then "focus"'
+    assert parser.fields == {"message": 'Take a break — then "focus"', "confidence": 0.9}
+    assert parser.done
+
+
+def test_stream_text_yields_only_content_and_closes_the_run():
+    runner = FakeRunner(["Hello", "", " world"])
+
+    async def scenario():
+        return [text async for text in stream_text(runner, "prompt")]
+
+    assert asyncio.run(scenario()) == ["Hello", " world"]
+    assert runner.closed
+
+
+def test_idle_stream_sends_heartbeats():
+    async def events():
+        await asyncio.sleep(0.05)
+        yield "token", {"text": "late"}
+
+    async def scenario():
+        return [frame async for frame in _event_stream(FakeRequest(), events(), heartbeat_seconds=0.01)]
+
+    frames = asyncio.run(scenario())
+    assert ": heartbeat\n\n" in frames
+    assert frames[-2:] == [format_event("token", {"text": "late"}), format_event("done", {})]
+
+
+def test_client_disconnect_cancels_the_model_run(monkeypatch):
+    runner = FakeRunner(["one", "two", "three"], hang=True, name="Coach")
+    enqueued = []
+    monkeypatch.setattr(coach_module, "productivity_coach", runner)
+    monkeypatch.setattr(coach_module, "context_builder", FakeContextBuilder())
+    monkeypatch.setattr(coach_module, "memory_consolidator", SimpleNamespace(enqueue=lambda *args: enqueued.append(args)))
+
+    async def scenario():
+        async def events():
+            async for token in coach_module.stream_coaching("u1", "Stuck"):
+                yield "token", {"text": token}
+
+        request = FakeRequest(disconnect_after=2)
+        return [frame async for frame in _event_stream(request, events(), heartbeat_seconds=1)]
+
+    frames = asyncio.run(scenario())
+    assert frames == [format_event("token", {"text": "one"}), format_event("token", {"text": "two"})]
+    assert runner.closed
+    assert enqueued == []  # A cut-off answer is not remembered
+
+
+def test_coaching_stream_ends_with_done(monkeypatch):
+    runner = FakeRunner(["Start ", "small."], name="Coach")
+    monkeypatch.setattr(coach_module, "productivity_coach", runner)
+    monkeypatch.setattr(coach_module, "context_builder", FakeContextBuilder())
+    monkeypatch.setattr(coach_module, "memory_consolidator", SimpleNamespace(enqueue=lambda *args: True))
+
+    response = _post("/v1/coaching/stream", {"user_id": "u1", "context": "Stuck"})
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert _events(response.text) == [
+        ("token", {"text": "Start "}),
+        ("token", {"text": "small."}),
+        ("done", {}),
+    ]
+
+
+def test_energy_stream_sends_fields_then_the_advice(monkeypatch):
+    advice = {
+        "current_recommendation": "Write the report",
+        "optimal_task_type": "purposeful",
+        "reasoning": "Peak energy",
+        "next_energy_shift": None,
+    }
+    text = json.dumps(advice)
+    runner = FakeRunner([text[:30], text[30:]], name="EnergyAdvisorStream")
+    monkeypatch.setattr(advisor_module, "energy_advisor_stream", runner)
+
+    response = _post("/v1/energy-advice/stream", {"current_energy": "peak", "hour_of_day": 9})
+    events = _events(response.text)
+
+    fields = [data for event, data in events if event == "field"]
+    assert fields[0]["field"] == "current_recommendation"
+    assert "".join(f["delta"] for f in fields if f["field"] == "reasoning") == "Peak energy"
+    assert events[-2][0] == "advice"
+    assert events[-2][1]["recommendation"] == "Write the report"
+    assert events[-1] == ("done", {})
+
+
+def test_team_stream_reports_a_failed_run_as_an_error_event(monkeypatch):
+    runner = FakeRunner(["Plan ", "the"], error=RuntimeError("model unavailable"), name="Team")
+    enqueued = []
+    monkeypatch.setattr(team_module, "hyperfocus_team", runner)
+    monkeypatch.setattr(team_module, "context_builder", FakeContextBuilder())
+    monkeypatch.setattr(team_module, "memory_consolidator", SimpleNamespace(enqueue=lambda *args: enqueued.append(args)))
+    monkeypatch.setattr(team_module.intent_router, "route", lambda question: (TEAM, "rule"))
+
+    response = _post("/v1/team-advice/stream", {"user_id": "u1", "question": "How should I plan my week?"})
+
+    assert _events(response.text) == [
+        ("token", {"text": "Plan "}),
+        ("token", {"text": "the"}),
+        ("error", {"detail": "model unavailable"}),
+    ]
+    assert runner.closed
+    assert enqueued == []
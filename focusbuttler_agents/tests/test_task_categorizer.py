@@ -0,0 +1,48 @@
+import asyncio
+import sys
+
+import pytest
+
+from agents.task_categorizer import TaskCategorization, TaskType
+
+# `agents.task_categorizer` is also the name of the categorizer agent
+module = sys.modules["agents.task_categorizer"]
+
+ANSWER = TaskCategorization(
+    category=TaskType.NECESSARY,
+    reasoning="Admin",
+    suggested_time_of_day="afternoon",
+    estimated_energy_required="low",
+)
+
+
+def test_titles_the_batch_agent_drops_are_categorized_concurrently(monkeypatch):
+    running = 0
+    peak = 0
+
+    async def drop_everything(titles):
+        return {}
+
+    async def categorize(title):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return ANSWER
+
+    monkeypatch.setattr(module, "_run_batch", drop_everything)
+    monkeypatch.setattr(module, "categorize_task", categorize)
+
+    async def run():
+        return await module._categorize_chunk([f"zqx task {i}" for i in range(6)], asyncio.Semaphore(3))
+
+    resolved = asyncio.run(run())
+    assert len(resolved) == 6
+    assert all(result is ANSWER for result in resolved.values())
+    assert peak == 3
+
+
+def test_batch_rejects_empty_chunks():
+    with pytest.raises(ValueError):
+        asyncio.run(module.categorize_tasks(["zqx task"], chunk_size=0))
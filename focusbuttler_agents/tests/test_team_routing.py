@@ -0,0 +1,37 @@
+import asyncio
+import sys
+from types import SimpleNamespace
+
+from agents.context_builder import ContextBuilder
+from core.storage import Storage
+from teams.intent_router import ENERGY
+
+# `teams.hyperfocus_team` is also the name of the team
+module = sys.modules["teams.hyperfocus_team"]
+
+
+class FakeMemoryDb:
+    def get_user_memories(self, user_id, limit):
+        return [SimpleNamespace(memory="The user has most energy before noon", updated_at=0)]
+
+
+def test_routed_question_carries_the_users_memories(tmp_path, monkeypatch):
+    builder = ContextBuilder(Storage(str(tmp_path / "context.db")))
+    builder._db = FakeMemoryDb()
+    prompts = []
+
+    async def arun(prompt, **kwargs):
+        prompts.append(prompt)
+        return SimpleNamespace(content="Do your deep work this morning.")
+
+    monkeypatch.setattr(module, "context_builder", builder)
+    monkeypatch.setattr(module, "energy_advisor", SimpleNamespace(arun=arun))
+    monkeypatch.setattr(module, "memory_consolidator", SimpleNamespace(enqueue=lambda *args: True))
+    monkeypatch.setattr(module.intent_router, "route", lambda question: (ENERGY, "rule"))
+
+    advice = asyncio.run(module.team_advice("u1", "When should I do deep work?"))
+
+    assert advice == "Do your deep work this morning."
+    (prompt,) = prompts
+    assert "The user has most energy before noon" in prompt
+    assert prompt.endswith("When should I do deep work?")
@@ -0,0 +1,44 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from agno.models.message import Message
+
+from benchmarks.fake_model import PROFILES, FakeChat
+from core.models import _instrumented
+from core.traffic import Anonymizer, traffic_recorder, use_replay_latencies
+
+
+def test_replayed_invocations_take_their_recorded_latencies():
+    model = _instrumented(FakeChat)(id="mistral-small-latest", profile=PROFILES["slow"])
+    run = SimpleNamespace(agent_name="ProductivityCoach")
+    messages = [Message(role="user", content="Plan my morning")]
+    recorded = [
+        ["ProductivityCoach", "mistral-small-latest", 40.0, None, "ok"],
+        ["ProductivityCoach", "mistral-small-latest", 120.0, 30.0, "ok"],
+    ]
+
+    async def replay():
+        use_replay_latencies(json.dumps(recorded))
+        calls = traffic_recorder.begin()
+        await model.ainvoke(messages=messages, run_response=run)
+        async for _ in model.ainvoke_stream(messages=messages, run_response=run):
+            pass
+        return calls
+
+    calls = asyncio.run(replay())
+    # One record per invocation, timed like the recorded one it replayed
+    assert [call[:2] for call in calls] == [["ProductivityCoach", "mistral-small-latest"]] * 2
+    assert 40 <= calls[0][2] < 90
+    assert calls[0][3] is None
+    assert 120 <= calls[1][2] < 170
+    assert 30 <= calls[1][3] < 80
+
+
+def test_only_allow_listed_words_survive_anonymization():
+    anonymizer = Anonymizer(b"salt")
+    text = anonymizer.text("Write the focus report during my peak hyperfocus morning")
+    words = text.split()
+    assert words[6:] == ["peak", "hyperfocus", "morning"]
+    assert all(word.startswith("x") for word in words[:6])
+    assert anonymizer.text("Write the report") == anonymizer.text("Write the report")
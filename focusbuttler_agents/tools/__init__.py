@@ -1 +1,10 @@
-"""Empty init for tools module"""
+"""Tools module initialization"""
+
+from .event_tools import distractions_per_session, energy_by_hour
+from .knowledge_tools import search_hyperfocus_knowledge
+
+__all__ = [
+    "distractions_per_session",
+    "energy_by_hour",
+    "search_hyperfocus_knowledge",
+]
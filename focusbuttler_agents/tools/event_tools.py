@@ -0,0 +1,59 @@
+"""
+Event Tools
+
+Agent tools over the user's own event history in the columnar event store
+(see analytics/event_store.py). The user is taken from the run, so the
+model can only query the person it is talking to.
+"""
+
+import json
+
+
+def distractions_per_session(days: int = 14, run_context=None, agent=None) -> str:
+    """Look up the user's focus sessions and how many distractions each one had.
+
+    Args:
+        days: How many days back to look, e.g. 14 for the last two weeks.
+
+    Returns:
+        One JSON line per session (start, mode, completed, minutes, distractions),
+        or a note that there is no history.
+    """
+    from analytics.event_store import event_store
+
+    user_id = _user_id(run_context, agent)
+    if not user_id:
+        return "No user for this run."
+    sessions = event_store.distractions_per_session(user_id, _clamp(days))
+    if not sessions:
+        return f"No focus sessions logged in the last {days} days."
+    return "\n".join(json.dumps(session) for session in sessions)
+
+
+def energy_by_hour(days: int = 14, run_context=None, agent=None) -> str:
+    """Look up the user's average logged energy for each hour of the day (UTC).
+
+    Args:
+        days: How many days back to look.
+
+    Returns:
+        Mean energy per hour on a 0 (exhausted) to 4 (peak) scale,
+        or a note that there is no history.
+    """
+    from analytics.event_store import event_store
+
+    user_id = _user_id(run_context, agent)
+    if not user_id:
+        return "No user for this run."
+    hours = event_store.energy_by_hour(user_id, _clamp(days))
+    if not hours:
+        return f"No energy logged in the last {days} days."
+    return ", ".join(f"{hour:02d}:00 {mean}" for hour, mean in hours.items())
+
+
+def _user_id(run_context, agent) -> str:
+    return getattr(run_context, "user_id", None) or getattr(agent, "user_id", None) or ""
+
+
+def _clamp(days: int) -> int:
+    return max(1, min(int(days), 365))
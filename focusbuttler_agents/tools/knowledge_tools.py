@@ -0,0 +1,24 @@
+"""
+Knowledge Tools
+
+Agent tools for grounding answers in the Hyperfocus methodology using the
+local BM25 index (no vector store or embedding call needed).
+"""
+
+from knowledge.bm25_index import get_index
+
+
+def search_hyperfocus_knowledge(query: str, limit: int = 3) -> str:
+    """Search the Hyperfocus book and core concepts for passages about a topic.
+
+    Args:
+        query: What to look up, e.g. "recovering from distractions".
+        limit: Maximum number of passages to return.
+
+    Returns:
+        The most relevant passages, or a note that nothing matched.
+    """
+    results = get_index().search(query, limit)
+    if not results:
+        return "No matching Hyperfocus passages found."
+    return "\n\n".join(f"[{doc['title']}]\n{doc['text'][:1200]}" for doc, _ in results)
@@ -45,6 +45,33 @@ class AgentEndpoint extends Endpoint {
     return TaskType.purposeful;
   }
 
+  /// Get AI categorizations for many tasks with one batched agent request
+  Future<List<TaskType>> categorizeTasks(
+    Session session,
+    List<String> taskTitles,
+  ) async {
+    try {
+      final response = await http.post(
+        Uri.parse('$_agnoUrl/v1/categorize/batch'),
+        headers: {'Content-Type': 'application/json'},
+        body: jsonEncode(taskTitles),
+      );
+
+      if (response.statusCode == 200) {
+        final data = jsonDecode(response.body);
+        final results = data['results'] as List<dynamic>;
+        return results
+            .map((r) => TaskType.fromJson(r['category'] as String))
+            .toList();
+      }
+    } catch (e) {
+      session.log('Agent batch categorization failed: $e');
+    }
+
+    // Fallback to purposeful if agent unavailable
+    return List.filled(taskTitles.length, TaskType.purposeful);
+  }
+
   /// Get productivity coaching insight from the agent
   Future<AIInsight> getCoachingInsight(
     Session session,